@@ -0,0 +1,192 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Structured events of Ansible playbook executions.
+
+ansible-runner hands every event of a playbook to an ``event_handler`` and
+every change of the job status to a ``status_handler`` while the playbook
+runs. `AnsibleEventStream` plugs into both and turns the task events into
+compact `AnsibleTaskResult` records, so the callers of
+`utils.run_ansible_playbook` know what happened on which host without
+parsing the artifacts or the output of the playbook.
+"""
+
+import collections
+import datetime
+import logging
+
+
+LOG = logging.getLogger(__name__ + ".ansible_events")
+
+AnsibleTaskResult = collections.namedtuple(
+    'AnsibleTaskResult',
+    ['host', 'play', 'task', 'status', 'duration', 'changed', 'failed', 'msg',
+     'role', 'start']
+)
+# The Ansible role and the start time of the task are optional
+AnsibleTaskResult.__new__.__defaults__ = (None, None)
+
+# Status of the task results for the ansible-runner events
+_TASK_EVENTS = {
+    'runner_on_ok': 'ok',
+    'runner_on_failed': 'failed',
+    'runner_on_unreachable': 'unreachable',
+    'runner_on_skipped': 'skipped',
+}
+
+
+def parse_timestamp(value):
+    """Parse the timestamp of an ansible-runner event.
+
+    :param value: Timestamp, like '2020-06-01T10:00:00.000000'.
+    :type value: String
+
+    :returns: datetime or None when the value is not a timestamp.
+    """
+
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f')
+    except (TypeError, ValueError):
+        return None
+
+
+class AnsibleEventStream(object):
+    """Task results and statistics of a playbook execution.
+
+    The instance is given to `utils.run_ansible_playbook` which registers
+    `event_handler` and `status_handler` with ansible-runner.
+    """
+
+    def __init__(self, callback=None, keep_results=True):
+        """Create an empty stream.
+
+        :param callback: Called with every `AnsibleTaskResult` as soon as
+                         the task finishes on a host.
+        :type callback: Callable
+
+        :param keep_results: Keep the task results in `results`.
+        :type keep_results: Boolean
+        """
+
+        self.callback = callback
+        self.keep_results = keep_results
+        self.results = []
+        self.hosts = collections.OrderedDict()
+        self.plays = collections.OrderedDict()
+        self.stats = {}
+        self.status = None
+        self.start = None
+        self.end = None
+
+    def event_handler(self, event):
+        """Handle an ansible-runner event.
+
+        :param event: Event of ansible-runner.
+        :type event: Dictionary
+
+        :returns: True, ansible-runner keeps writing the event to the
+                  artifacts.
+        """
+
+        created = parse_timestamp(event.get('created'))
+        if created:
+            self.start = min(self.start or created, created)
+            self.end = max(self.end or created, created)
+
+        kind = event.get('event')
+        data = event.get('event_data') or {}
+        if kind == 'playbook_on_play_start':
+            self.plays[data.get('play_uuid')] = data.get('play_pattern')
+        elif kind == 'playbook_on_stats':
+            for key in ('ok', 'changed', 'failures', 'dark', 'skipped',
+                        'ignored', 'rescued'):
+                self.stats[key] = data.get(key) or {}
+        elif kind in _TASK_EVENTS:
+            self._task_result(_TASK_EVENTS[kind], data)
+        return True
+
+    def _task_result(self, status, data):
+        res = data.get('res') or {}
+        if not isinstance(res, dict):
+            res = {}
+        failed = status == 'unreachable' or (
+            status == 'failed' and not data.get('ignore_errors'))
+        result = AnsibleTaskResult(
+            host=data.get('host') or data.get('remote_addr'),
+            play=data.get('play'),
+            task=data.get('task'),
+            status=status,
+            duration=data.get('duration'),
+            changed=bool(res.get('changed')),
+            failed=failed,
+            msg=res.get('msg') if failed else None,
+            role=data.get('role'),
+            start=data.get('start')
+        )
+        self.hosts.setdefault(result.host, True)
+        if self.keep_results:
+            self.results.append(result)
+        if self.callback:
+            try:
+                self.callback(result)
+            except Exception as e:
+                LOG.warning('Ansible event callback failed: %s' % e)
+
+    def status_handler(self, status, runner_config=None):
+        """Handle an ansible-runner status change.
+
+        :param status: Status of ansible-runner.
+        :type status: Dictionary
+        """
+
+        self.status = status.get('status')
+
+    @property
+    def failures(self):
+        """Results of the tasks which failed, ignored errors excluded."""
+
+        return [r for r in self.results if r.failed]
+
+    @property
+    def duration(self):
+        """Time elapsed between the first and the last event."""
+
+        if self.start is None:
+            return None
+        return self.end - self.start
+
+    def host_status(self):
+        """Return the final status of every host.
+
+        :returns: Dictionary of the host names to 'unreachable', 'failed'
+                  or 'ok'.
+        """
+
+        status = collections.OrderedDict()
+        hosts = list(self.hosts)
+        for key in ('ok', 'failures', 'dark'):
+            hosts.extend(h for h in self.stats.get(key, {})
+                         if h not in hosts)
+        # The statistics are missing when the playbook was interrupted
+        failed = dict((r.host, r.status) for r in self.failures)
+        for host in hosts:
+            if (self.stats.get('dark', {}).get(host) or
+                    failed.get(host) == 'unreachable'):
+                status[host] = 'unreachable'
+            elif self.stats.get('failures', {}).get(host) or host in failed:
+                status[host] = 'failed'
+            else:
+                status[host] = 'ok'
+        return status
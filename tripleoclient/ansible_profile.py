@@ -0,0 +1,270 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Timing profiles of the config-download runs.
+
+Every config-download run writes the timing of its tasks to a JSON lines
+file in the ``profiles`` directory of the stack work directory, one record
+per task and host::
+
+    {"task": "Start containers for step 2", "role": "tripleo_container_manage",
+     "host": "controller-0", "play": "Deploy step tasks for 2", "step": 2,
+     "status": "ok", "start": "2020-06-01T10:00:00.200000", "duration": 41.2}
+
+The records are written as soon as the tasks finish, so the profile of an
+interrupted run is kept too. `summarize` and `compare` rank the records for
+``openstack overcloud deploy profile show``.
+"""
+
+import collections
+import datetime
+import glob
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from tripleoclient import ansible_events
+from tripleoclient import constants
+from tripleoclient import exceptions
+
+
+LOG = logging.getLogger(__name__ + ".ansible_profile")
+
+GROUP_BY = ('task', 'step', 'host', 'role')
+
+ProfileEntry = collections.namedtuple(
+    'ProfileEntry', ['name', 'count', 'elapsed', 'total', 'longest'])
+
+# The deploy step plays are named like 'Deploy step tasks for 3' or
+# 'External deployment step 2'
+_STEP = re.compile(r'\b(?:step|for)\s+(\d+)\s*$', re.IGNORECASE)
+
+
+def task_step(play):
+    """Return the deployment step of a play.
+
+    :param play: Name of the play.
+    :type play: String
+
+    :returns: Integer or None when the play does not run a step.
+    """
+
+    match = _STEP.search(play or '')
+    return int(match.group(1)) if match else None
+
+
+def profile_dir(work_dir):
+    """Return the directory of the profiles of a stack work directory."""
+
+    return os.path.join(work_dir, constants.DEPLOY_PROFILE_DIR)
+
+
+def new_profile_path(work_dir):
+    """Return the path of the profile of a new run.
+
+    The runs of other processes started in the same second get other paths,
+    `ProfileWriter` picks another one when the path is taken anyway.
+
+    :param work_dir: Stack work directory.
+    :type work_dir: String
+
+    :returns: String
+    """
+
+    return os.path.join(profile_dir(work_dir), '{}-{}.jsonl'.format(
+        time.strftime('%Y%m%d-%H%M%S'), os.getpid()))
+
+
+def list_profiles(work_dir):
+    """Return the profiles of a stack work directory, oldest first.
+
+    :param work_dir: Stack work directory.
+    :type work_dir: String
+
+    :returns: List of paths.
+    """
+
+    return sorted(glob.glob(os.path.join(profile_dir(work_dir), '*.jsonl')))
+
+
+class ProfileWriter(object):
+    """Write the task results of a playbook run to a profile.
+
+    The instance is the callback of an `ansible_events.AnsibleEventStream`.
+    The profile is created with the first task result, a run which does not
+    execute any task leaves no profile behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._file = None
+        # The playbooks run concurrently share the profile
+        self._lock = threading.Lock()
+
+    def __call__(self, result):
+        with self._lock:
+            self._write(result)
+
+    def _write(self, result):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self._file = self._create()
+        record = collections.OrderedDict([
+            ('task', result.task),
+            ('role', result.role),
+            ('host', result.host),
+            ('play', result.play),
+            ('step', task_step(result.play)),
+            ('status', result.status),
+            ('start', result.start),
+            ('duration', result.duration),
+        ])
+        self._file.write(json.dumps(record) + '\n')
+        self.records += 1
+
+    def _create(self):
+        base, ext = os.path.splitext(self.path)
+        for attempt in itertools.count(1):
+            try:
+                # Line buffered, the records survive an interrupted run
+                return open(self.path, 'x', 1)
+            except FileExistsError:
+                # Never overwrite the profile of another run
+                self.path = '{}-{}{}'.format(base, attempt, ext)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def load_profile(path):
+    """Read the records of a profile.
+
+    :param path: Path of the profile.
+    :type path: String
+
+    :returns: List of dictionaries.
+    """
+
+    if not os.path.isfile(path):
+        raise exceptions.NotFound('Profile %s does not exist' % path)
+    records = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # The last record of an interrupted run may be truncated
+                LOG.warning('Ignoring invalid record %s of %s' %
+                            (number, path))
+    return records
+
+
+def _rank_by(group_by):
+    # The tasks of a step run in parallel on the hosts, the time spent in
+    # a step is the time elapsed between its first and its last task
+    return 'elapsed' if group_by == 'step' else 'total'
+
+
+def summarize(records, group_by='task'):
+    """Rank the records of a profile, slowest first.
+
+    The steps are ranked by the time elapsed between the start of their
+    first task and the end of their last task, the tasks, hosts and roles
+    by the total duration of their tasks.
+
+    :param records: Records of a profile.
+    :type records: List
+
+    :param group_by: Field grouping the records, one of `GROUP_BY`.
+    :type group_by: String
+
+    :returns: List of `ProfileEntry`.
+    """
+
+    groups = collections.OrderedDict()
+    for record in records:
+        name = record.get(group_by)
+        if name is None:
+            continue
+        duration = record.get('duration') or 0.0
+        group = groups.get(name)
+        if group is None:
+            group = groups[name] = [0, 0.0, 0.0, None, None]
+        group[0] += 1
+        group[1] += duration
+        group[2] = max(group[2], duration)
+        start = ansible_events.parse_timestamp(record.get('start'))
+        if start:
+            end = start + datetime.timedelta(seconds=duration)
+            group[3] = min(group[3] or start, start)
+            group[4] = max(group[4] or end, end)
+
+    entries = []
+    for name, (count, total, longest, first, last) in groups.items():
+        if first is None:
+            elapsed = longest
+        else:
+            elapsed = (last - first).total_seconds()
+        entries.append(ProfileEntry(name, count, elapsed, total, longest))
+    rank_by = _rank_by(group_by)
+    return sorted(entries, key=lambda e: getattr(e, rank_by), reverse=True)
+
+
+def compare(before, after, group_by='task'):
+    """Compare the records of two profiles.
+
+    :param before: Records of the earlier profile.
+    :type before: List
+
+    :param after: Records of the later profile.
+    :type after: List
+
+    :param group_by: Field grouping the records, one of `GROUP_BY`.
+    :type group_by: String
+
+    :returns: List of (name, before, after, delta) tuples, the largest
+              slowdown first. The time of a group missing from a profile
+              is None.
+    """
+
+    rank_by = _rank_by(group_by)
+    times_before = collections.OrderedDict(
+        (e.name, getattr(e, rank_by)) for e in summarize(before, group_by))
+    rows = []
+    for entry in summarize(after, group_by):
+        time_after = getattr(entry, rank_by)
+        time_before = times_before.pop(entry.name, None)
+        rows.append((entry.name, time_before, time_after,
+                     time_after - (time_before or 0.0)))
+    for name, time_before in times_before.items():
+        rows.append((name, time_before, None, -time_before))
+    return sorted(rows, key=lambda r: r[3], reverse=True)
@@ -0,0 +1,195 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Concurrent execution of independent playbooks.
+
+The playbooks of a list run one after the other, in the order of the list.
+The entries of the list may declare the inventory groups their playbook
+targets and the playbooks it requires::
+
+    - playbook: update_steps_playbook.yaml
+      hosts: [Controller]
+    - playbook: external_update_steps_playbook.yaml
+      hosts: [Undercloud]
+    - playbook: post_update_playbook.yaml
+      requires: [update_steps_playbook.yaml]
+
+A playbook runs after the playbooks it requires, and after the playbooks
+listed before it which share hosts with it. A playbook which does not
+declare its hosts targets all of them. Above, the first two playbooks run
+concurrently and the last one once the first one is done, and the second
+one too since it targets all the hosts.
+"""
+
+import collections
+import logging
+
+from concurrent import futures
+
+import six
+
+from tripleoclient import exceptions
+from tripleoclient import yaml_utils
+
+
+LOG = logging.getLogger(__name__ + ".ansible_scheduler")
+
+# The hosts of a playbook are None when it targets all the hosts
+PlaybookNode = collections.namedtuple(
+    'PlaybookNode', ['playbook', 'hosts', 'requires'])
+
+
+def _entry(entry):
+    if isinstance(entry, six.string_types):
+        return entry, None, []
+    if not isinstance(entry, dict) or not entry.get('playbook'):
+        raise exceptions.InvalidConfiguration(
+            'Invalid playbook entry: {}'.format(entry))
+    hosts = entry.get('hosts')
+    if isinstance(hosts, six.string_types):
+        hosts = [hosts]
+    requires = entry.get('requires') or []
+    if isinstance(requires, six.string_types):
+        requires = [requires]
+    return entry['playbook'], hosts, requires
+
+
+def load_playbooks(path):
+    """Read a list of playbooks from a YAML file.
+
+    :param path: Path of the file.
+    :type path: String
+
+    :returns: List of playbook names or dictionaries.
+    """
+
+    try:
+        with open(path) as f:
+            playbooks = yaml_utils.safe_load(f)
+    except (IOError, yaml_utils.YAMLError) as e:
+        raise exceptions.InvalidConfiguration(
+            'Unable to read the playbooks of {}: {}'.format(path, e))
+    if not isinstance(playbooks, list) or not playbooks:
+        raise exceptions.InvalidConfiguration(
+            '{} does not contain a list of playbooks'.format(path))
+    return playbooks
+
+
+def playbook_nodes(playbooks, resolve_hosts=None):
+    """Build the dependency graph of a list of playbooks.
+
+    :param playbooks: Playbook names or dictionaries with the playbook, the
+                      inventory groups it targets and the playbooks it
+                      requires.
+    :type playbooks: List
+
+    :param resolve_hosts: Return the hosts of a list of inventory groups,
+                          None when they can not be resolved. The group
+                          names are compared when not provided.
+    :type resolve_hosts: Callable
+
+    :returns: List of `PlaybookNode`, in the order of the list. The
+              requirements of a node cover all the playbooks it must run
+              after.
+    """
+
+    nodes = []
+    for entry in playbooks:
+        playbook, groups, requires = _entry(entry)
+        names = [n.playbook for n in nodes]
+        if playbook in names:
+            raise exceptions.InvalidConfiguration(
+                'Playbook {} is listed twice'.format(playbook))
+        for name in requires:
+            if name not in names:
+                # Requiring the playbooks listed before only keeps the
+                # graph free of cycles
+                raise exceptions.InvalidConfiguration(
+                    'Playbook {} requires {} which is not listed before '
+                    'it'.format(playbook, name))
+
+        hosts = None
+        if groups:
+            hosts = resolve_hosts(groups) if resolve_hosts else set(groups)
+        after = set(requires)
+        for node in nodes:
+            if hosts is None or node.hosts is None or hosts & node.hosts:
+                after.add(node.playbook)
+        nodes.append(PlaybookNode(
+            playbook,
+            frozenset(hosts) if hosts is not None else None,
+            [n for n in names if n in after]))
+    return nodes
+
+
+def is_sequential(nodes):
+    """Return True when every playbook must run after the previous one."""
+
+    return all(nodes[i - 1].playbook in nodes[i].requires
+               for i in range(1, len(nodes)))
+
+
+def run_playbooks(nodes, run, workers):
+    """Run the playbooks after their requirements.
+
+    The playbooks which are ready run concurrently. Once a playbook
+    failed, the playbooks which did not start are not run.
+
+    :param nodes: Dependency graph of the playbooks.
+    :type nodes: List of `PlaybookNode`
+
+    :param run: Run a playbook, called with its `PlaybookNode` and
+                returning its return code.
+    :type run: Callable
+
+    :param workers: Maximum number of playbooks running at the same time.
+    :type workers: Integer
+
+    :returns: Ordered dictionary of the playbooks which ran to their
+              return code.
+    """
+
+    if workers < 1:
+        raise ValueError('At least one worker is needed to run playbooks')
+    results = collections.OrderedDict()
+    pending = list(nodes)
+    running = {}
+    failed = False
+    with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for node in list(pending):
+                if failed or len(running) >= workers:
+                    break
+                if all(results.get(r) == 0 for r in node.requires):
+                    LOG.info('Starting playbook {}'.format(node.playbook))
+                    running[pool.submit(run, node)] = node
+                    pending.remove(node)
+            if not running:
+                # Done, or the requirements of the pending playbooks failed
+                break
+            done, _ = futures.wait(
+                running, return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                try:
+                    results[node.playbook] = future.result()
+                except Exception as e:
+                    LOG.error('Playbook {} failed: {}'.format(
+                        node.playbook, e))
+                    results[node.playbook] = 1
+                failed = failed or results[node.playbook] != 0
+    return collections.OrderedDict(
+        (n.playbook, results[n.playbook]) for n in nodes
+        if n.playbook in results)
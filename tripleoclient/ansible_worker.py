@@ -0,0 +1,392 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Warm Ansible workers for localhost-only playbook executions.
+
+Most of the `cli-*.yaml` playbooks run against ``localhost,`` and spend more
+time starting ``ansible-playbook`` than running tasks. A worker is a long
+lived python process which imports Ansible once, using the ``ANSIBLE_*``
+environment of the playbooks it serves, and then forks a child for every
+playbook it is asked to run. The children start with Ansible already
+loaded, so each playbook only costs its task time.
+
+Workers talk to the client with one JSON document per line on their stdin
+and stdout. The client side is `AnsibleWorkerPool`, the worker side is
+`serve`.
+"""
+
+from __future__ import print_function
+
+import atexit
+import collections
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from tripleoclient import exceptions
+
+
+LOG = logging.getLogger(__name__ + ".ansible_worker")
+
+# ansible-runner uses the same return code when a job times out.
+TIMEOUT_RC = 254
+
+
+# Plugin and role search paths of a job, which hold its working directory,
+# and the plugin loader of Ansible each one feeds. They are applied to
+# every job instead of being read when Ansible is imported.
+_JOB_PATHS = (
+    ('ANSIBLE_LIBRARY', 'module_loader'),
+    ('ANSIBLE_ACTION_PLUGINS', 'action_loader'),
+    ('ANSIBLE_CALLBACK_PLUGINS', 'callback_loader'),
+    ('ANSIBLE_FILTER_PLUGINS', 'filter_loader'),
+    ('ANSIBLE_LOOKUP_PLUGINS', 'lookup_loader'),
+    ('ANSIBLE_ROLES_PATH', None),
+)
+
+
+def _worker_env(env):
+    """Return the environment a worker imports Ansible with.
+
+    :param env: Environment of the job.
+    :type env: Dictionary
+
+    :returns: Dictionary
+    """
+
+    job_paths = set(var for var, _ in _JOB_PATHS)
+    return dict((k, v) for k, v in env.items() if k not in job_paths)
+
+
+def _worker_key(env):
+    """Return the part of an environment which shapes a worker.
+
+    Ansible reads its configuration from the ``ANSIBLE_*`` variables when
+    it is imported, so only jobs sharing those variables can share a
+    worker. The plugin and role paths of the jobs are left out, see
+    `_apply_job_paths`.
+
+    :param env: Environment of the job.
+    :type env: Dictionary
+
+    :returns: Frozenset
+    """
+
+    return frozenset(
+        (k, v) for k, v in _worker_env(env).items()
+        if k.startswith('ANSIBLE_')
+    )
+
+
+def _apply_job_paths(env, loader, constants):
+    """Add the plugin and role paths of a job to an imported Ansible.
+
+    :param env: Environment of the job.
+    :type env: Dictionary
+
+    :param loader: The `ansible.plugins.loader` module.
+    :type loader: Module
+
+    :param constants: The `ansible.constants` module.
+    :type constants: Module
+    """
+
+    for var, name in _JOB_PATHS:
+        paths = [os.path.expanduser(p)
+                 for p in env.get(var, '').split(os.pathsep) if p]
+        if name is None:
+            constants.DEFAULT_ROLES_PATH = paths + [
+                p for p in constants.DEFAULT_ROLES_PATH if p not in paths]
+        else:
+            for path in paths:
+                getattr(loader, name).add_directory(path)
+
+
+class AnsibleWorker(object):
+    """Client side handle of a single warm worker process."""
+
+    def __init__(self, env):
+        """Start a worker process.
+
+        :param env: Environment used to import Ansible in the worker.
+        :type env: Dictionary
+        """
+
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'tripleoclient.ansible_worker'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            universal_newlines=True
+        )
+        ready = self._receive()
+        if not ready.get('ready'):
+            self.stop()
+            raise exceptions.AnsibleWorkerError(
+                'Ansible worker failed to start: {}'.format(
+                    ready.get('error')
+                )
+            )
+
+    def _receive(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise exceptions.AnsibleWorkerError(
+                'Ansible worker {} exited unexpectedly'.format(
+                    self.process.pid
+                )
+            )
+        return json.loads(line)
+
+    def run(self, command, env, cwd, timeout=None, quiet=False):
+        """Run a single ansible-playbook command line in the worker.
+
+        :param command: ansible-playbook command line.
+        :type command: List
+
+        :param env: Environment of the job.
+        :type env: Dictionary
+
+        :param cwd: Working directory of the job.
+        :type cwd: String
+
+        :param timeout: Timeout for the job to finish (seconds).
+        :type timeout: Integer
+
+        :param quiet: Disable all output.
+        :type quiet: Boolean
+
+        :returns: Tuple (status, rc)
+        """
+
+        self.process.stdin.write(
+            json.dumps({
+                'command': list(command),
+                'env': env,
+                'cwd': cwd,
+                'timeout': timeout,
+                'quiet': quiet
+            }) + '\n'
+        )
+        self.process.stdin.flush()
+        result = self._receive()
+        return result['status'], result['rc']
+
+    def stop(self):
+        """Stop the worker process."""
+
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=10)
+            except (IOError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+
+
+class AnsibleWorkerPool(object):
+    """Bounded pool of warm Ansible workers.
+
+    Workers are started on demand, one per distinct ``ANSIBLE_*``
+    environment besides the plugin and role paths, and kept for the whole
+    CLI invocation. When the pool is
+    full the least recently used worker is stopped.
+    """
+
+    def __init__(self, size=1):
+        """Create an empty pool.
+
+        :param size: Maximum number of workers kept alive.
+        :type size: Integer
+        """
+
+        self.size = max(int(size), 1)
+        self.workers = collections.OrderedDict()
+
+    def _get_worker(self, env):
+        key = _worker_key(env)
+        worker = self.workers.pop(key, None)
+        if worker is None or worker.process.poll() is not None:
+            while len(self.workers) >= self.size:
+                _, evicted = self.workers.popitem(last=False)
+                evicted.stop()
+            LOG.debug('Starting a warm Ansible worker')
+            worker = AnsibleWorker(env=_worker_env(env))
+        self.workers[key] = worker
+        return worker
+
+    def run(self, command, env, cwd, timeout=None, quiet=False):
+        """Run an ansible-playbook command line in a warm worker.
+
+        See `AnsibleWorker.run`.
+
+        :returns: Tuple (status, rc)
+        """
+
+        worker = self._get_worker(env=env)
+        try:
+            return worker.run(
+                command=command,
+                env=env,
+                cwd=cwd,
+                timeout=timeout,
+                quiet=quiet
+            )
+        except (exceptions.AnsibleWorkerError, IOError):
+            self.workers.pop(_worker_key(env), None)
+            worker.stop()
+            raise
+
+    def shutdown(self):
+        """Stop all the workers of the pool."""
+
+        while self.workers:
+            _, worker = self.workers.popitem()
+            worker.stop()
+
+
+_POOL = None
+
+
+def get_pool(size=1):
+    """Return the process wide worker pool, creating it on first use.
+
+    :param size: Maximum number of workers kept alive.
+    :type size: Integer
+
+    :returns: `AnsibleWorkerPool`
+    """
+
+    global _POOL
+    if _POOL is None:
+        _POOL = AnsibleWorkerPool(size=size)
+        atexit.register(_POOL.shutdown)
+    return _POOL
+
+
+def _load_executor():
+    """Import Ansible and return a callable running a command line."""
+
+    from ansible import cli
+    from ansible.cli import playbook
+    from ansible import constants
+    from ansible.plugins import loader
+
+    if hasattr(cli.CLI, 'cli_executor'):
+        def _run(command):
+            return playbook.PlaybookCLI.cli_executor(command)
+    else:
+        def _run(command):
+            return playbook.PlaybookCLI(command).run()
+
+    def _executor(command):
+        # Run in the child of the job, its environment is already set
+        _apply_job_paths(os.environ, loader, constants)
+        return _run(command)
+    return _executor
+
+
+def _run_child(job, executor):
+    """Run a job in a freshly forked child, never returns."""
+
+    rc = 1
+    try:
+        os.chdir(job['cwd'])
+        os.environ.update(job['env'])
+        if job.get('quiet'):
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, 1)
+            os.dup2(devnull, 2)
+        else:
+            # NOTE: stdout carries the worker protocol, send the playbook
+            # output to the terminal instead.
+            os.dup2(2, 1)
+        rc = executor(job['command'])
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else 1
+    except BaseException as e:
+        print('Ansible worker job failed: {}'.format(e), file=sys.stderr)
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(rc or 0)
+
+
+def _wait_child(pid, timeout=None):
+    """Wait for a child and return the tuple (status, rc)."""
+
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        waited, status = os.waitpid(pid, os.WNOHANG if deadline else 0)
+        if waited:
+            break
+        if time.time() > deadline:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+            return 'timeout', TIMEOUT_RC
+        time.sleep(0.05)
+
+    if os.WIFSIGNALED(status):
+        rc = -os.WTERMSIG(status)
+    else:
+        rc = os.WEXITSTATUS(status)
+    return ('successful' if rc == 0 else 'failed'), rc
+
+
+def serve(stdin, stdout, executor):
+    """Serve jobs from stdin until it is closed.
+
+    :param stdin: Stream the jobs are read from.
+    :type stdin: File
+
+    :param stdout: Stream the results are written to.
+    :type stdout: File
+
+    :param executor: Callable running an ansible-playbook command line and
+                     returning its return code.
+    :type executor: Callable
+    """
+
+    for line in iter(stdin.readline, ''):
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        pid = os.fork()
+        if pid == 0:
+            _run_child(job, executor)
+        status, rc = _wait_child(pid, timeout=job.get('timeout'))
+        stdout.write(json.dumps({'status': status, 'rc': rc}) + '\n')
+        stdout.flush()
+
+
+def main():
+    try:
+        executor = _load_executor()
+    except Exception as e:
+        print(json.dumps({'ready': False, 'error': str(e)}), flush=True)
+        return 1
+    print(json.dumps({'ready': True}), flush=True)
+    serve(sys.stdin, sys.stdout, executor)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Reachability probes of the BMCs of the nodes to import.
+
+The BMC of an IPMI node answers an RMCP presence ping on UDP port 623, the
+BMCs managed over HTTPS (Redfish, iDRAC, iLO, iRMC) accept TCP connections
+on port 443. The probes only check that the BMC answers, not the
+credentials of the nodes.
+"""
+
+import itertools
+import logging
+import socket
+import struct
+import time
+
+from concurrent import futures
+
+from six.moves.urllib import parse
+
+from tripleoclient import constants
+
+
+LOG = logging.getLogger(__name__ + ".bmc_probe")
+
+IPMI_PORT = 623
+HTTPS_PORT = 443
+# Drivers managing the nodes over HTTPS, by prefix of their pm_type
+_HTTPS_DRIVERS = ('redfish', 'idrac', 'ilo', 'irmc')
+
+# RMCP header (version 6, no acknowledge, ASF class) and ASF presence ping
+# (IANA enterprise number 4542, message type 0x80) of RFC 4542
+_RMCP_PING = struct.Struct('!BBBBIBBBB')
+_ASF_IANA = 4542
+_ASF_PING = 0x80
+_ASF_PONG = 0x40
+_tags = itertools.count()
+
+
+def probe_target(node):
+    """Return the BMC endpoint of a node.
+
+    :param node: Node of an instackenv file.
+    :type node: Dictionary
+
+    :returns: Tuple (protocol, host, port), None when the driver of the node
+              is not probed.
+    """
+
+    pm_type = node.get('pm_type') or ''
+    if 'ipmi' in pm_type:
+        address = node.get('pm_addr') or node.get('ipmi_address')
+        port = node.get('pm_port') or node.get('ipmi_port') or IPMI_PORT
+        protocol = 'ipmi'
+    else:
+        driver = [d for d in _HTTPS_DRIVERS if pm_type.startswith(d)]
+        if not driver:
+            return None
+        address = (node.get('pm_addr') or
+                   node.get('%s_address' % driver[0]))
+        port = node.get('pm_port') or HTTPS_PORT
+        protocol = 'https'
+        if address and '://' in address:
+            url = parse.urlparse(address)
+            address = url.hostname
+            port = url.port or (80 if url.scheme == 'http' else HTTPS_PORT)
+    if not address:
+        return None
+    return protocol, address, int(port)
+
+
+def rmcp_ping(host, port=IPMI_PORT, timeout=constants.BMC_PROBE_TIMEOUT):
+    """Check that an IPMI BMC answers an RMCP presence ping.
+
+    :param host: Address of the BMC.
+    :type host: String
+
+    :param port: UDP port of the BMC.
+    :type port: Integer
+
+    :param timeout: Seconds to wait for the answer.
+    :type timeout: Float
+
+    :raises: socket.error, socket.timeout when the BMC does not answer.
+    """
+
+    tag = next(_tags) % 255
+    family, _, _, _, address = socket.getaddrinfo(
+        host, port, 0, socket.SOCK_DGRAM)[0]
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    try:
+        deadline = time.time() + timeout
+        sock.settimeout(timeout)
+        sock.sendto(_RMCP_PING.pack(6, 0, 0xff, 6, _ASF_IANA, _ASF_PING,
+                                    tag, 0, 0), address)
+        while True:
+            data = bytearray(sock.recv(512))
+            if (len(data) >= _RMCP_PING.size and data[8] == _ASF_PONG and
+                    data[9] == tag):
+                return
+            # Not the answer to this ping, keep waiting for it
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise socket.timeout('timed out')
+            sock.settimeout(remaining)
+    finally:
+        sock.close()
+
+
+def tcp_connect(host, port=HTTPS_PORT, timeout=constants.BMC_PROBE_TIMEOUT):
+    """Check that a BMC accepts TCP connections.
+
+    :param host: Address of the BMC.
+    :type host: String
+
+    :param port: TCP port of the BMC.
+    :type port: Integer
+
+    :param timeout: Seconds to wait for the connection.
+    :type timeout: Float
+
+    :raises: socket.error, socket.timeout when the BMC does not accept the
+             connection.
+    """
+
+    socket.create_connection((host, port), timeout=timeout).close()
+
+
+def _probe(target, timeout):
+    protocol, host, port = target
+    try:
+        if protocol == 'ipmi':
+            rmcp_ping(host, port, timeout)
+        else:
+            tcp_connect(host, port, timeout)
+    except (socket.error, socket.timeout) as e:
+        return 'BMC {}:{} ({}) is not reachable: {}'.format(
+            host, port, protocol, e or 'timed out')
+
+
+def probe_nodes(nodes, timeout=constants.BMC_PROBE_TIMEOUT,
+                workers=constants.BMC_PROBE_WORKERS):
+    """Probe the BMCs of nodes concurrently.
+
+    :param nodes: Nodes of an instackenv file.
+    :type nodes: List
+
+    :param timeout: Seconds to wait for a BMC.
+    :type timeout: Float
+
+    :param workers: Maximum number of BMCs probed at the same time.
+    :type workers: Integer
+
+    :returns: List of (node index, error) tuples of the BMCs which did not
+              answer, ordered by node index.
+    """
+
+    targets = [(index, probe_target(node))
+               for index, node in enumerate(nodes)]
+    targets = [(index, target) for index, target in targets if target]
+    if not targets:
+        return []
+    LOG.debug('Probing the BMCs of {} nodes'.format(len(targets)))
+    with futures.ThreadPoolExecutor(
+            max_workers=max(min(workers, len(targets)), 1)) as pool:
+        jobs = [(index, pool.submit(_probe, target, timeout))
+                for index, target in targets]
+    return [(index, job.result()) for index, job in jobs if job.result()]
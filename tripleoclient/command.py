@@ -18,8 +18,7 @@ import logging
 from osc_lib.command import command
 from osc_lib import exceptions as oscexc
 
-from tripleo_common.utils import config
-
+from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import utils
 
@@ -51,19 +50,16 @@ class Command(command.Command):
         :param orchestration: Orchestration client object.
         :type orchestration: Object
 
-        :returns: Tuple
+        :returns: Tuple of the key and the directory the configuration of
+                  the stack is downloaded under.
         """
 
         if no_workflow:
+            # The configuration of the stack is downloaded by
+            # `deployment.config_download` under this directory and reused
+            # until the stack changes.
             key = utils.get_key(stack=stack)
-            stack_config = config.Config(orchestration)
-            with utils.TempDirs(chdir=False) as tmp:
-                stack_config.write_config(
-                    stack_config.fetch_config(stack),
-                    stack,
-                    tmp
-                )
-                return key, tmp
+            return key, constants.DEFAULT_WORK_DIR
         else:
             # Assumes execution will take place from within a mistral
             # container.
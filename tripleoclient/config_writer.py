@@ -0,0 +1,244 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Incremental download of the config-download files of a stack.
+
+The configuration of a stack is stored in its config container, with one
+object per file of the config-download directory::
+
+    deploy_steps_playbook.yaml
+    group_vars/<role>
+    host_vars/<host>
+    <role>/deployments.yaml
+    <role>/<host>/...
+
+`sync_container` only downloads the objects whose content differs from the
+files of the directory, and replaces the files atomically so Ansible never
+reads a partial file. The changed files are mapped to the roles and the
+hosts they configure.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+
+import six
+
+from tripleoclient import utils
+
+
+LOG = logging.getLogger(__name__ + ".config_writer")
+
+# Files of the config-download directory which do not configure the nodes
+_IGNORED_DIRS = ('.git',)
+
+
+class ConfigChanges(object):
+    """Files written by a download and the roles and hosts they configure."""
+
+    def __init__(self):
+        self.written = []
+        self.unchanged = 0
+        self.roles = set()
+        self.hosts = set()
+        # Changed files shared by all the nodes, the whole deployment is
+        # affected
+        self.common = []
+
+    @property
+    def changed(self):
+        return bool(self.roles or self.hosts or self.common)
+
+    def limit(self):
+        """Return an Ansible limit of the changed roles and hosts.
+
+        :returns: String, None when files shared by all the nodes changed.
+        """
+
+        if self.common:
+            return None
+        return ':'.join(sorted(self.roles) + sorted(self.hosts))
+
+
+def _digest(path):
+    md5 = hashlib.md5()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                md5.update(chunk)
+    except IOError:
+        return None
+    return md5.hexdigest()
+
+
+def _umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def write_file(path, contents, mode=None):
+    """Replace a file atomically when its content changed.
+
+    :param path: Path of the file.
+    :type path: String
+
+    :param contents: New content of the file.
+    :type contents: Bytes
+
+    :param mode: Permissions of a new file, those of the existing file are
+                 kept.
+    :type mode: Integer
+
+    :returns: True when the file was written.
+    """
+
+    if _digest(path) == hashlib.md5(contents).hexdigest():
+        return False
+    dirname = os.path.dirname(path)
+    utils.makedirs(dirname)
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except OSError:
+        if mode is None:
+            mode = 0o666 & ~_umask()
+    fd, tmp_path = tempfile.mkstemp(dir=dirname,
+                                    prefix='.' + os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(contents)
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def _classify(changes, name, roles):
+    parts = name.split('/')
+    if parts[0] in _IGNORED_DIRS:
+        return
+    if len(parts) == 2 and parts[0] == 'group_vars':
+        changes.roles.add(parts[1])
+    elif len(parts) == 2 and parts[0] == 'host_vars':
+        changes.hosts.add(parts[1])
+    elif len(parts) > 2 and parts[0] in roles:
+        # Per host files of a role
+        changes.hosts.add(parts[1])
+    elif len(parts) > 1 and parts[0] in roles:
+        changes.roles.add(parts[0])
+    else:
+        changes.common.append(name)
+
+
+def sync_container(swift, container, work_dir, ignore=()):
+    """Download the objects of a container which differ from the files.
+
+    The objects are compared with the files by their MD5 checksum, the
+    ETag of the objects.
+
+    :param swift: Object storage client.
+    :type swift: Object
+
+    :param container: Name of the container.
+    :type container: String
+
+    :param work_dir: Directory to download the objects to.
+    :type work_dir: String
+
+    :param ignore: Names of the objects which do not configure the nodes.
+    :type ignore: List
+
+    :returns: `ConfigChanges`
+    """
+
+    objects = swift.get_container(container, full_listing=True)[1]
+    names = [obj['name'] for obj in objects]
+    roles = set(n.split('/', 1)[1] for n in names
+                if n.startswith('group_vars/'))
+    changes = ConfigChanges()
+    mode = 0o666 & ~_umask()
+    for obj in objects:
+        name = obj['name']
+        path = os.path.join(work_dir, name)
+        if os.path.isabs(name) or os.path.relpath(
+                path, work_dir).startswith(os.pardir):
+            LOG.warning('Skipping object {} of container {} outside of '
+                        'the directory'.format(name, container))
+            continue
+        if name.endswith('/') or obj.get('content_type') == \
+                'application/directory':
+            utils.makedirs(path)
+            continue
+        if obj.get('hash') and obj['hash'] == _digest(path):
+            changes.unchanged += 1
+            continue
+        contents = swift.get_object(container, name)[1]
+        if isinstance(contents, six.text_type):
+            contents = contents.encode('utf-8')
+        if not write_file(path, contents, mode):
+            changes.unchanged += 1
+            continue
+        changes.written.append(name)
+        if name not in ignore:
+            _classify(changes, name, roles)
+    LOG.debug('Downloaded {} files of container {} to {}, {} unchanged'
+              .format(len(changes.written), container, work_dir,
+                      changes.unchanged))
+    return changes
+
+
+def link_latest(work_dir):
+    """Point the config-download-latest link at a config-download directory.
+
+    :param work_dir: config-download directory of a stack.
+    :type work_dir: String
+    """
+
+    link = os.path.join(os.path.dirname(work_dir), 'config-download-latest')
+    if os.path.islink(link) and os.readlink(link) == work_dir:
+        return
+    if os.path.lexists(link):
+        os.unlink(link)
+    os.symlink(work_dir, link)
+
+
+def summary(changes):
+    """Return a message describing the changes of a download.
+
+    :param changes: Changes of a download.
+    :type changes: `ConfigChanges`
+
+    :returns: String
+    """
+
+    if not changes.changed:
+        return 'The configuration of the nodes is unchanged'
+    if changes.common:
+        common = sorted(changes.common)
+        if len(common) > 5:
+            common = common[:5] + ['...']
+        return ('The configuration shared by all the nodes changed: '
+                '{}'.format(', '.join(common)))
+    parts = []
+    if changes.roles:
+        parts.append('roles {}'.format(', '.join(sorted(changes.roles))))
+    if changes.hosts:
+        parts.append('hosts {}'.format(', '.join(sorted(changes.hosts))))
+    return ('The configuration changed for {}, the nodes affected may be '
+            'selected with --limit {}'.format(
+                ' and '.join(parts), changes.limit()))
@@ -59,6 +59,10 @@ PUPPET_BASE = "/etc/puppet/"
 
 STACK_TIMEOUT = 240
 
+# Bounds of the adaptive poll period used while waiting for a stack action
+STACK_POLL_PERIOD_MIN = 5
+STACK_POLL_PERIOD_MAX = 40
+
 IRONIC_HTTP_BOOT_BIND_MOUNT = '/var/lib/ironic/httpboot'
 IRONIC_LOCAL_IMAGE_PATH = '/var/lib/ironic/images'
 
@@ -73,6 +77,8 @@ MAJOR_UPGRADE_PLAYBOOKS = ["upgrade_steps_playbook.yaml",
 MAJOR_UPGRADE_SKIP_TAGS = ['validation', 'pre-upgrade']
 EXTERNAL_UPDATE_PLAYBOOKS = ['external_update_steps_playbook.yaml']
 EXTERNAL_UPGRADE_PLAYBOOKS = ['external_upgrade_steps_playbook.yaml']
+# Number of independent playbooks of a list run at the same time
+PLAYBOOK_WORKERS = 4
 # upgrade environment files expected by the client in the --templates
 # tripleo-heat-templates default above $TRIPLEO_HEAT_TEMPLATES
 UPDATE_PREPARE_ENV = "environments/lifecycle/update-prepare.yaml"
@@ -85,6 +91,8 @@ FFWD_UPGRADE_CONVERGE_ENV = "environments/lifecycle/ffwd-upgrade-converge.yaml"
 ENABLE_SSH_ADMIN_TIMEOUT = 600
 ENABLE_SSH_ADMIN_STATUS_INTERVAL = 5
 ENABLE_SSH_ADMIN_SSH_PORT_TIMEOUT = 600
+# Number of times the hosts failing the ssh admin enablement are retried
+ENABLE_SSH_ADMIN_RETRIES = 1
 
 ADDITIONAL_ARCHITECTURES = ['ppc64le']
 
@@ -95,6 +103,10 @@ VALIDATIONS_LOG_BASEDIR = '/var/log/validations'
 DEFAULT_WORK_DIR = os.path.join(os.environ.get('HOME', '~/'),
                                 'config-download')
 
+# Directory of the task timing profiles in the config-download directory
+# of a stack
+DEPLOY_PROFILE_DIR = 'profiles'
+
 ANSIBLE_INVENTORY = os.path.join(DEFAULT_WORK_DIR,
                                  '{}/tripleo-ansible-inventory.yaml')
 
@@ -103,6 +115,38 @@ ANSIBLE_VALIDATION_DIR = \
 ANSIBLE_TRIPLEO_PLAYBOOKS = \
     '/usr/share/ansible/tripleo-playbooks'
 
+# Environment variable enabling warm Ansible workers for localhost-only
+# playbooks. Its value is the maximum number of workers kept alive, unset or
+# 0 disables the workers.
+ANSIBLE_WORKERS_ENV = 'TRIPLEO_ANSIBLE_WORKERS'
+
+# Environment variable setting the number of Ansible forks. 'auto' sizes the
+# forks after the inventory and the undercloud, an integer is used as is and
+# ANSIBLE_DEFAULT_FORKS is used when unset.
+ANSIBLE_FORKS_ENV = 'TRIPLEO_ANSIBLE_FORKS'
+ANSIBLE_DEFAULT_FORKS = 36
+# Limits of the automatic sizing: forks per CPU and memory used by a fork
+ANSIBLE_FORKS_PER_CPU = 8
+ANSIBLE_FORK_MEMORY_MB = 100
+ANSIBLE_GATHER_TIMEOUT = 45
+
+# Default number of concurrent Swift requests used to upload or download the
+# files of a plan
+PLAN_TRANSFER_WORKERS = 8
+
+# Default number of concurrent requests used to update the Ironic nodes
+IRONIC_UPDATE_WORKERS = 8
+# Retries of an Ironic request failing with a conflict, the node being
+# locked by another operation, and the delay before the first retry in
+# seconds. The delay doubles with every retry.
+IRONIC_CONFLICT_RETRIES = 3
+IRONIC_CONFLICT_RETRY_DELAY = 2
+
+# Seconds to wait for the BMC of a node to answer a reachability probe, and
+# maximum number of BMCs probed at the same time
+BMC_PROBE_TIMEOUT = 5
+BMC_PROBE_WORKERS = 32
+
 VALIDATION_GROUPS_INFO = '%s/groups.yaml' % DEFAULT_VALIDATIONS_BASEDIR
 
 # ctlplane network defaults
@@ -156,6 +200,18 @@ DEPRECATED_SERVICES = {"OS::TripleO::Services::OpenDaylightApi":
 CLOUD_HOME_DIR = os.path.expanduser('~' + os.environ.get('SUDO_USER', ''))
 CLOUDS_YAML_DIR = os.path.join('.config', 'openstack')
 
+# Cache of the environment files processed by the deployments
+ENVIRONMENT_CACHE_DIR = os.path.join(CLOUD_HOME_DIR, '.tripleo', 'cache',
+                                     'environments')
+
+# Cache of the static Ansible inventories of the stacks
+INVENTORY_CACHE_DIR = os.path.join(CLOUD_HOME_DIR, '.tripleo', 'cache',
+                                   'inventories')
+
+# Ansible facts of the nodes of the stacks, shared by the playbook runs
+FACT_CACHE_DIR = os.path.join(CLOUD_HOME_DIR, '.tripleo', 'fact_cache')
+FACT_CACHE_TIMEOUT = 7200
+
 # Undercloud config and output
 UNDERCLOUD_CONF_PATH = os.path.join(CLOUD_HOME_DIR, "undercloud.conf")
 try:
@@ -0,0 +1,139 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Layered composition of Heat environments.
+
+A deployment composes dozens of environments, which used to be folded one
+by one into an accumulator with `template_utils.deep_update`, and the
+result deep updated again into the environment of the command. Every fold
+walks and copies the nested dictionaries again.
+
+`LayeredEnvironment` keeps the parsed environments as ordered layers and
+builds the merged dictionary once, with the semantics of `deep_update`.
+The layers also tell which environment set a given key.
+"""
+
+from collections import abc
+
+
+def _final_run(values):
+    """Return the values of a key which survive the merge.
+
+    Merging stops at a value which is not a mapping, except for None which
+    does not replace a mapping. Only the mappings after the last replacing
+    value contribute to the result.
+
+    :param values: (source, value) tuples of a key, in layer order.
+    :type values: List
+
+    :returns: Tuple (is_mapping, values)
+    """
+
+    run = []
+    mapping = False
+    for source, value in values:
+        if isinstance(value, abc.Mapping):
+            if not mapping:
+                run = []
+                mapping = True
+            run.append((source, value))
+        elif value is None and mapping:
+            continue
+        else:
+            mapping = False
+            run = [(source, value)]
+    return mapping, run
+
+
+def _fold(merged, mapping):
+    """Deep update a dictionary built by `LayeredEnvironment`.
+
+    Mappings are copied, other values are shared with the layer. Unlike
+    `template_utils.deep_update`, a mapping replaces a value which is not a
+    mapping instead of failing.
+    """
+
+    for key, value in mapping.items():
+        if isinstance(value, abc.Mapping):
+            current = merged.get(key)
+            if not isinstance(current, dict):
+                current = merged[key] = {}
+            _fold(current, value)
+        elif value is None and isinstance(merged.get(key), dict):
+            continue
+        else:
+            merged[key] = value
+
+
+class LayeredEnvironment(object):
+    """Ordered layers of Heat environments merged on demand."""
+
+    def __init__(self):
+        self.layers = []
+
+    def add(self, env, source):
+        """Add an environment on top of the existing layers.
+
+        Empty documents and documents which are not mappings are ignored.
+
+        :param env: Parsed environment.
+        :type env: Dictionary
+
+        :param source: Name of the environment, usually its path.
+        :type source: String
+        """
+
+        if env and isinstance(env, abc.Mapping):
+            self.layers.append((source, env))
+
+    def materialise(self):
+        """Return the merged environment.
+
+        The result is a new dictionary, equal to folding the layers into an
+        empty dictionary with `template_utils.deep_update`. Values which
+        are not mappings, lists included, are shared with the layers.
+
+        :returns: Dictionary
+        """
+
+        merged = {}
+        for _, env in self.layers:
+            _fold(merged, env)
+        return merged
+
+    def sources(self, *path):
+        """Return the environments which set a key.
+
+        :param path: Keys leading to the value, for example
+                     ``('parameter_defaults', 'NtpServer')``.
+        :type path: Tuple
+
+        :returns: List of the sources contributing to the value, the last
+                  one has precedence. A single source for values which are
+                  not mappings.
+
+        :raises: KeyError when the key is not set by any layer.
+        """
+
+        mapping, run = True, self.layers
+        for key in path:
+            if not mapping:
+                raise KeyError(path)
+            values = [(source, value[key]) for source, value in run
+                      if key in value]
+            if not values:
+                raise KeyError(path)
+            mapping, run = _final_run(values)
+        return [source for source, _ in run]
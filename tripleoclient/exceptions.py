@@ -123,3 +123,7 @@ class UndercloudUpgradeNotConfirmed(Base):
 
 class CellExportError(Base):
     """Cell export failed"""
+
+
+class AnsibleWorkerError(Base):
+    """Warm Ansible worker failed to start or stopped answering"""
@@ -19,12 +19,12 @@ import logging
 import os
 import re
 import sys
-import yaml
 
 from osc_lib.i18n import _
 
 from tripleoclient import constants
 from tripleoclient import utils as oooutils
+from tripleoclient import yaml_utils
 
 
 LOG = logging.getLogger(__name__ + ".utils")
@@ -41,7 +41,7 @@ def export_passwords(swift, stack, excludes=True):
                   "file from swift: %s", str(e))
         sys.exit(1)
 
-    data = yaml.safe_load(content)["passwords"]
+    data = yaml_utils.safe_load(content)["passwords"]
     if excludes:
         excluded_passwords = []
         for k in data:
@@ -0,0 +1,163 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Persistent Ansible fact cache of the stacks.
+
+`utils.run_ansible_playbook` points the ``jsonfile`` fact cache of Ansible
+at a directory of the stack it runs for::
+
+    ~/.tripleo/fact_cache/<stack>/facts/<host>
+    ~/.tripleo/fact_cache/<stack>/stack
+
+so the facts gathered on the nodes by a deployment are reused by the
+validations, updates and upgrades of the same stack, instead of being
+gathered again by every command. The ``stack`` file records the version of
+the stack the facts belong to, `sync` drops the facts when the stack
+changed.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from tripleoclient import constants
+
+
+LOG = logging.getLogger(__name__ + ".fact_cache")
+
+_FACTS = 'facts'
+_STAMP = 'stack'
+
+
+def stack_dir(plan, base_dir=None):
+    """Return the cache directory of a stack.
+
+    :param plan: Name of the stack.
+    :type plan: String
+
+    :param base_dir: Directory of the caches, `constants.FACT_CACHE_DIR`
+                     when None.
+    :type base_dir: String
+
+    :returns: String
+    """
+
+    return os.path.join(base_dir or constants.FACT_CACHE_DIR, plan)
+
+
+def fact_dir(plan, base_dir=None):
+    """Return the directory of the facts of a stack.
+
+    :param plan: Name of the stack.
+    :type plan: String
+
+    :param base_dir: Directory of the caches, `constants.FACT_CACHE_DIR`
+                     when None.
+    :type base_dir: String
+
+    :returns: String
+    """
+
+    return os.path.join(stack_dir(plan, base_dir), _FACTS)
+
+
+def cached_hosts(plan, base_dir=None, timeout=constants.FACT_CACHE_TIMEOUT):
+    """Return the hosts of a stack with facts in the cache.
+
+    :param plan: Name of the stack.
+    :type plan: String
+
+    :param base_dir: Directory of the caches, `constants.FACT_CACHE_DIR`
+                     when None.
+    :type base_dir: String
+
+    :param timeout: Age in seconds after which Ansible ignores the facts.
+    :type timeout: Integer
+
+    :returns: Sorted list of host names.
+    """
+
+    path = fact_dir(plan, base_dir)
+    if not os.path.isdir(path):
+        return []
+    oldest = time.time() - timeout
+    return sorted(
+        host for host in os.listdir(path)
+        if os.path.getmtime(os.path.join(path, host)) > oldest
+    )
+
+
+def clear(plan, base_dir=None):
+    """Drop the facts of a stack.
+
+    :param plan: Name of the stack.
+    :type plan: String
+
+    :param base_dir: Directory of the caches, `constants.FACT_CACHE_DIR`
+                     when None.
+    :type base_dir: String
+    """
+
+    shutil.rmtree(fact_dir(plan, base_dir), ignore_errors=True)
+
+
+def stack_stamp(stack):
+    """Return the version of a stack the facts are recorded for.
+
+    The version changes with every create and update of the stack.
+
+    :param stack: Heat Stack object
+    :type stack: Object
+
+    :returns: String
+    """
+
+    return '{}:{}'.format(stack.id, stack.updated_time or stack.creation_time)
+
+
+def sync(stack, base_dir=None):
+    """Drop the facts of a stack when the stack changed since they were cached.
+
+    :param stack: Heat Stack object
+    :type stack: Object
+
+    :param base_dir: Directory of the caches, `constants.FACT_CACHE_DIR`
+                     when None.
+    :type base_dir: String
+
+    :returns: True when the cache of the stack was reset, the facts of
+              the nodes have to be gathered again.
+    """
+
+    path = stack_dir(stack.stack_name, base_dir)
+    stamp_path = os.path.join(path, _STAMP)
+    stamp = stack_stamp(stack)
+    try:
+        with open(stamp_path) as f:
+            if f.read().strip() == stamp:
+                return False
+    except IOError:
+        pass
+
+    LOG.info('Resetting the fact cache of stack {}'.format(stack.stack_name))
+    clear(stack.stack_name, base_dir)
+    os.makedirs(fact_dir(stack.stack_name, base_dir))
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix='.stack')
+    with os.fdopen(fd, 'w') as f:
+        f.write(stamp + '\n')
+    os.rename(tmp_path, stamp_path)
+    return True
@@ -0,0 +1,62 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import timeit
+
+from testtools import content
+
+from tripleoclient.tests import base
+
+
+class BenchmarkTestCase(base.TestCase):
+    """Base class for the client micro-benchmarks.
+
+    Benchmarks run as part of the unit test suite. Timings are attached to
+    the test result as details so the outcome of a test never depends on
+    the speed of the host. Assertions in benchmarks should only cover
+    deterministic properties such as the number of API calls made.
+    """
+
+    def measure(self, name, func, number=10):
+        """Time a callable and record the average cost of a single call.
+
+        :param name: Name of the measurement.
+        :type name: String
+
+        :param func: Callable to measure.
+        :type func: Callable
+
+        :param number: Number of times the callable is executed.
+        :type number: Integer
+
+        :returns: Average time of one call in seconds.
+        """
+
+        per_call = timeit.timeit(func, number=number) / number
+        self.record(name, '{:.6f}s per call ({} calls)'.format(
+            per_call, number))
+        return per_call
+
+    def record(self, name, value):
+        """Attach a measurement to the test result.
+
+        :param name: Name of the measurement.
+        :type name: String
+
+        :param value: Value of the measurement.
+        :type value: Object
+        """
+
+        self.addDetail(name, content.text_content(str(value)))
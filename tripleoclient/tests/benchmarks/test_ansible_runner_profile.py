@@ -0,0 +1,78 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import mock
+import os
+import tempfile
+
+from ansible_runner import Runner
+
+from tripleoclient import utils
+
+from tripleoclient.tests.benchmarks import base
+from tripleoclient.tests import fakes
+
+
+class TestRunAnsiblePlaybookSetup(base.BenchmarkTestCase):
+
+    calls = 25
+
+    def setUp(self):
+        super(TestRunAnsiblePlaybookSetup, self).setUp()
+        self.workdir = tempfile.mkdtemp()
+        with open(os.path.join(self.workdir, 'playbook.yaml'), 'w') as f:
+            f.write('- hosts: localhost\n  tasks: []\n')
+        utils.clear_runner_profiles()
+        self.addCleanup(utils.clear_runner_profiles)
+        fact_cache = mock.patch('tripleoclient.constants.FACT_CACHE_DIR',
+                                os.path.join(self.workdir, 'facts'))
+        fact_cache.start()
+        self.addCleanup(fact_cache.stop)
+        run = mock.patch.object(
+            Runner,
+            'run',
+            return_value=fakes.fake_ansible_runner_run_return()
+        )
+        run.start()
+        self.addCleanup(run.stop)
+        self.profile = mock.patch(
+            'tripleoclient.utils.AnsibleRunnerProfile',
+            wraps=utils.AnsibleRunnerProfile
+        )
+        self.mock_profile = self.profile.start()
+        self.addCleanup(self.profile.stop)
+
+    def _run(self):
+        utils.run_ansible_playbook(
+            playbook='playbook.yaml',
+            inventory='localhost,',
+            workdir=self.workdir,
+            connection='local',
+            quiet=True
+        )
+
+    def _run_cold(self):
+        utils.clear_runner_profiles()
+        self._run()
+
+    def test_setup_overhead(self):
+        cold = self.measure('cold-profile', self._run_cold, self.calls)
+        self.assertEqual(self.calls, self.mock_profile.call_count)
+
+        utils.clear_runner_profiles()
+        self.mock_profile.reset_mock()
+        warm = self.measure('warm-profile', self._run, self.calls)
+        self.assertEqual(1, self.mock_profile.call_count)
+        self.record('speedup', '{:.2f}x'.format(cold / warm))
@@ -0,0 +1,87 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+import tracemalloc
+
+import fixtures
+import simplejson
+
+from tripleoclient import utils
+
+from tripleoclient.tests.benchmarks import base
+
+# Nodes of the synthetic inventory
+NODE_COUNT = 10000
+
+
+def _former_iter_env_file(env_file):
+    # Former implementation, decoding the whole document at once
+    nodes_config = simplejson.load(env_file)
+    if 'nodes' in nodes_config:
+        nodes_config = nodes_config['nodes']
+    return iter(nodes_config)
+
+
+class TestEnvFile(base.BenchmarkTestCase):
+    """Read the nodes of a JSON inventory of 10000 nodes."""
+
+    def setUp(self):
+        super(TestEnvFile, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'instackenv.json')
+        nodes = [{'name': 'node-%05d' % i,
+                  'pm_type': 'ipmi',
+                  'pm_addr': '10.0.%d.%d' % (i // 250, i % 250),
+                  'pm_user': 'admin',
+                  'pm_password': 'password',
+                  'mac': ['52:54:00:%02x:%02x:01' % (i // 256, i % 256)],
+                  'capabilities': 'boot_option:local',
+                  'cpu': 8, 'memory': 32768, 'disk': 100, 'arch': 'x86_64'}
+                 for i in range(NODE_COUNT)]
+        with open(self.path, 'w') as f:
+            simplejson.dump({'nodes': nodes}, f, indent=2)
+
+    def _consume(self, iter_env_file):
+        # Handle the nodes one at a time, like a pipeline would
+        count = 0
+        with open(self.path) as env_file:
+            for node in iter_env_file(env_file):
+                count += 1
+        return count
+
+    def _peak(self, iter_env_file):
+        tracemalloc.start()
+        try:
+            self.assertEqual(NODE_COUNT, self._consume(iter_env_file))
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory(self):
+        former = self._peak(_former_iter_env_file)
+        current = self._peak(utils.iter_env_file)
+        self.record('memory-former', '{} KiB'.format(former // 1024))
+        self.record('memory-streaming', '{} KiB'.format(current // 1024))
+        self.assertLess(current, former)
+
+    def test_parse(self):
+        former = self.measure(
+            'parse-former', lambda: self._consume(_former_iter_env_file),
+            number=3)
+        current = self.measure(
+            'parse-streaming', lambda: self._consume(utils.iter_env_file),
+            number=3)
+        self.record('parse-ratio', '{:.2f}'.format(current / former))
@@ -0,0 +1,105 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import tracemalloc
+
+from heatclient.common import template_utils
+
+from tripleoclient import environment_merge
+
+from tripleoclient.tests.benchmarks import base
+
+ROLES = ['Controller', 'Compute', 'CephStorage', 'ObjectStorage',
+         'BlockStorage', 'Networker']
+
+
+def _environment(index):
+    """Return an environment shaped like the tripleo-heat-templates ones.
+
+    Every environment maps a few services, sets its own parameters and
+    overrides some of the parameters shared by all the environments.
+    """
+
+    env = {
+        'resource_registry': dict(
+            ('OS::TripleO::Services::Service%d%d' % (index, i),
+             '../deployment/service-%d/service-%d.yaml' % (index, i))
+            for i in range(20)),
+        'parameter_defaults': dict(
+            ('Service%dParameter%d' % (index, i), 'value-%d' % i)
+            for i in range(150))
+    }
+    defaults = env['parameter_defaults']
+    for role in ROLES:
+        defaults['%sParameters' % role] = dict(
+            ('Env%dSetting%d' % (index, i), i) for i in range(10))
+        defaults['%sExtraConfig' % role] = {
+            'service::setting_%d' % index: ['a', 'b', 'c']}
+    for i in range(50):
+        defaults['SharedParameter%d' % i] = 'env-%d' % index
+    return env
+
+
+class TestEnvironmentMerge(base.BenchmarkTestCase):
+
+    def setUp(self):
+        super(TestEnvironmentMerge, self).setUp()
+        self.user_env = {'parameter_defaults': {'NtpServer': ['pool.ntp']}}
+        self.parameters_env = {
+            'parameter_defaults': {'DeployIdentifier': '1', 'StackAction':
+                                   'UPDATE'}}
+        self.envs = [_environment(i) for i in range(60)]
+
+    def _deep_update(self):
+        # Former composition of overcloud deploy
+        localenv = {}
+        for env in self.envs:
+            localenv = template_utils.deep_update(localenv, env)
+        env = {}
+        template_utils.deep_update(env, self.user_env)
+        template_utils.deep_update(env, self.parameters_env)
+        template_utils.deep_update(env, localenv)
+        return env, localenv
+
+    def _layered(self):
+        layers = environment_merge.LayeredEnvironment()
+        layers.add(self.user_env, 'user-environment.yaml')
+        layers.add(self.parameters_env, 'tripleoclient-parameters.yaml')
+        for index, env in enumerate(self.envs):
+            layers.add(env, 'env-%d.yaml' % index)
+        return layers.materialise(), layers
+
+    def _peak_memory(self, func):
+        tracemalloc.start()
+        try:
+            result = func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        del result
+        return peak
+
+    def test_compose(self):
+        self.assertEqual(self._deep_update()[0], self._layered()[0])
+
+        self.measure('deep-update-time', self._deep_update)
+        self.measure('layered-time', self._layered)
+
+        deep_update_peak = self._peak_memory(self._deep_update)
+        layered_peak = self._peak_memory(self._layered)
+        self.record('deep-update-peak-memory',
+                    '{} bytes'.format(deep_update_peak))
+        self.record('layered-peak-memory', '{} bytes'.format(layered_peak))
+        self.assertLess(layered_peak, deep_update_peak)
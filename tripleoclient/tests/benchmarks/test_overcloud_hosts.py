@@ -0,0 +1,103 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import copy
+
+import fixtures
+
+from tripleoclient.workflows import deployment
+
+from tripleoclient.tests.benchmarks import base
+
+# Number of nodes of the roles of the synthetic overcloud
+ROLES = {'Controller': 3, 'Networker': 97, 'CephStorage': 900,
+         'Compute': 4000}
+
+
+def _ip(network, index):
+    return '%d.%d.%d.%d' % (network, index // 65536 % 256,
+                            index // 256 % 256, index % 256)
+
+
+def _role_net_ip_map():
+    role_net_ip_map = {}
+    index = 0
+    for role, count in ROLES.items():
+        nodes = range(index, index + count)
+        role_net_ip_map[role] = {
+            'ctlplane': [_ip(192, i) for i in nodes],
+            'internal_api': [_ip(172, i) for i in nodes],
+            'storage': [_ip(10, i) for i in nodes],
+        }
+        index += count
+    return role_net_ip_map
+
+
+def _former_get_overcloud_hosts(role_net_ip_map, blacklisted_ips,
+                                ssh_network):
+    # Former implementation, with a list scan and a list.index per
+    # blacklisted address
+    ips = []
+    for net_ip_map in role_net_ip_map.values():
+        net_ips = copy.copy(net_ip_map.get(ssh_network, []))
+        ctlplane_ips = copy.copy(net_ip_map.get('ctlplane', []))
+        blacklisted_ctlplane_ips = \
+            [ip for ip in ctlplane_ips if ip in blacklisted_ips]
+        for bcip in blacklisted_ctlplane_ips:
+            index = ctlplane_ips.index(bcip)
+            ctlplane_ips.pop(index)
+            net_ips.pop(index)
+        ips.extend(net_ips)
+    return ips
+
+
+class TestGetOvercloudHosts(base.BenchmarkTestCase):
+    """Filter the blacklisted hosts of a 5000 nodes overcloud."""
+
+    def setUp(self):
+        super(TestGetOvercloudHosts, self).setUp()
+        self.role_net_ip_map = _role_net_ip_map()
+        self.useFixture(fixtures.MockPatch(
+            'tripleoclient.utils.get_role_net_ip_map',
+            return_value=self.role_net_ip_map))
+        self.mock_blacklist = self.useFixture(fixtures.MockPatch(
+            'tripleoclient.utils.get_blacklisted_ip_addresses')).mock
+
+    def _compare(self, name, blacklisted_ips):
+        self.mock_blacklist.return_value = blacklisted_ips
+        expected = _former_get_overcloud_hosts(
+            self.role_net_ip_map, blacklisted_ips, 'internal_api')
+        self.assertEqual(
+            expected, deployment.get_overcloud_hosts(None, 'internal_api'))
+        self.record('%s-hosts' % name, len(expected))
+
+        former = self.measure(
+            '%s-former' % name,
+            lambda: _former_get_overcloud_hosts(
+                self.role_net_ip_map, blacklisted_ips, 'internal_api'))
+        current = self.measure(
+            '%s-single-pass' % name,
+            lambda: deployment.get_overcloud_hosts(None, 'internal_api'))
+        self.record('%s-speedup' % name, '{:.1f}x'.format(former / current))
+
+    def test_no_blacklist(self):
+        self._compare('no-blacklist', [])
+
+    def test_blacklist(self):
+        # Every tenth node of every role is blacklisted
+        blacklisted_ips = [
+            ip for net_ip_map in self.role_net_ip_map.values()
+            for ip in net_ip_map['ctlplane'][::10]]
+        self._compare('blacklist', blacklisted_ips)
@@ -0,0 +1,175 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import logging
+import threading
+import time
+
+from tripleoclient import utils
+
+from tripleoclient.tests.benchmarks import base
+
+# Nodes of the synthetic Ironic inventory and flavors of the deployment
+NODE_COUNT = 3000
+PROFILES = ['profile%d' % i for i in range(12)]
+# Nodes of every profile already tagged, the others are assigned from the
+# <profile>_profile capabilities
+TAGGED = 150
+SCALE = 200
+# Simulated latency of a PATCH request to Ironic
+PATCH_LATENCY = 0.0005
+
+
+class FakeNode(object):
+
+    def __init__(self, index):
+        self.uuid = 'node-%05d' % index
+        self.provision_state = 'available'
+        profile = PROFILES[index % len(PROFILES)]
+        caps = {'boot_option': 'local', 'cpu_vt': 'true',
+                '%s_profile' % profile: '1'}
+        if index < TAGGED * len(PROFILES):
+            caps['profile'] = profile
+        self.properties = {'capabilities': utils.dict_to_capabilities(caps)}
+
+
+class FakeIronic(object):
+    """Node API of Ironic, counting the PATCH requests."""
+
+    def __init__(self):
+        self.node = self
+        self.nodes = [FakeNode(i) for i in range(NODE_COUNT)]
+        self.patches = 0
+        self.lock = threading.Lock()
+
+    def list(self, maintenance=False, detail=True):
+        return self.nodes
+
+    def update(self, uuid, patch):
+        time.sleep(PATCH_LATENCY)
+        with self.lock:
+            self.patches += 1
+
+
+class FakeFlavor(object):
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def get_keys(self):
+        return {'capabilities:profile': self.profile}
+
+
+def _former_assign_profiles(bm_client, flavors, dry_run=False):
+    # Former implementation, scanning the whole pool of nodes for every
+    # flavor and saving the profiles one node at a time
+    log = logging.getLogger(utils.__name__ + ".assign_and_verify_profiles")
+    bm_nodes = {node.uuid: node
+                for node in bm_client.node.list(maintenance=False,
+                                                detail=True)
+                if node.provision_state in ('available', 'active')}
+    free_node_caps = {uu: utils.node_get_capabilities(node)
+                      for uu, node in bm_nodes.items()}
+    errors = 0
+    for flavor_name, (flavor, scale) in flavors.items():
+        profile = flavor.get_keys().get('capabilities:profile')
+        assigned_nodes = [uu for uu, caps in free_node_caps.items()
+                          if caps.get('profile') == profile]
+        required_count = scale - len(assigned_nodes)
+        if required_count > 0:
+            capability = '%s_profile' % profile
+            more_nodes = [
+                uu for uu, caps in free_node_caps.items()
+                if not caps.get('profile') and
+                caps.get(capability, '').lower() in ('1', 'true') and
+                bm_nodes[uu].provision_state == 'available'
+            ][:required_count]
+            assigned_nodes.extend(more_nodes)
+            required_count -= len(more_nodes)
+        for uu in assigned_nodes:
+            node_caps = free_node_caps.pop(uu)
+            if not required_count and not node_caps.get('profile'):
+                if not dry_run:
+                    utils.node_add_capabilities(bm_client, bm_nodes[uu],
+                                                profile=profile)
+                log.info('Node %s was assigned profile %s', uu, profile)
+            else:
+                log.debug('Node %s has profile %s', uu, profile)
+        if required_count > 0:
+            errors += 1
+    nodes_without_profile = [uu for uu, caps in free_node_caps.items()
+                             if not caps.get('profile')]
+    if nodes_without_profile:
+        log.warning(
+            "There are %d ironic nodes with no profile that will "
+            "not be used: %s", len(nodes_without_profile),
+            ', '.join(nodes_without_profile))
+    return errors
+
+
+class TestProfileMatching(base.BenchmarkTestCase):
+    """Match the profiles of 12 flavors on 3000 Ironic nodes."""
+
+    def setUp(self):
+        super(TestProfileMatching, self).setUp()
+        self.flavors = {p: (FakeFlavor(p), SCALE) for p in PROFILES}
+
+    def _profiles(self, ironic):
+        return [utils.node_get_capabilities(n).get('profile')
+                for n in ironic.nodes]
+
+    def test_match(self):
+        # Matching only, the profiles are not saved
+        ironic = FakeIronic()
+        self.assertEqual(0, _former_assign_profiles(
+            ironic, self.flavors, dry_run=True))
+        # One warning for the nodes left without a profile
+        self.assertEqual((0, 1), utils.assign_and_verify_profiles(
+            ironic, self.flavors, assign_profiles=True, dry_run=True))
+
+        former = self.measure(
+            'match-former',
+            lambda: _former_assign_profiles(ironic, self.flavors,
+                                            dry_run=True),
+            number=3)
+        current = self.measure(
+            'match-indexed',
+            lambda: utils.assign_and_verify_profiles(
+                ironic, self.flavors, assign_profiles=True, dry_run=True),
+            number=3)
+        self.record('match-speedup', '{:.1f}x'.format(former / current))
+
+    def test_assign(self):
+        former_ironic = FakeIronic()
+        former = self.measure(
+            'assign-former',
+            lambda: _former_assign_profiles(former_ironic, self.flavors),
+            number=1)
+
+        ironic = FakeIronic()
+        current = self.measure(
+            'assign-concurrent',
+            lambda: utils.assign_and_verify_profiles(
+                ironic, self.flavors, assign_profiles=True),
+            number=1)
+        self.record('assign-speedup', '{:.1f}x'.format(former / current))
+
+        # The same nodes are assigned, with one PATCH per node
+        self.assertEqual(self._profiles(former_ironic),
+                         self._profiles(ironic))
+        expected = (SCALE - TAGGED) * len(PROFILES)
+        self.assertEqual(expected, former_ironic.patches)
+        self.assertEqual(expected, ironic.patches)
+        self.record('assign-patches', ironic.patches)
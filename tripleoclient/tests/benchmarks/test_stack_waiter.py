@@ -0,0 +1,127 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import mock
+import six
+
+from heatclient.common import event_utils
+
+from tripleoclient import utils
+
+from tripleoclient.tests.benchmarks import base
+
+STACK_ID = 'c1b3e1c2-0000-4000-8000-000000000000'
+STACK_NAME = 'overcloud/%s' % STACK_ID
+
+
+class FakeEvent(object):
+
+    def __init__(self, id, resource_name, resource_status, event_time,
+                 physical_resource_id=''):
+        self.id = id
+        self.resource_name = resource_name
+        self.resource_status = resource_status
+        self.resource_status_reason = 'state changed'
+        self.event_time = '%d' % event_time
+        self.time = event_time
+        self.physical_resource_id = physical_resource_id
+        self.links = [
+            {'rel': 'stack',
+             'href': 'http://heat/v1/admin/stacks/%s' % STACK_NAME},
+            {'rel': 'root_stack',
+             'href': 'http://heat/v1/admin/stacks/%s' % STACK_NAME},
+        ]
+
+
+class FakeOrchestrationClient(object):
+    """Orchestration client simulating the creation of a large stack.
+
+    Resources complete in bursts, separated by long quiet periods where
+    software deployments run, the way an overcloud stack is created. Time
+    is simulated, `sleep` advances the clock.
+    """
+
+    def __init__(self, resources=500, bursts=10, burst_interval=360):
+        self.now = 0
+        self.calls = {'events.list': 0, 'stacks.get': 0}
+        self.timeline = []
+        per_burst = resources // bursts
+        for burst in range(bursts):
+            for i in range(per_burst):
+                event_time = burst * burst_interval + i // 10
+                self.timeline.append(FakeEvent(
+                    'event-%d-%d' % (burst, i), 'Resource%d' % i,
+                    'CREATE_COMPLETE', event_time))
+        self.complete_time = bursts * burst_interval
+        self.timeline.append(FakeEvent(
+            'event-stack', 'overcloud', 'CREATE_COMPLETE',
+            self.complete_time, physical_resource_id=STACK_ID))
+        self.events = mock.Mock(list=self._list_events)
+        self.stacks = mock.Mock(get=self._get_stack)
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def _list_events(self, stack_id, marker=None, **kwargs):
+        self.calls['events.list'] += 1
+        events = [e for e in self.timeline if e.time <= self.now]
+        if marker:
+            ids = [e.id for e in events]
+            events = events[ids.index(marker) + 1:]
+        return events
+
+    def _get_stack(self, stack_id, **kwargs):
+        self.calls['stacks.get'] += 1
+        if self.now >= self.complete_time:
+            status = 'CREATE_COMPLETE'
+        else:
+            status = 'CREATE_IN_PROGRESS'
+        return mock.Mock(stack_status=status, updated_time=None)
+
+
+class TestStackWaiterApiCalls(base.BenchmarkTestCase):
+
+    def _wait(self, poll):
+        client = FakeOrchestrationClient()
+        with mock.patch('time.sleep', side_effect=client.sleep):
+            status, _msg = poll(client)
+        self.assertEqual('CREATE_COMPLETE', status)
+        calls = sum(client.calls.values())
+        return calls, client.now - client.complete_time
+
+    def _record(self, name, calls, latency):
+        self.record(name, '{} API calls, completion seen after {}s'.format(
+            calls, latency))
+
+    def test_api_calls(self):
+        legacy_calls, latency = self._wait(
+            lambda hc: event_utils.poll_for_events(
+                hc, STACK_NAME, action='CREATE', poll_period=5,
+                out=six.StringIO(), nested_depth=6))
+        self._record('fixed-5s-nested', legacy_calls, latency)
+
+        verbose_calls, latency = self._wait(
+            lambda hc: utils.poll_for_stack_events(
+                hc, STACK_NAME, action='CREATE', out=six.StringIO(),
+                nested_depth=6, verbose=True))
+        self._record('adaptive-verbose', verbose_calls, latency)
+
+        quiet_calls, latency = self._wait(
+            lambda hc: utils.poll_for_stack_events(
+                hc, STACK_NAME, action='CREATE', verbose=False))
+        self._record('adaptive-quiet', quiet_calls, latency)
+
+        self.assertLess(verbose_calls, legacy_calls)
+        self.assertLess(quiet_calls, verbose_calls)
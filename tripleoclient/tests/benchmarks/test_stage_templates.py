@@ -0,0 +1,65 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import itertools
+import os
+import shutil
+import tempfile
+
+from tripleoclient import utils
+
+from tripleoclient.tests.benchmarks import base
+
+
+class TestStageTemplatesDir(base.BenchmarkTestCase):
+
+    def _templates_tree(self, directories=100, files=30, size=8192):
+        """Create a tree shaped like tripleo-heat-templates"""
+
+        source = tempfile.mkdtemp()
+        content = 'x' * size
+        for d in range(directories):
+            path = os.path.join(source, 'deployment', 'service-%d' % d)
+            os.makedirs(path)
+            # A few directories hold jinja2 templates
+            names = ['file-%d.yaml' % f for f in range(files)]
+            if d % 10 == 0:
+                names.append('role.role.j2.yaml')
+            for name in names:
+                with open(os.path.join(path, name), 'w') as f:
+                    f.write(content)
+        return source
+
+    def test_stage_templates_dir(self):
+        source = self._templates_tree()
+        workdir = tempfile.mkdtemp()
+        counter = itertools.count()
+        stats = {}
+
+        def _copytree():
+            dest = os.path.join(workdir, str(next(counter)))
+            shutil.copytree(source, dest, symlinks=True)
+
+        def _stage():
+            dest = os.path.join(workdir, str(next(counter)))
+            stats.update(utils.stage_templates_dir(source, dest))
+
+        self.measure('copytree', _copytree, number=3)
+        self.measure('stage_templates_dir', _stage, number=3)
+        self.record('staged files', stats)
+
+        # Only the directories holding jinja2 templates are copied
+        self.assertEqual(10 * 31, stats['copy'])
+        self.assertEqual(90 * 30, sum(stats.values()) - stats['copy'])
@@ -0,0 +1,98 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+
+import jinja2
+import yaml
+
+from tripleoclient import constants
+from tripleoclient import yaml_utils
+
+from tripleoclient.tests.benchmarks import base
+
+
+class TestYamlBackends(base.BenchmarkTestCase):
+    """Compare the pure Python and libyaml backends.
+
+    The documents are the resource registry and the roles data of the
+    installed tripleo-heat-templates, the test is skipped without them.
+    """
+
+    def setUp(self):
+        super(TestYamlBackends, self).setUp()
+        if not getattr(yaml, '__with_libyaml__', False):
+            self.skipTest('PyYAML is built without libyaml')
+        self.tht_root = constants.TRIPLEO_HEAT_TEMPLATES
+        roles_file = os.path.join(self.tht_root,
+                                  constants.OVERCLOUD_ROLES_FILE)
+        if not os.path.exists(roles_file):
+            self.skipTest('tripleo-heat-templates are not installed')
+        with open(roles_file) as f:
+            self.roles_data = f.read()
+        self.registry = self._resource_registry()
+
+    def _resource_registry(self):
+        registry = os.path.join(self.tht_root,
+                                'overcloud-resource-registry-puppet.yaml')
+        if os.path.exists(registry):
+            with open(registry) as f:
+                return f.read()
+        # Render the registry like the plan creation does
+        with open(registry.replace('.yaml', '.j2.yaml')) as f:
+            template = jinja2.Template(f.read())
+        networks = []
+        for name in (constants.OVERCLOUD_NETWORKS_FILE,
+                     'network_data_default.yaml'):
+            path = os.path.join(self.tht_root, name)
+            if os.path.exists(path):
+                with open(path) as f:
+                    networks = yaml.safe_load(f)
+                break
+        return template.render(roles=yaml.safe_load(self.roles_data),
+                               networks=networks)
+
+    def _compare(self, name, document):
+        data = yaml.load(document, Loader=yaml.SafeLoader)
+        self.assertEqual(data, yaml_utils.safe_load(document))
+        self.assertEqual(
+            data,
+            yaml_utils.safe_load(
+                yaml_utils.safe_dump(data, default_flow_style=False)))
+
+        python_load = self.measure(
+            '%s-load-python' % name,
+            lambda: yaml.load(document, Loader=yaml.SafeLoader))
+        libyaml_load = self.measure(
+            '%s-load-libyaml' % name,
+            lambda: yaml_utils.safe_load(document))
+        self.record('%s-load-speedup' % name,
+                    '{:.1f}x'.format(python_load / libyaml_load))
+
+        python_dump = self.measure(
+            '%s-dump-python' % name,
+            lambda: yaml.dump(data, Dumper=yaml.SafeDumper,
+                              default_flow_style=False))
+        libyaml_dump = self.measure(
+            '%s-dump-libyaml' % name,
+            lambda: yaml_utils.safe_dump(data, default_flow_style=False))
+        self.record('%s-dump-speedup' % name,
+                    '{:.1f}x'.format(python_dump / libyaml_dump))
+
+    def test_resource_registry(self):
+        self._compare('resource-registry', self.registry)
+
+    def test_roles_data(self):
+        self._compare('roles-data', self.roles_data)
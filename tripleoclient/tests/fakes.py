@@ -18,6 +18,7 @@ import sys
 
 from osc_lib.tests import utils
 
+from tripleoclient import config_writer
 from tripleoclient import plugin
 
 
@@ -151,10 +152,12 @@ class FakeObjectClient(object):
         self._instance = mock.Mock()
         self.put_object = mock.Mock()
 
-    def get_object(self, *args):
+    def get_object(self, *args, **kwargs):
+        if kwargs.get('resp_chunk_size'):
+            return [None, iter([b"fake"])]
         return [None, "fake"]
 
-    def get_container(self, *args):
+    def get_container(self, *args, **kwargs):
         return [None, [{"name": "fake"}]]
 
 
@@ -201,11 +204,14 @@ class FakePlaybookExecution(utils.TestCommand):
         self.addCleanup(self.ansible.stop)
 
         self.config_action = mock.patch(
-            'tripleo_common.actions.config.DownloadConfigAction',
-            autospec=True
+            'tripleoclient.config_writer.sync_container',
+            return_value=config_writer.ConfigChanges()
         )
         self.config_action.start()
         self.addCleanup(self.config_action.stop)
+        link_latest = mock.patch('tripleoclient.config_writer.link_latest')
+        link_latest.start()
+        self.addCleanup(link_latest.stop)
         get_key = mock.patch('tripleoclient.utils.get_key')
         get_key.start()
         get_key.return_value = 'keyfile-path'
@@ -0,0 +1,133 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import datetime
+import mock
+
+from tripleoclient import ansible_events
+
+from tripleoclient.tests import base
+
+
+def _event(event, created, **event_data):
+    return {
+        'uuid': 'event-uuid',
+        'counter': 1,
+        'event': event,
+        'created': created,
+        'event_data': event_data
+    }
+
+
+PLAY_UUID = '52540000-0000-4000-8000-000000000001'
+
+EVENTS = [
+    _event('playbook_on_start', '2020-06-01T10:00:00.000000'),
+    _event('playbook_on_play_start', '2020-06-01T10:00:00.100000',
+           play='Check', play_uuid=PLAY_UUID, play_pattern='Controller'),
+    _event('runner_on_start', '2020-06-01T10:00:00.200000',
+           host='controller-0', task='ping'),
+    _event('runner_on_ok', '2020-06-01T10:00:01.000000',
+           host='controller-0', play='Check', task='ping', duration=0.8,
+           role='check', start='2020-06-01T10:00:00.200000',
+           res={'changed': False, 'ping': 'pong'}),
+    _event('runner_on_ok', '2020-06-01T10:00:02.000000',
+           host='controller-1', play='Check', task='ping', duration=1.8,
+           res={'changed': True}),
+    _event('runner_on_failed', '2020-06-01T10:00:03.000000',
+           host='controller-0', play='Check', task='ignored', duration=0.5,
+           ignore_errors=True, res={'msg': 'ignored failure'}),
+    _event('runner_on_failed', '2020-06-01T10:00:04.000000',
+           host='controller-1', play='Check', task='check disk',
+           duration=0.5, res={'msg': 'disk full'}),
+    _event('runner_on_unreachable', '2020-06-01T10:00:05.000000',
+           host='controller-2', play='Check', task='ping', duration=10.0,
+           res={'msg': 'Connection timed out'}),
+    _event('runner_on_skipped', '2020-06-01T10:00:06.000000',
+           host='controller-0', play='Check', task='optional',
+           duration=0.0),
+    _event('playbook_on_stats', '2020-06-01T10:00:07.500000',
+           ok={'controller-0': 2, 'controller-1': 1},
+           changed={'controller-1': 1},
+           failures={'controller-1': 1},
+           dark={'controller-2': 1},
+           skipped={'controller-0': 1}),
+]
+
+
+class TestAnsibleEventStream(base.TestCase):
+
+    def _stream(self, events=EVENTS, **kwargs):
+        stream = ansible_events.AnsibleEventStream(**kwargs)
+        for event in events:
+            self.assertTrue(stream.event_handler(event))
+        return stream
+
+    def test_results(self):
+        stream = self._stream()
+        self.assertEqual(
+            [('controller-0', 'ping', 'ok', False, False),
+             ('controller-1', 'ping', 'ok', True, False),
+             ('controller-0', 'ignored', 'failed', False, False),
+             ('controller-1', 'check disk', 'failed', False, True),
+             ('controller-2', 'ping', 'unreachable', False, True),
+             ('controller-0', 'optional', 'skipped', False, False)],
+            [(r.host, r.task, r.status, r.changed, r.failed)
+             for r in stream.results])
+        self.assertEqual(1.8, stream.results[1].duration)
+        self.assertEqual(('check', '2020-06-01T10:00:00.200000'),
+                         (stream.results[0].role, stream.results[0].start))
+        self.assertIsNone(stream.results[1].role)
+        self.assertIsNone(stream.results[2].msg)
+
+    def test_failures(self):
+        self.assertEqual(
+            [('check disk', 'disk full'),
+             ('ping', 'Connection timed out')],
+            [(r.task, r.msg) for r in self._stream().failures])
+
+    def test_callback(self):
+        callback = mock.Mock(
+            side_effect=[None, Exception('broken')] + [None] * 4)
+        stream = self._stream(callback=callback, keep_results=False)
+        self.assertEqual([], stream.results)
+        self.assertEqual(6, callback.call_count)
+        self.assertEqual('controller-0', callback.call_args_list[0][0][0].host)
+
+    def test_plays_and_duration(self):
+        stream = self._stream()
+        self.assertEqual({PLAY_UUID: 'Controller'}, stream.plays)
+        self.assertEqual(datetime.timedelta(seconds=7.5), stream.duration)
+
+    def test_host_status(self):
+        self.assertEqual(
+            [('controller-0', 'ok'),
+             ('controller-1', 'failed'),
+             ('controller-2', 'unreachable')],
+            list(self._stream().host_status().items()))
+
+    def test_host_status_without_stats(self):
+        self.assertEqual(
+            [('controller-0', 'ok'),
+             ('controller-1', 'failed'),
+             ('controller-2', 'unreachable')],
+            list(self._stream(EVENTS[:-1]).host_status().items()))
+
+    def test_status_handler(self):
+        stream = ansible_events.AnsibleEventStream()
+        self.assertIsNone(stream.duration)
+        stream.status_handler({'status': 'running', 'runner_ident': '1'},
+                              runner_config=None)
+        self.assertEqual('running', stream.status)
@@ -0,0 +1,165 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import fixtures
+import mock
+import os
+
+from tripleoclient import ansible_events
+from tripleoclient import ansible_profile
+from tripleoclient import constants
+from tripleoclient import exceptions
+
+from tripleoclient.tests import base
+
+
+def _result(task, host, play, start, duration, role=None):
+    return ansible_events.AnsibleTaskResult(
+        host=host, play=play, task=task, status='ok', duration=duration,
+        changed=False, failed=False, msg=None, role=role, start=start)
+
+
+RESULTS = [
+    _result('Gather facts', 'controller-0', 'Server deployments',
+            '2020-06-01T10:00:00.000000', 2.0),
+    _result('Start containers', 'controller-0', 'Deploy step tasks for 2',
+            '2020-06-01T10:00:10.000000', 30.0, 'tripleo_container_manage'),
+    _result('Start containers', 'compute-0', 'Deploy step tasks for 2',
+            '2020-06-01T10:00:12.000000', 5.0, 'tripleo_container_manage'),
+    _result('Start containers', 'controller-0', 'Deploy step tasks for 3',
+            '2020-06-01T10:01:00.000000', 4.0, 'tripleo_container_manage'),
+    _result('Run puppet', 'compute-0', 'External deployment step 3',
+            '2020-06-01T10:01:02.000000', 6.0),
+]
+
+
+class TestAnsibleProfile(base.TestCase):
+
+    def setUp(self):
+        super(TestAnsibleProfile, self).setUp()
+        self.work_dir = self.useFixture(fixtures.TempDir()).path
+
+    def _write(self, name, results=RESULTS):
+        path = os.path.join(ansible_profile.profile_dir(self.work_dir), name)
+        with ansible_profile.ProfileWriter(path) as writer:
+            for result in results:
+                writer(result)
+        return path
+
+    def test_task_step(self):
+        self.assertEqual(2, ansible_profile.task_step(
+            'Deploy step tasks for 2'))
+        self.assertEqual(0, ansible_profile.task_step(
+            'Deploy step tasks for step 0'))
+        self.assertEqual(5, ansible_profile.task_step(
+            'External deployment step 5'))
+        self.assertIsNone(ansible_profile.task_step(
+            'Server pre deployment steps'))
+        self.assertIsNone(ansible_profile.task_step(None))
+
+    def test_write_and_load(self):
+        path = self._write('20200601-100000.jsonl')
+        self.assertEqual(
+            os.path.join(self.work_dir, constants.DEPLOY_PROFILE_DIR,
+                         '20200601-100000.jsonl'), path)
+        records = ansible_profile.load_profile(path)
+        self.assertEqual(5, len(records))
+        self.assertEqual(
+            {'task': 'Start containers', 'role': 'tripleo_container_manage',
+             'host': 'controller-0', 'play': 'Deploy step tasks for 2',
+             'step': 2, 'status': 'ok',
+             'start': '2020-06-01T10:00:10.000000', 'duration': 30.0},
+            records[1])
+
+    def test_writer_without_results(self):
+        path = os.path.join(ansible_profile.profile_dir(self.work_dir),
+                            'empty.jsonl')
+        with ansible_profile.ProfileWriter(path) as writer:
+            pass
+        self.assertEqual(0, writer.records)
+        self.assertFalse(os.path.exists(path))
+
+    def test_writer_existing_profile(self):
+        path = self._write('20200601-100000.jsonl')
+        with ansible_profile.ProfileWriter(path) as writer:
+            writer(RESULTS[0])
+        # The profile of the other run is left alone
+        self.assertEqual(path[:-len('.jsonl')] + '-1.jsonl', writer.path)
+        self.assertEqual(5, len(ansible_profile.load_profile(path)))
+        self.assertEqual(1, len(ansible_profile.load_profile(writer.path)))
+
+    def test_new_profile_path(self):
+        with mock.patch('time.strftime', return_value='20200601-100000'):
+            path = ansible_profile.new_profile_path(self.work_dir)
+        self.assertEqual(
+            os.path.join(ansible_profile.profile_dir(self.work_dir),
+                         '20200601-100000-%d.jsonl' % os.getpid()), path)
+
+    def test_load_truncated(self):
+        path = self._write('20200601-100000.jsonl')
+        with open(path, 'a') as f:
+            f.write('{"task": "Wait for')
+        self.assertEqual(5, len(ansible_profile.load_profile(path)))
+
+    def test_load_missing(self):
+        self.assertRaises(exceptions.NotFound, ansible_profile.load_profile,
+                          os.path.join(self.work_dir, 'missing.jsonl'))
+
+    def test_list_profiles(self):
+        self.assertEqual([], ansible_profile.list_profiles(self.work_dir))
+        second = self._write('20200602-100000.jsonl')
+        first = self._write('20200601-100000.jsonl')
+        self.assertEqual([first, second],
+                         ansible_profile.list_profiles(self.work_dir))
+        self.assertTrue(ansible_profile.new_profile_path(
+            self.work_dir).startswith(os.path.dirname(first)))
+
+    def test_summarize_tasks(self):
+        records = ansible_profile.load_profile(self._write('profile.jsonl'))
+        self.assertEqual(
+            [('Start containers', 3, 54.0, 39.0, 30.0),
+             ('Run puppet', 1, 6.0, 6.0, 6.0),
+             ('Gather facts', 1, 2.0, 2.0, 2.0)],
+            [tuple(e) for e in ansible_profile.summarize(records)])
+
+    def test_summarize_steps(self):
+        records = ansible_profile.load_profile(self._write('profile.jsonl'))
+        # Steps are ranked by elapsed time, the plays without step ignored
+        self.assertEqual(
+            [(2, 2, 30.0, 35.0, 30.0), (3, 2, 8.0, 10.0, 6.0)],
+            [tuple(e) for e in ansible_profile.summarize(records, 'step')])
+
+    def test_summarize_without_start(self):
+        records = [{'task': 'ping', 'host': 'controller-0', 'duration': 3.0},
+                   {'task': 'ping', 'host': 'controller-1', 'duration': None}]
+        self.assertEqual(
+            [('ping', 2, 3.0, 3.0, 3.0)],
+            [tuple(e) for e in ansible_profile.summarize(records)])
+
+    def test_compare(self):
+        before = ansible_profile.load_profile(self._write('before.jsonl'))
+        after = ansible_profile.load_profile(self._write(
+            'after.jsonl',
+            [_result('Start containers', 'controller-0',
+                     'Deploy step tasks for 2',
+                     '2020-06-02T10:00:10.000000', 100.0),
+             _result('Run ansible', 'compute-0', 'External deployment step 3',
+                     '2020-06-02T10:02:00.000000', 1.0)]))
+        self.assertEqual(
+            [('Start containers', 39.0, 100.0, 61.0),
+             ('Run ansible', None, 1.0, 1.0),
+             ('Gather facts', 2.0, None, -2.0),
+             ('Run puppet', 6.0, None, -6.0)],
+            ansible_profile.compare(before, after))
@@ -0,0 +1,205 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import fixtures
+import mock
+import os
+import threading
+
+from tripleoclient import ansible_scheduler
+from tripleoclient import exceptions
+
+from tripleoclient.tests import base
+
+
+GROUPS = {
+    'Controller': {'controller-0', 'controller-1'},
+    'Compute': {'compute-0'},
+    'Undercloud': {'undercloud'},
+    'overcloud': {'controller-0', 'controller-1', 'compute-0'},
+}
+
+
+def _resolve(groups):
+    hosts = set()
+    for group in groups:
+        if group not in GROUPS:
+            return None
+        hosts.update(GROUPS[group])
+    return hosts
+
+
+class TestPlaybookNodes(base.TestCase):
+
+    def _requires(self, playbooks, resolve_hosts=_resolve):
+        return [
+            (n.playbook, n.requires)
+            for n in ansible_scheduler.playbook_nodes(playbooks,
+                                                      resolve_hosts)]
+
+    def test_names(self):
+        # The playbooks without hosts run one after the other
+        nodes = ansible_scheduler.playbook_nodes(
+            ['upgrade.yaml', 'deploy.yaml', 'post.yaml'])
+        self.assertEqual(
+            [('upgrade.yaml', None, []),
+             ('deploy.yaml', None, ['upgrade.yaml']),
+             ('post.yaml', None, ['upgrade.yaml', 'deploy.yaml'])],
+            [tuple(n) for n in nodes])
+        self.assertTrue(ansible_scheduler.is_sequential(nodes))
+
+    def test_disjoint_hosts(self):
+        playbooks = [
+            {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+            {'playbook': 'compute.yaml', 'hosts': 'Compute'},
+            {'playbook': 'external.yaml', 'hosts': ['Undercloud']},
+            {'playbook': 'overcloud.yaml', 'hosts': ['overcloud']},
+            'post.yaml',
+        ]
+        self.assertEqual(
+            [('controller.yaml', []),
+             ('compute.yaml', []),
+             ('external.yaml', []),
+             ('overcloud.yaml', ['controller.yaml', 'compute.yaml']),
+             ('post.yaml', ['controller.yaml', 'compute.yaml',
+                            'external.yaml', 'overcloud.yaml'])],
+            self._requires(playbooks))
+        self.assertFalse(ansible_scheduler.is_sequential(
+            ansible_scheduler.playbook_nodes(playbooks, _resolve)))
+
+    def test_requires(self):
+        self.assertEqual(
+            [('controller.yaml', []),
+             ('external.yaml', ['controller.yaml'])],
+            self._requires([
+                {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+                {'playbook': 'external.yaml', 'hosts': ['Undercloud'],
+                 'requires': 'controller.yaml'}]))
+
+    def test_unresolved_hosts(self):
+        # The hosts of an unknown group may be any of them
+        self.assertEqual(
+            [('controller.yaml', []),
+             ('other.yaml', ['controller.yaml'])],
+            self._requires([
+                {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+                {'playbook': 'other.yaml', 'hosts': ['Other']}]))
+
+    def test_group_names(self):
+        self.assertEqual(
+            [('controller.yaml', []),
+             ('overcloud.yaml', [])],
+            self._requires([
+                {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+                {'playbook': 'overcloud.yaml', 'hosts': ['overcloud']}],
+                resolve_hosts=None))
+
+    def test_invalid(self):
+        for playbooks in (
+                ['deploy.yaml', 'deploy.yaml'],
+                [{'playbook': 'deploy.yaml', 'requires': ['post.yaml']},
+                 'post.yaml'],
+                [{'hosts': ['Controller']}],
+                [['deploy.yaml']]):
+            self.assertRaises(exceptions.InvalidConfiguration,
+                              ansible_scheduler.playbook_nodes, playbooks)
+
+    def test_load_playbooks(self):
+        work_dir = self.useFixture(fixtures.TempDir()).path
+        path = os.path.join(work_dir, 'playbooks.yaml')
+        with open(path, 'w') as f:
+            f.write('- playbook: controller.yaml\n'
+                    '  hosts: [Controller]\n'
+                    '- post.yaml\n')
+        self.assertEqual(
+            [{'playbook': 'controller.yaml', 'hosts': ['Controller']},
+             'post.yaml'],
+            ansible_scheduler.load_playbooks(path))
+
+        with open(path, 'w') as f:
+            f.write('playbook: controller.yaml\n')
+        self.assertRaises(exceptions.InvalidConfiguration,
+                          ansible_scheduler.load_playbooks, path)
+        self.assertRaises(exceptions.InvalidConfiguration,
+                          ansible_scheduler.load_playbooks,
+                          os.path.join(work_dir, 'missing.yaml'))
+
+
+class TestRunPlaybooks(base.TestCase):
+
+    def setUp(self):
+        super(TestRunPlaybooks, self).setUp()
+        self.nodes = ansible_scheduler.playbook_nodes([
+            {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+            {'playbook': 'compute.yaml', 'hosts': ['Compute']},
+            'post.yaml',
+        ], _resolve)
+
+    def test_concurrent(self):
+        started = threading.Barrier(2, timeout=10)
+        order = []
+
+        def _run(node):
+            if node.playbook != 'post.yaml':
+                # Both playbooks run at the same time
+                started.wait()
+            order.append(node.playbook)
+            return 0
+
+        results = ansible_scheduler.run_playbooks(self.nodes, _run, 4)
+        self.assertEqual(
+            [('controller.yaml', 0), ('compute.yaml', 0), ('post.yaml', 0)],
+            list(results.items()))
+        self.assertEqual('post.yaml', order[-1])
+
+    def test_workers(self):
+        running = []
+
+        def _run(node):
+            running.append(node.playbook)
+            self.assertEqual(1, len(running))
+            running.remove(node.playbook)
+            return 0
+
+        results = ansible_scheduler.run_playbooks(self.nodes, _run, 1)
+        self.assertEqual(['controller.yaml', 'compute.yaml', 'post.yaml'],
+                         list(results))
+
+    def test_no_workers(self):
+        run = mock.Mock(return_value=0)
+        self.assertRaises(ValueError, ansible_scheduler.run_playbooks,
+                          self.nodes, run, 0)
+        run.assert_not_called()
+
+    def test_failure(self):
+        def _run(node):
+            if node.playbook == 'compute.yaml':
+                raise RuntimeError('Ansible execution failed')
+            return 0
+
+        results = ansible_scheduler.run_playbooks(self.nodes, _run, 4)
+        # The playbooks requiring the failed one do not run
+        self.assertEqual(
+            [('controller.yaml', 0), ('compute.yaml', 1)],
+            list(results.items()))
+
+    def test_failure_stops_scheduling(self):
+        nodes = ansible_scheduler.playbook_nodes([
+            {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+            {'playbook': 'compute.yaml', 'hosts': ['Compute']},
+        ], _resolve)
+        results = ansible_scheduler.run_playbooks(
+            nodes, lambda node: 2, 1)
+        self.assertEqual([('controller.yaml', 2)], list(results.items()))
@@ -0,0 +1,291 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import fixtures
+import json
+import mock
+import os
+import six
+import tempfile
+import time
+
+from ansible_runner import Runner
+
+from tripleoclient import ansible_events
+from tripleoclient import ansible_worker
+from tripleoclient import constants
+from tripleoclient import exceptions
+from tripleoclient import utils
+
+from tripleoclient.tests import base
+from tripleoclient.tests import fakes
+
+
+def _fake_executor(command):
+    if command[-1] == 'sleep':
+        time.sleep(30)
+    if command[-1] == 'env':
+        return 0 if os.environ.get('TRIPLEO_PLAN_NAME') == 'plan' else 3
+    return int(command[-1])
+
+
+class TestServe(base.TestCase):
+
+    def _serve(self, *jobs):
+        stdin = six.StringIO(
+            ''.join(json.dumps(job) + '\n' for job in jobs)
+        )
+        stdout = six.StringIO()
+        ansible_worker.serve(stdin, stdout, _fake_executor)
+        return [json.loads(i) for i in stdout.getvalue().splitlines()]
+
+    def _job(self, command, **kwargs):
+        job = {
+            'command': ['ansible-playbook', command],
+            'env': {},
+            'cwd': tempfile.gettempdir(),
+            'quiet': True
+        }
+        job.update(kwargs)
+        return job
+
+    def test_serve(self):
+        self.assertEqual(
+            [{'status': 'successful', 'rc': 0},
+             {'status': 'failed', 'rc': 2}],
+            self._serve(self._job('0'), self._job('2'))
+        )
+
+    def test_serve_env(self):
+        self.assertEqual(
+            [{'status': 'successful', 'rc': 0}],
+            self._serve(self._job('env', env={'TRIPLEO_PLAN_NAME': 'plan'}))
+        )
+        self.assertNotEqual('plan', os.environ.get('TRIPLEO_PLAN_NAME'))
+
+    def test_serve_timeout(self):
+        self.assertEqual(
+            [{'status': 'timeout', 'rc': ansible_worker.TIMEOUT_RC}],
+            self._serve(self._job('sleep', timeout=0.2))
+        )
+
+
+class TestApplyJobPaths(base.TestCase):
+
+    def test_apply_job_paths(self):
+        loader = mock.Mock()
+        constants = mock.Mock(DEFAULT_ROLES_PATH=['/etc/ansible/roles',
+                                                  '/tmp/job/roles'])
+        ansible_worker._apply_job_paths({
+            'ANSIBLE_LIBRARY': '/tmp/job/modules:/usr/share/ansible/modules',
+            'ANSIBLE_ROLES_PATH': '/tmp/job/roles:/usr/share/ansible/roles',
+        }, loader, constants)
+        self.assertEqual(
+            [mock.call('/tmp/job/modules'),
+             mock.call('/usr/share/ansible/modules')],
+            loader.module_loader.add_directory.call_args_list)
+        loader.action_loader.add_directory.assert_not_called()
+        self.assertEqual(
+            ['/tmp/job/roles', '/usr/share/ansible/roles',
+             '/etc/ansible/roles'],
+            constants.DEFAULT_ROLES_PATH)
+
+
+class TestAnsibleWorker(base.TestCase):
+
+    @mock.patch('subprocess.Popen')
+    def test_run(self, mock_popen):
+        process = mock_popen.return_value
+        process.stdout.readline.side_effect = [
+            '{"ready": true}\n',
+            '{"status": "failed", "rc": 2}\n'
+        ]
+        worker = ansible_worker.AnsibleWorker(env={'ANSIBLE_FORKS': '36'})
+        self.assertEqual(
+            ('failed', 2),
+            worker.run(command=['ansible-playbook'], env={}, cwd='/tmp')
+        )
+        job = json.loads(process.stdin.write.call_args[0][0])
+        self.assertEqual(['ansible-playbook'], job['command'])
+
+    @mock.patch('subprocess.Popen')
+    def test_start_failed(self, mock_popen):
+        process = mock_popen.return_value
+        process.poll.return_value = None
+        process.stdout.readline.return_value = (
+            '{"ready": false, "error": "No module named ansible"}\n'
+        )
+        self.assertRaises(
+            exceptions.AnsibleWorkerError,
+            ansible_worker.AnsibleWorker,
+            env={}
+        )
+        process.stdin.close.assert_called_once_with()
+
+    @mock.patch('subprocess.Popen')
+    def test_worker_exited(self, mock_popen):
+        mock_popen.return_value.stdout.readline.return_value = ''
+        self.assertRaises(
+            exceptions.AnsibleWorkerError,
+            ansible_worker.AnsibleWorker,
+            env={}
+        )
+
+
+@mock.patch('tripleoclient.ansible_worker.AnsibleWorker')
+class TestAnsibleWorkerPool(base.TestCase):
+
+    def test_reuse_worker(self, mock_worker):
+        mock_worker.return_value.process.poll.return_value = None
+        mock_worker.return_value.run.return_value = ('successful', 0)
+        pool = ansible_worker.AnsibleWorkerPool(size=1)
+        env = {'ANSIBLE_FORKS': '36', 'TRIPLEO_PLAN_NAME': 'overcloud'}
+        for plan in ('overcloud', 'other'):
+            env['TRIPLEO_PLAN_NAME'] = plan
+            self.assertEqual(
+                ('successful', 0),
+                pool.run(command=['ansible-playbook'], env=env, cwd='/tmp')
+            )
+        self.assertEqual(1, mock_worker.call_count)
+
+    def test_reuse_worker_other_workdir(self, mock_worker):
+        mock_worker.return_value.process.poll.return_value = None
+        mock_worker.return_value.run.return_value = ('successful', 0)
+        pool = ansible_worker.AnsibleWorkerPool(size=1)
+        profile = utils.get_runner_profile(
+            connection='local', ssh_user='root', key=None, module_path=None,
+            gathering_policy='smart', ansible_cfg='/ansible.cfg')
+        envs = []
+        for workdir in ('/tmp/tripleo-1', '/tmp/tripleo-2'):
+            env = dict(profile.env, ANSIBLE_FORKS='36')
+            env.update(profile.plugin_paths(workdir=workdir, cwd=workdir))
+            envs.append(env)
+            pool.run(command=['ansible-playbook'], env=env, cwd=workdir)
+        self.assertNotEqual(envs[0]['ANSIBLE_LIBRARY'],
+                            envs[1]['ANSIBLE_LIBRARY'])
+        # One worker, started without the paths of the first job, serves
+        # both jobs with their own paths
+        self.assertEqual(1, mock_worker.call_count)
+        worker_env = mock_worker.call_args[1]['env']
+        self.assertEqual('36', worker_env['ANSIBLE_FORKS'])
+        self.assertNotIn('ANSIBLE_LIBRARY', worker_env)
+        self.assertNotIn('ANSIBLE_ROLES_PATH', worker_env)
+        self.assertEqual(
+            [envs[0]['ANSIBLE_LIBRARY'], envs[1]['ANSIBLE_LIBRARY']],
+            [c[1]['env']['ANSIBLE_LIBRARY']
+             for c in mock_worker.return_value.run.call_args_list])
+
+    def test_evict_worker(self, mock_worker):
+        mock_worker.return_value.process.poll.return_value = None
+        pool = ansible_worker.AnsibleWorkerPool(size=1)
+        for forks in ('1', '2'):
+            pool.run(
+                command=['ansible-playbook'],
+                env={'ANSIBLE_FORKS': forks},
+                cwd='/tmp'
+            )
+        self.assertEqual(2, mock_worker.call_count)
+        self.assertEqual(1, len(pool.workers))
+        mock_worker.return_value.stop.assert_called_once_with()
+
+    def test_failed_worker_dropped(self, mock_worker):
+        mock_worker.return_value.process.poll.return_value = None
+        mock_worker.return_value.run.side_effect = (
+            exceptions.AnsibleWorkerError
+        )
+        pool = ansible_worker.AnsibleWorkerPool(size=2)
+        self.assertRaises(
+            exceptions.AnsibleWorkerError,
+            pool.run,
+            command=['ansible-playbook'],
+            env={},
+            cwd='/tmp'
+        )
+        self.assertEqual(0, len(pool.workers))
+
+
+class TestRunAnsiblePlaybookWorker(base.TestCase):
+
+    def setUp(self):
+        super(TestRunAnsiblePlaybookWorker, self).setUp()
+        self.workdir = tempfile.mkdtemp()
+        with open(os.path.join(self.workdir, 'existing.yaml'), 'w') as f:
+            f.write('- hosts: localhost\n')
+        get_pool = mock.patch('tripleoclient.ansible_worker.get_pool')
+        self.mock_pool = get_pool.start().return_value
+        self.addCleanup(get_pool.stop)
+        self.mock_pool.run.return_value = ('successful', 0)
+        run = mock.patch.object(
+            Runner,
+            'run',
+            return_value=fakes.fake_ansible_runner_run_return()
+        )
+        self.mock_run = run.start()
+        self.addCleanup(run.stop)
+        fact_cache = mock.patch('tripleoclient.constants.FACT_CACHE_DIR',
+                                os.path.join(self.workdir, 'facts'))
+        fact_cache.start()
+        self.addCleanup(fact_cache.stop)
+
+    def _run(self, inventory='localhost,'):
+        return utils.run_ansible_playbook(
+            playbook='existing.yaml',
+            inventory=inventory,
+            workdir=self.workdir
+        )
+
+    def test_disabled(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, None))
+        self.assertEqual((0, 'Test Status'), self._run())
+        self.mock_pool.run.assert_not_called()
+
+    def test_enabled(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, '2'))
+        self.assertEqual((0, 'successful'), self._run())
+        self.mock_run.assert_not_called()
+        kwargs = self.mock_pool.run.call_args[1]
+        self.assertEqual('overcloud', kwargs['env']['TRIPLEO_PLAN_NAME'])
+
+    def test_enabled_events(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, '2'))
+        self.assertEqual((0, 'Test Status'), utils.run_ansible_playbook(
+            playbook='existing.yaml',
+            inventory='localhost,',
+            workdir=self.workdir,
+            events=ansible_events.AnsibleEventStream()
+        ))
+        self.mock_pool.run.assert_not_called()
+
+    def test_enabled_remote_inventory(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, '2'))
+        self.assertEqual((0, 'Test Status'), self._run(inventory='node-0,'))
+        self.mock_pool.run.assert_not_called()
+
+    def test_enabled_worker_error(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, '1'))
+        self.mock_pool.run.side_effect = exceptions.AnsibleWorkerError
+        self.assertEqual((0, 'Test Status'), self._run())
+        self.mock_run.assert_called_once_with()
+
+    def test_invalid_value(self):
+        self.useFixture(fixtures.EnvironmentVariable(
+            constants.ANSIBLE_WORKERS_ENV, 'many'))
+        self.assertEqual((0, 'Test Status'), self._run())
+        self.mock_pool.run.assert_not_called()
@@ -0,0 +1,129 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import socket
+import threading
+
+from tripleoclient import bmc_probe
+
+from tripleoclient.tests import base
+
+
+class FakeIPMIBMC(object):
+    """UDP listener answering the RMCP presence pings."""
+
+    def __init__(self, answer=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.port = self.sock.getsockname()[1]
+        self.answer = answer
+        self.pings = 0
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                data, address = self.sock.recvfrom(512)
+            except socket.error:
+                return
+            self.pings += 1
+            if not self.answer:
+                continue
+            pong = bytearray(data)
+            # Answer a stale ping first, it is ignored by the client
+            pong[8] = 0x40
+            pong[9] = (pong[9] + 1) % 255
+            self.sock.sendto(bytes(pong), address)
+            pong[9] = data[9]
+            self.sock.sendto(bytes(pong), address)
+
+    def close(self):
+        self.sock.close()
+
+
+class TestBMCProbe(base.TestCase):
+
+    def setUp(self):
+        super(TestBMCProbe, self).setUp()
+        self.ipmi = FakeIPMIBMC()
+        self.addCleanup(self.ipmi.close)
+        self.https = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.https.bind(('127.0.0.1', 0))
+        self.https.listen(8)
+        self.addCleanup(self.https.close)
+        self.https_port = self.https.getsockname()[1]
+        # Port with nothing listening
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    def test_probe_target(self):
+        self.assertEqual(('ipmi', '192.0.2.1', 623), bmc_probe.probe_target(
+            {'pm_type': 'ipmi', 'pm_addr': '192.0.2.1'}))
+        self.assertEqual(('ipmi', '192.0.2.1', 6230), bmc_probe.probe_target(
+            {'pm_type': 'pxe_ipmitool', 'ipmi_address': '192.0.2.1',
+             'ipmi_port': '6230'}))
+        self.assertEqual(('https', '192.0.2.1', 443), bmc_probe.probe_target(
+            {'pm_type': 'idrac', 'pm_addr': '192.0.2.1'}))
+        self.assertEqual(('https', '192.0.2.1', 8000), bmc_probe.probe_target(
+            {'pm_type': 'redfish',
+             'redfish_address': 'https://192.0.2.1:8000/redfish/v1'}))
+        self.assertEqual(('https', 'bmc', 80), bmc_probe.probe_target(
+            {'pm_type': 'redfish', 'pm_addr': 'http://bmc'}))
+        self.assertIsNone(bmc_probe.probe_target(
+            {'pm_type': 'manual-management'}))
+        self.assertIsNone(bmc_probe.probe_target({'pm_type': 'ipmi'}))
+
+    def test_rmcp_ping(self):
+        bmc_probe.rmcp_ping('127.0.0.1', self.ipmi.port, timeout=5)
+        self.assertEqual(1, self.ipmi.pings)
+
+    def test_rmcp_ping_timeout(self):
+        self.ipmi.answer = False
+        self.assertRaises(socket.timeout, bmc_probe.rmcp_ping,
+                          '127.0.0.1', self.ipmi.port, timeout=0.2)
+
+    def test_tcp_connect(self):
+        bmc_probe.tcp_connect('127.0.0.1', self.https_port, timeout=5)
+        self.assertRaises(socket.error, bmc_probe.tcp_connect,
+                          '127.0.0.1', self.closed_port, timeout=5)
+
+    def test_probe_nodes(self):
+        silent = FakeIPMIBMC(answer=False)
+        self.addCleanup(silent.close)
+        nodes = [
+            {'pm_type': 'ipmi', 'pm_addr': '127.0.0.1',
+             'pm_port': self.ipmi.port},
+            {'pm_type': 'redfish',
+             'pm_addr': 'https://127.0.0.1:%d' % self.https_port},
+            {'pm_type': 'ipmi', 'pm_addr': '127.0.0.1',
+             'pm_port': silent.port},
+            {'pm_type': 'idrac', 'pm_addr': '127.0.0.1',
+             'pm_port': self.closed_port},
+            {'pm_type': 'manual-management'},
+        ]
+        errors = bmc_probe.probe_nodes(nodes, timeout=0.5, workers=4)
+        self.assertEqual([2, 3], [index for index, _ in errors])
+        self.assertIn('BMC 127.0.0.1:%d (ipmi) is not reachable: timed out'
+                      % silent.port, errors[0][1])
+        self.assertIn('BMC 127.0.0.1:%d (https) is not reachable'
+                      % self.closed_port, errors[1][1])
+
+    def test_probe_nodes_none(self):
+        self.assertEqual([], bmc_probe.probe_nodes(
+            [{'pm_type': 'manual-management'}]))
@@ -0,0 +1,137 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import fixtures
+import hashlib
+import os
+
+from tripleoclient import config_writer
+
+from tripleoclient.tests import base
+
+
+class FakeSwift(object):
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.downloaded = []
+
+    def get_container(self, container, full_listing=False):
+        return {}, [
+            {'name': name,
+             'hash': hashlib.md5(contents.encode('utf-8')).hexdigest()}
+            for name, contents in sorted(self.objects.items())]
+
+    def get_object(self, container, name):
+        self.downloaded.append(name)
+        return {}, self.objects[name]
+
+
+class TestConfigWriter(base.TestCase):
+
+    def setUp(self):
+        super(TestConfigWriter, self).setUp()
+        self.work_dir = self.useFixture(fixtures.TempDir()).path
+        self.swift = FakeSwift({
+            'deploy_steps_playbook.yaml': 'deploy',
+            'group_vars/Controller': 'controller',
+            'group_vars/Compute': 'compute',
+            'host_vars/controller-0': 'controller-0',
+            'host_vars/compute-0': 'compute-0',
+            'Controller/deployments.yaml': 'deployments',
+            'Compute/compute-0/NetworkDeployment': 'network',
+            '.git/index': 'index',
+            'overcloud-config.tar.gz': 'tarball',
+        })
+
+    def _sync(self):
+        self.swift.downloaded = []
+        return config_writer.sync_container(
+            self.swift, 'overcloud-config', self.work_dir,
+            ignore=['overcloud-config.tar.gz'])
+
+    def _read(self, name):
+        with open(os.path.join(self.work_dir, name)) as f:
+            return f.read()
+
+    def test_sync_container(self):
+        changes = self._sync()
+        self.assertEqual(9, len(changes.written))
+        self.assertEqual('network',
+                         self._read('Compute/compute-0/NetworkDeployment'))
+        self.assertEqual(['deploy_steps_playbook.yaml'], changes.common)
+        self.assertIsNone(changes.limit())
+
+        # The files are only downloaded once
+        changes = self._sync()
+        self.assertEqual([], self.swift.downloaded)
+        self.assertEqual([], changes.written)
+        self.assertEqual(9, changes.unchanged)
+        self.assertFalse(changes.changed)
+        self.assertEqual('The configuration of the nodes is unchanged',
+                         config_writer.summary(changes))
+
+    def test_sync_container_changes(self):
+        self._sync()
+        self.swift.objects.update({
+            'group_vars/Compute': 'compute changed',
+            'Compute/compute-0/NetworkDeployment': 'network changed',
+            'host_vars/controller-0': 'controller-0 changed',
+            '.git/index': 'index changed',
+            'overcloud-config.tar.gz': 'tarball changed',
+        })
+        changes = self._sync()
+        self.assertEqual(5, len(changes.written))
+        self.assertEqual(sorted(changes.written), sorted(
+            self.swift.downloaded))
+        self.assertEqual('compute changed',
+                         self._read('group_vars/Compute'))
+        self.assertEqual({'Compute'}, changes.roles)
+        self.assertEqual({'compute-0', 'controller-0'}, changes.hosts)
+        self.assertEqual([], changes.common)
+        self.assertEqual('Compute:compute-0:controller-0', changes.limit())
+        self.assertEqual(
+            'The configuration changed for roles Compute and hosts '
+            'compute-0, controller-0, the nodes affected may be selected '
+            'with --limit Compute:compute-0:controller-0',
+            config_writer.summary(changes))
+
+    def test_sync_container_outside(self):
+        self.swift.objects = {'../escape': 'escape'}
+        changes = self._sync()
+        self.assertEqual([], changes.written)
+        self.assertFalse(os.path.exists(
+            os.path.join(os.path.dirname(self.work_dir), 'escape')))
+
+    def test_write_file(self):
+        path = os.path.join(self.work_dir, 'group_vars', 'Compute')
+        self.assertTrue(config_writer.write_file(path, b'compute', 0o640))
+        self.assertEqual(0o640, os.stat(path).st_mode & 0o777)
+        self.assertFalse(config_writer.write_file(path, b'compute'))
+        os.chmod(path, 0o600)
+        self.assertTrue(config_writer.write_file(path, b'changed', 0o640))
+        # The permissions of the existing file are kept
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+        self.assertEqual(['Compute'], os.listdir(os.path.dirname(path)))
+
+    def test_link_latest(self):
+        stack_dir = os.path.join(self.work_dir, 'overcloud')
+        link = os.path.join(self.work_dir, 'config-download-latest')
+        config_writer.link_latest(stack_dir)
+        config_writer.link_latest(stack_dir)
+        self.assertEqual(stack_dir, os.readlink(link))
+        other_dir = os.path.join(self.work_dir, 'other')
+        config_writer.link_latest(other_dir)
+        self.assertEqual(other_dir, os.readlink(link))
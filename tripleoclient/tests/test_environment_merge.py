@@ -0,0 +1,108 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import copy
+
+from heatclient.common import template_utils
+
+from tripleoclient import environment_merge
+
+from tripleoclient.tests import base
+
+
+class TestLayeredEnvironment(base.TestCase):
+
+    def setUp(self):
+        super(TestLayeredEnvironment, self).setUp()
+        self.envs = [
+            ('base.yaml', {
+                'resource_registry': {
+                    'OS::TripleO::Services::Foo': 'foo.yaml',
+                    'OS::TripleO::Services::Bar': 'bar.yaml'},
+                'parameter_defaults': {
+                    'NtpServer': ['pool.ntp.org'],
+                    'ControllerParameters': {'Debug': True},
+                    'ComputeParameters': {'Debug': True}}}),
+            ('empty.yaml', {'parameter_defaults': None}),
+            ('override.yaml', {
+                'resource_registry': {
+                    'OS::TripleO::Services::Bar': 'OS::Heat::None'},
+                'parameter_defaults': {
+                    'NtpServer': ['ntp.example.com'],
+                    'ControllerParameters': {'Verbose': True},
+                    'ComputeParameters': 'replaced',
+                    'Unset': None}}),
+            ('mapping.yaml', {
+                'parameter_defaults': {
+                    'ComputeParameters': {'Debug': False},
+                    'ControllerParameters': None}}),
+        ]
+        self.layers = environment_merge.LayeredEnvironment()
+        for source, env in self.envs:
+            self.layers.add(env, source)
+
+    def test_materialise(self):
+        # deep_update fails to merge a mapping into a value which is not
+        # a mapping, as done by the last environment
+        layers = environment_merge.LayeredEnvironment()
+        expected = {}
+        for source, env in self.envs[:-1]:
+            layers.add(env, source)
+            template_utils.deep_update(expected, copy.deepcopy(env))
+        self.assertEqual(expected, layers.materialise())
+
+    def test_materialise_replaced_by_mapping(self):
+        env = self.layers.materialise()
+        self.assertEqual({'Debug': False},
+                         env['parameter_defaults']['ComputeParameters'])
+        self.assertEqual({'Debug': True, 'Verbose': True},
+                         env['parameter_defaults']['ControllerParameters'])
+
+    def test_materialise_copies_mappings(self):
+        env = self.layers.materialise()
+        env['parameter_defaults']['ControllerParameters']['Debug'] = False
+        self.assertTrue(
+            self.envs[0][1]['parameter_defaults']['ControllerParameters'][
+                'Debug'])
+
+    def test_sources(self):
+        self.assertEqual(
+            ['override.yaml'],
+            self.layers.sources('parameter_defaults', 'NtpServer'))
+        self.assertEqual(
+            ['base.yaml', 'override.yaml'],
+            self.layers.sources('parameter_defaults',
+                                'ControllerParameters'))
+        self.assertEqual(
+            ['mapping.yaml'],
+            self.layers.sources('parameter_defaults', 'ComputeParameters'))
+        self.assertEqual(
+            ['base.yaml'],
+            self.layers.sources('resource_registry',
+                                'OS::TripleO::Services::Foo'))
+
+    def test_sources_not_set(self):
+        self.assertRaises(KeyError, self.layers.sources,
+                          'parameter_defaults', 'Missing')
+        self.assertRaises(KeyError, self.layers.sources,
+                          'parameter_defaults', 'NtpServer', 'Missing')
+
+    def test_empty(self):
+        layers = environment_merge.LayeredEnvironment()
+        layers.add(None, 'none.yaml')
+        layers.add({}, 'empty.yaml')
+        layers.add('text', 'text.yaml')
+        self.assertEqual([], layers.layers)
+        self.assertEqual({}, layers.materialise())
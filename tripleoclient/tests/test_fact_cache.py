@@ -0,0 +1,94 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import fixtures
+import mock
+import os
+import time
+
+from tripleoclient import fact_cache
+
+from tripleoclient.tests import base
+
+
+class TestFactCache(base.TestCase):
+
+    def setUp(self):
+        super(TestFactCache, self).setUp()
+        self.base_dir = self.useFixture(fixtures.TempDir()).path
+        self.stack = mock.Mock(id='stack-id', stack_name='overcloud',
+                               creation_time='2020-06-01T10:00:00Z',
+                               updated_time=None)
+
+    def _cache_facts(self, *hosts):
+        path = fact_cache.fact_dir('overcloud', self.base_dir)
+        for host in hosts:
+            with open(os.path.join(path, host), 'w') as f:
+                f.write('{"_ansible_facts_gathered": true}')
+
+    def test_fact_dir(self):
+        self.assertEqual(
+            os.path.join(self.base_dir, 'overcloud', 'facts'),
+            fact_cache.fact_dir('overcloud', self.base_dir))
+
+    def test_fact_dir_default(self):
+        self.useFixture(fixtures.MockPatch(
+            'tripleoclient.constants.FACT_CACHE_DIR', '/home/stack/facts'))
+        self.assertEqual('/home/stack/facts/standalone/facts',
+                         fact_cache.fact_dir('standalone'))
+
+    def test_sync(self):
+        self.assertTrue(fact_cache.sync(self.stack, self.base_dir))
+        self._cache_facts('controller-0', 'compute-0')
+        self.assertFalse(fact_cache.sync(self.stack, self.base_dir))
+        self.assertEqual(['compute-0', 'controller-0'],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
+
+        # The facts of the nodes are dropped with every stack update
+        self.stack.updated_time = '2020-06-02T10:00:00Z'
+        self.assertTrue(fact_cache.sync(self.stack, self.base_dir))
+        self.assertEqual([],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
+        self.assertEqual(['facts', 'stack'], sorted(os.listdir(
+            fact_cache.stack_dir('overcloud', self.base_dir))))
+        self.assertFalse(fact_cache.sync(self.stack, self.base_dir))
+
+    def test_sync_other_stack(self):
+        self.assertTrue(fact_cache.sync(self.stack, self.base_dir))
+        self._cache_facts('controller-0')
+        self.stack.id = 'other-stack-id'
+        self.assertTrue(fact_cache.sync(self.stack, self.base_dir))
+        self.assertEqual([],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
+
+    def test_cached_hosts_expired(self):
+        self.assertEqual([],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
+        fact_cache.sync(self.stack, self.base_dir)
+        self._cache_facts('controller-0', 'compute-0')
+        path = os.path.join(fact_cache.fact_dir('overcloud', self.base_dir),
+                            'compute-0')
+        old = time.time() - 7300
+        os.utime(path, (old, old))
+        self.assertEqual(['controller-0'],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
+
+    def test_clear(self):
+        fact_cache.sync(self.stack, self.base_dir)
+        self._cache_facts('controller-0')
+        fact_cache.clear('overcloud', self.base_dir)
+        fact_cache.clear('overcloud', self.base_dir)
+        self.assertEqual([],
+                         fact_cache.cached_hosts('overcloud', self.base_dir))
@@ -17,17 +17,21 @@
 import ansible_runner
 import argparse
 import datetime
+import fixtures
+import json
 import logging
 import mock
 import os
 import os.path
 import shutil
+import six
 import socket
 import subprocess
 import tempfile
 
 import sys
 
+from heatclient.common import template_utils
 from heatclient import exc as hc_exc
 
 from uuid import uuid4
@@ -36,6 +40,7 @@ from testscenarios import TestWithScenarios
 from unittest import TestCase
 import yaml
 
+from tripleoclient import ansible_events
 from tripleoclient import exceptions
 from tripleoclient import utils
 
@@ -55,6 +60,10 @@ class TestRunAnsiblePlaybook(TestCase):
         self.unlink_patch.start()
         self.mock_log = mock.Mock('logging.getLogger')
         self.ansible_playbook_cmd = "ansible-playbook"
+        self.fact_cache_patch = mock.patch(
+            'tripleoclient.constants.FACT_CACHE_DIR', '/cache/facts')
+        self.addCleanup(self.fact_cache_patch.stop)
+        self.fact_cache_patch.start()
 
     @mock.patch('os.path.exists', return_value=False)
     @mock.patch('tripleoclient.utils.run_command_and_log')
@@ -196,6 +205,80 @@ class TestRunAnsiblePlaybook(TestCase):
         )
         self.assertEqual(retcode, 0)
 
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('os.makedirs')
+    @mock.patch('ansible_runner.utils.dump_artifact', autospec=True,
+                return_value="/foo/inventory.yaml")
+    @mock.patch('ansible_runner.runner_config.RunnerConfig')
+    @mock.patch('ansible_runner.Runner')
+    def test_run_with_events(self, mock_runner, mock_config,
+                             mock_dump_artifact, mock_mkdirs, mock_exists):
+        runner_config = mock_config.return_value
+        runner_config.env = {'ANSIBLE_STDOUT_CALLBACK': 'awx_display'}
+        mock_runner.return_value.run.return_value = ('successful', 0)
+        events = ansible_events.AnsibleEventStream()
+        self.assertEqual(
+            (0, 'successful'),
+            utils.run_ansible_playbook(
+                playbook='existing.yaml',
+                inventory='localhost,',
+                workdir='/tmp',
+                events=events
+            )
+        )
+        mock_runner.assert_called_once_with(
+            config=runner_config,
+            event_handler=events.event_handler,
+            status_handler=events.status_handler)
+        # The callback of ansible-runner emitting the events is kept
+        self.assertEqual({'ANSIBLE_STDOUT_CALLBACK': 'awx_display',
+                          'ORIGINAL_STDOUT_CALLBACK': 'yaml'},
+                         runner_config.env)
+
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('os.makedirs')
+    @mock.patch('ansible_runner.utils.dump_artifact', autospec=True,
+                return_value="/foo/inventory.yaml")
+    @mock.patch('ansible_runner.runner_config.RunnerConfig')
+    @mock.patch('ansible_runner.Runner')
+    @mock.patch('tripleoclient.utils._available_memory_mb', return_value=None)
+    @mock.patch('tripleoclient.utils._cpu_count', return_value=2)
+    def test_run_with_auto_forks(self, mock_cpu_count, mock_memory,
+                                 mock_runner, mock_config, mock_dump_artifact,
+                                 mock_mkdirs, mock_exists):
+        mock_runner.return_value.run.return_value = ('successful', 0)
+        with mock.patch.dict('os.environ', {'TRIPLEO_ANSIBLE_FORKS': 'auto'}):
+            utils.run_ansible_playbook(
+                playbook='existing.yaml',
+                inventory='controller-0,compute-0,compute-1,',
+                workdir='/tmp'
+            )
+        envvars = mock_config.call_args[1]['envvars']
+        self.assertEqual('3', envvars['ANSIBLE_FORKS'])
+        self.assertEqual('45', envvars['ANSIBLE_GATHER_TIMEOUT'])
+
+    @mock.patch('tripleoclient.utils.makedirs')
+    @mock.patch('os.path.exists', return_value=True)
+    @mock.patch('ansible_runner.utils.dump_artifact', autospec=True,
+                return_value="/foo/inventory.yaml")
+    @mock.patch('ansible_runner.runner_config.RunnerConfig')
+    @mock.patch('ansible_runner.Runner')
+    def test_run_with_stack_fact_cache(self, mock_runner, mock_config,
+                                       mock_dump_artifact, mock_exists,
+                                       mock_mkdirs):
+        mock_runner.return_value.run.return_value = ('successful', 0)
+        utils.run_ansible_playbook(
+            playbook='existing.yaml',
+            inventory='localhost,',
+            workdir='/tmp',
+            plan='central'
+        )
+        mock_mkdirs.assert_any_call('/cache/facts/central/facts')
+        self.assertEqual('/cache/facts/central/facts',
+                         mock_config.call_args[1]['fact_cache'])
+        envvars = mock_config.call_args[1]['envvars']
+        self.assertEqual('7200', envvars['ANSIBLE_CACHE_PLUGIN_TIMEOUT'])
+
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tripleoclient.utils.makedirs')
     @mock.patch('os.path.exists', side_effect=(False, True, True))
@@ -246,6 +329,168 @@ class TestRunAnsiblePlaybook(TestCase):
         )
 
 
+class TestAnsibleRunnerProfile(base.TestCase):
+    def setUp(self):
+        super(TestAnsibleRunnerProfile, self).setUp()
+        utils.clear_runner_profiles()
+        self.addCleanup(utils.clear_runner_profiles)
+        self.useFixture(fixtures.MockPatch(
+            'tripleoclient.constants.FACT_CACHE_DIR',
+            self.useFixture(fixtures.TempDir()).path))
+
+    def test_get_runner_profile_cached(self):
+        profile = utils.get_runner_profile(ssh_user='tripleo-admin')
+        self.assertIs(
+            profile,
+            utils.get_runner_profile(ssh_user='tripleo-admin')
+        )
+        self.assertIsNot(
+            profile,
+            utils.get_runner_profile(ssh_user='root')
+        )
+
+    def test_profile_env(self):
+        profile = utils.get_runner_profile(
+            connection='local',
+            ssh_user='tripleo-admin',
+            key='/tmp/key',
+            gathering_policy='explicit'
+        )
+        self.assertEqual('local', profile.env['ANSIBLE_TRANSPORT'])
+        self.assertEqual('tripleo-admin', profile.env['ANSIBLE_REMOTE_USER'])
+        self.assertEqual('/tmp/key', profile.env['ANSIBLE_PRIVATE_KEY_FILE'])
+        self.assertEqual('explicit', profile.env['ANSIBLE_GATHERING'])
+        self.assertEqual(
+            sys.executable,
+            profile.env['ANSIBLE_PYTHON_INTERPRETER']
+        )
+
+    def test_profile_plugin_paths(self):
+        profile = utils.get_runner_profile(module_path='/foo/modules')
+        paths = profile.plugin_paths(workdir='/work', cwd='/cwd')
+        library = paths['ANSIBLE_LIBRARY'].split(':')
+        self.assertIn('/work/modules', library)
+        self.assertIn('/cwd/modules', library)
+        self.assertEqual('/foo/modules', library[-1])
+        roles = paths['ANSIBLE_ROLES_PATH'].split(':')
+        self.assertIn('/work/roles', roles)
+        self.assertIn('/etc/ansible/roles', roles)
+
+    def test_profile_generated_ansible_cfg(self):
+        profile = utils.get_runner_profile()
+        ansible_cfg = profile.ansible_cfg
+        self.assertEqual(ansible_cfg, profile.ansible_cfg)
+        cfg = ConfigParser()
+        cfg.read(ansible_cfg)
+        self.assertEqual('0.05', cfg.get('defaults', 'internal_poll_interval'))
+
+    def test_profile_generated_ansible_cfg_removed(self):
+        profile = utils.get_runner_profile()
+        ansible_cfg = profile.ansible_cfg
+        shutil.rmtree(os.path.dirname(ansible_cfg))
+        self.assertTrue(os.path.isfile(profile.ansible_cfg))
+
+    def test_profile_provided_ansible_cfg(self):
+        profile = utils.get_runner_profile(ansible_cfg='/foo/ansible.cfg')
+        self.assertEqual('/foo/ansible.cfg', profile.ansible_cfg)
+
+    @mock.patch.object(
+        Runner,
+        'run',
+        return_value=fakes.fake_ansible_runner_run_return()
+    )
+    @mock.patch('tripleoclient.utils.AnsibleRunnerProfile',
+                wraps=utils.AnsibleRunnerProfile)
+    def test_run_ansible_playbook_reuses_profile(self, mock_profile,
+                                                 mock_run):
+        workdir = tempfile.mkdtemp()
+        with open(os.path.join(workdir, 'existing.yaml'), 'w') as f:
+            f.write('- hosts: localhost\n')
+        for plan in ('overcloud', 'other'):
+            utils.run_ansible_playbook(
+                playbook='existing.yaml',
+                inventory='localhost,',
+                workdir=workdir,
+                plan=plan
+            )
+        self.assertEqual(1, mock_profile.call_count)
+        self.assertEqual(2, mock_run.call_count)
+
+
+class TestStageTemplatesDir(base.TestCase):
+
+    def setUp(self):
+        super(TestStageTemplatesDir, self).setUp()
+        self.source = tempfile.mkdtemp()
+        self.dest = os.path.join(tempfile.mkdtemp(), 'tht')
+        for name in ('overcloud.j2.yaml', 'roles_data.yaml',
+                     'environments/ssl.yaml', 'network/ports/vip.yaml',
+                     'network/ports/ports.j2'):
+            path = os.path.join(self.source, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(name)
+        os.symlink('environments', os.path.join(self.source, 'envs'))
+        os.symlink('ssl.yaml',
+                   os.path.join(self.source, 'environments', 'tls.yaml'))
+
+    def _path(self, name):
+        return os.path.join(self.dest, name)
+
+    def _shared(self, name):
+        return os.path.samefile(os.path.join(self.source, name),
+                                self._path(name))
+
+    def _assert_tree(self):
+        for name in ('overcloud.j2.yaml', 'roles_data.yaml',
+                     'environments/ssl.yaml', 'network/ports/vip.yaml'):
+            with open(self._path(name)) as f:
+                self.assertEqual(name, f.read())
+        self.assertEqual('environments', os.readlink(self._path('envs')))
+        self.assertEqual('ssl.yaml',
+                         os.readlink(self._path('environments/tls.yaml')))
+        self.assertFalse(os.path.islink(self._path('environments')))
+
+    def test_hardlink(self):
+        stats = utils.stage_templates_dir(self.source, self.dest,
+                                          methods=('hardlink',))
+        self._assert_tree()
+        self.assertEqual({'hardlink': 1, 'copy': 4}, stats)
+        self.assertTrue(self._shared('environments/ssl.yaml'))
+        # Directories with jinja2 templates are never shared
+        self.assertFalse(self._shared('roles_data.yaml'))
+        self.assertFalse(self._shared('network/ports/vip.yaml'))
+
+    def test_symlink(self):
+        stats = utils.stage_templates_dir(self.source, self.dest,
+                                          methods=('symlink', 'copy'))
+        self._assert_tree()
+        self.assertEqual({'symlink': 1, 'copy': 4}, stats)
+        self.assertTrue(os.path.islink(self._path('environments/ssl.yaml')))
+        self.assertFalse(os.path.islink(self._path('roles_data.yaml')))
+
+    @mock.patch('os.link', side_effect=OSError(18, 'Invalid cross-device'))
+    def test_fallback_to_copy(self, mock_link):
+        stats = utils.stage_templates_dir(self.source, self.dest,
+                                          methods=('hardlink',))
+        self._assert_tree()
+        self.assertEqual({'copy': 5}, stats)
+        self.assertEqual(1, mock_link.call_count)
+
+    @mock.patch('fcntl.ioctl', side_effect=IOError(95, 'Not supported'))
+    def test_reflink_not_supported(self, mock_ioctl):
+        stats = utils.stage_templates_dir(self.source, self.dest)
+        self._assert_tree()
+        self.assertEqual({'hardlink': 1, 'copy': 4}, stats)
+        self.assertEqual(1, mock_ioctl.call_count)
+
+    def test_dest_exists(self):
+        os.makedirs(self.dest)
+        self.assertRaises(OSError, utils.stage_templates_dir,
+                          self.source, self.dest)
+
+
 class TestRunCommandAndLog(TestCase):
     def setUp(self):
         self.mock_logger = mock.Mock(spec=logging.Logger)
@@ -360,7 +605,7 @@ class TestWaitForStackUtil(TestCase):
         self.assertTrue(complete)
 
     @mock.patch("time.sleep")
-    @mock.patch("heatclient.common.event_utils.poll_for_events")
+    @mock.patch("tripleoclient.utils.poll_for_stack_events")
     @mock.patch("tripleoclient.utils.get_stack")
     def test_wait_for_stack_ready_retry(self, mock_get_stack, mock_poll,
                                         mock_time):
@@ -376,7 +621,7 @@ class TestWaitForStackUtil(TestCase):
         self.assertTrue(complete)
 
     @mock.patch("time.sleep")
-    @mock.patch("heatclient.common.event_utils.poll_for_events")
+    @mock.patch("tripleoclient.utils.poll_for_stack_events")
     @mock.patch("tripleoclient.utils.get_stack")
     def test_wait_for_stack_ready_retry_fail(self, mock_get_stack, mock_poll,
                                              mock_time):
@@ -392,7 +637,7 @@ class TestWaitForStackUtil(TestCase):
                           self.mock_orchestration, 'stack')
 
     @mock.patch("time.sleep")
-    @mock.patch("heatclient.common.event_utils.poll_for_events")
+    @mock.patch("tripleoclient.utils.poll_for_stack_events")
     @mock.patch("tripleoclient.utils.get_stack")
     def test_wait_for_stack_ready_server_fail(self, mock_get_stack, mock_poll,
                                               mock_time):
@@ -425,7 +670,7 @@ class TestWaitForStackUtil(TestCase):
 
         self.assertFalse(complete)
 
-    @mock.patch("heatclient.common.event_utils.poll_for_events")
+    @mock.patch("tripleoclient.utils.poll_for_stack_events")
     def test_wait_for_stack_in_progress(self, mock_poll_for_events):
 
         mock_poll_for_events.return_value = ("CREATE_IN_PROGRESS", "MESSAGE")
@@ -438,6 +683,119 @@ class TestWaitForStackUtil(TestCase):
         result = utils.wait_for_stack_ready(self.mock_orchestration, 'stack')
         self.assertEqual(False, result)
 
+    @mock.patch('time.sleep')
+    def test_poll_for_stack_events_not_verbose(self, mock_sleep):
+        stacks = [mock.Mock(stack_status='CREATE_IN_PROGRESS',
+                            updated_time=None) for i in range(4)]
+        stacks[2].updated_time = stacks[3].updated_time = '2020-01-01T00:00'
+        stacks.append(mock.Mock(stack_status='CREATE_COMPLETE'))
+        self.mock_orchestration.stacks.get.side_effect = stacks
+
+        status, msg = utils.poll_for_stack_events(
+            self.mock_orchestration, 'stack/id', action='CREATE',
+            verbose=False, min_period=2, max_period=8)
+
+        self.assertEqual('CREATE_COMPLETE', status)
+        self.assertIn('stack/id CREATE_COMPLETE', msg)
+        self.assertEqual(
+            [mock.call(4), mock.call(8), mock.call(4), mock.call(8)],
+            mock_sleep.call_args_list)
+        self.mock_orchestration.events.list.assert_not_called()
+
+    @mock.patch('time.sleep')
+    @mock.patch('heatclient.common.event_utils.get_events')
+    def test_poll_for_stack_events_verbose(self, mock_events, mock_sleep):
+        mock_events.side_effect = [
+            [self.mock_event('Controller', 'a', 'state changed',
+                             'CREATE_IN_PROGRESS', '2020-01-01T00:00:00')],
+            [],
+            [self.mock_event('stack', 'b', 'state changed',
+                             'CREATE_COMPLETE', '2020-01-01T00:00:01')],
+        ]
+        out = six.StringIO()
+
+        status, msg = utils.poll_for_stack_events(
+            self.mock_orchestration, 'stack/id', action='CREATE',
+            marker='start', out=out, nested_depth=2,
+            min_period=2, max_period=8)
+
+        self.assertEqual('CREATE_COMPLETE', status)
+        self.assertEqual(
+            ['start', 'a', 'a'],
+            [c[1]['marker'] for c in mock_events.call_args_list])
+        self.assertEqual(
+            [mock.call(2), mock.call(4)], mock_sleep.call_args_list)
+        self.assertIn('Controller', out.getvalue())
+        self.mock_orchestration.stacks.get.assert_not_called()
+
+    @mock.patch('time.sleep')
+    @mock.patch('heatclient.common.event_utils.get_events', return_value=[])
+    def test_poll_for_stack_events_verbose_stack_get(self, mock_events,
+                                                     mock_sleep):
+        self.mock_orchestration.stacks.get.return_value = mock.Mock(
+            stack_status='UPDATE_FAILED')
+
+        status, msg = utils.poll_for_stack_events(
+            self.mock_orchestration, 'stack/id', action='UPDATE',
+            out=six.StringIO())
+
+        self.assertEqual('UPDATE_FAILED', status)
+        self.assertEqual(2, mock_events.call_count)
+        self.mock_orchestration.stacks.get.assert_called_once_with(
+            'stack/id', resolve_outputs=False)
+
+    @mock.patch('time.sleep')
+    @mock.patch('heatclient.common.event_utils.get_events')
+    def test_poll_for_stack_events_terminal(self, mock_events, mock_sleep):
+        mock_events.side_effect = [
+            [self.mock_event('Controller', 'a', 'state changed',
+                             'CREATE_IN_PROGRESS', '2020-01-01T00:00:00')],
+            [], [],
+            [self.mock_event('Controller', 'b', 'state changed',
+                             'CREATE_COMPLETE', '2020-01-01T00:00:01')],
+            [], [],
+        ]
+        self.mock_orchestration.stacks.get.side_effect = [
+            mock.Mock(stack_status='CREATE_IN_PROGRESS'),
+            mock.Mock(stack_status='CREATE_COMPLETE')]
+
+        status, msg = utils.poll_for_stack_events(
+            self.mock_orchestration, 'stack/id', action='CREATE',
+            out=six.StringIO(), min_period=2, max_period=8)
+
+        self.assertEqual('CREATE_COMPLETE', status)
+        # No backoff once the resources settled
+        self.assertEqual(
+            [mock.call(2), mock.call(4), mock.call(8), mock.call(2),
+             mock.call(2)],
+            mock_sleep.call_args_list)
+
+    @mock.patch('heatclient.common.event_utils.get_events')
+    @mock.patch('tripleoclient.utils.get_stack')
+    def test_wait_for_stack_ready_retry_marker(self, mock_get_stack,
+                                               mock_events):
+        stack = mock.Mock(id='id')
+        stack.stack_name = 'stack'
+        mock_get_stack.return_value = stack
+        mock_events.side_effect = [
+            [self.mock_event('Controller', 'a', 'state changed',
+                             'CREATE_IN_PROGRESS', '2020-01-01T00:00:00')],
+            hc_exc.HTTPException(code=503),
+            [self.mock_event('stack', 'b', 'state changed',
+                             'CREATE_COMPLETE', '2020-01-01T00:00:01')],
+        ]
+
+        with mock.patch('sys.stdout', new_callable=six.StringIO):
+            complete = utils.wait_for_stack_ready(
+                self.mock_orchestration, 'stack', marker='start',
+                verbose=True)
+
+        self.assertTrue(complete)
+        # The retry goes on after the events already printed
+        self.assertEqual(
+            ['start', 'a', 'a'],
+            [c[1]['marker'] for c in mock_events.call_args_list])
+
     def test_check_stack_network_matches_env_files(self):
         stack_reg = {
             'OS::TripleO::Network': 'val',
@@ -812,6 +1170,33 @@ class TestAssignVerifyProfiles(TestCase):
         self.flavors = {'baremetal': (FakeFlavor('baremetal', None), 1)}
         self._test(0, 0)
 
+    def test_assign_profiles_concurrently(self):
+        self.nodes[:] = [self._get_fake_node(possible_profiles=['compute'])
+                         for _ in range(5)]
+        self.nodes.append(self._get_fake_node(profile='control'))
+        self.flavors['compute'] = (FakeFlavor('compute'), 5)
+
+        errors, warnings = utils.assign_and_verify_profiles(
+            self.bm_client, self.flavors, assign_profiles=True, workers=3)
+        self.assertEqual((0, 0), (errors, warnings))
+        self.assertEqual(
+            sorted(node.uuid for node in self.nodes[:5]),
+            sorted(c[0][0] for c in
+                   self.bm_client.node.update.call_args_list))
+        self.assertEqual(
+            ['compute'] * 5 + ['control'],
+            [utils.node_get_capabilities(node).get('profile')
+             for node in self.nodes])
+
+    def test_assign_profiles_update_failed(self):
+        self.nodes[:] = [self._get_fake_node(possible_profiles=['compute']),
+                         self._get_fake_node(possible_profiles=['control'])]
+        self.bm_client.node.update.side_effect = RuntimeError('Conflict')
+
+        self.assertRaises(RuntimeError, utils.assign_and_verify_profiles,
+                          self.bm_client, self.flavors, True)
+        self.assertEqual(2, self.bm_client.node.update.call_count)
+
 
 class TestPromptUser(TestCase):
     def setUp(self):
@@ -1110,8 +1495,8 @@ class ProcessMultipleEnvironments(TestCase):
                 'parse', autospec=True, return_value=dict())
     @mock.patch('heatclient.common.template_format.'
                 'parse', autospec=True, return_value=dict())
-    @mock.patch('yaml.safe_dump', autospec=True)
-    @mock.patch('yaml.safe_load', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_dump', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tempfile.NamedTemporaryFile', autospec=True)
     def test_rewrite_env_files(self,
@@ -1156,6 +1541,111 @@ class ProcessMultipleEnvironments(TestCase):
                                         default_flow_style=False)])
 
 
+class TestProcessEnvironmentsCache(base.TestCase):
+
+    def setUp(self):
+        super(TestProcessEnvironmentsCache, self).setUp()
+        self.cache_dir = os.path.join(self.temp_homedir, 'cache')
+        self.user_tht_root = tempfile.mkdtemp()
+        self.env_files = []
+        for i in range(3):
+            self._write('puppet/service-%d.yaml' % i,
+                        'heat_template_version: rocky\n'
+                        'resources:\n'
+                        '  config:\n'
+                        '    type: OS::Heat::Value\n'
+                        '    properties:\n'
+                        '      value: {get_file: config-%d.txt}\n' % i)
+            self._write('puppet/config-%d.txt' % i, 'config %d' % i)
+            self._write('environments/env-%d.yaml' % i,
+                        'resource_registry:\n'
+                        '  OS::TripleO::Service%d: '
+                        '../puppet/service-%d.yaml\n'
+                        'parameter_defaults:\n'
+                        '  Param%d: %d\n' % (i, i, i, i))
+            self.env_files.append(os.path.join(
+                self.user_tht_root, 'environments', 'env-%d.yaml' % i))
+
+    def _write(self, name, content, root=None):
+        path = os.path.join(root or self.user_tht_root, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _stage(self):
+        tht_root = os.path.join(tempfile.mkdtemp(), 'tripleo-heat-templates')
+        shutil.copytree(self.user_tht_root, tht_root)
+        return tht_root
+
+    def _process(self, tht_root):
+        with mock.patch('heatclient.common.template_utils.'
+                        'process_environment_and_files',
+                        wraps=template_utils.process_environment_and_files
+                        ) as mock_process:
+            result = utils.process_multiple_environments(
+                self.env_files, tht_root, self.user_tht_root,
+                cache_dir=self.cache_dir)
+        return result, mock_process.call_count
+
+    def test_cache_hit(self):
+        tht_root = self._stage()
+        (files, env), calls = self._process(tht_root)
+        self.assertEqual(3, calls)
+        self.assertEqual(3, len(os.listdir(self.cache_dir)))
+        self.assertEqual(((files, env), 0), self._process(tht_root))
+
+    def test_cache_relocated(self):
+        self._process(self._stage())
+        tht_root = self._stage()
+        (files, env), calls = self._process(tht_root)
+        self.assertEqual(0, calls)
+        self.assertEqual(2, env['parameter_defaults']['Param2'])
+        self.assertTrue(env['resource_registry']['OS::TripleO::Service0']
+                        .startswith('file://' + tht_root + '/'))
+        for url in files:
+            self.assertTrue(url.startswith('file://' + tht_root + '/'))
+
+    def test_cache_sibling_paths(self):
+        env = {'resource_registry': {
+            'OS::TripleO::Service0': '/tmp/a/tht/puppet/service-0.yaml',
+            'OS::TripleO::Service1': '/tmp/a/tht-custom/service-1.yaml',
+            'OS::TripleO::Service2': '/tmp/a/tht'}}
+        utils._store_cached_environment(self.cache_dir, 'key', '/tmp/a/tht',
+                                        {}, env)
+        self.assertEqual(
+            ({}, {'resource_registry': {
+                'OS::TripleO::Service0': '/tmp/b/tht/puppet/service-0.yaml',
+                'OS::TripleO::Service1': '/tmp/a/tht-custom/service-1.yaml',
+                'OS::TripleO::Service2': '/tmp/b/tht'}}),
+            utils._load_cached_environment(self.cache_dir, 'key',
+                                           '/tmp/b/tht/'))
+
+    def test_cache_invalidated(self):
+        self._process(self._stage())
+        self._write('puppet/config-1.txt', 'new config')
+        self._write('environments/env-2.yaml',
+                    'parameter_defaults:\n  Param2: 42\n')
+        tht_root = self._stage()
+        (files, env), calls = self._process(tht_root)
+        self.assertEqual(2, calls)
+        self.assertEqual(42, env['parameter_defaults']['Param2'])
+        self.assertEqual(
+            b'new config',
+            files['file://%s/puppet/config-1.txt' % tht_root])
+
+    def test_cache_pruned(self):
+        with mock.patch('tripleoclient.utils._ENVIRONMENT_CACHE_SIZE', 2):
+            self._process(self._stage())
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_cache_disabled(self):
+        self.cache_dir = None
+        tht_root = self._stage()
+        self.assertEqual(3, self._process(tht_root)[1])
+        self.assertEqual(3, self._process(tht_root)[1])
+
+
 class GetTripleoAnsibleInventory(TestCase):
 
     def setUp(self):
@@ -1185,6 +1675,150 @@ class GetTripleoAnsibleInventory(TestCase):
             )
 
 
+class TestCachedTripleoAnsibleInventory(base.TestCase):
+
+    def setUp(self):
+        super(TestCachedTripleoAnsibleInventory, self).setUp()
+        self.cache_dir = os.path.join(self.useFixture(
+            fixtures.TempDir()).path, 'inventories')
+        self.clients = mock.Mock()
+        self.auth = self.clients.tripleoclient.create_mistral_context(
+            ).security
+        self.auth.auth_uri = 'http://192.168.24.1:5000'
+        self.auth.project_name = 'admin'
+        self.auth.user_name = 'admin'
+        self.auth.auth_cacert = '/etc/pki/ca.pem'
+        self.stack = mock.Mock(id='stack-id', stack_status='UPDATE_COMPLETE',
+                               updated_time='2020-06-01T10:00:00Z')
+        self.useFixture(fixtures.MockPatch(
+            'tripleoclient.utils.get_key', return_value='/key'))
+        self.mock_get_stack = self.useFixture(fixtures.MockPatch(
+            'tripleoclient.utils.get_stack', return_value=self.stack)).mock
+        self.mock_inventory = self.useFixture(fixtures.MockPatch(
+            'tripleo_common.inventory.TripleoInventory')).mock
+        self.mock_inventory.return_value.write_static_inventory.side_effect = \
+            self._write_inventory
+
+    def _write_inventory(self, path):
+        with open(path, 'w') as f:
+            f.write('Undercloud: {}\n')
+
+    def _inventory(self, **kwargs):
+        return utils.get_tripleo_ansible_inventory(
+            ssh_user='tripleo-admin', stack='overcloud',
+            return_inventory_file_path=True, clients=self.clients,
+            cache_dir=self.cache_dir, **kwargs)
+
+    def test_generated_once(self):
+        path = self._inventory()
+        self.assertEqual(self.cache_dir, os.path.dirname(path))
+        self.assertEqual(path, self._inventory())
+        self.assertEqual(1, self.mock_inventory.call_count)
+        self.mock_inventory.assert_called_once_with(
+            hclient=self.clients.orchestration,
+            auth_url='http://192.168.24.1:5000',
+            cacert='/etc/pki/ca.pem',
+            project_name='admin',
+            username='admin', ansible_ssh_user='tripleo-admin',
+            undercloud_key_file='/key', undercloud_connection='ssh',
+            plan_name='overcloud')
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+        self.assertEqual(['Undercloud: {}\n'],
+                         open(path).readlines())
+        self.assertEqual([os.path.basename(path)],
+                         os.listdir(self.cache_dir))
+
+    def test_regenerated_when_stack_changes(self):
+        path = self._inventory()
+        self.stack.updated_time = '2020-06-02T10:00:00Z'
+        self.assertNotEqual(path, self._inventory())
+        self.stack.stack_status = 'UPDATE_IN_PROGRESS'
+        self._inventory()
+        self.assertEqual(3, self.mock_inventory.call_count)
+
+    def test_regenerated_for_other_settings(self):
+        path = self._inventory()
+        self.assertNotEqual(path,
+                            self._inventory(undercloud_connection='local'))
+        self.assertEqual(2, self.mock_inventory.call_count)
+
+    def test_regenerated_when_cacert_changes(self):
+        path = self._inventory()
+        self.auth.auth_cacert = None
+        self.assertNotEqual(path, self._inventory())
+        self.assertEqual(2, self.mock_inventory.call_count)
+        self.assertIsNone(self.mock_inventory.call_args[1]['cacert'])
+
+    def test_prune(self):
+        with mock.patch('tripleoclient.utils._INVENTORY_CACHE_SIZE', 2):
+            for updated in range(4):
+                self.stack.updated_time = str(updated)
+                self._inventory()
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_cleanup_keeps_cached_inventory(self):
+        path = self._inventory()
+        utils.cleanup_tripleo_ansible_inventory_file(
+            path, cache_dir=self.cache_dir)
+        self.assertTrue(os.path.exists(path))
+
+    def test_missing_stack_not_cached(self):
+        self.mock_get_stack.return_value = None
+        home = self.useFixture(fixtures.TempDir()).path
+        with mock.patch('tripleoclient.constants.CLOUD_HOME_DIR', home):
+            path = self._inventory()
+        self.assertEqual(os.path.join(home, 'tripleo-ansible-inventory.yaml'),
+                         path)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+    def test_generation_failure(self):
+        self.mock_inventory.return_value.write_static_inventory.side_effect = \
+            Exception('No IPs found for Controller role on ctlplane network')
+        self.assertRaises(exceptions.InvalidConfiguration, self._inventory)
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+
+class TestConfigCache(base.TestCase):
+
+    def setUp(self):
+        super(TestConfigCache, self).setUp()
+        self.work_dir = self.useFixture(fixtures.TempDir()).path
+        self.stack = mock.Mock(id='stack-id', stack_status='UPDATE_COMPLETE',
+                               updated_time='2020-06-01T10:00:00Z')
+
+    def test_config_cache_key(self):
+        key = utils.config_cache_key(self.stack, 'overcloud-config')
+        self.assertEqual(key, utils.config_cache_key(self.stack,
+                                                     'overcloud-config'))
+        self.assertNotEqual(key, utils.config_cache_key(self.stack,
+                                                        'other-config'))
+        for attr, value in (('stack_status', 'UPDATE_IN_PROGRESS'),
+                            ('updated_time', '2020-06-02T10:00:00Z'),
+                            ('id', 'other-stack-id')):
+            stack = mock.Mock(**{'id': self.stack.id,
+                                 'stack_status': self.stack.stack_status,
+                                 'updated_time': self.stack.updated_time,
+                                 attr: value})
+            self.assertNotEqual(
+                key, utils.config_cache_key(stack, 'overcloud-config'))
+
+    def test_set_config_cache_key(self):
+        self.assertFalse(utils.is_config_cached(self.work_dir, 'key'))
+        utils.set_config_cache_key(self.work_dir, 'key')
+        self.assertTrue(utils.is_config_cached(self.work_dir, 'key'))
+        self.assertFalse(utils.is_config_cached(self.work_dir, 'other'))
+        self.assertEqual(['.tripleo-config-key'], os.listdir(self.work_dir))
+
+        utils.set_config_cache_key(self.work_dir)
+        utils.set_config_cache_key(self.work_dir)
+        self.assertFalse(utils.is_config_cached(self.work_dir, 'key'))
+
+    def test_set_config_cache_key_missing_dir(self):
+        work_dir = os.path.join(self.work_dir, 'overcloud')
+        utils.set_config_cache_key(work_dir, 'key')
+        self.assertFalse(utils.is_config_cached(work_dir, 'key'))
+
+
 class TestNormalizeFilePath(TestCase):
 
     @mock.patch('os.path.isfile', return_value=True)
@@ -1212,6 +1846,140 @@ class TestFetchRolesFile(TestCase):
                                  [{'name': 'Foobar'}])
 
 
+class TestTuneAnsibleScenarios(TestWithScenarios):
+    # Hosts of the inventory, CPUs and available memory of the undercloud
+    scenarios = [
+        ('standalone',
+         dict(hosts=1, cpus=4, memory=8000, forks=1, gather_timeout=45)),
+        ('small_overcloud',
+         dict(hosts=10, cpus=8, memory=32000, forks=10, gather_timeout=45)),
+        ('large_overcloud_large_undercloud',
+         dict(hosts=500, cpus=64, memory=256000, forks=500,
+              gather_timeout=105)),
+        ('large_overcloud_small_undercloud',
+         dict(hosts=500, cpus=8, memory=32000, forks=64,
+              gather_timeout=120)),
+        ('memory_bound',
+         dict(hosts=500, cpus=64, memory=2000, forks=20, gather_timeout=45)),
+        ('no_memory',
+         dict(hosts=10, cpus=2, memory=50, forks=1, gather_timeout=45)),
+        ('unknown_hosts_and_memory',
+         dict(hosts=None, cpus=4, memory=None, forks=32,
+              gather_timeout=120)),
+        ('unknown_cpus',
+         dict(hosts=100, cpus=None, memory=None, forks=8,
+              gather_timeout=120)),
+    ]
+
+    def test_tune(self):
+        self.assertEqual(
+            {'ANSIBLE_FORKS': self.forks,
+             'ANSIBLE_GATHER_TIMEOUT': self.gather_timeout},
+            utils.tune_ansible(self.hosts, self.cpus, self.memory))
+
+
+class TestAnsibleTuning(TestCase):
+
+    def test_count_inventory_hosts(self):
+        self.assertEqual(1, utils.count_inventory_hosts('localhost,'))
+        self.assertEqual(2, utils.count_inventory_hosts('192.0.2.1,192.0.2.2'))
+        self.assertIsNone(utils.count_inventory_hosts('/missing/inventory'))
+        self.assertIsNone(utils.count_inventory_hosts(None))
+        inventory = {
+            'Undercloud': {'hosts': {'undercloud': {}}},
+            'Controller': {'hosts': {'controller-0': {}, 'controller-1': {}}},
+            'Compute': {'hosts': ['compute-0']},
+            'overcloud': {'children': {'Controller': {}, 'Compute': {}}},
+            'allovercloud': {'children': {
+                'nested': {'hosts': {'controller-0': {}, 'ceph-0': {}}}}},
+        }
+        self.assertEqual(5, utils.count_inventory_hosts(inventory))
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml') as f:
+            yaml.safe_dump(inventory, f)
+            f.flush()
+            self.assertEqual(5, utils.count_inventory_hosts(f.name))
+
+    def test_inventory_group_hosts(self):
+        inventory = {
+            'Undercloud': {'hosts': {'undercloud': {}}},
+            'Controller': {'hosts': {'controller-0': {}, 'controller-1': {}}},
+            'Compute': {'hosts': ['compute-0']},
+            'overcloud': {'children': {'Controller': {}, 'Compute': {}}},
+            'allovercloud': {'children': {
+                'overcloud': {},
+                'nested': {'hosts': {'ceph-0': {}}}}},
+            'loop': {'children': {'loop': {}}},
+        }
+        self.assertEqual({'controller-0', 'controller-1', 'compute-0'},
+                         utils.inventory_group_hosts(inventory,
+                                                     ['overcloud']))
+        self.assertEqual({'controller-0', 'controller-1', 'compute-0',
+                          'ceph-0', 'undercloud'},
+                         utils.inventory_group_hosts(
+                             inventory, ['allovercloud', 'Undercloud']))
+        self.assertEqual(set(), utils.inventory_group_hosts(inventory,
+                                                            ['loop']))
+        self.assertIsNone(utils.inventory_group_hosts(inventory, ['all']))
+        self.assertIsNone(utils.inventory_group_hosts(inventory,
+                                                      ['Missing']))
+        self.assertIsNone(utils.inventory_group_hosts('localhost,',
+                                                      ['Compute']))
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml') as f:
+            yaml.safe_dump(inventory, f)
+            f.flush()
+            self.assertEqual({'compute-0'},
+                             utils.inventory_group_hosts(f.name, ['Compute']))
+
+    def test_inventory_limit_hosts(self):
+        inventory = {
+            'Undercloud': {'hosts': {'undercloud': {}}},
+            'Controller': {'hosts': {'controller-0': {}, 'controller-1': {}}},
+            'Compute': {'hosts': {'compute-%d' % i: {} for i in range(11)}},
+        }
+        computes = ['compute-%d' % i for i in range(11)]
+        self.assertEqual(computes,
+                         utils.inventory_limit_hosts(inventory, 'Compute'))
+        self.assertEqual(
+            ['compute-0', 'compute-1', 'controller-1'],
+            utils.inventory_limit_hosts(
+                inventory, 'Controller:compute-0,compute-1:!controller-0'))
+        self.assertEqual(
+            ['controller-0', 'controller-1', 'undercloud'],
+            utils.inventory_limit_hosts(inventory, 'all:!Compute'))
+        self.assertEqual(
+            ['controller-0', 'controller-1', 'undercloud'],
+            utils.inventory_limit_hosts(inventory, '!Compute'))
+        self.assertEqual(14, len(utils.inventory_limit_hosts(inventory,
+                                                             None)))
+        self.assertIsNone(utils.inventory_limit_hosts(inventory, 'compute*'))
+        self.assertIsNone(utils.inventory_limit_hosts('localhost,',
+                                                      'Compute'))
+
+    def test_default(self):
+        with mock.patch.dict('os.environ', clear=True):
+            self.assertEqual({}, utils._ansible_tuning('localhost,'))
+
+    def test_explicit_forks(self):
+        with mock.patch.dict('os.environ', {'TRIPLEO_ANSIBLE_FORKS': '12'}):
+            self.assertEqual({'ANSIBLE_FORKS': 12},
+                             utils._ansible_tuning('localhost,'))
+
+    def test_invalid_forks(self):
+        for value in ('0', 'many'):
+            with mock.patch.dict('os.environ',
+                                 {'TRIPLEO_ANSIBLE_FORKS': value}):
+                self.assertEqual({}, utils._ansible_tuning('localhost,'))
+
+    @mock.patch('tripleoclient.utils._available_memory_mb', return_value=1000)
+    @mock.patch('tripleoclient.utils._cpu_count', return_value=16)
+    def test_auto(self, mock_cpu_count, mock_memory):
+        with mock.patch.dict('os.environ', {'TRIPLEO_ANSIBLE_FORKS': 'Auto'}):
+            self.assertEqual(
+                {'ANSIBLE_FORKS': 10, 'ANSIBLE_GATHER_TIMEOUT': 45},
+                utils._ansible_tuning(','.join(
+                    'compute-%d' % i for i in range(50))))
+
+
 class TestOvercloudNameScenarios(TestWithScenarios):
     scenarios = [
         ('kernel_default',
@@ -1340,6 +2108,77 @@ class TestDeployNameScenarios(TestWithScenarios):
         self.assertEqual(self.expected, observed)
 
 
+class TestUpdateNodesDeployData(TestCase):
+
+    http_boot = '/var/lib/ironic/httpboot'
+
+    def setUp(self):
+        super(TestUpdateNodesDeployData, self).setUp()
+        existing = {os.path.join(self.http_boot, name)
+                    for name in ('agent.kernel', 'agent.ramdisk',
+                                 'x86_64/agent.kernel',
+                                 'SNB-x86_64/agent.ramdisk')}
+        patcher = mock.patch('os.path.exists', autospec=True,
+                             side_effect=lambda path: path in existing)
+        self.mock_exists = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_update_nodes_deploy_data(self):
+        nodes = [{'arch': 'x86_64', 'platform': 'SNB'} for _ in range(100)]
+        nodes += [{'arch': 'x86_64'}, {'platform': 'SNB'},
+                  {'kernel_id': 'k', 'ramdisk_id': 'r'}]
+        utils.update_nodes_deploy_data(nodes, http_boot=self.http_boot)
+        self.assertEqual(
+            {'arch': 'x86_64', 'platform': 'SNB',
+             'kernel_id': 'file://%s/x86_64/agent.kernel' % self.http_boot,
+             'ramdisk_id': 'file://%s/SNB-x86_64/agent.ramdisk' %
+             self.http_boot},
+            nodes[0])
+        self.assertEqual(
+            'file://%s/agent.ramdisk' % self.http_boot,
+            nodes[100]['ramdisk_id'])
+        self.assertEqual(
+            'file://%s/agent.kernel' % self.http_boot,
+            nodes[101]['kernel_id'])
+        self.assertEqual('k', nodes[102]['kernel_id'])
+        # The images of a combination are only looked up once
+        self.assertEqual(8, self.mock_exists.call_count)
+
+    def test_update_nodes_deploy_data_shared_index(self):
+        deploy_images = utils.DeployImageIndex(self.http_boot)
+        utils.update_nodes_deploy_data([{'arch': 'x86_64'}],
+                                       deploy_images=deploy_images)
+        calls = self.mock_exists.call_count
+        self.assertEqual(
+            ('file://%s/x86_64/agent.kernel' % self.http_boot,
+             ['x86_64/agent.kernel', 'agent.kernel']),
+            deploy_images.find(utils.deploy_kernel, 'x86_64'))
+        self.assertEqual(calls, self.mock_exists.call_count)
+
+    def test_deploy_image_index_find_specific(self):
+        deploy_images = utils.DeployImageIndex(self.http_boot)
+        self.assertEqual(
+            'file://%s/x86_64/agent.kernel' % self.http_boot,
+            deploy_images.find_specific(utils.deploy_kernel, 'x86_64', 'SNB'))
+        self.assertEqual(
+            'file://%s/SNB-x86_64/agent.ramdisk' % self.http_boot,
+            deploy_images.find_specific(utils.deploy_ramdisk, 'x86_64',
+                                        'SNB'))
+        # Only the generic images exist
+        self.assertIsNone(
+            deploy_images.find_specific(utils.deploy_ramdisk, 'x86_64'))
+        self.assertIsNone(deploy_images.find_specific(utils.deploy_kernel))
+        self.assertIsNone(utils.DeployImageIndex('/other').find_specific(
+            utils.deploy_kernel, 'x86_64'))
+
+    def test_update_nodes_deploy_data_missing(self):
+        self.assertRaisesRegex(
+            RuntimeError,
+            "No kernel image provided and none of \\['agent.kernel'\\] "
+            "found in /other",
+            utils.update_nodes_deploy_data, [{}], http_boot='/other')
+
+
 class TestDeploymentPythonInterpreter(TestCase):
     def test_system_default(self):
         args = mock.MagicMock()
@@ -1694,6 +2533,77 @@ class TestParseExtraVars(TestCase):
             ValueError, utils.parse_extra_vars, input_parameter)
 
 
+class TestParseEnvFile(TestCase):
+
+    nodes = [{'pm_type': 'ipmi', 'pm_addr': '192.0.2.%d' % i,
+              'pm_user': 'admin', 'pm_password': 'p', 'pm_port': 6230 + i,
+              'mac': ['00:0b:d0:69:7e:%02d' % i], 'capabilities': 'x:1.5'}
+             for i in range(40)]
+
+    def _env_file(self, contents, name):
+        env_file = six.StringIO(contents)
+        env_file.name = name
+        return env_file
+
+    def test_json(self):
+        contents = json.dumps(self.nodes, indent=4)
+        self.assertEqual(self.nodes, utils.parse_env_file(
+            self._env_file(contents, 'instackenv.json')))
+        contents = json.dumps({'arch': 'x86_64', 'nodes': self.nodes,
+                               'other': [{'a': 1.25}]})
+        self.assertEqual(self.nodes, utils.parse_env_file(
+            self._env_file(contents, 'instackenv'), file_type='json'))
+        self.assertEqual([], utils.parse_env_file(
+            self._env_file(' [ ] ', 'instackenv.json')))
+
+    @mock.patch('tripleoclient.utils._JSON_CHUNK_SIZE', 7)
+    def test_json_chunks(self):
+        # The values spanning several chunks are read in full
+        contents = u'\ufeff' + json.dumps({'nodes': self.nodes, 'n': 12345})
+        self.assertEqual(self.nodes, utils.parse_env_file(
+            self._env_file(contents, 'instackenv.json')))
+
+    def test_json_lazy(self):
+        contents = json.dumps(self.nodes)[:-30]
+        nodes = utils.iter_env_file(
+            self._env_file(contents, 'instackenv.json'))
+        # The nodes are yielded before the truncated end is read
+        self.assertEqual(self.nodes[0], next(nodes))
+        self.assertRaises(ValueError, list, nodes)
+
+    def test_json_invalid(self):
+        for contents in ('{"nodes": [{}] "other": 1}', '[{}] []',
+                         '{"nodes": {}}', '{}', '"nodes"'):
+            self.assertRaises(
+                (ValueError, exceptions.InvalidConfiguration),
+                utils.parse_env_file,
+                self._env_file(contents, 'instackenv.json'))
+
+    def test_yaml(self):
+        self.assertEqual(self.nodes, utils.parse_env_file(
+            self._env_file(yaml.safe_dump({'nodes': self.nodes}),
+                           'instackenv.yaml')))
+        self.assertEqual(self.nodes, utils.parse_env_file(
+            self._env_file(yaml.safe_dump(self.nodes), 'instackenv'),
+            file_type='yaml'))
+
+    def test_csv(self):
+        contents = ('ipmi,192.0.2.1,admin,p,00:0b:d0:69:7e:59\n'
+                    'ipmi,192.0.2.2,admin,p,00:0b:d0:69:7e:58,6230\n')
+        self.assertEqual([
+            {'pm_type': 'ipmi', 'pm_addr': '192.0.2.1', 'pm_user': 'admin',
+             'pm_password': 'p', 'mac': ['00:0b:d0:69:7e:59']},
+            {'pm_type': 'ipmi', 'pm_addr': '192.0.2.2', 'pm_user': 'admin',
+             'pm_password': 'p', 'mac': ['00:0b:d0:69:7e:58'],
+             'pm_port': '6230'},
+        ], utils.parse_env_file(self._env_file(contents, 'instackenv.csv')))
+
+    def test_invalid_extension(self):
+        self.assertRaises(exceptions.InvalidConfiguration,
+                          utils.parse_env_file,
+                          self._env_file('[]', 'instackenv.txt'))
+
+
 class TestGeneralUtils(base.TestCommand):
 
     def setUp(self):
@@ -1721,3 +2631,19 @@ class TestGeneralUtils(base.TestCommand):
         limit_hosts_expected = 'controller0:compute0:compute1:!compute2'
         limit_hosts_actual = utils.playbook_limit_parse(limit_nodes)
         self.assertEqual(limit_hosts_actual, limit_hosts_expected)
+
+    @mock.patch('swiftclient.client.Connection', autospec=True)
+    def test_swift_connection_factory(self, mock_connection):
+        swift = self.tc.object_store
+        create_connection = utils.swift_connection_factory(swift)
+
+        self.assertIs(swift, create_connection())
+        mock_connection.assert_not_called()
+        self.assertIs(mock_connection.return_value, create_connection())
+        mock_connection.assert_called_once_with(
+            preauthurl=swift.url,
+            preauthtoken=swift.token,
+            insecure=swift.insecure,
+            cacert=swift.cacert,
+            timeout=swift.timeout,
+            retries=swift.retries)
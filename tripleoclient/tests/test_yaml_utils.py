@@ -0,0 +1,86 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import os
+import six
+import tempfile
+import yaml
+
+from tripleoclient import utils
+from tripleoclient import yaml_utils
+
+from tripleoclient.tests import base
+
+
+class TestYamlUtils(base.TestCase):
+
+    def setUp(self):
+        super(TestYamlUtils, self).setUp()
+        self.data = {
+            'parameter_defaults': {
+                'ControllerCount': 3,
+                'NtpServer': ['0.pool.ntp.org', '1.pool.ntp.org'],
+                'ControllerExtraConfig': {'nova::debug': True},
+                'Empty': None
+            },
+            'resource_registry': {
+                'OS::TripleO::Services::Foo': 'OS::Heat::None'
+            }
+        }
+
+    def test_safe_load(self):
+        document = yaml.safe_dump(self.data)
+        self.assertEqual(self.data, yaml_utils.safe_load(document))
+        self.assertEqual(self.data,
+                         yaml_utils.safe_load(six.StringIO(document)))
+
+    def test_safe_load_error(self):
+        self.assertRaises(yaml_utils.YAMLError, yaml_utils.safe_load,
+                          'key: [unclosed')
+
+    def test_safe_load_unsafe_tag(self):
+        self.assertRaises(yaml_utils.YAMLError, yaml_utils.safe_load,
+                          '!!python/object/apply:os.getcwd []')
+
+    def test_safe_dump(self):
+        for kwargs in ({}, {'default_flow_style': False},
+                       {'default_flow_style': False, 'indent': 2,
+                        'allow_unicode': True}):
+            self.assertEqual(yaml.safe_dump(self.data, **kwargs),
+                             yaml_utils.safe_dump(self.data, **kwargs))
+
+    def test_safe_dump_stream(self):
+        stream = six.StringIO()
+        self.assertIsNone(yaml_utils.safe_dump(self.data, stream))
+        self.assertEqual(yaml.safe_dump(self.data), stream.getvalue())
+
+    def test_no_alias_dumper(self):
+        servers = ['0.pool.ntp.org']
+        data = {'NtpServer': servers, 'ChronyServer': servers}
+        self.assertIn('&id001', yaml_utils.safe_dump(data))
+        self.assertEqual(
+            'ChronyServer:\n- 0.pool.ntp.org\nNtpServer:\n- 0.pool.ntp.org\n',
+            yaml_utils.safe_dump(data, default_flow_style=False,
+                                 Dumper=yaml_utils.NoAliasSafeDumper))
+
+    def test_write_env_file(self):
+        servers = ['0.pool.ntp.org']
+        env_file = os.path.join(tempfile.mkdtemp(), 'env.yaml')
+        utils.write_env_file({'NtpServer': servers, 'ChronyServer': servers},
+                             env_file, None)
+        with open(env_file) as f:
+            self.assertNotIn('&id001', f.read())
+        # The other documents still use aliases
+        self.assertIn('&id001', yaml_utils.safe_dump([servers, servers]))
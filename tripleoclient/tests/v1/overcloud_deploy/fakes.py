@@ -13,6 +13,7 @@
 #   under the License.
 #
 
+import fixtures
 import mock
 
 from tripleoclient.tests import fakes
@@ -114,3 +115,8 @@ class TestDeployOvercloud(fakes.FakePlaybookExecution):
             autospec=True)
         self.mock_rc_action = self.rc_action_patcher.start()
         self.addCleanup(self.rc_action_patcher.stop)
+
+        # Keep the processed environments cache out of the home directory
+        self.useFixture(fixtures.MonkeyPatch(
+            'tripleoclient.constants.ENVIRONMENT_CACHE_DIR',
+            self.useFixture(fixtures.TempDir()).path))
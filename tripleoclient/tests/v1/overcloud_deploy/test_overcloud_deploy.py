@@ -14,6 +14,7 @@
 #
 
 import fixtures
+import json
 import os
 import shutil
 import six
@@ -55,6 +56,12 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         history_patcher.start()
         self.addCleanup(history_patcher.stop)
 
+        # Mock the fact cache to avoid leaking files and gathering facts
+        fact_cache_patcher = mock.patch('tripleoclient.fact_cache.sync',
+                                        return_value=False)
+        fact_cache_patcher.start()
+        self.addCleanup(fact_cache_patcher.stop)
+
         # Mock this function to avoid file creation
         self.real_download_missing = self.cmd._download_missing_files_from_plan
         self.cmd._download_missing_files_from_plan = mock.Mock()
@@ -78,11 +85,11 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         mock_time.start()
         self.addCleanup(mock_time.stop)
 
-        # Mock copytree to avoid creating temporary templates
-        mock_copytree = mock.patch('shutil.copytree',
-                                   autospec=True)
-        mock_copytree.start()
-        self.addCleanup(mock_copytree.stop)
+        # Mock the staging to avoid creating temporary templates
+        mock_stage = mock.patch('tripleoclient.utils.stage_templates_dir',
+                                autospec=True)
+        mock_stage.start()
+        self.addCleanup(mock_stage.stop)
 
         # Mock sleep to reduce time of test
         mock_sleep = mock.patch('time.sleep', autospec=True)
@@ -1530,13 +1537,14 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         # assuming heat deploy consumed a 3m out of total 451m timeout
         with mock.patch('time.time', side_effect=[0, 1585820346, 1585820526]):
             self.cmd.take_action(parsed_args)
+        parameters = {'DeployIdentifier': '', 'UpdateIdentifier': '',
+                      'StackAction': 'UPDATE', 'UndercloudHostsEntries':
+                      ['192.168.0.1 uc.ctlplane.localhost uc.ctlplane']}
         self.assertIn(
             [mock.call(mock.ANY, mock.ANY, 'overcloud', mock.ANY,
-                       {'DeployIdentifier': '', 'UpdateIdentifier': '',
-                        'StackAction': 'UPDATE', 'UndercloudHostsEntries':
-                        ['192.168.0.1 uc.ctlplane.localhost uc.ctlplane']}, {},
-                       451, mock.ANY, {}, False, False, False, None,
-                       deployment_options={})],
+                       parameters, {}, 451, mock.ANY,
+                       {'parameter_defaults': parameters}, False, False,
+                       False, None, deployment_options={})],
             mock_hd.mock_calls)
         self.assertIn(
             [mock.call(mock.ANY, mock.ANY, mock.ANY, 'ctlplane', None, None,
@@ -1595,7 +1603,7 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
                 playbook=playbook, playbook_dir=mock.ANY,
                 reproduce_command=True, skip_tags='opendev-validation',
                 ssh_user='tripleo-admin', tags=None,
-                timeout=240,
+                timeout=240, events=mock.ANY, fail_on_rc=True,
                 verbosity=3, workdir=mock.ANY)],
             utils_fixture2.mock_run_ansible_playbook.mock_calls)
 
@@ -1620,6 +1628,44 @@ class TestDeployOvercloud(fakes.TestDeployOvercloud):
         mock_makedirs.assert_called_with(dirname)
         mock_open.assert_called()
 
+    @mock.patch('tripleoclient.utils.makedirs', autospec=True,
+                side_effect=lambda path: os.makedirs(path, exist_ok=True))
+    def test_download_missing_files_from_plan_concurrent(self,
+                                                         mock_makedirs):
+        self.cmd._download_missing_files_from_plan = self.real_download_missing
+        self.cmd._setup_clients(mock.Mock())
+        tht_dir = self.tmp_dir.join('tht')
+        os.makedirs(os.path.join(tht_dir, 'environments'))
+        with open(os.path.join(tht_dir, 'overcloud.yaml'), 'w') as f:
+            f.write('local')
+
+        names = ['overcloud.yaml', 'environments/ssl.yaml'] + [
+            'deployment/role-%d/role.yaml' % i for i in range(20)]
+        object_client = mock.Mock()
+        object_client.get_container.return_value = (
+            {}, [{'name': name} for name in names])
+        object_client.get_object.side_effect = (
+            lambda plan, name, resp_chunk_size: (
+                {}, iter([b'# ', name.encode('utf-8')])))
+        self.cmd.object_client = object_client
+        connection = mock.patch('swiftclient.client.Connection',
+                                return_value=object_client)
+        connection.start()
+        self.addCleanup(connection.stop)
+
+        self.cmd._download_missing_files_from_plan(tht_dir, 'overcast',
+                                                   workers=4)
+
+        object_client.get_container.assert_called_once_with(
+            'overcast', full_listing=True)
+        self.assertEqual(21, object_client.get_object.call_count)
+        self.assertEqual(21, mock_makedirs.call_count)
+        with open(os.path.join(tht_dir, 'overcloud.yaml')) as f:
+            self.assertEqual('local', f.read())
+        for name in names[1:]:
+            with open(os.path.join(tht_dir, name)) as f:
+                self.assertEqual('# ' + name, f.read())
+
     def test_validate_args_deprecated(self):
         arglist = ['--control-scale', '3', '--control-flavor', 'control']
         verifylist = [
@@ -1802,3 +1848,67 @@ class TestGetDeploymentStatus(utils.TestCommand):
             '+-----------+-------------------+\n')
 
         self.assertEqual(expected, self.cmd.app.stdout.getvalue())
+
+
+class TestShowDeploymentProfile(utils.TestCommand):
+
+    def setUp(self):
+        super(TestShowDeploymentProfile, self).setUp()
+        self.cmd = overcloud_deploy.ShowDeploymentProfile(self.app, None)
+        self.output_dir = self.useFixture(fixtures.TempDir()).path
+        self.profile_dir = os.path.join(self.output_dir, 'overcloud',
+                                        constants.DEPLOY_PROFILE_DIR)
+        os.makedirs(self.profile_dir)
+        self._write_profile('20200601-100000.jsonl', 10.0)
+        self._write_profile('20200602-100000.jsonl', 30.0)
+
+    def _write_profile(self, name, duration):
+        with open(os.path.join(self.profile_dir, name), 'w') as f:
+            for task, host, task_duration in (
+                    ('Start containers', 'controller-0', duration),
+                    ('Start containers', 'compute-0', 5.0),
+                    ('Wait for puppet', 'controller-0', 20.0)):
+                f.write(json.dumps({
+                    'task': task, 'role': None, 'host': host,
+                    'play': 'Deploy step tasks for 2', 'step': 2,
+                    'status': 'ok', 'start': None,
+                    'duration': task_duration}) + '\n')
+
+    def _take_action(self, *args):
+        arglist = ['--output-dir', self.output_dir] + list(args)
+        parsed_args = self.check_parser(self.cmd, arglist, [])
+        return self.cmd.take_action(parsed_args)
+
+    def test_show_last(self):
+        columns, rows = self._take_action()
+        self.assertEqual(('Task', 'Count', 'Elapsed (s)', 'Total (s)',
+                          'Longest (s)'), columns)
+        self.assertEqual([('Start containers', 2, 30.0, 35.0, 30.0),
+                          ('Wait for puppet', 1, 20.0, 20.0, 20.0)], rows)
+
+    def test_show_profile_by_host(self):
+        columns, rows = self._take_action(
+            '--profile', os.path.join(self.profile_dir,
+                                      '20200601-100000.jsonl'),
+            '--group-by', 'host', '--top', '1')
+        self.assertEqual('Host', columns[0])
+        self.assertEqual([('controller-0', 2, 20.0, 30.0, 20.0)], rows)
+
+    def test_compare_previous(self):
+        columns, rows = self._take_action('--compare')
+        self.assertEqual(('Task', 'Before (s)', 'After (s)', 'Delta (s)'),
+                         columns)
+        self.assertEqual([('Start containers', 15.0, 35.0, 20.0),
+                          ('Wait for puppet', 20.0, 20.0, 0.0)], rows)
+
+    def test_compare_without_previous(self):
+        self.assertRaises(
+            exceptions.NotFound, self._take_action, '--compare', '--profile',
+            os.path.join(self.profile_dir, '20200601-100000.jsonl'))
+
+    def test_no_profile(self):
+        parsed_args = self.check_parser(
+            self.cmd, ['--output-dir', self.output_dir, '--stack', 'other'],
+            [])
+        self.assertRaises(exceptions.NotFound, self.cmd.take_action,
+                          parsed_args)
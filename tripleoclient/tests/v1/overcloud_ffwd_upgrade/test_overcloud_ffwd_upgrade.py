@@ -51,8 +51,8 @@ class TestFFWDUpgradePrepare(fakes.TestFFWDUpgradePrepare):
     @mock.patch('tripleoclient.workflows.package_update.update',
                 autospec=True)
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates', autospec=True)
@@ -108,8 +108,8 @@ class TestFFWDUpgradePrepare(fakes.TestFFWDUpgradePrepare):
                 autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates', autospec=True)
     def test_ffwd_upgrade_failed(
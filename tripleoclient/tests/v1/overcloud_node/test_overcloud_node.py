@@ -76,6 +76,11 @@ class TestDeleteNode(fakes.TestDeleteNode):
         self.addCleanup(wait_stack.stop)
         self.app.client_manager.compute.servers.get.return_value = None
 
+        fact_cache = mock.patch('tripleoclient.fact_cache.sync',
+                                return_value=False)
+        fact_cache.start()
+        self.addCleanup(fact_cache.stop)
+
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
                 autospec=True)
     def test_node_delete(self, mock_playbook):
@@ -134,7 +139,7 @@ class TestDeleteNode(fakes.TestDeleteNode):
         self.cmd.take_action(parsed_args)
 
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
-                autospec=True)
+                autospec=True, return_value=(0, 'successful'))
     @mock.patch('tripleoclient.utils.tempfile')
     def test_node_delete_baremetal_deployment(self,
                                               mock_tempfile,
@@ -253,7 +258,9 @@ class TestDeleteNode(fakes.TestDeleteNode):
                 extra_env_variables={'ANSIBLE_BECOME': True},
                 extra_vars=None,
                 tags=None,
-                timeout=90
+                timeout=90,
+                events=mock.ANY,
+                fail_on_rc=True
             ),
             mock.call(
                 inventory='localhost,',
@@ -592,6 +599,13 @@ class TestConfigureNode(fakes.TestOvercloudNode):
         self.cmd = overcloud_node.ConfigureNode(self.app, None)
 
         self.http_boot = '/var/lib/ironic/httpboot'
+        nodes = [mock.Mock(uuid='node_uuid1',
+                           properties={'cpu_arch': 'x86_64'}, extra={}),
+                 mock.Mock(uuid='3c9a6d5e-node2',
+                           properties={'cpu_arch': 'ppc64le'}, extra={})]
+        nodes[0].name = None
+        nodes[1].name = 'node_uuid2'
+        self.app.client_manager.baremetal.node.list.return_value = nodes
 
         self.workflow_input = {
             'kernel_name': 'file://%s/agent.kernel' % self.http_boot,
@@ -615,6 +629,59 @@ class TestConfigureNode(fakes.TestOvercloudNode):
         parsed_args = self.check_parser(self.cmd, argslist, verifylist)
         self.cmd.take_action(parsed_args)
 
+    @mock.patch('tripleo_common.actions.baremetal.ConfigureBootAction',
+                autospec=True)
+    def test_configure_specified_nodes_arch_images(self, mock_boot):
+        mock_boot.return_value.run.return_value = None
+        existing = {os.path.join(self.http_boot, name)
+                    for name in ('agent.kernel', 'agent.ramdisk',
+                                 'x86_64/agent.kernel')}
+        self.useFixture(fixtures.MockPatch(
+            'os.path.exists', autospec=True,
+            side_effect=lambda path: path in existing))
+        parsed_args = self.check_parser(self.cmd,
+                                        ['node_uuid1', 'node_uuid2'],
+                                        [('deploy_kernel', None),
+                                         ('deploy_ramdisk', None)])
+        self.cmd.take_action(parsed_args)
+        # The images of the architecture of the nodes where they exist, the
+        # default ones otherwise
+        self.assertEqual(
+            [mock.call(node_uuid='node_uuid1',
+                       kernel_name='file://%s/x86_64/agent.kernel' %
+                       self.http_boot,
+                       ramdisk_name='file://%s/agent.ramdisk' %
+                       self.http_boot,
+                       instance_boot_option=None),
+             mock.call(node_uuid='node_uuid2',
+                       kernel_name='file://%s/agent.kernel' %
+                       self.http_boot,
+                       ramdisk_name='file://%s/agent.ramdisk' %
+                       self.http_boot,
+                       instance_boot_option=None)],
+            mock_boot.call_args_list)
+        # The nodes are listed once
+        self.app.client_manager.baremetal.node.list.assert_called_once_with(
+            fields=['uuid', 'name', 'properties', 'extra'], limit=0)
+        self.app.client_manager.baremetal.node.get.assert_not_called()
+
+    @mock.patch('tripleo_common.actions.baremetal.ConfigureBootAction',
+                autospec=True)
+    def test_configure_specified_nodes_generic_images(self, mock_boot):
+        mock_boot.return_value.run.return_value = None
+        self.useFixture(fixtures.MockPatch(
+            'os.path.exists', autospec=True, return_value=True))
+        parsed_args = self.check_parser(
+            self.cmd, ['node_uuid1', '--deploy-kernel', 'test_kernel'],
+            [('deploy_kernel', 'test_kernel')])
+        self.cmd.take_action(parsed_args)
+        # The images given are used as is
+        mock_boot.assert_called_once_with(
+            node_uuid='node_uuid1', kernel_name='test_kernel',
+            ramdisk_name='file://%s/agent.ramdisk' % self.http_boot,
+            instance_boot_option=None)
+        self.app.client_manager.baremetal.node.list.assert_not_called()
+
     def test_configure_no_node_or_flag_specified(self):
         self.assertRaises(test_utils.ParserException,
                           self.check_parser,
@@ -46,8 +46,8 @@ class TestOvercloudUpdatePrepare(fakes.TestOvercloudUpdatePrepare):
     @mock.patch('tripleoclient.workflows.package_update.update',
                 autospec=True)
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates_tmpdir', autospec=True)
@@ -83,8 +83,8 @@ class TestOvercloudUpdatePrepare(fakes.TestOvercloudUpdatePrepare):
                 autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates', autospec=True)
     def test_update_failed(self, mock_deploy, mock_copy, mock_yaml,
@@ -140,6 +140,47 @@ class TestOvercloudUpdateRun(fakes.TestOvercloudUpdateRun):
         self.assertRaises(ParserException, lambda: self.check_parser(
             self.cmd, argslist, verifylist))
 
+    @mock.patch('tripleoclient.workflows.deployment.config_download',
+                autospec=True)
+    @mock.patch('tripleoclient.utils.get_tripleo_ansible_inventory',
+                return_value='/inventory.yaml')
+    @mock.patch('tripleoclient.utils.get_stack')
+    def test_update_batches(self, mock_stack, mock_inventory,
+                            mock_config_download):
+        self.cmd.get_ansible_key_and_dir = mock.Mock(
+            return_value=('/key', '/ansible'))
+        argslist = ['--limit', 'Compute', '--batch-size', '10',
+                    '--max-fail-percentage', '20']
+        verifylist = [
+            ('batch_size', 10),
+            ('max_fail_percentage', 20),
+        ]
+        parsed_args = self.check_parser(self.cmd, argslist, verifylist)
+        self.cmd.take_action(parsed_args)
+
+        kwargs = mock_config_download.call_args[1]
+        self.assertEqual('Compute', kwargs['limit_hosts'])
+        self.assertEqual(10, kwargs['batch_size'])
+        self.assertEqual(20, kwargs['max_fail_percentage'])
+
+    @mock.patch('tripleoclient.workflows.deployment.config_download',
+                autospec=True)
+    def test_update_batches_invalid(self, mock_config_download):
+        for argslist in (['--limit', 'Compute', '--batch-size', '0'],
+                         ['--limit', 'Compute', '--batch-size', '2',
+                          '--max-fail-percentage', '101']):
+            parsed_args = self.check_parser(self.cmd, argslist, [])
+            self.assertRaises(exceptions.InvalidConfiguration,
+                              self.cmd.take_action, parsed_args)
+        mock_config_download.assert_not_called()
+
+    def test_update_playbook_workers_invalid(self):
+        for workers in ('0', '-1', 'two'):
+            self.assertRaises(ParserException, self.check_parser, self.cmd,
+                              ['--limit', 'Compute', '--playbook-graph',
+                               '/playbooks.yaml', '--playbook-workers',
+                               workers], [])
+
 
 class TestOvercloudUpdateConverge(fakes.TestOvercloudUpdateConverge):
 
@@ -52,8 +52,8 @@ class TestOvercloudUpgradePrepare(fakes.TestOvercloudUpgradePrepare):
     @mock.patch('tripleoclient.workflows.package_update.update',
                 autospec=True)
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates', autospec=True)
@@ -114,8 +114,8 @@ class TestOvercloudUpgradePrepare(fakes.TestOvercloudUpgradePrepare):
                 autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('os.path.abspath')
-    @mock.patch('yaml.safe_load')
-    @mock.patch('shutil.copytree', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
+    @mock.patch('tripleoclient.utils.stage_templates_dir', autospec=True)
     @mock.patch('tripleoclient.v1.overcloud_deploy.DeployOvercloud.'
                 '_deploy_tripleo_heat_templates', autospec=True)
     def test_upgrade_failed(self, mock_deploy, mock_copy, mock_yaml,
@@ -221,6 +221,44 @@ class TestOvercloudUpgradeRun(fakes.TestOvercloudUpgradeRun):
 
         self.check_parser(self.cmd, argslist, verifylist)
 
+    @mock.patch('tripleoclient.workflows.deployment.config_download',
+                autospec=True)
+    @mock.patch('tripleoclient.utils.get_tripleo_ansible_inventory',
+                return_value='/inventory.yaml')
+    @mock.patch('tripleoclient.utils.get_stack')
+    @mock.patch('tripleoclient.ansible_scheduler.load_playbooks')
+    def test_upgrade_playbook_graph(self, mock_load, mock_stack,
+                                    mock_inventory, mock_config_download):
+        playbooks = [
+            {'playbook': 'upgrade_steps_playbook.yaml',
+             'hosts': ['Controller']},
+            {'playbook': 'external_upgrade_steps_playbook.yaml',
+             'hosts': ['Undercloud']}]
+        mock_load.return_value = playbooks
+        self.cmd.get_ansible_key_and_dir = mock.Mock(
+            return_value=('/key', '/ansible'))
+        argslist = ['--limit', 'controller-0',
+                    '--playbook-graph', '/playbooks.yaml',
+                    '--playbook-workers', '2']
+        verifylist = [
+            ('playbook_graph', '/playbooks.yaml'),
+            ('playbook_workers', 2),
+        ]
+        parsed_args = self.check_parser(self.cmd, argslist, verifylist)
+        self.cmd.take_action(parsed_args)
+
+        mock_load.assert_called_once_with('/playbooks.yaml')
+        kwargs = mock_config_download.call_args[1]
+        self.assertEqual(playbooks, kwargs['ansible_playbook_name'])
+        self.assertEqual(2, kwargs['playbook_workers'])
+
+    def test_upgrade_playbook_workers_invalid(self):
+        for workers in ('0', '-1', 'two'):
+            self.assertRaises(ParserException, self.check_parser, self.cmd,
+                              ['--limit', 'controller-0', '--playbook-graph',
+                               '/playbooks.yaml', '--playbook-workers',
+                               workers], [])
+
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
                 autospec=True)
     @mock.patch('os.path.expanduser')
@@ -39,5 +39,18 @@ class TestAdminAuthorize(test_plugin.TestPluginV1):
             parsed_args.overcloud_ssh_user,
             mock.ANY,
             parsed_args.overcloud_ssh_port_timeout,
-            mock.ANY
+            mock.ANY,
+            batch_size=None,
+            retries=1
+        )
+
+    def test_batch(self, mock_get_host_and_enable_ssh_admin, mock_get_stack):
+        arglist = ['--overcloud-ssh-batch-size', '50',
+                   '--overcloud-ssh-retries', '3']
+        parsed_args = self.check_parser(self.cmd, arglist, [])
+
+        self.cmd.take_action(parsed_args)
+        mock_get_host_and_enable_ssh_admin.assert_called_once_with(
+            mock.ANY, mock.ANY, mock.ANY, mock.ANY, mock.ANY,
+            verbosity=mock.ANY, batch_size=50, retries=3
         )
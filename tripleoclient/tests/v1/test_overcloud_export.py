@@ -33,7 +33,7 @@ class TestOvercloudExport(utils.TestCommand):
         self.mock_open = mock.mock_open()
 
     @mock.patch('os.path.exists')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     @mock.patch('tripleoclient.export.export_stack')
     @mock.patch('tripleoclient.export.export_passwords')
     def test_export(self, mock_export_passwords,
@@ -64,7 +64,7 @@ class TestOvercloudExport(utils.TestCommand):
             mock_safe_dump.call_args[0][0])
 
     @mock.patch('os.path.exists')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     @mock.patch('tripleoclient.export.export_stack')
     @mock.patch('tripleoclient.export.export_passwords')
     def test_export_stack_name(self, mock_export_passwords,
@@ -89,7 +89,7 @@ class TestOvercloudExport(utils.TestCommand):
             path)
 
     @mock.patch('os.path.exists')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     @mock.patch('tripleoclient.export.export_stack')
     @mock.patch('tripleoclient.export.export_passwords')
     def test_export_stack_name_and_dir(self, mock_export_passwords,
@@ -113,7 +113,7 @@ class TestOvercloudExport(utils.TestCommand):
             '/tmp/bar')
 
     @mock.patch('os.path.exists')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     @mock.patch('tripleoclient.export.export_stack')
     @mock.patch('tripleoclient.export.export_passwords')
     def test_export_no_excludes(self, mock_export_passwords,
@@ -14,6 +14,7 @@
 #
 
 import fixtures
+import json
 import mock
 import os
 import sys
@@ -23,6 +24,7 @@ import yaml
 from heatclient import exc as hc_exc
 from tripleo_common.image import kolla_builder
 
+from tripleoclient import ansible_events
 from tripleoclient import exceptions
 from tripleoclient.tests import fakes
 from tripleoclient.tests.v1.test_plugin import TestPluginV1
@@ -64,6 +66,10 @@ class TestDeployUndercloud(TestPluginV1):
         self.orc.stacks.create = mock.MagicMock(
             return_value={'stack': {'id': 'foo'}})
 
+        # Disable the processed environments cache, the tests mock open()
+        self.useFixture(fixtures.MonkeyPatch(
+            'tripleoclient.constants.ENVIRONMENT_CACHE_DIR', None))
+
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy._is_undercloud_deploy')
     @mock.patch('tripleoclient.utils.check_hostname')
     def test_run_preflight_checks(self, mock_check_hostname, mock_uc):
@@ -97,6 +103,21 @@ class TestDeployUndercloud(TestPluginV1):
         self.cmd._run_preflight_checks(parsed_args)
         mock_check_hostname.assert_not_called()
 
+    def test_log_ansible_failures(self):
+        failures = [
+            ansible_events.AnsibleTaskResult(
+                host='undercloud', play='Deploy', task='Start nova',
+                status='failed', duration=1.0, changed=False, failed=True,
+                msg='failed to start')
+        ]
+        with mock.patch.object(self.cmd, 'log') as mock_log:
+            self.cmd._log_ansible_failures(failures, 'undercloud')
+        errors = json.loads(mock_log.error.call_args_list[-1][0][0])
+        self.assertEqual(
+            {'undercloud': [['Start nova', {'msg': 'failed to start',
+                                            'status': 'failed'}]]},
+            errors)
+
     def test_get_roles_file_path(self):
         parsed_args = self.check_parser(self.cmd,
                                         ['--local-ip', '127.0.0.1/8'], [])
@@ -207,15 +228,16 @@ class TestDeployUndercloud(TestPluginV1):
             'Bar')
 
     @mock.patch('os.path.exists', side_effect=[True, False])
-    @mock.patch('shutil.copytree')
+    @mock.patch('tripleoclient.utils.stage_templates_dir')
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy.'
                 '_create_working_dirs')
-    def test_populate_templates_dir(self, mock_workingdirs, mock_copy,
+    def test_populate_templates_dir(self, mock_workingdirs, mock_stage,
                                     mock_exists):
         self.cmd.tht_render = '/foo'
         self.cmd._populate_templates_dir('/bar')
         mock_workingdirs.assert_called_once()
-        mock_copy.assert_called_once_with('/bar', '/foo', symlinks=True)
+        mock_stage.assert_called_once_with(
+            '/bar', '/foo', methods=('reflink', 'symlink', 'copy'))
 
     @mock.patch('os.path.exists', return_value=False)
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy.'
@@ -233,7 +255,7 @@ class TestDeployUndercloud(TestPluginV1):
     # TODO(cjeanner) drop once we have proper oslo.privsep
     @mock.patch('subprocess.check_call', autospec=True)
     @mock.patch('tripleo_common.utils.passwords.generate_passwords')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     def test_update_passwords_env_init(self, mock_dump, mock_pw, mock_cc,
                                        mock_exists, mock_chmod, mock_user):
         pw_dict = {"GeneratedPassword": 123}
@@ -257,7 +279,7 @@ class TestDeployUndercloud(TestPluginV1):
     # TODO(cjeanner) drop once we have proper oslo.privsep
     @mock.patch('subprocess.check_call', autospec=True)
     @mock.patch('tripleo_common.utils.passwords.generate_passwords')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     def test_update_passwords_env(self, mock_dump, mock_pw, mock_cc,
                                   mock_exists, mock_chmod, mock_user):
         pw_dict = {"GeneratedPassword": 123, "LegacyPass": "override me"}
@@ -301,7 +323,7 @@ class TestDeployUndercloud(TestPluginV1):
     # TODO(bogdando) drop once we have proper oslo.privsep
     @mock.patch('subprocess.check_call', autospec=True)
     @mock.patch('tripleo_common.utils.passwords.generate_passwords')
-    @mock.patch('yaml.safe_dump')
+    @mock.patch('tripleoclient.yaml_utils.safe_dump')
     def test_update_passwords_env_upgrade(self, mock_dump, mock_pw, mock_cc,
                                           mock_exists, mock_chmod, mock_user):
         pw_dict = {"GeneratedPassword": 123, "LegacyPass": "override me"}
@@ -405,8 +427,8 @@ class TestDeployUndercloud(TestPluginV1):
                 'parse', autospec=True, return_value=dict())
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy.'
                 '_setup_heat_environments', autospec=True)
-    @mock.patch('yaml.safe_dump', autospec=True)
-    @mock.patch('yaml.safe_load', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_dump', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tempfile.NamedTemporaryFile', autospec=True)
     @mock.patch('tripleo_common.image.kolla_builder.'
@@ -481,8 +503,8 @@ class TestDeployUndercloud(TestPluginV1):
                 'parse', autospec=True, return_value=dict())
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy.'
                 '_setup_heat_environments', autospec=True)
-    @mock.patch('yaml.safe_dump', autospec=True)
-    @mock.patch('yaml.safe_load', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_dump', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load', autospec=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tempfile.NamedTemporaryFile', autospec=True)
     @mock.patch('tripleo_common.image.kolla_builder.'
@@ -606,8 +628,9 @@ class TestDeployUndercloud(TestPluginV1):
         self.assertEqual(expected, results)
 
     @mock.patch('time.time', return_value=123)
-    @mock.patch('yaml.safe_load', return_value={}, autospec=True)
-    @mock.patch('yaml.safe_dump', autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_load', return_value={},
+                autospec=True)
+    @mock.patch('tripleoclient.yaml_utils.safe_dump', autospec=True)
     @mock.patch('os.path.isfile', return_value=True)
     @mock.patch('six.moves.builtins.open')
     @mock.patch('tripleoclient.v1.tripleo_deploy.Deploy.'
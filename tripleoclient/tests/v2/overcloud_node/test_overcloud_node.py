@@ -23,6 +23,7 @@ import tempfile
 from osc_lib.tests import utils as test_utils
 
 from tripleoclient import constants
+from tripleoclient import exceptions
 from tripleoclient.tests.v2.overcloud_node import fakes
 from tripleoclient.v2 import overcloud_node
 
@@ -99,6 +100,50 @@ class TestImportNode(fakes.TestOvercloudNode):
                                          ('provide', False)])
         self.cmd.take_action(parsed_args)
 
+    @mock.patch('tripleoclient.workflows.baremetal.validate_nodes',
+                autospec=True)
+    def test_import_validate_only_check_bmc(self, mock_validate):
+        parsed_args = self.check_parser(self.cmd,
+                                        [self.json_file.name,
+                                         '--validate-only',
+                                         '--check-bmc',
+                                         '--bmc-timeout', '2'],
+                                        [('validate_only', True),
+                                         ('check_bmc', True),
+                                         ('bmc_timeout', 2)])
+        self.cmd.take_action(parsed_args)
+        mock_validate.assert_called_once_with(
+            self.app.client_manager, nodes_json=self.nodes_list,
+            check_bmc=True, bmc_timeout=2)
+
+    @mock.patch('tripleoclient.workflows.baremetal.register_or_update',
+                autospec=True)
+    @mock.patch('tripleoclient.workflows.baremetal.validate_nodes',
+                autospec=True)
+    def test_import_check_bmc_requires_validate_only(self, mock_validate,
+                                                     mock_register):
+        for argslist in (['--check-bmc'],
+                         ['--check-bmc', '--bmc-timeout', '2'],
+                         ['--validate-only', '--bmc-timeout', '2']):
+            parsed_args = self.check_parser(
+                self.cmd, argslist + [self.json_file.name], [])
+            self.assertRaises(exceptions.InvalidConfiguration,
+                              self.cmd.take_action, parsed_args)
+        mock_validate.assert_not_called()
+        mock_register.assert_not_called()
+
+    @mock.patch('tripleoclient.workflows.baremetal.validate_nodes',
+                autospec=True)
+    def test_import_check_bmc_default_timeout(self, mock_validate):
+        parsed_args = self.check_parser(self.cmd,
+                                        [self.json_file.name,
+                                         '--validate-only', '--check-bmc'],
+                                        [('bmc_timeout', None)])
+        self.cmd.take_action(parsed_args)
+        mock_validate.assert_called_once_with(
+            self.app.client_manager, nodes_json=self.nodes_list,
+            check_bmc=True, bmc_timeout=constants.BMC_PROBE_TIMEOUT)
+
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
                 autospec=True)
     def test_import_and_introspect(self, mock_playbook):
@@ -12,8 +12,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+from ironicclient import exc as ironic_exc
 import mock
 
+from tripleoclient import exceptions
 from tripleoclient.tests import fakes
 from tripleoclient.workflows import baremetal
 
@@ -60,6 +62,103 @@ class TestBaremetalWorkflows(fakes.FakePlaybookExecution):
             instance_boot_option='local'
         ), [mock.ANY])
 
+    @mock.patch('tripleo_common.actions.baremetal.RegisterOrUpdateNodes.run')
+    def test_register_or_update_manage(self, mock_register):
+        nodes = [mock.Mock(uuid='node-%d' % i,
+                           provision_state='enroll' if i % 2 else 'available')
+                 for i in range(6)]
+        mock_register.return_value = nodes
+        self.assertEqual(nodes, baremetal.register_or_update(
+            self.app.client_manager, nodes_json=[]))
+        self.assertEqual(
+            ['node-1', 'node-3', 'node-5'],
+            sorted(c[1]['node_uuid'] for c in self.app.client_manager.
+                   baremetal.node.set_provision_state.call_args_list))
+        self.app.client_manager.baremetal.node.set_provision_state \
+            .assert_called_with(node_uuid=mock.ANY, state='manage')
+
+    @mock.patch('tripleo_common.actions.baremetal.RegisterOrUpdateNodes.run')
+    def test_register_or_update_manage_failed(self, mock_register):
+        mock_register.return_value = [
+            mock.Mock(uuid='node-0', provision_state='enroll'),
+            mock.Mock(uuid='node-1', provision_state='enroll')]
+
+        def _set_provision_state(node_uuid, state):
+            if node_uuid == 'node-1':
+                raise ironic_exc.BadRequest('Invalid credentials')
+
+        self.app.client_manager.baremetal.node.set_provision_state \
+            .side_effect = _set_provision_state
+        self.assertRaisesRegex(
+            exceptions.RegisterOrUpdateError,
+            'Failed to manage 1 registered nodes:\nnode-1: .*Invalid '
+            'credentials',
+            baremetal.register_or_update,
+            self.app.client_manager, nodes_json=[])
+
+    @mock.patch('time.sleep')
+    def test_set_provision_state_conflict(self, mock_sleep):
+        attempts = {}
+
+        def _set_provision_state(node_uuid, state):
+            attempts[node_uuid] = attempts.get(node_uuid, 0) + 1
+            # node-0 is locked for two attempts, node-1 for good
+            if (node_uuid == 'node-1' or
+                    node_uuid == 'node-0' and attempts[node_uuid] <= 2):
+                raise ironic_exc.Conflict('Node is locked')
+
+        node = self.app.client_manager.baremetal.node
+        node.set_provision_state.side_effect = _set_provision_state
+        results = baremetal.set_provision_state(
+            self.app.client_manager, ['node-0', 'node-1', 'node-2'],
+            'provide', workers=2, retries=3, retry_delay=1)
+
+        self.assertEqual(['node-0', 'node-1', 'node-2'], list(results))
+        self.assertIsNone(results['node-0'])
+        self.assertIn('Node is locked', results['node-1'])
+        self.assertIsNone(results['node-2'])
+        self.assertEqual({'node-0': 3, 'node-1': 4, 'node-2': 1}, attempts)
+        # The delay doubles with every retry
+        self.assertEqual([1, 1, 2, 2, 4],
+                         sorted(c[0][0] for c in mock_sleep.call_args_list))
+
+    def test_set_provision_state_no_nodes(self):
+        self.assertEqual({}, baremetal.set_provision_state(
+            self.app.client_manager, [], 'manage'))
+
+    @mock.patch('tripleo_common.actions.baremetal.ValidateNodes.run')
+    def test_validate_nodes(self, mock_validate):
+        mock_validate.return_value = None
+        self.assertTrue(baremetal.validate_nodes(
+            self.app.client_manager, nodes_json=[]))
+
+    @mock.patch('tripleoclient.bmc_probe.probe_nodes', autospec=True)
+    @mock.patch('tripleo_common.actions.baremetal.ValidateNodes.run')
+    def test_validate_nodes_check_bmc(self, mock_validate, mock_probe):
+        mock_validate.return_value = mock.Mock(
+            error='node #0: MAC address 00:11 is invalid')
+        mock_probe.return_value = [
+            (1, 'BMC 192.0.2.2:623 (ipmi) is not reachable: timed out')]
+        nodes = [{'pm_type': 'ipmi', 'pm_addr': '192.0.2.1'},
+                 {'pm_type': 'ipmi', 'pm_addr': '192.0.2.2'}]
+        # The errors of the validation and of the probes are reported
+        # together
+        self.assertRaisesRegex(
+            exceptions.RegisterOrUpdateError,
+            'node #0: MAC address 00:11 is invalid\n'
+            'node #1: BMC 192.0.2.2:623 \\(ipmi\\) is not reachable',
+            baremetal.validate_nodes,
+            self.app.client_manager, nodes_json=nodes, check_bmc=True,
+            bmc_timeout=2)
+        mock_probe.assert_called_once_with(nodes, timeout=2)
+
+    @mock.patch('tripleoclient.bmc_probe.probe_nodes', autospec=True)
+    @mock.patch('tripleo_common.actions.baremetal.ValidateNodes.run')
+    def test_validate_nodes_no_check_bmc(self, mock_validate, mock_probe):
+        mock_validate.return_value = None
+        baremetal.validate_nodes(self.app.client_manager, nodes_json=[])
+        mock_probe.assert_not_called()
+
     def test_provide_success(self):
         baremetal.provide(self.app.client_manager, node_uuids=[])
 
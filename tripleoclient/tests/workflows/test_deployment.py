@@ -12,11 +12,19 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import fixtures
 import mock
+import os
+import threading
 
+from mistral_lib import actions
 from osc_lib.tests import utils
 
+from tripleoclient import ansible_profile
+from tripleoclient import config_writer
+from tripleoclient import exceptions
 from tripleoclient import plugin
+from tripleoclient import utils as plugin_utils
 from tripleoclient.tests.fakes import FakeInstanceData
 from tripleoclient.tests.fakes import FakeStackObject
 from tripleoclient.workflows import deployment
@@ -37,12 +45,11 @@ class TestDeploymentWorkflows(utils.TestCommand):
         tc.create_mistral_context = plugin.ClientWrapper(
             instance=FakeInstanceData
         ).create_mistral_context
-        self.gcn = mock.patch(
-            'tripleo_common.actions.config.DownloadConfigAction',
-            autospec=True
-        )
-        self.gcn.start()
-        self.addCleanup(self.gcn.stop)
+        self.mock_sync_container = self.useFixture(fixtures.MockPatch(
+            'tripleoclient.config_writer.sync_container',
+            return_value=config_writer.ConfigChanges())).mock
+        self.useFixture(fixtures.MockPatch(
+            'tripleoclient.config_writer.link_latest'))
         self.ansible = mock.patch(
             'tripleo_common.actions.ansible.AnsibleGenerateInventoryAction',
             autospec=True
@@ -67,17 +74,14 @@ class TestDeploymentWorkflows(utils.TestCommand):
             "message": "Fail.",
         }])
 
-    @mock.patch('shutil.rmtree')
-    @mock.patch('os.chdir')
-    @mock.patch('tripleoclient.utils.tempfile')
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
                 autospec=True)
-    def test_enable_ssh_admin(self, mock_rmtree, mock_chdir, mock_tempfile,
-                              mock_playbook):
+    def test_enable_ssh_admin(self, mock_playbook):
         hosts = 'a', 'b', 'c'
         ssh_user = 'test-user'
         ssh_key = 'test-key'
         timeout = 30
+        mock_playbook.return_value = (0, 'successful')
 
         deployment.enable_ssh_admin(
             FakeStackObject,
@@ -87,8 +91,84 @@ class TestDeploymentWorkflows(utils.TestCommand):
             timeout
         )
 
-        # once for ssh-keygen, then twice per host
         self.assertEqual(1, mock_playbook.call_count)
+        kwargs = mock_playbook.call_args[1]
+        self.assertEqual('a,b,c', kwargs['inventory'])
+        self.assertEqual(['a', 'b', 'c'], kwargs['extra_vars']['ssh_servers'])
+        self.assertIsNone(kwargs['extra_env_variables'])
+
+    def _fake_playbook(self, unreachable):
+        """Simulate the playbook, any error is fatal to all the hosts.
+
+        unreachable maps the hosts to the number of runs they are
+        unreachable for.
+        """
+
+        def run_ansible_playbook(**kwargs):
+            events = kwargs['events']
+            hosts = kwargs['extra_vars']['ssh_servers']
+            down = [host for host in hosts if unreachable.get(host)]
+            for host in hosts:
+                if host in down:
+                    unreachable[host] -= 1
+                    event = 'runner_on_unreachable'
+                elif down:
+                    # Stopped by the failure of the other hosts
+                    continue
+                else:
+                    event = 'runner_on_ok'
+                events.event_handler({
+                    'event': event,
+                    'event_data': {'host': host, 'task': 'Ping host',
+                                   'duration': 1.5}})
+            return (4 if down else 0), 'failed' if down else 'successful'
+        return run_ansible_playbook
+
+    @mock.patch('tripleoclient.utils.run_ansible_playbook',
+                autospec=True)
+    def test_enable_ssh_admin_batches(self, mock_playbook):
+        hosts = ['host-%d' % i for i in range(5)]
+        mock_playbook.side_effect = self._fake_playbook({})
+
+        deployment.enable_ssh_admin(FakeStackObject, hosts, 'test-user',
+                                    'test-key', 30, batch_size=2)
+
+        self.assertEqual(
+            [('host-0,host-1', {'ANSIBLE_FORKS': 2}),
+             ('host-2,host-3', {'ANSIBLE_FORKS': 2}),
+             ('host-4', {'ANSIBLE_FORKS': 1})],
+            [(c[1]['inventory'], c[1]['extra_env_variables'])
+             for c in mock_playbook.call_args_list])
+
+    @mock.patch('tripleoclient.utils.run_ansible_playbook',
+                autospec=True)
+    def test_enable_ssh_admin_retries_unreachable(self, mock_playbook):
+        hosts = ['host-%d' % i for i in range(4)]
+        mock_playbook.side_effect = self._fake_playbook({'host-1': 1})
+
+        deployment.enable_ssh_admin(FakeStackObject, hosts, 'test-user',
+                                    'test-key', 30, batch_size=2)
+        # The wave is run again without the unreachable host, then the
+        # unreachable host is retried on its own
+        self.assertEqual(
+            ['host-0,host-1', 'host-0', 'host-2,host-3', 'host-1'],
+            [c[1]['inventory'] for c in mock_playbook.call_args_list])
+
+    @mock.patch('tripleoclient.utils.run_ansible_playbook',
+                autospec=True)
+    def test_enable_ssh_admin_fails_after_retries(self, mock_playbook):
+        hosts = ['host-%d' % i for i in range(4)]
+        mock_playbook.side_effect = self._fake_playbook(
+            {'host-1': 3, 'host-2': 3})
+
+        self.assertRaisesRegex(
+            exceptions.DeploymentError, 'host-1, host-2',
+            deployment.enable_ssh_admin, FakeStackObject, hosts,
+            'test-user', 'test-key', 30, retries=2)
+        self.assertEqual(
+            ['host-0,host-1,host-2,host-3', 'host-0,host-3',
+             'host-1,host-2', 'host-1,host-2'],
+            [c[1]['inventory'] for c in mock_playbook.call_args_list])
 
     @mock.patch('tripleoclient.utils.get_blacklisted_ip_addresses')
     @mock.patch('tripleoclient.utils.get_role_net_ip_map')
@@ -115,6 +195,28 @@ class TestDeploymentWorkflows(utils.TestCommand):
                     '10.10.10.10', '11.11.11.11', '12.12.12.12']
         self.assertEqual(sorted(expected), sorted(ips))
 
+    @mock.patch('tripleoclient.utils.get_blacklisted_ip_addresses')
+    @mock.patch('tripleoclient.utils.get_role_net_ip_map')
+    def test_get_overcloud_hosts_without_blacklist_output(
+            self, mock_role_net_ip_map, mock_blacklisted_ip_addresses):
+        stack = mock.Mock()
+        mock_role_net_ip_map.return_value = {
+            'Controller': {
+                'ctlplane': ['1.1.1.1', '2.2.2.2'],
+                'external': ['4.4.4.4', '5.5.5.5']},
+            'Compute': {
+                'external': ['10.10.10.10']},
+        }
+        mock_blacklisted_ip_addresses.return_value = None
+        self.assertEqual(
+            ['10.10.10.10', '4.4.4.4', '5.5.5.5'],
+            sorted(deployment.get_overcloud_hosts(stack, 'external')))
+
+        mock_blacklisted_ip_addresses.return_value = ['2.2.2.2']
+        self.assertEqual(
+            ['10.10.10.10', '4.4.4.4'],
+            sorted(deployment.get_overcloud_hosts(stack, 'external')))
+
     @mock.patch('tripleoclient.utils.get_blacklisted_ip_addresses')
     @mock.patch('tripleoclient.utils.get_role_net_ip_map')
     def test_get_overcloud_hosts_with_blacklist(
@@ -148,10 +250,11 @@ class TestDeploymentWorkflows(utils.TestCommand):
         expected = ['4.4.4.4', '6.6.6.6', '11.11.11.11']
         self.assertEqual(sorted(expected), sorted(ips))
 
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
     @mock.patch('tripleoclient.utils.run_ansible_playbook',
-                autospec=True)
+                autospec=True, return_value=(0, 'successful'))
     def test_config_download_already_in_progress_for_diff_stack(
-            self, mock_playbook):
+            self, mock_playbook, mock_sync):
         log = mock.Mock()
         stack = mock.Mock()
         stack.stack_name = 'stacktest'
@@ -163,3 +266,362 @@ class TestDeploymentWorkflows(utils.TestCommand):
             'timeout')
 
         self.assertEqual(2, mock_playbook.call_count)
+        events = mock_playbook.call_args_list[1][1]['events']
+        self.assertIsInstance(events.callback, ansible_profile.ProfileWriter)
+        self.assertFalse(events.keep_results)
+        mock_sync.assert_called_once_with(stack)
+
+    @mock.patch('tripleoclient.fact_cache.cached_hosts',
+                return_value=['controller-0'])
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=True)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook',
+                autospec=True, return_value=(0, 'successful'))
+    def test_config_download_warm_fact_cache(self, mock_playbook, mock_sync,
+                                             mock_hosts):
+        stack = mock.Mock()
+        stack.stack_name = 'stacktest'
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        deployment.config_download(
+            mock.Mock(), mock.Mock(), stack, inventory_path='/inventory',
+            limit_hosts='controller-0')
+
+        # The facts are gathered before the deployment playbook
+        self.assertEqual(3, mock_playbook.call_count)
+        kwargs = mock_playbook.call_args_list[1][1]
+        self.assertTrue(
+            kwargs['playbook'].endswith('tripleo-gather-facts.yaml'))
+        self.assertEqual('/inventory', kwargs['inventory'])
+        self.assertEqual('stacktest', kwargs['plan'])
+        self.assertEqual('controller-0', kwargs['limit_hosts'])
+        self.assertFalse(kwargs['fail_on_rc'])
+        self.assertIn('events', mock_playbook.call_args_list[2][1])
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_playbook_graph(self, mock_playbook, mock_sync):
+        mock_playbook.return_value = (0, 'successful')
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        with mock.patch('tripleoclient.utils.inventory_group_hosts',
+                        side_effect=lambda i, groups: set(groups)):
+            deployment.config_download(
+                mock.Mock(), mock.Mock(), stack,
+                output_dir='/work', inventory_path='/inventory',
+                ansible_playbook_name=[
+                    {'playbook': 'update_steps_playbook.yaml',
+                     'hosts': ['Controller']},
+                    {'playbook': 'external_update_steps_playbook.yaml',
+                     'hosts': ['Undercloud']}])
+
+        self.assertEqual(3, mock_playbook.call_count)
+        calls = sorted(mock_playbook.call_args_list[1:],
+                       key=lambda c: c[1]['playbook'])
+        self.assertEqual(
+            ['/work/overcloud/external_update_steps_playbook.yaml',
+             '/work/overcloud/update_steps_playbook.yaml'],
+            [c[1]['playbook'] for c in calls])
+        for call in calls:
+            self.assertTrue(call[1]['parallel_run'])
+            self.assertTrue(call[1]['quiet'])
+            self.assertEqual('/inventory', call[1]['inventory'])
+            self.assertIsInstance(call[1]['events'].callback,
+                                  ansible_profile.ProfileWriter)
+
+    @mock.patch('tripleoclient.utils.inventory_group_hosts',
+                side_effect=lambda i, groups: set(groups))
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_playbook_graph_concurrent(self, mock_playbook,
+                                                       mock_sync, mock_hosts):
+        cwd = os.getcwd()
+        started = threading.Barrier(2, timeout=10)
+        a_done = threading.Event()
+        runs = {}
+
+        def _playbook(playbook, workdir, **kwargs):
+            name = os.path.basename(playbook)
+            if name not in ('a.yaml', 'b.yaml'):
+                return 0, 'successful'
+            # Both playbooks are running at the same time
+            started.wait()
+            if name == 'b.yaml':
+                # b ends after a and its temporary directory are gone
+                a_done.wait(10)
+            runs[name] = (workdir, kwargs['cwd'], os.getcwd(),
+                          os.path.isdir(workdir))
+            if name == 'a.yaml':
+                threading.Timer(0.1, a_done.set).start()
+            return 0, 'successful'
+
+        mock_playbook.side_effect = _playbook
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        deployment.config_download(
+            mock.Mock(), mock.Mock(), stack,
+            output_dir='/work', inventory_path='/inventory',
+            ansible_playbook_name=[
+                {'playbook': 'a.yaml', 'hosts': ['Controller']},
+                {'playbook': 'b.yaml', 'hosts': ['Undercloud']}],
+            playbook_workers=2)
+
+        self.assertEqual(['a.yaml', 'b.yaml'], sorted(runs))
+        self.assertNotEqual(runs['a.yaml'][0], runs['b.yaml'][0])
+        for workdir, run_cwd, process_cwd, exists in runs.values():
+            # The plugins are searched in the workdir of the playbook, the
+            # working directory of the process is unchanged
+            self.assertEqual(workdir, run_cwd)
+            self.assertEqual(cwd, process_cwd)
+            self.assertTrue(exists)
+        self.assertEqual(cwd, os.getcwd())
+
+    @mock.patch('tripleoclient.utils.inventory_group_hosts',
+                side_effect=lambda i, groups: set(groups))
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_playbook_graph_failed(self, mock_playbook,
+                                                   mock_sync, mock_hosts):
+        def _playbook(playbook, **kwargs):
+            return (2 if playbook.endswith('controller.yaml') else 0), ''
+
+        mock_playbook.side_effect = _playbook
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        self.assertRaisesRegex(
+            exceptions.DeploymentError,
+            'Playbooks failed: controller.yaml, not run: post.yaml',
+            deployment.config_download,
+            mock.Mock(), mock.Mock(), stack,
+            output_dir='/work', inventory_path='/inventory',
+            ansible_playbook_name=[
+                {'playbook': 'controller.yaml', 'hosts': ['Controller']},
+                {'playbook': 'external.yaml', 'hosts': ['Undercloud']},
+                {'playbook': 'post.yaml', 'requires': ['controller.yaml'],
+                 'hosts': ['Compute']}],
+            playbook_workers=2)
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.get_config', autospec=True)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_reuse_config(self, mock_playbook,
+                                          mock_get_config, mock_sync):
+        mock_playbook.return_value = (0, 'successful')
+        output_dir = self.useFixture(fixtures.TempDir()).path
+        stack_work_dir = os.path.join(output_dir, 'overcloud')
+        stack = mock.Mock(id='stack-id', stack_name='overcloud',
+                          stack_status='UPDATE_COMPLETE',
+                          updated_time='2020-06-01T10:00:00Z')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        mock_download = self.mock_sync_container
+        mock_download.side_effect = \
+            lambda *args, **kwargs: os.mkdir(stack_work_dir) or \
+            config_writer.ConfigChanges()
+
+        for _ in range(2):
+            deployment.config_download(
+                mock.Mock(), mock.Mock(), stack, output_dir=output_dir,
+                inventory_path='/inventory')
+        # The configuration is downloaded once while the stack is unchanged
+        self.assertEqual(1, mock_get_config.call_count)
+        self.assertEqual(1, mock_download.call_count)
+        self.assertEqual(stack_work_dir,
+                         mock_playbook.call_args[1]['playbook_dir'])
+
+        stack.updated_time = '2020-06-02T10:00:00Z'
+        mock_download.side_effect = None
+        deployment.config_download(
+            mock.Mock(), mock.Mock(), stack, output_dir=output_dir,
+            inventory_path='/inventory')
+        self.assertEqual(2, mock_get_config.call_count)
+        self.assertEqual(2, mock_download.call_count)
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.get_config', autospec=True)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_failed_download(self, mock_playbook,
+                                             mock_get_config, mock_sync):
+        output_dir = self.useFixture(fixtures.TempDir()).path
+        stack_work_dir = os.path.join(output_dir, 'overcloud')
+        os.mkdir(stack_work_dir)
+        stack = mock.Mock(id='stack-id', stack_name='overcloud',
+                          stack_status='UPDATE_COMPLETE',
+                          updated_time='2020-06-01T10:00:00Z')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        plugin_utils.set_config_cache_key(stack_work_dir, 'old-key')
+        self.mock_sync_container.side_effect = RuntimeError('Download failed')
+
+        self.assertRaises(RuntimeError, deployment.config_download,
+                          mock.Mock(), mock.Mock(), stack,
+                          output_dir=output_dir, inventory_path='/inventory')
+        # The partial download is not reused by the next command
+        self.assertEqual([], os.listdir(stack_work_dir))
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.get_config', autospec=True)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_action_error(self, mock_playbook,
+                                          mock_get_config, mock_sync):
+        output_dir = self.useFixture(fixtures.TempDir()).path
+        stack_work_dir = os.path.join(output_dir, 'overcloud')
+        os.mkdir(stack_work_dir)
+        stack = mock.Mock(id='stack-id', stack_name='overcloud',
+                          stack_status='UPDATE_COMPLETE',
+                          updated_time='2020-06-01T10:00:00Z')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        # The action returns its error
+        mock_get_config.return_value = actions.Result('No stack outputs')
+        self.assertRaisesRegex(
+            exceptions.WorkflowActionError,
+            'GetOvercloudConfig execution failed: No stack outputs',
+            deployment.config_download,
+            mock.Mock(), mock.Mock(), stack,
+            output_dir=output_dir, inventory_path='/inventory')
+        self.assertEqual([], os.listdir(stack_work_dir))
+        self.mock_sync_container.assert_not_called()
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_batches(self, mock_playbook, mock_sync):
+        def _playbook(playbook, limit_hosts=None, events=None, **kwargs):
+            if events:
+                events.event_handler({
+                    'event': 'playbook_on_stats',
+                    'event_data': {'ok': dict.fromkeys(
+                        limit_hosts.split(':'), 1)}})
+            return 0, 'successful'
+
+        mock_playbook.side_effect = _playbook
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        hosts = ['compute-0', 'compute-1', 'compute-2']
+        with mock.patch('tripleoclient.utils.inventory_limit_hosts',
+                        return_value=hosts) as mock_limit:
+            deployment.config_download(
+                mock.Mock(), mock.Mock(), stack,
+                output_dir='/work', inventory_path='/inventory',
+                limit_hosts='Compute', batch_size=2)
+        mock_limit.assert_called_once_with('/inventory', 'Compute')
+
+        # The configuration is downloaded once for all the batches
+        self.assertEqual(3, mock_playbook.call_count)
+        self.assertEqual(
+            ['compute-0:compute-1', 'compute-2'],
+            [c[1]['limit_hosts'] for c in mock_playbook.call_args_list[1:]])
+        for call in mock_playbook.call_args_list[1:]:
+            self.assertFalse(call[1]['fail_on_rc'])
+
+    @mock.patch('tripleoclient.utils.inventory_group_hosts',
+                side_effect=lambda i, groups: set(groups))
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_batches_playbook_graph_not_run(
+            self, mock_playbook, mock_sync, mock_hosts):
+        def _playbook(playbook, limit_hosts=None, events=None, **kwargs):
+            if events:
+                events.event_handler({
+                    'event': 'playbook_on_stats',
+                    'event_data': {'ok': dict.fromkeys(
+                        limit_hosts.split(':'), 1)}})
+            return (2 if playbook.endswith('compute.yaml') else 0), ''
+
+        mock_playbook.side_effect = _playbook
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        with mock.patch('tripleoclient.utils.inventory_limit_hosts',
+                        return_value=['compute-0', 'compute-1']):
+            # The hosts look fine, the playbook requiring the failed one
+            # did not run on them
+            self.assertRaisesRegex(
+                exceptions.DeploymentError,
+                'Playbooks failed: compute.yaml, not run: post.yaml',
+                deployment.config_download,
+                mock.Mock(), mock.Mock(), stack,
+                output_dir='/work', inventory_path='/inventory',
+                limit_hosts='Compute', batch_size=1, max_fail_percentage=100,
+                ansible_playbook_name=[
+                    {'playbook': 'compute.yaml', 'hosts': ['Compute']},
+                    {'playbook': 'external.yaml', 'hosts': ['Undercloud']},
+                    {'playbook': 'post.yaml', 'requires': ['compute.yaml'],
+                     'hosts': ['Compute']}],
+                playbook_workers=2)
+        # The second batch is not run
+        self.assertEqual(
+            ['compute-0'] * 2,
+            [c[1]['limit_hosts'] for c in mock_playbook.call_args_list[1:]])
+
+    @mock.patch('tripleoclient.fact_cache.sync', return_value=False)
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_config_download_batches_unresolved(self, mock_playbook,
+                                                mock_sync):
+        mock_playbook.return_value = (0, 'successful')
+        stack = mock.Mock(stack_name='overcloud')
+        stack.output_show.return_value = {'output': {'output_value': []}}
+        with mock.patch('tripleoclient.utils.inventory_limit_hosts',
+                        return_value=None):
+            self.assertRaises(
+                exceptions.InvalidConfiguration,
+                deployment.config_download,
+                mock.Mock(), mock.Mock(), stack,
+                output_dir='/work', inventory_path='/inventory',
+                limit_hosts='compute*', batch_size=2)
+        # Only the configuration was downloaded
+        self.assertEqual(1, mock_playbook.call_count)
+
+    def test_run_in_batches(self):
+        limits = []
+
+        def _run(limit):
+            limits.append(limit)
+            return 0, {}
+
+        deployment._run_in_batches(_run, ['a', 'b', 'c', 'd', 'e'], 2, 0)
+        self.assertEqual(['a:b', 'c:d', 'e'], limits)
+
+    def test_run_in_batches_abort(self):
+        limits = []
+
+        def _run(limit):
+            limits.append(limit)
+            return 2, {'a': 'ok', 'b': 'unreachable'}
+
+        self.assertRaisesRegex(
+            exceptions.DeploymentError,
+            '1 of the 2 hosts of batch 1 failed, above the 0% allowed: b. '
+            '3 hosts were not updated',
+            deployment._run_in_batches, _run, ['a', 'b', 'c', 'd', 'e'], 2, 0)
+        self.assertEqual(['a:b'], limits)
+
+    def test_run_in_batches_max_fail_percentage(self):
+        limits = []
+
+        def _run(limit):
+            limits.append(limit)
+            # The hosts without status failed with the playbooks
+            return (2, {'a': 'ok'}) if limit == 'a:b' else (0, {})
+
+        self.assertRaisesRegex(
+            exceptions.DeploymentError,
+            'The playbooks failed on hosts: b$',
+            deployment._run_in_batches, _run, ['a', 'b', 'c', 'd', 'e'], 2,
+            50)
+        self.assertEqual(['a:b', 'c:d', 'e'], limits)
+
+    @mock.patch('tripleoclient.fact_cache.cached_hosts', return_value=[])
+    @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
+    def test_warm_fact_cache(self, mock_playbook, mock_hosts):
+        playbooks = []
+
+        def _playbook(playbook, **kwargs):
+            with open(playbook) as f:
+                playbooks.append(f.read())
+            return 2, 'failed'
+
+        mock_playbook.side_effect = _playbook
+        stack = mock.Mock(stack_name='overcloud')
+        deployment.warm_fact_cache(stack, '/inventory', 'tripleo-admin',
+                                   '/key')
+        self.assertEqual(1, mock_playbook.call_count)
+        # No gather_facts, the hosts with cached facts are skipped
+        self.assertEqual(
+            '- hosts: all\n  name: Gather facts\n  tasks: []\n',
+            playbooks[0])
+        mock_hosts.assert_called_once_with('overcloud')
@@ -78,7 +78,7 @@ class TestParameterWorkflows(utils.TestCommand):
         flatten.start()
         self.addCleanup(flatten.stop)
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     def test_invoke_plan_env_workflows(self, mock_open,
                                        mock_safe_load):
@@ -111,7 +111,7 @@ class TestParameterWorkflows(utils.TestCommand):
                 'user_inputs': {
                     'num_phy_cores_per_numa_node_for_pmd': 2}})
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
     @mock.patch('tripleoclient.utils.get_tripleo_ansible_inventory',
@@ -147,7 +147,7 @@ class TestParameterWorkflows(utils.TestCommand):
         ]
         mock_playbook.assert_has_calls(calls, any_order=True)
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     @mock.patch('tripleoclient.utils.run_ansible_playbook', autospec=True)
     @mock.patch('tripleoclient.utils.get_tripleo_ansible_inventory',
@@ -194,7 +194,7 @@ class TestParameterWorkflows(utils.TestCommand):
         ]
         mock_playbook.assert_has_calls(calls, any_order=True)
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     def test_invoke_plan_env_workflow_failed(self, mock_open,
                                              mock_safe_load):
@@ -227,7 +227,7 @@ class TestParameterWorkflows(utils.TestCommand):
                 'user_inputs': {
                     'num_phy_cores_per_numa_node_for_pmd': 2}})
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     def test_invoke_plan_env_workflows_no_workflow_params(
             self, mock_open, mock_safe_load):
@@ -241,7 +241,7 @@ class TestParameterWorkflows(utils.TestCommand):
 
         self.workflow.executions.create.assert_not_called()
 
-    @mock.patch('yaml.safe_load')
+    @mock.patch('tripleoclient.yaml_utils.safe_load')
     @mock.patch("six.moves.builtins.open")
     def test_invoke_plan_env_workflows_no_plan_env_file(
             self, mock_open, mock_safe_load):
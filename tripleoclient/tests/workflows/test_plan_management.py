@@ -11,7 +11,10 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import fixtures
+import hashlib
 import mock
+import os
 
 from osc_lib.tests import utils
 from swiftclient import exceptions as swift_exc
@@ -242,7 +245,8 @@ class TestPlanUpdateWorkflows(base.TestCommand):
             'test-overcloud',
             '/tht-root/',
             keep_env=True,
-            validate_stack=False)
+            validate_stack=False,
+            delta_upload=False)
 
         mock_empty_container.assert_called_once_with(
             self.object_store, 'test-overcloud')
@@ -291,7 +295,8 @@ class TestPlanUpdateWorkflows(base.TestCommand):
             self.app.client_manager,
             'test-overcloud',
             '/tht-root/',
-            validate_stack=False)
+            validate_stack=False,
+            delta_upload=False)
 
         mock_empty_container.assert_called_once_with(
             self.object_store, 'test-overcloud')
@@ -319,7 +324,7 @@ class TestPlanUpdateWorkflows(base.TestCommand):
     @mock.patch("tripleoclient.utils.run_ansible_playbook", autospec=True)
     @mock.patch('tripleoclient.workflows.plan_management._update_passwords',
                 autospec=True)
-    @mock.patch('yaml.safe_load',
+    @mock.patch('tripleoclient.yaml_utils.safe_load',
                 autospec=True)
     @mock.patch('tripleoclient.workflows.plan_management.tarball',
                 autospec=True)
@@ -334,7 +339,8 @@ class TestPlanUpdateWorkflows(base.TestCommand):
             self.app.client_manager,
             'test-overcloud',
             '/tht-root/',
-            validate_stack=False)
+            validate_stack=False,
+            delta_upload=False)
         # A dictionary without the "passwords" key is provided in
         # the _load_passwords method.
         mock_yaml_safe_load.return_value = {}
@@ -354,6 +360,32 @@ class TestPlanUpdateWorkflows(base.TestCommand):
             verbosity=1,
         )
 
+    @mock.patch("tripleoclient.utils.run_ansible_playbook", autospec=True)
+    @mock.patch('tripleoclient.workflows.plan_management._upload_templates',
+                autospec=True)
+    @mock.patch('tripleo_common.utils.swift.empty_container',
+                autospec=True)
+    def test_update_plan_from_templates_delta(
+            self, mock_empty_container, mock_upload, mock_run_playbook):
+
+        plan_management.update_plan_from_templates(
+            self.app.client_manager,
+            'test-overcloud',
+            '/tht-root/',
+            keep_env=True,
+            validate_stack=False)
+
+        mock_empty_container.assert_not_called()
+        mock_upload.assert_called_once_with(
+            self.object_store, 'test-overcloud', '/tht-root/', delta=True,
+            keep=mock.ANY)
+        self.assertEqual(
+            sorted(['plan-environment.yaml', 'user-environment.yaml',
+                    'roles_data.yaml', 'network_data.yaml',
+                    'user-files/somecustomfile.yaml',
+                    'user-files/othercustomfile.yaml']),
+            sorted(mock_upload.call_args[1]['keep']))
+
 
 class TestUpdatePasswords(base.TestCase):
 
@@ -401,3 +433,101 @@ parameter_defaults:
                                           {'SecretPassword': 'abcd'})
 
         self.swift_client.put_object.assert_not_called()
+
+
+class TestDeltaUploadTemplates(base.TestCase):
+
+    def setUp(self):
+        super(TestDeltaUploadTemplates, self).setUp()
+        self.tht_root = self.useFixture(fixtures.TempDir()).path
+        self.files = {
+            'overcloud.j2.yaml': 'heat_template_version: rocky\n',
+            'roles_data.yaml': '- name: Controller\n',
+            'environments/ssl.yaml': 'parameter_defaults: {}\n',
+            'environments/new.yaml': 'resource_registry: {}\n',
+            'tools/module.pyc': 'bytecode',
+            '.git/HEAD': 'ref: refs/heads/master\n',
+        }
+        for name, content in self.files.items():
+            path = os.path.join(self.tht_root, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(content)
+        self.swift_client = mock.MagicMock()
+        self.swift_client.get_container.return_value = ({}, [
+            self._object('overcloud.j2.yaml'),
+            self._object('roles_data.yaml'),
+            self._object('environments/ssl.yaml', 'old content'),
+            self._object('environments/removed.yaml', 'removed'),
+            self._object('user-files/custom.yaml', 'custom'),
+        ])
+        # Every upload worker shares the same fake connection
+        self.useFixture(fixtures.MockPatch(
+            'swiftclient.client.Connection', return_value=self.swift_client))
+
+    def _object(self, name, content=None):
+        if content is None:
+            content = self.files[name]
+        return {'name': name,
+                'hash': hashlib.md5(content.encode('utf-8')).hexdigest()}
+
+    def _put_names(self):
+        return sorted(c[0][1] for c in
+                      self.swift_client.put_object.call_args_list)
+
+    def _delete_names(self):
+        return sorted(c[0][1] for c in
+                      self.swift_client.delete_object.call_args_list)
+
+    def test_list_template_files(self):
+        self.assertEqual(
+            ['environments/new.yaml', 'environments/ssl.yaml',
+             'overcloud.j2.yaml', 'roles_data.yaml'],
+            sorted(plan_management._list_template_files(self.tht_root)))
+
+    def test_upload_delta(self):
+        result = plan_management._upload_templates(
+            self.swift_client, 'overcloud', self.tht_root, delta=True)
+
+        self.assertEqual((2, 2), result)
+        self.swift_client.get_container.assert_called_once_with(
+            'overcloud', full_listing=True)
+        self.assertEqual(['environments/new.yaml', 'environments/ssl.yaml'],
+                         self._put_names())
+        self.assertEqual(['environments/removed.yaml',
+                          'user-files/custom.yaml'],
+                         self._delete_names())
+
+    def test_upload_delta_keep_and_override(self):
+        roles_file = os.path.join(self.tht_root, 'custom_roles.yaml')
+        with open(roles_file, 'w') as f:
+            f.write('- name: Compute\n')
+
+        plan_management._upload_templates(
+            self.swift_client, 'overcloud', self.tht_root,
+            roles_file=roles_file, delta=True,
+            keep=['user-files/custom.yaml', 'environments/new.yaml'])
+
+        self.assertEqual(['custom_roles.yaml', 'environments/ssl.yaml',
+                          'roles_data.yaml'],
+                         self._put_names())
+        self.assertEqual(['environments/removed.yaml'], self._delete_names())
+
+    def test_upload_delta_unchanged(self):
+        self.swift_client.get_container.return_value = ({}, [
+            self._object(name) for name in
+            plan_management._list_template_files(self.tht_root)
+        ])
+
+        self.assertEqual((0, 0), plan_management._upload_templates(
+            self.swift_client, 'overcloud', self.tht_root, delta=True))
+        self.swift_client.put_object.assert_not_called()
+        self.swift_client.delete_object.assert_not_called()
+
+    def test_delete_missing_object(self):
+        self.swift_client.delete_object.side_effect = (
+            swift_exc.ClientException('Not found', http_status=404))
+
+        self.assertEqual((2, 2), plan_management._upload_templates(
+            self.swift_client, 'overcloud', self.tht_root, delta=True))
@@ -14,6 +14,9 @@
 #
 
 from __future__ import print_function
+import argparse
+import atexit
+import base64
 import collections
 
 try:
@@ -24,10 +27,12 @@ except AttributeError:
 import csv
 import datetime
 import errno
+import fcntl
 import getpass
 import glob
 import hashlib
 import logging
+import multiprocessing
 from six.moves.configparser import ConfigParser
 
 import json
@@ -44,7 +49,8 @@ import subprocess
 import sys
 import tempfile
 import time
-import yaml
+
+from concurrent import futures
 
 import ansible_runner
 
@@ -60,11 +66,17 @@ from six.moves import configparser
 from heatclient import exc as hc_exc
 from six.moves.urllib import error as url_error
 from six.moves.urllib import request
+from swiftclient import client as swift_client_lib
 
 from tripleo_common.actions import config
+from tripleo_common import inventory as tripleo_inventory
 
+from tripleoclient import ansible_worker
 from tripleoclient import constants
+from tripleoclient import environment_merge
 from tripleoclient import exceptions
+from tripleoclient import fact_cache
+from tripleoclient import yaml_utils
 
 
 LOG = logging.getLogger(__name__ + ".utils")
@@ -205,6 +217,112 @@ def makedirs(dir_path):
         return True
 
 
+# ioctl cloning a file into another one sharing the same extents, see
+# ioctl_ficlone(2)
+_FICLONE = 0x40049409
+
+
+def _reflink_file(src, dst):
+    with open(src, 'rb') as src_file:
+        with open(dst, 'wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), _FICLONE, src_file.fileno())
+            except (IOError, OSError):
+                os.unlink(dst)
+                raise
+    shutil.copystat(src, dst)
+
+
+def _hardlink_file(src, dst):
+    os.link(src, dst)
+
+
+def _symlink_file(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+# Ways of staging a file of a templates tree, see stage_templates_dir
+_STAGE_METHODS = collections.OrderedDict([
+    ('reflink', _reflink_file),
+    ('hardlink', _hardlink_file),
+    ('symlink', _symlink_file),
+    ('copy', shutil.copy2),
+])
+
+
+def stage_templates_dir(source_dir, dest_dir,
+                        methods=('reflink', 'hardlink', 'copy')):
+    """Build a working tree of a templates directory without copying it.
+
+    This is an alternative to ``shutil.copytree(source_dir, dest_dir,
+    symlinks=True)`` where the directories are created and the files are
+    linked to the source tree, with the first method of `methods` the
+    filesystem supports.
+
+    Files are only shared with the source tree when nothing writes into
+    them. The files of directories holding jinja2 templates, which may be
+    overwritten by the rendered templates, are never hard or symbolic
+    links. Symbolic links of the source tree are preserved.
+
+    :param source_dir: Templates directory.
+    :type source_dir: String
+
+    :param dest_dir: Working directory to create, it must not exist.
+    :type dest_dir: String
+
+    :param methods: Ordered ways of staging a file, among ``reflink``,
+                    ``hardlink``, ``symlink`` and ``copy``. The next one is
+                    used when the filesystem does not support a method.
+    :type methods: Tuple
+
+    :returns: Dictionary of the number of files staged by each method
+    """
+
+    methods = list(methods)
+    if 'copy' not in methods:
+        methods.append('copy')
+    stats = collections.Counter()
+
+    def _stage(src, dst, materialize):
+        for method in list(methods):
+            if materialize and method in ('hardlink', 'symlink'):
+                continue
+            try:
+                _STAGE_METHODS[method](src, dst)
+            except (IOError, OSError) as e:
+                if method == 'copy':
+                    raise
+                LOG.debug('Unable to stage {} with {}, falling back: '
+                          '{}'.format(src, method, e))
+                methods.remove(method)
+            else:
+                stats[method] += 1
+                return
+
+    os.makedirs(dest_dir)
+    for root, dirs, files in os.walk(source_dir):
+        dest_root = os.path.join(dest_dir, os.path.relpath(root, source_dir))
+        materialize = any('.j2' in f for f in files)
+        for name in list(dirs):
+            src = os.path.join(root, name)
+            if os.path.islink(src):
+                dirs.remove(name)
+                os.symlink(os.readlink(src), os.path.join(dest_root, name))
+            else:
+                os.mkdir(os.path.join(dest_root, name))
+        for name in files:
+            src = os.path.join(root, name)
+            dst = os.path.join(dest_root, name)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                _stage(src, dst, materialize)
+
+    LOG.debug('Staged {} into {}: {}'.format(
+        source_dir, dest_dir, dict(stats)))
+    return dict(stats)
+
+
 def playbook_limit_parse(limit_nodes):
     """Return a parsed string for limits.
 
@@ -240,6 +358,486 @@ def playbook_verbosity(self):
             return self.app_args.verbose_level
 
 
+# Process level cache of runner profiles. Profiles are keyed on the
+# arguments which shape the static part of an ansible-runner environment,
+# see `get_runner_profile`.
+_RUNNER_PROFILES = dict()
+
+# Plugin search paths exported to ansible-runner. Each entry is the
+# environment variable name, the sub-directory name searched within the
+# workdir and the cwd, the user level plugin directory and the system wide
+# plugin directories.
+_ANSIBLE_PLUGIN_PATHS = (
+    ('ANSIBLE_LIBRARY', 'modules', '.ansible/plugins/modules', (
+        '/usr/share/ansible/tripleo-plugins/modules',
+        '/usr/share/ansible/plugins/modules',
+        '/usr/share/ceph-ansible/library',
+        '/usr/share/ansible-modules',
+        '{}/library'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+    ('ANSIBLE_LOOKUP_PLUGINS', 'lookup', '.ansible/plugins/lookup', (
+        '/usr/share/ansible/tripleo-plugins/lookup',
+        '/usr/share/ansible/plugins/lookup',
+        '/usr/share/ceph-ansible/plugins/lookup',
+        '{}/lookup_plugins'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+    ('ANSIBLE_CALLBACK_PLUGINS', 'callback', '.ansible/plugins/callback', (
+        '/usr/share/ansible/tripleo-plugins/callback',
+        '/usr/share/ansible/plugins/callback',
+        '/usr/share/ceph-ansible/plugins/callback',
+        '{}/callback_plugins'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+    ('ANSIBLE_ACTION_PLUGINS', 'action', '.ansible/plugins/action', (
+        '/usr/share/ansible/tripleo-plugins/action',
+        '/usr/share/ansible/plugins/action',
+        '/usr/share/ceph-ansible/plugins/actions',
+        '{}/action_plugins'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+    ('ANSIBLE_FILTER_PLUGINS', 'filter', '.ansible/plugins/filter', (
+        '/usr/share/ansible/tripleo-plugins/filter',
+        '/usr/share/ansible/plugins/filter',
+        '/usr/share/ceph-ansible/plugins/filter',
+        '{}/filter_plugins'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+    ('ANSIBLE_ROLES_PATH', 'roles', '.ansible/roles', (
+        '/usr/share/ansible/tripleo-roles',
+        '/usr/share/ansible/roles',
+        '/usr/share/ceph-ansible/roles',
+        '/etc/ansible/roles',
+        '{}/roles'.format(constants.DEFAULT_VALIDATIONS_BASEDIR))),
+)
+
+
+class AnsibleRunnerProfile(object):
+    """Reusable part of an ansible-runner execution environment.
+
+    A profile holds everything `run_ansible_playbook` needs that does not
+    change from one playbook execution to the next: the TripleO specific
+    environment variables, the static parts of the plugin search paths and
+    the generated ansible configuration file.
+    """
+
+    def __init__(self, connection='smart', ssh_user='root', key=None,
+                 module_path=None, gathering_policy='smart',
+                 ansible_cfg=None):
+        """Build the static environment for a given connection setup.
+
+        :param connection: Connection type (local, smart, etc).
+        :type connection: String
+
+        :param ssh_user: User for the ssh connection.
+        :type ssh_user: String
+
+        :param key: Private key to use for the ssh connection.
+        :type key: String
+
+        :param module_path: Location of the ansible module and library.
+        :type module_path: String
+
+        :param gathering_policy: This setting controls the default policy of
+                                 fact gathering ('smart', 'implicit',
+                                 'explicit').
+        :type gathering_policy: String
+
+        :param ansible_cfg: Path to an ansible configuration file. One will
+                            be generated, once, if this option is None.
+        :type ansible_cfg: String
+        """
+
+        self.module_path = module_path
+        self._ansible_cfg = ansible_cfg
+        self._generated_cfg = None
+
+        env = dict()
+        env['ANSIBLE_SSH_ARGS'] = (
+            '-o UserKnownHostsFile={} '
+            '-o StrictHostKeyChecking=no '
+            '-o ControlMaster=auto '
+            '-o ControlPersist=30m '
+            '-o ServerAliveInterval=64 '
+            '-o ServerAliveCountMax=1024 '
+            '-o Compression=no '
+            '-o TCPKeepAlive=yes '
+            '-o VerifyHostKeyDNS=no '
+            '-o ForwardX11=no '
+            '-o ForwardAgent=yes '
+            '-o PreferredAuthentications=publickey '
+            '-T'
+        ).format(os.devnull)
+        env['ANSIBLE_DISPLAY_FAILED_STDERR'] = True
+        env['ANSIBLE_FORKS'] = constants.ANSIBLE_DEFAULT_FORKS
+        env['ANSIBLE_GATHER_TIMEOUT'] = constants.ANSIBLE_GATHER_TIMEOUT
+        env['ANSIBLE_SSH_RETRIES'] = 3
+        env['ANSIBLE_PIPELINING'] = True
+        env['ANSIBLE_SCP_IF_SSH'] = True
+        env['ANSIBLE_REMOTE_USER'] = ssh_user
+        env['ANSIBLE_RETRY_FILES_ENABLED'] = False
+        env['ANSIBLE_HOST_KEY_CHECKING'] = False
+        env['ANSIBLE_TRANSPORT'] = connection
+        env['ANSIBLE_CACHE_PLUGIN_TIMEOUT'] = constants.FACT_CACHE_TIMEOUT
+
+        if connection == 'local':
+            env['ANSIBLE_PYTHON_INTERPRETER'] = sys.executable
+
+        if gathering_policy in ('smart', 'explicit', 'implicit'):
+            env['ANSIBLE_GATHERING'] = gathering_policy
+
+        try:
+            user_pwd = pwd.getpwuid(int(os.getenv('SUDO_UID', os.getuid())))
+        except TypeError:
+            home = constants.CLOUD_HOME_DIR
+        else:
+            home = user_pwd.pw_dir
+
+        env['ANSIBLE_LOG_PATH'] = os.path.join(home, 'ansible.log')
+
+        if key:
+            env['ANSIBLE_PRIVATE_KEY_FILE'] = key
+
+        self.env = env
+        self._plugin_paths = [
+            (
+                env_key,
+                subdir,
+                os.path.expanduser(
+                    '{}/{}'.format(constants.CLOUD_HOME_DIR, user_dir)
+                ),
+                ':'.join(system_dirs)
+            )
+            for env_key, subdir, user_dir, system_dirs in _ANSIBLE_PLUGIN_PATHS
+        ]
+
+    def plugin_paths(self, workdir, cwd):
+        """Return the plugin search path environment variables.
+
+        :param workdir: Location of the working directory.
+        :type workdir: String
+
+        :param cwd: Current working directory of the process.
+        :type cwd: String
+
+        :returns: Dictionary
+        """
+
+        paths = dict()
+        for env_key, subdir, user_dir, system_dirs in self._plugin_paths:
+            paths[env_key] = ':'.join([
+                user_dir,
+                os.path.join(workdir, subdir),
+                os.path.join(cwd, subdir),
+                system_dirs
+            ])
+
+        if self.module_path:
+            paths['ANSIBLE_LIBRARY'] = ':'.join(
+                [paths['ANSIBLE_LIBRARY'], self.module_path]
+            )
+        return paths
+
+    @property
+    def ansible_cfg(self):
+        """Return the ansible configuration file for this profile.
+
+        When no configuration file was provided, one is generated the
+        first time it is requested and reused for the life of the process.
+
+        :returns: String
+        """
+
+        if self._ansible_cfg:
+            return self._ansible_cfg
+
+        if not self._generated_cfg or not os.path.isfile(self._generated_cfg):
+            cfg_dir = tempfile.mkdtemp(prefix='tripleo-ansible-profile-')
+            atexit.register(shutil.rmtree, cfg_dir, ignore_errors=True)
+            self._generated_cfg = os.path.join(cfg_dir, 'ansible.cfg')
+            config = configparser.ConfigParser()
+            config.add_section('defaults')
+            config.set('defaults', 'internal_poll_interval', '0.05')
+            with open(self._generated_cfg, 'w') as f:
+                config.write(f)
+        return self._generated_cfg
+
+
+def get_runner_profile(connection='smart', ssh_user='root', key=None,
+                       module_path=None, gathering_policy='smart',
+                       ansible_cfg=None):
+    """Return a cached `AnsibleRunnerProfile`.
+
+    Profiles are built once per process for every unique combination of
+    arguments and reused by all subsequent playbook executions.
+
+    :returns: `AnsibleRunnerProfile`
+    """
+
+    profile_key = (
+        connection,
+        ssh_user,
+        key,
+        module_path,
+        gathering_policy,
+        ansible_cfg
+    )
+    profile = _RUNNER_PROFILES.get(profile_key)
+    if profile is None:
+        LOG.debug('Creating ansible runner profile: {}'.format(profile_key))
+        profile = _RUNNER_PROFILES[profile_key] = AnsibleRunnerProfile(
+            *profile_key
+        )
+    return profile
+
+
+def clear_runner_profiles():
+    """Drop all cached runner profiles."""
+    _RUNNER_PROFILES.clear()
+
+
+def _ansible_worker_pool_size():
+    """Return the number of warm Ansible workers, 0 when disabled.
+
+    Warm workers are enabled by setting the environment variable named by
+    `constants.ANSIBLE_WORKERS_ENV` to the size of the worker pool.
+
+    :returns: Integer
+    """
+
+    value = os.environ.get(constants.ANSIBLE_WORKERS_ENV)
+    if not value:
+        return 0
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        LOG.warning(
+            'Ignoring invalid value "{}" for {}, expected an integer'.format(
+                value,
+                constants.ANSIBLE_WORKERS_ENV
+            )
+        )
+        return 0
+
+
+def _available_memory_mb():
+    """Return the memory available on the undercloud, None when unknown."""
+
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _load_inventory(inventory):
+    if isinstance(inventory, six.string_types) and os.path.isfile(inventory):
+        try:
+            with open(inventory) as f:
+                inventory = yaml_utils.safe_load(f)
+        except (IOError, OSError, yaml_utils.YAMLError):
+            return None
+    return inventory if isinstance(inventory, dict) else None
+
+
+def count_inventory_hosts(inventory):
+    """Return the number of hosts of an Ansible inventory.
+
+    :param inventory: Comma separated list of hosts, static YAML inventory
+                      or path of a static YAML inventory.
+    :type inventory: String or Dictionary
+
+    :returns: Integer or None when the hosts can not be counted.
+    """
+
+    if (isinstance(inventory, six.string_types) and
+            not os.path.isfile(inventory)):
+        if ',' in inventory:
+            return len([h for h in inventory.split(',') if h.strip()])
+        return None
+    inventory = _load_inventory(inventory)
+    if inventory is None:
+        return None
+    return len(_inventory_hosts(inventory))
+
+
+def _inventory_hosts(inventory):
+    hosts = set()
+    groups = list(inventory.values())
+    while groups:
+        group = groups.pop()
+        if not isinstance(group, dict):
+            continue
+        if isinstance(group.get('hosts'), (dict, list)):
+            hosts.update(group['hosts'])
+        if isinstance(group.get('children'), dict):
+            groups.extend(group['children'].values())
+    return hosts
+
+
+def inventory_group_hosts(inventory, groups):
+    """Return the hosts of groups of a static Ansible inventory.
+
+    The children of the groups are resolved by name, as in the inventories
+    generated by TripleO.
+
+    :param inventory: Static YAML inventory or path of a static YAML
+                      inventory.
+    :type inventory: String or Dictionary
+
+    :param groups: Names of the groups.
+    :type groups: List
+
+    :returns: Set of host names, None when a group is not in the
+              inventory.
+    """
+
+    inventory = _load_inventory(inventory)
+    if inventory is None:
+        return None
+
+    pending = []
+    for name in groups:
+        if name in ('all', 'ungrouped') or name not in inventory:
+            return None
+        pending.append(inventory[name])
+    hosts = set()
+    seen = set()
+    while pending:
+        group = pending.pop()
+        if not isinstance(group, dict) or id(group) in seen:
+            continue
+        seen.add(id(group))
+        if isinstance(group.get('hosts'), (dict, list)):
+            hosts.update(group['hosts'])
+        if isinstance(group.get('children'), dict):
+            for name, child in group['children'].items():
+                pending.extend([child, inventory.get(name)])
+    return hosts
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', name)]
+
+
+def inventory_limit_hosts(inventory, limit):
+    """Return the hosts of a static Ansible inventory matched by a limit.
+
+    The limit is a list of host and group names separated by ':' or ',',
+    the names starting with '!' are excluded. The other host patterns of
+    Ansible are not supported.
+
+    :param inventory: Static YAML inventory or path of a static YAML
+                      inventory.
+    :type inventory: String or Dictionary
+
+    :param limit: Limit of the playbook execution, all the hosts when empty.
+    :type limit: String
+
+    :returns: List of host names, in natural order, None when the limit can
+              not be resolved.
+    """
+
+    inventory = _load_inventory(inventory)
+    if inventory is None:
+        return None
+
+    all_hosts = _inventory_hosts(inventory)
+    included = None
+    excluded = set()
+    for term in re.split('[:,]', limit or ''):
+        term = term.strip()
+        if not term:
+            continue
+        name = term.lstrip('!')
+        if name == 'all':
+            hosts = all_hosts
+        elif name in all_hosts:
+            hosts = {name}
+        else:
+            hosts = inventory_group_hosts(inventory, [name])
+            if hosts is None:
+                return None
+        if term.startswith('!'):
+            excluded.update(hosts)
+        else:
+            included = (included or set()) | hosts
+    if included is None:
+        included = all_hosts
+    return sorted(included - excluded, key=_natural_key)
+
+
+def tune_ansible(host_count, cpu_count, memory_mb=None):
+    """Return the Ansible settings sized for an inventory and the undercloud.
+
+    The forks are limited by the number of hosts, by
+    `constants.ANSIBLE_FORKS_PER_CPU` forks per CPU and by the available
+    memory, `constants.ANSIBLE_FORK_MEMORY_MB` per fork. The fact gathering
+    timeout grows by 15 seconds for every fork sharing a CPU, from
+    `constants.ANSIBLE_GATHER_TIMEOUT`.
+
+    :param host_count: Number of hosts of the inventory, None when unknown.
+    :type host_count: Integer
+
+    :param cpu_count: Number of CPUs of the undercloud.
+    :type cpu_count: Integer
+
+    :param memory_mb: Memory available on the undercloud, None when unknown.
+    :type memory_mb: Integer
+
+    :returns: Dictionary of Ansible environment variables.
+    """
+
+    cpu_count = max(cpu_count or 1, 1)
+    forks = cpu_count * constants.ANSIBLE_FORKS_PER_CPU
+    if memory_mb is not None:
+        forks = min(forks, memory_mb // constants.ANSIBLE_FORK_MEMORY_MB)
+    if host_count:
+        forks = min(forks, host_count)
+    forks = max(forks, 1)
+    gather_timeout = max(constants.ANSIBLE_GATHER_TIMEOUT,
+                         15 * (forks // cpu_count))
+    return {
+        'ANSIBLE_FORKS': forks,
+        'ANSIBLE_GATHER_TIMEOUT': gather_timeout
+    }
+
+
+def _ansible_tuning(inventory):
+    """Return the Ansible settings requested by `ANSIBLE_FORKS_ENV`."""
+
+    value = os.environ.get(constants.ANSIBLE_FORKS_ENV)
+    if not value:
+        return {}
+    if value.strip().lower() != 'auto':
+        try:
+            forks = int(value)
+            if forks < 1:
+                raise ValueError(value)
+        except ValueError:
+            LOG.warning(
+                'Ignoring invalid value "{}" for {}, expected "auto" or a '
+                'positive integer'.format(value, constants.ANSIBLE_FORKS_ENV))
+            return {}
+        LOG.info('Running Ansible with {} forks'.format(forks))
+        return {'ANSIBLE_FORKS': forks}
+
+    host_count = count_inventory_hosts(inventory)
+    cpu_count = _cpu_count()
+    memory_mb = _available_memory_mb()
+    tuning = tune_ansible(host_count, cpu_count, memory_mb)
+    LOG.info(
+        'Running Ansible with {} forks and a {}s fact gathering timeout, '
+        'sized for {} hosts, {} CPUs and {} MB of available memory'.format(
+            tuning['ANSIBLE_FORKS'], tuning['ANSIBLE_GATHER_TIMEOUT'],
+            host_count if host_count is not None else 'an unknown number of',
+            cpu_count,
+            memory_mb if memory_mb is not None else 'unknown'))
+    return tuning
+
+
 def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
                          connection='smart', output_callback='yaml',
                          ssh_user='root', key=None, module_path=None,
@@ -250,9 +848,13 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
                          parallel_run=False, callback_whitelist=None,
                          ansible_cfg=None, ansible_timeout=30,
                          reproduce_command=False, fail_on_rc=True,
-                         timeout=None):
+                         timeout=None, events=None, cwd=None):
     """Simple wrapper for ansible-playbook.
 
+    Localhost-only playbooks (``inventory='localhost,'``) are handed to a
+    warm Ansible worker when the ``TRIPLEO_ANSIBLE_WORKERS`` environment
+    variable is set, see `tripleoclient.ansible_worker`.
+
     :param playbook: Playbook filename.
     :type playbook: String
 
@@ -346,6 +948,16 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
 
     :param timeout: Timeout for ansible to finish playbook execution (minutes).
     :type timeout: int
+
+    :param events: Receives the task results and the statistics of the
+                   execution while the playbook runs. The playbook is never
+                   handed to a warm Ansible worker then.
+    :type events: `ansible_events.AnsibleEventStream`
+
+    :param cwd: Directory searched for plugins and roles besides the
+                workdir. Defaults to the current working directory of the
+                process, which concurrent runs must not rely on.
+    :type cwd: String
     """
 
     def _playbook_check(play):
@@ -363,7 +975,7 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
                 if os.path.exists(inventory):
                     return inventory
             elif isinstance(inventory, dict):
-                inventory = yaml.safe_dump(
+                inventory = yaml_utils.safe_dump(
                     inventory,
                     default_flow_style=False
                 )
@@ -390,27 +1002,29 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
     if extra_vars_file:
         runner_extra_vars = os.path.join(runner_env, 'extravars')
         with open(runner_extra_vars, 'w') as f:
-            f.write(yaml.safe_dump(extra_vars_file, default_flow_style=False))
+            f.write(yaml_utils.safe_dump(extra_vars_file,
+                                         default_flow_style=False))
 
     if timeout and timeout > 0:
         settings_file = os.path.join(runner_env, 'settings')
         timeout_value = timeout * 60
         if os.path.exists(settings_file):
             with open(settings_file, 'r') as f:
-                settings_object = yaml.safe_load(f.read())
+                settings_object = yaml_utils.safe_load(f.read())
                 settings_object['job_timeout'] = timeout_value
         else:
             settings_object = {'job_timeout': timeout_value}
 
         with open(settings_file, 'w') as f:
-            f.write(yaml.safe_dump(settings_object, default_flow_style=False))
+            f.write(yaml_utils.safe_dump(settings_object,
+                                         default_flow_style=False))
 
     if isinstance(playbook, (list, set)):
         verified_playbooks = [_playbook_check(play=i) for i in playbook]
         playbook = os.path.join(workdir, 'tripleo-multi-playbook.yaml')
         with open(playbook, 'w') as f:
             f.write(
-                yaml.safe_dump(
+                yaml_utils.safe_dump(
                     [{'import_playbook': i} for i in verified_playbooks],
                     default_flow_style=False
                 )
@@ -443,14 +1057,10 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
                 limit_hosts
             )
         )
-    cwd = os.getcwd()
-    ansible_fact_path = os.path.join(
-        os.path.join(
-            tempfile.gettempdir(),
-            'tripleo-ansible'
-        ),
-        'fact_cache'
-    )
+    if cwd is None:
+        cwd = os.getcwd()
+    # The facts are shared by all the playbook runs of the stack
+    ansible_fact_path = fact_cache.fact_dir(plan)
     makedirs(ansible_fact_path)
 
     if callback_whitelist:
@@ -460,141 +1070,22 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
 
     callback_whitelist = ','.join([callback_whitelist, 'profile_tasks'])
 
+    profile = get_runner_profile(
+        connection=connection,
+        ssh_user=ssh_user,
+        key=key,
+        module_path=module_path,
+        gathering_policy=gathering_policy,
+        ansible_cfg=ansible_cfg
+    )
     env = os.environ.copy()
-    env['ANSIBLE_SSH_ARGS'] = (
-        '-o UserKnownHostsFile={} '
-        '-o StrictHostKeyChecking=no '
-        '-o ControlMaster=auto '
-        '-o ControlPersist=30m '
-        '-o ServerAliveInterval=64 '
-        '-o ServerAliveCountMax=1024 '
-        '-o Compression=no '
-        '-o TCPKeepAlive=yes '
-        '-o VerifyHostKeyDNS=no '
-        '-o ForwardX11=no '
-        '-o ForwardAgent=yes '
-        '-o PreferredAuthentications=publickey '
-        '-T'
-    ).format(os.devnull)
-    env['ANSIBLE_DISPLAY_FAILED_STDERR'] = True
-    env['ANSIBLE_FORKS'] = 36
+    env.update(profile.env)
+    env.update(profile.plugin_paths(workdir=workdir, cwd=cwd))
     env['ANSIBLE_TIMEOUT'] = ansible_timeout
-    env['ANSIBLE_GATHER_TIMEOUT'] = 45
-    env['ANSIBLE_SSH_RETRIES'] = 3
-    env['ANSIBLE_PIPELINING'] = True
-    env['ANSIBLE_SCP_IF_SSH'] = True
-    env['ANSIBLE_REMOTE_USER'] = ssh_user
     env['ANSIBLE_STDOUT_CALLBACK'] = output_callback
-    env['ANSIBLE_LIBRARY'] = os.path.expanduser(
-        '{}/.ansible/plugins/modules:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-plugins/modules:'
-        '/usr/share/ansible/plugins/modules:'
-        '/usr/share/ceph-ansible/library:'
-        '/usr/share/ansible-modules:'
-        '{}/library'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'modules'),
-            os.path.join(cwd, 'modules'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
-    env['ANSIBLE_LOOKUP_PLUGINS'] = os.path.expanduser(
-        '{}/.ansible/plugins/lookup:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-plugins/lookup:'
-        '/usr/share/ansible/plugins/lookup:'
-        '/usr/share/ceph-ansible/plugins/lookup:'
-        '{}/lookup_plugins'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'lookup'),
-            os.path.join(cwd, 'lookup'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
-    env['ANSIBLE_CALLBACK_PLUGINS'] = os.path.expanduser(
-        '{}/.ansible/plugins/callback:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-plugins/callback:'
-        '/usr/share/ansible/plugins/callback:'
-        '/usr/share/ceph-ansible/plugins/callback:'
-        '{}/callback_plugins'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'callback'),
-            os.path.join(cwd, 'callback'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
-    env['ANSIBLE_ACTION_PLUGINS'] = os.path.expanduser(
-        '{}/.ansible/plugins/action:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-plugins/action:'
-        '/usr/share/ansible/plugins/action:'
-        '/usr/share/ceph-ansible/plugins/actions:'
-        '{}/action_plugins'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'action'),
-            os.path.join(cwd, 'action'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
-    env['ANSIBLE_FILTER_PLUGINS'] = os.path.expanduser(
-        '{}/.ansible/plugins/filter:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-plugins/filter:'
-        '/usr/share/ansible/plugins/filter:'
-        '/usr/share/ceph-ansible/plugins/filter:'
-        '{}/filter_plugins'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'filter'),
-            os.path.join(cwd, 'filter'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
-    env['ANSIBLE_ROLES_PATH'] = os.path.expanduser(
-        '{}/.ansible/roles:'
-        '{}:{}:'
-        '/usr/share/ansible/tripleo-roles:'
-        '/usr/share/ansible/roles:'
-        '/usr/share/ceph-ansible/roles:'
-        '/etc/ansible/roles:'
-        '{}/roles'.format(
-            constants.CLOUD_HOME_DIR,
-            os.path.join(workdir, 'roles'),
-            os.path.join(cwd, 'roles'),
-            constants.DEFAULT_VALIDATIONS_BASEDIR
-        )
-    )
     env['ANSIBLE_CALLBACK_WHITELIST'] = callback_whitelist
-    env['ANSIBLE_RETRY_FILES_ENABLED'] = False
-    env['ANSIBLE_HOST_KEY_CHECKING'] = False
-    env['ANSIBLE_TRANSPORT'] = connection
-    env['ANSIBLE_CACHE_PLUGIN_TIMEOUT'] = 7200
-
-    if connection == 'local':
-        env['ANSIBLE_PYTHON_INTERPRETER'] = sys.executable
-
-    if gathering_policy in ('smart', 'explicit', 'implicit'):
-        env['ANSIBLE_GATHERING'] = gathering_policy
-
-    if module_path:
-        env['ANSIBLE_LIBRARY'] = ':'.join(
-            [env['ANSIBLE_LIBRARY'], module_path]
-        )
-
     env['TRIPLEO_PLAN_NAME'] = plan
-
-    try:
-        user_pwd = pwd.getpwuid(int(os.getenv('SUDO_UID', os.getuid())))
-    except TypeError:
-        home = constants.CLOUD_HOME_DIR
-    else:
-        home = user_pwd.pw_dir
-
-    env['ANSIBLE_LOG_PATH'] = os.path.join(home, 'ansible.log')
-
-    if key:
-        env['ANSIBLE_PRIVATE_KEY_FILE'] = key
+    env.update(_ansible_tuning(inventory))
 
     if extra_env_variables:
         if not isinstance(extra_env_variables, dict):
@@ -604,20 +1095,12 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
         else:
             env.update(extra_env_variables)
 
+    if 'ANSIBLE_CONFIG' not in env:
+        env['ANSIBLE_CONFIG'] = profile.ansible_cfg
+
     command_path = None
 
     with TempDirs(chdir=False) as ansible_artifact_path:
-        if 'ANSIBLE_CONFIG' not in env and not ansible_cfg:
-            ansible_cfg = os.path.join(ansible_artifact_path, 'ansible.cfg')
-            config = configparser.ConfigParser()
-            config.add_section('defaults')
-            config.set('defaults', 'internal_poll_interval', '0.05')
-            with open(ansible_cfg, 'w') as f:
-                config.write(f)
-            env['ANSIBLE_CONFIG'] = ansible_cfg
-        elif 'ANSIBLE_CONFIG' not in env and ansible_cfg:
-            env['ANSIBLE_CONFIG'] = ansible_cfg
-
         r_opts = {
             'private_data_dir': workdir,
             'project_dir': playbook_dir,
@@ -647,15 +1130,27 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
 
         runner_config = ansible_runner.runner_config.RunnerConfig(**r_opts)
         runner_config.prepare()
-        # NOTE(cloudnull): overload the output callback after prepare
-        #                  to define the specific format we want.
-        #                  This is only required until PR
-        #                  https://github.com/ansible/ansible-runner/pull/387
-        #                  is merged and released. After this PR has been
-        #                  made available to us, this line should be removed.
-        runner_config.env['ANSIBLE_STDOUT_CALLBACK'] = \
-            r_opts['envvars']['ANSIBLE_STDOUT_CALLBACK']
-        runner = ansible_runner.Runner(config=runner_config)
+        if events is None:
+            # NOTE(cloudnull): overload the output callback after prepare
+            #                  to define the specific format we want.
+            #                  This is only required until PR
+            #                  https://github.com/ansible/ansible-runner/pull/387
+            #                  is merged and released. After this PR has been
+            #                  made available to us, this line should be
+            #                  removed.
+            runner_config.env['ANSIBLE_STDOUT_CALLBACK'] = \
+                r_opts['envvars']['ANSIBLE_STDOUT_CALLBACK']
+            runner = ansible_runner.Runner(config=runner_config)
+        else:
+            # The events are emitted by the stdout callback of
+            # ansible-runner, which wraps the requested one.
+            runner_config.env['ORIGINAL_STDOUT_CALLBACK'] = \
+                r_opts['envvars']['ANSIBLE_STDOUT_CALLBACK']
+            runner = ansible_runner.Runner(
+                config=runner_config,
+                event_handler=events.event_handler,
+                status_handler=events.status_handler
+            )
 
         if reproduce_command:
             command_path = os.path.join(
@@ -671,7 +1166,25 @@ def run_ansible_playbook(playbook, inventory, workdir, playbook_dir=None,
                 f.write('{} $@\n'.format(' '.join(runner_config.command)))
             os.chmod(command_path, 0o750)
 
-        status, rc = runner.run()
+        workers = _ansible_worker_pool_size()
+        if (workers and not parallel_run and events is None and
+                inventory == 'localhost,'):
+            try:
+                status, rc = ansible_worker.get_pool(size=workers).run(
+                    command=runner_config.command,
+                    env=runner_config.env,
+                    cwd=runner_config.cwd,
+                    timeout=getattr(runner_config, 'job_timeout', None),
+                    quiet=quiet
+                )
+            except (exceptions.AnsibleWorkerError, IOError) as e:
+                LOG.warning(
+                    'Warm Ansible worker unavailable, falling back to'
+                    ' ansible-runner: {}'.format(e)
+                )
+                status, rc = runner.run()
+        else:
+            status, rc = runner.run()
 
     if rc != 0:
         err_msg = (
@@ -814,9 +1327,8 @@ def write_env_file(env_data, env_file, registry_overwrites):
     if registry_overwrites:
         data['resource_registry'] = registry_overwrites
     with open(env_file, "w") as f:
-        dumper = yaml.dumper.SafeDumper
-        dumper.ignore_aliases = lambda self, data: True
-        yaml.dump(data, f, default_flow_style=False, Dumper=dumper)
+        yaml_utils.safe_dump(data, f, default_flow_style=False,
+                             Dumper=yaml_utils.NoAliasSafeDumper)
 
 
 def store_cli_param(command_name, parsed_args):
@@ -890,6 +1402,138 @@ def create_tempest_deployer_input(config_name='tempest-deployer-input.conf'):
         config.write(config_file)
 
 
+def poll_for_stack_events(orchestration_client, stack_name, action=None,
+                          marker=None, out=None, nested_depth=0,
+                          verbose=True,
+                          min_period=constants.STACK_POLL_PERIOD_MIN,
+                          max_period=constants.STACK_POLL_PERIOD_MAX,
+                          poll_state=None):
+    """Poll an orchestration stack until an action completes or fails.
+
+    The poll period is adaptive: it is halved, down to `min_period`,
+    whenever progress is seen and doubled, up to `max_period`, after every
+    poll without progress. Once the last status seen is a complete or failed
+    one the stack is about to settle, the period stays at `min_period`.
+    When `verbose` is enabled only the events newer than
+    the last seen event are listed, up to `nested_depth`. Otherwise no
+    events are listed at all and only the top level stack status is
+    checked.
+
+    :param orchestration_client: Instance of Orchestration client
+    :type  orchestration_client: heatclient.v1.client.Client
+
+    :param stack_name: Name or "name/UUID" of the stack to poll
+    :type  stack_name: string
+
+    :param action: Current action to check the stack for COMPLETE
+    :type action: string
+
+    :param marker: UUID of the last stack event before the current action
+    :type  marker: string
+
+    :param out: Stream the events are written to (defaults to stdout)
+    :type out: file
+
+    :param nested_depth: Max depth to look for events
+    :type nested_depth: int
+
+    :param verbose: Whether to list and print events
+    :type verbose: boolean
+
+    :param min_period: Shortest time between two polls (seconds)
+    :type min_period: int
+
+    :param max_period: Longest time between two polls (seconds)
+    :type max_period: int
+
+    :param poll_state: Updated with the 'marker' of the last event seen, a
+                       poll retried after an error goes on from there
+    :type poll_state: dict
+
+    :returns: tuple (stack status, message)
+    """
+    if action:
+        stop_status = ('%s_FAILED' % action, '%s_COMPLETE' % action)
+    else:
+        stop_status = None
+
+    def _terminal(status):
+        return status.endswith('_COMPLETE') or status.endswith('_FAILED')
+
+    def _stop_check(status):
+        if stop_status:
+            return status in stop_status
+        return _terminal(status)
+
+    def _msg(status):
+        return _("\n Stack %(name)s %(status)s \n") % dict(
+            name=stack_name, status=status)
+
+    def _get_stack_status():
+        stack = orchestration_client.stacks.get(stack_name,
+                                                resolve_outputs=False)
+        return stack.stack_status, getattr(stack, 'updated_time', None)
+
+    if not out:
+        out = sys.stdout
+    top_level_name = stack_name.split('/')[0]
+    event_log_context = heat_utils.EventLogContext()
+    if poll_state is None:
+        poll_state = {}
+    poll_state.setdefault('marker', marker)
+    last_state = None
+    last_status = ''
+    no_event_polls = 0
+    period = min_period
+    while True:
+        progress = False
+        if verbose:
+            events = event_utils.get_events(
+                orchestration_client, stack_id=stack_name,
+                event_args={'sort_dir': 'asc'},
+                nested_depth=nested_depth, marker=poll_state['marker'])
+            if events:
+                progress = True
+                no_event_polls = 0
+                poll_state['marker'] = getattr(events[-1], 'id', None)
+                last_status = getattr(events[-1], 'resource_status', '')
+                out.write(heat_utils.event_log_formatter(events,
+                                                         event_log_context))
+                out.write('\n')
+                for event in events:
+                    if getattr(event, 'resource_name', '') != top_level_name:
+                        continue
+                    stack_status = getattr(event, 'resource_status', '')
+                    if _stop_check(stack_status):
+                        return stack_status, _msg(stack_status)
+            else:
+                no_event_polls += 1
+
+            # NOTE: the stack event may not be part of the listed
+            # events, fall back to a stack get after 2 polls without events.
+            if no_event_polls >= 2:
+                no_event_polls = 0
+                stack_status, _updated = _get_stack_status()
+                if _stop_check(stack_status):
+                    return stack_status, _msg(stack_status)
+                last_status = stack_status
+        else:
+            state = _get_stack_status()
+            if _stop_check(state[0]):
+                return state[0], _msg(state[0])
+            progress = last_state is not None and state != last_state
+            last_state = state
+            last_status = state[0]
+
+        if _terminal(last_status):
+            period = min_period
+        elif progress:
+            period = max(period // 2, min_period)
+        else:
+            period = min(period * 2, max_period)
+        time.sleep(period)
+
+
 def wait_for_stack_ready(orchestration_client, stack_name, marker=None,
                          action='CREATE', verbose=False, nested_depth=2,
                          max_retries=10):
@@ -930,12 +1574,14 @@ def wait_for_stack_ready(orchestration_client, stack_name, marker=None,
     else:
         out = open(os.devnull, "w")
     retries = 0
+    # The events already printed are not listed again by the retries
+    poll_state = {'marker': marker}
     while retries <= max_retries:
         try:
-            stack_status, msg = event_utils.poll_for_events(
+            stack_status, msg = poll_for_stack_events(
                 orchestration_client, stack_name, action=action,
-                poll_period=5, marker=marker, out=out,
-                nested_depth=nested_depth)
+                marker=marker, out=out, nested_depth=nested_depth,
+                verbose=verbose, poll_state=poll_state)
             print(msg)
             return stack_status == '%s_COMPLETE' % action
         except hc_exc.HTTPException as e:
@@ -1125,8 +1771,53 @@ def node_add_capabilities(bm_client, node, **updated):
     return caps
 
 
+def _profile_indexes(bm_nodes, free_node_caps):
+    """Index the nodes by profile and by possible profile.
+
+    :returns: tuple (profile -> node UUIDs, <profile>_profile capability ->
+              UUIDs of the available nodes without a profile and with the
+              capability set to true), the UUIDs in the order of bm_nodes.
+    """
+
+    by_profile = collections.defaultdict(list)
+    by_capability = collections.defaultdict(list)
+    for uu, caps in free_node_caps.items():
+        by_profile[caps.get('profile')].append(uu)
+        # use only nodes without a known profile, and do not assign
+        # profiles for active nodes
+        if (caps.get('profile') or
+                bm_nodes[uu].provision_state != 'available'):
+            continue
+        for key in caps:
+            if (key.endswith('_profile') and
+                    caps[key].lower() in ('1', 'true')):
+                by_capability[key].append(uu)
+    return by_profile, by_capability
+
+
+def _update_nodes_profile(bm_client, updates, workers):
+    """Save the profile of nodes, running the Ironic PATCHes concurrently.
+
+    :param updates: list of (node, profile) tuples.
+    :param workers: maximum number of concurrent requests.
+    """
+
+    if len(updates) < 2 or workers < 2:
+        for node, profile in updates:
+            node_add_capabilities(bm_client, node, profile=profile)
+        return
+    with futures.ThreadPoolExecutor(
+            max_workers=min(workers, len(updates))) as pool:
+        jobs = [pool.submit(node_add_capabilities, bm_client, node,
+                            profile=profile)
+                for node, profile in updates]
+    for job in jobs:
+        job.result()
+
+
 def assign_and_verify_profiles(bm_client, flavors,
-                               assign_profiles=False, dry_run=False):
+                               assign_profiles=False, dry_run=False,
+                               workers=constants.IRONIC_UPDATE_WORKERS):
     """Assign and verify profiles for given flavors.
 
     :param bm_client: ironic client instance
@@ -1134,6 +1825,8 @@ def assign_and_verify_profiles(bm_client, flavors,
     :param assign_profiles: whether to allow assigning profiles to nodes
     :param dry_run: whether to skip applying actual changes (only makes sense
                     if assign_profiles is True)
+    :param workers: maximum number of concurrent requests saving the
+                    profiles assigned
     :returns: tuple (errors count, warnings count)
     """
     log = logging.getLogger(__name__ + ".assign_and_verify_profiles")
@@ -1148,6 +1841,9 @@ def assign_and_verify_profiles(bm_client, flavors,
     # create a pool of unprocessed nodes and record their capabilities
     free_node_caps = {uu: node_get_capabilities(node)
                       for uu, node in bm_nodes.items()}
+    # index the pool once instead of scanning it for every flavor
+    by_profile, by_capability = _profile_indexes(bm_nodes, free_node_caps)
+    updates = []
 
     # TODO(dtantsur): use command-line arguments to specify the order in
     # which profiles are processed (might matter for assigning profiles)
@@ -1174,8 +1870,8 @@ def assign_and_verify_profiles(bm_client, flavors,
         profile_flavor_used = True
 
         # first collect nodes with known profiles
-        assigned_nodes = [uu for uu, caps in free_node_caps.items()
-                          if caps.get('profile') == profile]
+        assigned_nodes = [uu for uu in by_profile.get(profile, ())
+                          if uu in free_node_caps]
         required_count = scale - len(assigned_nodes)
 
         if required_count < 0:
@@ -1187,14 +1883,12 @@ def assign_and_verify_profiles(bm_client, flavors,
             # find more nodes by checking XXX_profile capabilities that are
             # set by ironic-inspector or manually
             capability = '%s_profile' % profile
-            more_nodes = [
-                uu for uu, caps in free_node_caps.items()
-                # use only nodes without a know profile
-                if not caps.get('profile') and
-                caps.get(capability, '').lower() in ('1', 'true') and
-                # do not assign profiles for active nodes
-                bm_nodes[uu].provision_state == 'available'
-            ][:required_count]
+            more_nodes = []
+            for uu in by_capability.get(capability, ()):
+                if len(more_nodes) == required_count:
+                    break
+                if uu in free_node_caps:
+                    more_nodes.append(uu)
             assigned_nodes.extend(more_nodes)
             required_count -= len(more_nodes)
 
@@ -1204,9 +1898,8 @@ def assign_and_verify_profiles(bm_client, flavors,
             # save profile for newly assigned nodes, but only if we
             # succeeded in finding enough of them
             if not required_count and not node_caps.get('profile'):
-                node = bm_nodes[uu]
                 if not dry_run:
-                    node_add_capabilities(bm_client, node, profile=profile)
+                    updates.append((bm_nodes[uu], profile))
                 log.info('Node %s was assigned profile %s', uu, profile)
             else:
                 log.debug('Node %s has profile %s', uu, profile)
@@ -1223,6 +1916,8 @@ def assign_and_verify_profiles(bm_client, flavors,
                 profile)
             predeploy_errors += 1
 
+    _update_nodes_profile(bm_client, updates, workers)
+
     nodes_without_profile = [uu for uu, caps in free_node_caps.items()
                              if not caps.get('profile')]
     if nodes_without_profile and profile_flavor_used:
@@ -1236,6 +1931,25 @@ def assign_and_verify_profiles(bm_client, flavors,
     return predeploy_errors, predeploy_warnings
 
 
+def positive_int(value):
+    """Argument type of the options taking a number greater than zero.
+
+    :param value: Value of the option.
+    :type value: String
+
+    :returns: Integer
+    """
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError(
+            _('%s is not a positive integer') % value)
+    return number
+
+
 def add_deployment_plan_arguments(parser, mark_as_depr=False):
     """Add deployment plan arguments (flavors and scales) to a parser"""
 
@@ -1303,17 +2017,15 @@ def get_roles_info(parsed_args):
     }
 
 
-def _csv_to_nodes_dict(nodes_csv):
-    """Convert CSV to a list of dicts formatted for os_cloud_config
+def _iter_csv_nodes(nodes_csv):
+    """Convert CSV rows to dicts formatted for os_cloud_config, lazily
 
-    Given a CSV file in the format below, convert it into the
+    Given a CSV file in the format below, yield the nodes in the
     structure expected by os_cloud_config JSON files.
 
     pm_type, pm_addr, pm_user, pm_password, mac
     """
 
-    data = []
-
     for row in csv.reader(nodes_csv):
         node = {
             "pm_user": row[2],
@@ -1330,27 +2042,186 @@ def _csv_to_nodes_dict(nodes_csv):
         except IndexError:
             pass
 
-        data.append(node)
+        yield node
 
-    return data
 
+def _csv_to_nodes_dict(nodes_csv):
+    """Convert CSV to a list of dicts formatted for os_cloud_config
+
+    Given a CSV file in the format below, convert it into the
+    structure expected by os_cloud_config JSON files.
+
+    pm_type, pm_addr, pm_user, pm_password, mac
+    """
+
+    return list(_iter_csv_nodes(nodes_csv))
+
+
+# Characters read at once from a JSON nodes file
+_JSON_CHUNK_SIZE = 65536
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONNodesReader(object):
+    """Incremental reader of the nodes of a JSON document.
+
+    The document is read by chunks and only the node being decoded is
+    buffered, instead of the whole document.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = simplejson.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self, size=_JSON_CHUNK_SIZE):
+        if self.eof:
+            return False
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what was already decoded
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """Return the next character which is not a whitespace."""
+
+        while True:
+            self.pos = _JSON_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                return ''
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise simplejson.JSONDecodeError(
+                'Expecting one of %r' % chars, self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def _value(self):
+        """Decode the next value, reading until it is complete."""
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except simplejson.JSONDecodeError:
+                # Read as much as buffered, the reads of a large value
+                # stay linear
+                if self._read(max(_JSON_CHUNK_SIZE,
+                                  len(self.buffer) - self.pos)):
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next
+            # chunk
+            if end == len(self.buffer) and self._read():
+                continue
+            self.pos = end
+            return value
+
+    def _items(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def nodes(self):
+        """Yield the nodes of the document.
+
+        The document is either the list of the nodes, or an object with
+        the list of the nodes under the "nodes" key.
+        """
+
+        found = False
+        if self._peek() == u'\ufeff':
+            self.pos += 1
+        if self._peek() == '[':
+            yield from self._items()
+            found = True
+        else:
+            self._expect('{')
+            if self._peek() == '}':
+                self.pos += 1
+            else:
+                while True:
+                    key = self._value()
+                    self._expect(':')
+                    if key == 'nodes' and self._peek() == '[' and not found:
+                        yield from self._items()
+                        found = True
+                    else:
+                        self._value()
+                    if self._expect(',}') == '}':
+                        break
+        if self._peek():
+            raise simplejson.JSONDecodeError('Extra data', self.buffer,
+                                             self.pos)
+        if not found:
+            raise exceptions.InvalidConfiguration(
+                _("No nodes found in %s") % self.stream.name)
+
+
+def iter_env_file(env_file, file_type=None):
+    """Yield the nodes of a nodes definition file.
+
+    The nodes of the JSON and CSV files are parsed one at a time while the
+    file is read. YAML files are parsed at once.
+
+    :param env_file: Nodes definition file.
+    :type env_file: File
+
+    :param file_type: Format of the file, json, yaml or csv. Guessed from
+                      the extension of the file when unset.
+    :type file_type: String
+
+    :returns: Iterator of the node dicts.
+    """
 
-def parse_env_file(env_file, file_type=None):
     if file_type == 'json' or env_file.name.endswith('.json'):
-        nodes_config = simplejson.load(env_file)
+        return _JSONNodesReader(env_file).nodes()
     elif file_type == 'csv' or env_file.name.endswith('.csv'):
-        nodes_config = _csv_to_nodes_dict(env_file)
-    elif env_file.name.endswith('.yaml'):
-        nodes_config = yaml.safe_load(env_file)
+        return _iter_csv_nodes(env_file)
+    elif file_type == 'yaml' or env_file.name.endswith('.yaml'):
+        # The C loader of PyYAML cannot compose part of a document, and
+        # is faster than composing the nodes one at a time in Python
+        nodes_config = yaml_utils.safe_load(env_file)
+        if isinstance(nodes_config, dict):
+            if 'nodes' not in nodes_config:
+                raise exceptions.InvalidConfiguration(
+                    _("No nodes found in %s") % env_file.name)
+            nodes_config = nodes_config['nodes']
+        return iter(nodes_config or [])
     else:
         raise exceptions.InvalidConfiguration(
             _("Invalid file extension for %s, must be json, yaml or csv") %
             env_file.name)
 
-    if 'nodes' in nodes_config:
-        nodes_config = nodes_config['nodes']
 
-    return nodes_config
+def parse_env_file(env_file, file_type=None):
+    """Return the nodes of a nodes definition file.
+
+    :param env_file: Nodes definition file.
+    :type env_file: File
+
+    :param file_type: Format of the file, json, yaml or csv. Guessed from
+                      the extension of the file when unset.
+    :type file_type: String
+
+    :returns: List of the node dicts.
+    """
+
+    return list(iter_env_file(env_file, file_type=file_type))
 
 
 def prompt_user_for_confirmation(message, logger, positive_response='y'):
@@ -1404,8 +2275,8 @@ def replace_links_in_template_contents(contents, link_replacement):
 
     template = {}
     try:
-        template = yaml.safe_load(contents)
-    except yaml.YAMLError:
+        template = yaml_utils.safe_load(contents)
+    except yaml_utils.YAMLError:
         return contents
 
     if not (isinstance(template, dict) and
@@ -1414,7 +2285,7 @@ def replace_links_in_template_contents(contents, link_replacement):
 
     template = replace_links_in_template(template, link_replacement)
 
-    return yaml.safe_dump(template)
+    return yaml_utils.safe_dump(template)
 
 
 def replace_links_in_template(template_part, link_replacement):
@@ -1481,12 +2352,91 @@ def get_config(clients, container, container_config):
 
     :param container: Container name to pull from.
     :type container: String.
+
+    :returns: Result of the action, an `actions.Result` on failure.
     """
 
     context = clients.tripleoclient.create_mistral_context()
     config_action = config.GetOvercloudConfig(
         container=container, container_config=container_config)
-    config_action.run(context=context)
+    return config_action.run(context=context)
+
+
+_CONFIG_CACHE_VERSION = 1
+# File of the config-download directory of a stack holding the key of the
+# configuration downloaded in it
+_CONFIG_CACHE_STAMP = '.tripleo-config-key'
+
+
+def config_cache_key(stack, container_config):
+    """Return the key of the configuration of a stack.
+
+    The configuration is generated from the stack, the key covers the
+    identity, the last change and the status of the stack so it changes
+    with every stack create or update.
+
+    :param stack: Heat Stack object
+    :type stack: Object
+
+    :param container_config: Name of the container of the configuration.
+    :type container_config: String
+
+    :returns: String
+    """
+
+    key = hashlib.sha256()
+    for item in (str(_CONFIG_CACHE_VERSION), stack.id,
+                 str(stack.updated_time or stack.creation_time),
+                 stack.stack_status, container_config):
+        key.update(six.text_type(item).encode('utf-8') + b'\0')
+    return key.hexdigest()
+
+
+def is_config_cached(work_dir, key):
+    """Return True when a config-download directory holds a configuration.
+
+    :param work_dir: config-download directory of the stack.
+    :type work_dir: String
+
+    :param key: Key of the configuration, see `config_cache_key`.
+    :type key: String
+
+    :returns: Boolean
+    """
+
+    try:
+        with open(os.path.join(work_dir, _CONFIG_CACHE_STAMP)) as f:
+            return f.read().strip() == key
+    except IOError:
+        return False
+
+
+def set_config_cache_key(work_dir, key=None):
+    """Record the key of the configuration of a config-download directory.
+
+    :param work_dir: config-download directory of the stack.
+    :type work_dir: String
+
+    :param key: Key of the configuration downloaded in work_dir, None when
+                the directory is about to change and must not be reused.
+    :type key: String
+    """
+
+    path = os.path.join(work_dir, _CONFIG_CACHE_STAMP)
+    if key is None:
+        try:
+            os.unlink(path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        return
+    if not os.path.isdir(work_dir):
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=work_dir,
+                                    prefix=_CONFIG_CACHE_STAMP)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key + '\n')
+    os.rename(tmp_path, path)
 
 
 def get_key(stack, needs_pair=False):
@@ -1527,12 +2477,142 @@ def get_key(stack, needs_pair=False):
         return
 
 
+_INVENTORY_CACHE_VERSION = 1
+# Number of static inventories kept in the cache, the least recently used
+# ones are removed first
+_INVENTORY_CACHE_SIZE = 16
+
+
+def _inventory_cache_key(stack, ssh_user, undercloud_connection, key_file,
+                         auth):
+    """Return the key of the static inventory of a stack in the cache.
+
+    The key covers the identity and the last change of the stack, and all
+    the settings written to the inventory, so it changes with every stack
+    create, update or delete.
+    """
+
+    key = hashlib.sha256()
+    for item in (str(_INVENTORY_CACHE_VERSION), stack.id,
+                 str(stack.updated_time or stack.creation_time),
+                 stack.stack_status, ssh_user, undercloud_connection,
+                 key_file or '', auth.auth_uri or '',
+                 auth.project_name or '', auth.user_name or '',
+                 auth.auth_cacert or ''):
+        key.update(six.text_type(item).encode('utf-8') + b'\0')
+    return key.hexdigest()
+
+
+def _prune_inventory_cache(cache_dir):
+    entries = sorted(glob.glob(os.path.join(cache_dir, '*.yaml')),
+                     key=os.path.getmtime, reverse=True)
+    for path in entries[_INVENTORY_CACHE_SIZE:]:
+        os.unlink(path)
+
+
+def _cached_tripleo_ansible_inventory(clients, ssh_user, stack,
+                                      undercloud_connection, cache_dir):
+    """Return the path of a static inventory generated in-process.
+
+    The inventory of a stack is generated once and then reused from
+    cache_dir until the stack changes.
+    """
+
+    heat = clients.orchestration
+    auth = clients.tripleoclient.create_mistral_context().security
+    key_file = get_key(stack=stack)
+
+    def _write_inventory(path):
+        tripleo_inventory.TripleoInventory(
+            hclient=heat,
+            auth_url=auth.auth_uri,
+            cacert=auth.auth_cacert,
+            project_name=auth.project_name,
+            username=auth.user_name,
+            ansible_ssh_user=ssh_user,
+            undercloud_key_file=key_file,
+            undercloud_connection=undercloud_connection,
+            plan_name=stack).write_static_inventory(path)
+
+    stack_obj = get_stack(heat, stack)
+    if stack_obj is None:
+        # Only the undercloud is in the inventory, nothing worth caching
+        inventory_file = os.path.join(constants.CLOUD_HOME_DIR,
+                                      'tripleo-ansible-inventory.yaml')
+        _write_inventory(inventory_file)
+        return inventory_file
+
+    key = _inventory_cache_key(stack_obj, ssh_user, undercloud_connection,
+                               key_file, auth)
+    inventory_file = os.path.join(cache_dir, key + '.yaml')
+    if os.path.exists(inventory_file):
+        LOG.debug('Using the cached inventory %s of stack %s'
+                  % (inventory_file, stack))
+        os.utime(inventory_file, None)
+        return inventory_file
+
+    makedirs(cache_dir)
+    # The inventory holds the overcloud admin password, the temporary
+    # file is only readable by its owner
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.yaml',
+                                     delete=False) as f:
+        pass
+    try:
+        _write_inventory(f.name)
+        os.rename(f.name, inventory_file)
+    except Exception:
+        os.unlink(f.name)
+        raise
+    LOG.debug('Cached the inventory %s of stack %s'
+              % (inventory_file, stack))
+    _prune_inventory_cache(cache_dir)
+    return inventory_file
+
+
 def get_tripleo_ansible_inventory(inventory_file=None,
                                   ssh_user='tripleo-admin',
                                   stack='overcloud',
                                   undercloud_connection='ssh',
-                                  return_inventory_file_path=False):
-    if not inventory_file:
+                                  return_inventory_file_path=False,
+                                  clients=None,
+                                  cache_dir=constants.INVENTORY_CACHE_DIR):
+    """Return the static inventory of a stack or its path.
+
+    :param inventory_file: Existing inventory to use, an inventory is
+                           generated when not set.
+    :type inventory_file: String
+
+    :param ssh_user: SSH user of the overcloud nodes.
+    :type ssh_user: String
+
+    :param stack: Name of the stack.
+    :type stack: String
+
+    :param undercloud_connection: Ansible connection to the undercloud,
+                                  'ssh' or 'local'.
+    :type undercloud_connection: String
+
+    :param return_inventory_file_path: Return the path of the inventory
+                                       instead of its content.
+    :type return_inventory_file_path: Boolean
+
+    :param clients: Application client object. The inventory is generated
+                    in-process and cached until the stack changes when set,
+                    by the tripleo-ansible-inventory command otherwise.
+    :type clients: Object
+
+    :param cache_dir: Directory of the cached inventories.
+    :type cache_dir: String
+    """
+
+    if not inventory_file and clients is not None:
+        try:
+            inventory_file = _cached_tripleo_ansible_inventory(
+                clients, ssh_user, stack, undercloud_connection, cache_dir)
+        except Exception as e:
+            message = _("Failed to generate inventory: %s") % str(e)
+            raise exceptions.InvalidConfiguration(message)
+    elif not inventory_file:
         inventory_file = os.path.join(
             constants.CLOUD_HOME_DIR,
             'tripleo-ansible-inventory.yaml'
@@ -1561,17 +2641,224 @@ def get_tripleo_ansible_inventory(inventory_file=None,
             "Inventory file %s can not be found.") % inventory_file)
 
 
-def cleanup_tripleo_ansible_inventory_file(path):
-    """Remove the static tripleo-ansible-inventory file from disk"""
+def cleanup_tripleo_ansible_inventory_file(
+        path, cache_dir=constants.INVENTORY_CACHE_DIR):
+    """Remove the static tripleo-ansible-inventory file from disk
+
+    The cached inventories are kept for the next commands.
+    """
+    if os.path.dirname(os.path.abspath(path)) == os.path.abspath(cache_dir):
+        return
     if os.path.exists(path):
         processutils.execute('/usr/bin/rm', '-f', path)
 
 
-def process_multiple_environments(created_env_files, tht_root,
-                                  user_tht_root, cleanup=True):
+_ENVIRONMENT_CACHE_VERSION = 2
+# Number of processed environments kept in the cache, the least recently
+# used ones are removed first
+_ENVIRONMENT_CACHE_SIZE = 256
+# Placeholder for tht_root in the cached environments, the templates are
+# usually staged in a new temporary directory by each deployment.
+_THT_ROOT_PLACEHOLDER = '@@THT_ROOT@@'
+
+
+def _json_tht_root(tht_root):
+    # tht_root as it appears in the JSON strings
+    return json.dumps(tht_root.rstrip('/'))[1:-1]
+
+
+def _strip_tht_root(data, tht_root):
+    """Replace tht_root by its placeholder in a JSON document.
+
+    Only whole path components are replaced, the siblings of tht_root
+    sharing its prefix are left alone.
+    """
+
+    pattern = re.escape(_json_tht_root(tht_root)) + r'(?![^/\\"])'
+    return re.sub(pattern, lambda m: _THT_ROOT_PLACEHOLDER, data)
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _environment_cache_key(env_path, tht_root, user_tht_root):
+    """Return the key of a processed environment file in the cache.
+
+    The key covers the content of the file, its location relative to
+    tht_root and user_tht_root.
+    """
+
+    key = hashlib.sha256()
+    for item in (str(_ENVIRONMENT_CACHE_VERSION), _file_digest(env_path),
+                 _strip_tht_root(json.dumps(os.path.abspath(env_path)),
+                                 tht_root),
+                 user_tht_root):
+        key.update(item.encode('utf-8') + b'\0')
+    return key.hexdigest()
+
+
+def _url_to_path(url):
+    if not url.startswith('file://'):
+        return None
+    return request.url2pathname(url[len('file://'):])
+
+
+def _load_cached_environment(cache_dir, key, tht_root):
+    """Return the cached (files, env) tuple or None.
+
+    An entry is only used when every file it references still has the
+    content it had when the entry was stored.
+    """
+
+    cache_file = os.path.join(cache_dir, key + '.json')
+    try:
+        with open(cache_file) as f:
+            entry = json.loads(f.read().replace(_THT_ROOT_PLACEHOLDER,
+                                                _json_tht_root(tht_root)))
+        for url, digest in entry['digests'].items():
+            if _file_digest(_url_to_path(url)) != digest:
+                LOG.debug('Cached environment %s is stale, %s changed'
+                          % (cache_file, url))
+                return None
+        os.utime(cache_file, None)
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+    files = {}
+    for url, content in entry['files'].items():
+        if 'base64' in content:
+            files[url] = base64.b64decode(content['base64'])
+        else:
+            files[url] = content['text']
+    return files, entry['env']
+
+
+def _prune_environment_cache(cache_dir):
+    entries = sorted(glob.glob(os.path.join(cache_dir, '*.json')),
+                     key=os.path.getmtime, reverse=True)
+    for path in entries[_ENVIRONMENT_CACHE_SIZE:]:
+        os.unlink(path)
+
+
+def _store_cached_environment(cache_dir, key, tht_root, files, env):
+    """Store a processed environment in the cache, best effort."""
+
+    try:
+        paths = dict((url, _url_to_path(url)) for url in files)
+        if None in paths.values():
+            # Only local files can be validated
+            return
+        # Keys which are not strings would not survive the cache
+        if json.loads(json.dumps(env)) != env:
+            return
+        entry = {
+            'env': env,
+            'files': {},
+            'digests': dict(
+                (url, _file_digest(path)) for url, path in paths.items())
+        }
+        for url, content in files.items():
+            if isinstance(content, six.binary_type):
+                entry['files'][url] = {
+                    'base64': base64.b64encode(content).decode('ascii')}
+            else:
+                entry['files'][url] = {'text': content}
+        data = _strip_tht_root(json.dumps(entry), tht_root)
+        makedirs(cache_dir)
+        with tempfile.NamedTemporaryFile(mode='w', dir=cache_dir,
+                                         delete=False) as f:
+            f.write(data)
+        os.rename(f.name, os.path.join(cache_dir, key + '.json'))
+        _prune_environment_cache(cache_dir)
+    except (IOError, OSError, TypeError, ValueError) as e:
+        LOG.debug('Unable to cache processed environment: %s' % e)
+
+
+def _process_environment_file(env_path, abs_env_path, tht_root,
+                              user_tht_root, cleanup, log):
+    try:
+        files, env = template_utils.process_environment_and_files(
+            env_path=env_path)
+    except hc_exc.CommandError as ex:
+        # This provides fallback logic so that we can reference files
+        # inside the resource_registry values that may be rendered via
+        # j2.yaml templates, where the above will fail because the
+        # file doesn't exist in user_tht_root, but it is in tht_root
+        # See bug https://bugs.launchpad.net/tripleo/+bug/1625783
+        # for details on why this is needed (backwards-compatibility)
+        log.debug("Error %s processing environment file %s"
+                  % (six.text_type(ex), env_path))
+        # Use the temporary path as it's possible the environment
+        # itself was rendered via jinja.
+        with open(env_path, 'r') as f:
+            env_map = yaml_utils.safe_load(f)
+        env_registry = env_map.get('resource_registry', {})
+        env_dirname = os.path.dirname(os.path.abspath(env_path))
+        for rsrc, rsrc_path in six.iteritems(env_registry):
+            # We need to calculate the absolute path relative to
+            # env_path not cwd (which is what abspath uses).
+            abs_rsrc_path = os.path.normpath(
+                os.path.join(env_dirname, rsrc_path))
+            # If the absolute path matches user_tht_root, rewrite
+            # a temporary environment pointing at tht_root instead
+            if (abs_rsrc_path.startswith(user_tht_root) and
+                ((user_tht_root + '/') in abs_rsrc_path or
+                 abs_rsrc_path == user_tht_root)):
+                new_rsrc_path = abs_rsrc_path.replace(
+                    user_tht_root + '/', tht_root + '/')
+                log.debug("Rewriting %s %s path to %s"
+                          % (env_path, rsrc, new_rsrc_path))
+                env_registry[rsrc] = new_rsrc_path
+            else:
+                # Skip any resources that are mapping to OS::*
+                # resource names as these aren't paths
+                if not rsrc_path.startswith("OS::"):
+                    env_registry[rsrc] = abs_rsrc_path
+        env_map['resource_registry'] = env_registry
+        f_name = os.path.basename(os.path.splitext(abs_env_path)[0])
+        with tempfile.NamedTemporaryFile(dir=tht_root,
+                                         prefix="env-%s-" % f_name,
+                                         suffix=".yaml",
+                                         mode="w",
+                                         delete=cleanup) as f:
+            log.debug("Rewriting %s environment to %s"
+                      % (env_path, f.name))
+            f.write(yaml_utils.safe_dump(env_map, default_flow_style=False))
+            f.flush()
+            files, env = template_utils.process_environment_and_files(
+                env_path=f.name)
+    return files, env
+
+
+def load_multiple_environments(created_env_files, tht_root,
+                               user_tht_root, cleanup=True,
+                               cache_dir=None, layers=None):
+    """Process environment files into the layers of an environment.
+
+    The environments are not merged, see `process_multiple_environments`
+    for the merged environment.
+
+    :param cache_dir: Directory caching the processed environment files.
+                      Iterative deployments then skip the parsing of the
+                      environments and templates which did not change.
+                      Disabled when unset.
+    :type cache_dir: String
+
+    :param layers: Layers the environments are added on top of, a new
+                   `LayeredEnvironment` when unset.
+    :type layers: `environment_merge.LayeredEnvironment`
+
+    :returns: Tuple (env_files, layers)
+    """
+
     log = logging.getLogger(__name__ + ".process_multiple_environments")
     env_files = {}
-    localenv = {}
+    if layers is None:
+        layers = environment_merge.LayeredEnvironment()
     # Normalize paths for full match checks
     user_tht_root = os.path.normpath(user_tht_root)
     tht_root = os.path.normpath(tht_root)
@@ -1588,65 +2875,48 @@ def process_multiple_environments(created_env_files, tht_root,
             log.debug("Redirecting env file %s to %s"
                       % (abs_env_path, new_env_path))
             env_path = new_env_path
-        try:
-            files, env = template_utils.process_environment_and_files(
-                env_path=env_path)
-        except hc_exc.CommandError as ex:
-            # This provides fallback logic so that we can reference files
-            # inside the resource_registry values that may be rendered via
-            # j2.yaml templates, where the above will fail because the
-            # file doesn't exist in user_tht_root, but it is in tht_root
-            # See bug https://bugs.launchpad.net/tripleo/+bug/1625783
-            # for details on why this is needed (backwards-compatibility)
-            log.debug("Error %s processing environment file %s"
-                      % (six.text_type(ex), env_path))
-            # Use the temporary path as it's possible the environment
-            # itself was rendered via jinja.
-            with open(env_path, 'r') as f:
-                env_map = yaml.safe_load(f)
-            env_registry = env_map.get('resource_registry', {})
-            env_dirname = os.path.dirname(os.path.abspath(env_path))
-            for rsrc, rsrc_path in six.iteritems(env_registry):
-                # We need to calculate the absolute path relative to
-                # env_path not cwd (which is what abspath uses).
-                abs_rsrc_path = os.path.normpath(
-                    os.path.join(env_dirname, rsrc_path))
-                # If the absolute path matches user_tht_root, rewrite
-                # a temporary environment pointing at tht_root instead
-                if (abs_rsrc_path.startswith(user_tht_root) and
-                    ((user_tht_root + '/') in abs_rsrc_path or
-                     abs_rsrc_path == user_tht_root)):
-                    new_rsrc_path = abs_rsrc_path.replace(
-                        user_tht_root + '/', tht_root + '/')
-                    log.debug("Rewriting %s %s path to %s"
-                              % (env_path, rsrc, new_rsrc_path))
-                    env_registry[rsrc] = new_rsrc_path
-                else:
-                    # Skip any resources that are mapping to OS::*
-                    # resource names as these aren't paths
-                    if not rsrc_path.startswith("OS::"):
-                        env_registry[rsrc] = abs_rsrc_path
-            env_map['resource_registry'] = env_registry
-            f_name = os.path.basename(os.path.splitext(abs_env_path)[0])
-            with tempfile.NamedTemporaryFile(dir=tht_root,
-                                             prefix="env-%s-" % f_name,
-                                             suffix=".yaml",
-                                             mode="w",
-                                             delete=cleanup) as f:
-                log.debug("Rewriting %s environment to %s"
-                          % (env_path, f.name))
-                f.write(yaml.safe_dump(env_map, default_flow_style=False))
-                f.flush()
-                files, env = template_utils.process_environment_and_files(
-                    env_path=f.name)
+        cache_key = None
+        cached = None
+        if cache_dir:
+            try:
+                cache_key = _environment_cache_key(env_path, tht_root,
+                                                   user_tht_root)
+            except (IOError, OSError):
+                pass
+            else:
+                cached = _load_cached_environment(cache_dir, cache_key,
+                                                  tht_root)
+        if cached is not None:
+            log.debug("Using cached processed environment %s" % env_path)
+            files, env = cached
+        else:
+            files, env = _process_environment_file(
+                env_path, abs_env_path, tht_root, user_tht_root, cleanup,
+                log)
+            if cache_key:
+                _store_cached_environment(cache_dir, cache_key, tht_root,
+                                          files, env)
         if files:
             log.debug("Adding files %s for %s" % (files, env_path))
             env_files.update(files)
+        layers.add(env, env_path)
+    return env_files, layers
 
-        # 'env' can be a deeply nested dictionary, so a simple update is
-        # not enough
-        localenv = template_utils.deep_update(localenv, env)
-    return env_files, localenv
+
+def process_multiple_environments(created_env_files, tht_root,
+                                  user_tht_root, cleanup=True,
+                                  cache_dir=None):
+    """Process and merge environment files.
+
+    See `load_multiple_environments` for the parameters.
+
+    :returns: Tuple (env_files, env)
+    """
+
+    env_files, layers = load_multiple_environments(
+        created_env_files, tht_root, user_tht_root, cleanup=cleanup,
+        cache_dir=cache_dir)
+    return env_files, layers.materialise()
 
 
 def parse_extra_vars(extra_var_strings):
@@ -1674,8 +2944,8 @@ def parse_extra_vars(extra_var_strings):
         invalid_yaml = False
 
         try:
-            parse_vars = yaml.safe_load(extra_var_string)
-        except yaml.YAMLError:
+            parse_vars = yaml_utils.safe_load(extra_var_string)
+        except yaml_utils.YAMLError:
             invalid_yaml = True
 
         if invalid_yaml or not isinstance(parse_vars, dict):
@@ -1901,7 +3171,7 @@ def fetch_roles_file(roles_file, tht_path=constants.TRIPLEO_HEAT_TEMPLATES):
     if not roles_file:
         return None
     with open(rel_or_abs_path(roles_file, tht_path)) as f:
-        return yaml.safe_load(f)
+        return yaml_utils.safe_load(f)
 
 
 def load_config(osloconf, path):
@@ -1999,47 +3269,111 @@ def _candidate_files(node, call):
     yield call()
 
 
+class DeployImageIndex(object):
+    """Deploy kernels and ramdisks of the HTTP boot directory.
+
+    The most specific images of an architecture and platform combination
+    are looked up once, the nodes sharing the combination reuse them.
+
+    :param http_boot: HTTP boot directory of Ironic.
+    :type http_boot: String
+    """
+
+    def __init__(self, http_boot=constants.IRONIC_HTTP_BOOT_BIND_MOUNT):
+        self.http_boot = http_boot
+        self._images = {}
+
+    def find(self, call, arch=None, platform=None):
+        """Return the most specific image of an architecture and platform.
+
+        :param call: Image name helper, `deploy_kernel` or `deploy_ramdisk`.
+        :type call: Callable
+
+        :param arch: Architecture of the node.
+        :type arch: String
+
+        :param platform: Platform of the node.
+        :type platform: String
+
+        :returns: Tuple (URL of the image, None when none exists, names of
+                  the candidate images).
+        """
+
+        if not arch:
+            # A platform is only specific to an architecture
+            platform = None
+        key = (call, arch, platform)
+        if key not in self._images:
+            candidates = list(_candidate_files(
+                {'arch': arch, 'platform': platform}, call))
+            for name in candidates:
+                if os.path.exists(os.path.join(self.http_boot, name)):
+                    image = 'file://%s/%s' % (self.http_boot, name)
+                    break
+            else:
+                image = None
+            self._images[key] = (image, candidates)
+        return self._images[key]
+
+    def find_specific(self, call, arch=None, platform=None):
+        """Return the image of an architecture and platform.
+
+        :param call: Image name helper, `deploy_kernel` or `deploy_ramdisk`.
+        :type call: Callable
+
+        :param arch: Architecture of the node.
+        :type arch: String
+
+        :param platform: Platform of the node.
+        :type platform: String
+
+        :returns: URL of the image, None when only the generic image exists.
+        """
+
+        image, candidates = self.find(call, arch, platform)
+        if image == 'file://%s/%s' % (self.http_boot, candidates[-1]):
+            return None
+        return image
+
+
 def update_nodes_deploy_data(nodes,
-                             http_boot=constants.IRONIC_HTTP_BOOT_BIND_MOUNT):
+                             http_boot=constants.IRONIC_HTTP_BOOT_BIND_MOUNT,
+                             deploy_images=None):
     """Add specific kernel and ramdisk IDs to a node.
 
     Look at all images and update node data with the most specific
     deploy_kernel and deploy_ramdisk for the architecture/platform combination.
+
+    :param deploy_images: Images of the HTTP boot directory, shared with
+                          other lookups.
+    :type deploy_images: `DeployImageIndex`
     """
+    if deploy_images is None:
+        deploy_images = DeployImageIndex(http_boot)
+    http_boot = deploy_images.http_boot
+
     for node in nodes:
 
         # NOTE(tonyb): Check to see if we have a specific kernel for this node
         # and use that. Fall back to the generic image.
         if 'kernel_id' not in node:
-            kernel_locations = list(_candidate_files(node, deploy_kernel))
-
-            for kernel in kernel_locations:
-                path = os.path.join(http_boot, kernel)
-                if os.path.exists(path):
-                    node['kernel_id'] = 'file://%s/%s' % (
-                        http_boot,
-                        kernel)
-                    break
-            else:
+            kernel, kernel_locations = deploy_images.find(
+                deploy_kernel, node.get('arch'), node.get('platform'))
+            if kernel is None:
                 raise RuntimeError('No kernel image provided and none of %s '
                                    'found in %s' % (kernel_locations,
                                                     http_boot))
+            node['kernel_id'] = kernel
 
         # NOTE(tonyb): As above except for ramdisks
         if 'ramdisk_id' not in node:
-            ramdisk_locations = list(_candidate_files(node, deploy_ramdisk))
-
-            for ramdisk in ramdisk_locations:
-                path = os.path.join(http_boot, ramdisk)
-                if os.path.exists(path):
-                    node['ramdisk_id'] = 'file://%s/%s' % (
-                        http_boot,
-                        ramdisk)
-                    break
-            else:
+            ramdisk, ramdisk_locations = deploy_images.find(
+                deploy_ramdisk, node.get('arch'), node.get('platform'))
+            if ramdisk is None:
                 raise RuntimeError('No ramdisk image provided and none of %s '
                                    'found in %s' % (ramdisk_locations,
                                                     http_boot))
+            node['ramdisk_id'] = ramdisk
 
 
 def get_deployment_python_interpreter(parsed_args):
@@ -2226,7 +3560,7 @@ def read_validation_groups_file(groups_file_path=None):
         return []
 
     with open(groups_file_path, 'r') as grps:
-        contents = yaml.safe_load(grps)
+        contents = yaml_utils.safe_load(grps)
 
     return contents
 
@@ -2267,7 +3601,7 @@ def parse_all_validations_on_disk(path, groups=None):
         validation_id, _ext = os.path.splitext(os.path.basename(pl))
 
         with open(pl, 'r') as val_playbook:
-            contents = yaml.safe_load(val_playbook)
+            contents = yaml_utils.safe_load(val_playbook)
 
         validation_groups = get_validation_metadata(contents, 'groups') or []
         if not groups or set.intersection(set(groups), set(validation_groups)):
@@ -2336,10 +3670,10 @@ def get_validations_json(validations_data):
 
 def get_validations_yaml(validations_data):
     """Return the validations information as a pretty printed yaml """
-    return yaml.safe_dump(validations_data,
-                          allow_unicode=True,
-                          default_flow_style=False,
-                          indent=2)
+    return yaml_utils.safe_dump(validations_data,
+                                allow_unicode=True,
+                                default_flow_style=False,
+                                indent=2)
 
 
 def get_new_validations_logs_on_disk():
@@ -2415,7 +3749,7 @@ def check_file_for_enabled_service(env_file):
     """
     if os.path.exists(env_file):
         with open(env_file, "r") as f:
-            content = yaml.safe_load(f)
+            content = yaml_utils.safe_load(f)
         deprecated_services_enabled = []
         for service in constants.DEPRECATED_SERVICES.keys():
             try:
@@ -2553,7 +3887,7 @@ def update_deployment_status(clients, plan, status):
     swift.put_object(
         container,
         'deployment_status.yaml',
-        yaml.safe_dump(
+        yaml_utils.safe_dump(
             {
                 'deployment_status': status,
                 'workflow_status': {
@@ -2567,3 +3901,33 @@ def update_deployment_status(clients, plan, status):
             default_flow_style=False
         )
     )
+
+
+def swift_connection_factory(swift_client):
+    """Return a callable creating connections to the same Swift endpoint.
+
+    A swiftclient connection must not be shared between threads. The
+    returned callable, suitable for swiftclient's
+    `ConnectionThreadPoolExecutor`, hands out the given connection first
+    and then copies of it using the same endpoint and token.
+
+    :param swift_client: Swift connection to copy.
+    :type swift_client: `swiftclient.client.Connection`
+
+    :returns: Callable
+    """
+
+    connections = [swift_client]
+
+    def _create_connection():
+        if connections:
+            return connections.pop()
+        return swift_client_lib.Connection(
+            preauthurl=swift_client.url,
+            preauthtoken=swift_client.token,
+            insecure=swift_client.insecure,
+            cacert=swift_client.cacert,
+            timeout=swift_client.timeout,
+            retries=swift_client.retries)
+
+    return _create_connection
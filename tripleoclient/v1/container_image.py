@@ -29,7 +29,6 @@ from osc_lib import exceptions as oscexc
 from osc_lib.i18n import _
 import six
 from six.moves.urllib import parse
-import yaml
 
 from tripleo_common.image.builder import buildah
 from tripleo_common.image import image_uploader
@@ -40,6 +39,7 @@ from tripleoclient import command
 from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 
 
 def build_env_file(params, command_options):
@@ -50,8 +50,8 @@ def build_env_file(params, command_options):
     f.write('#   openstack %s\n#\n\n' %
             ' '.join(command_options))
 
-    yaml.safe_dump({'parameter_defaults': params}, f,
-                   default_flow_style=False)
+    yaml_utils.safe_dump({'parameter_defaults': params}, f,
+                         default_flow_style=False)
     return f.getvalue()
 
 
@@ -234,7 +234,7 @@ class BuildImage(command.Command):
             bb.build_all()
         elif parsed_args.list_dependencies:
             deps = json.loads(result)
-            yaml.safe_dump(
+            yaml_utils.safe_dump(
                 deps,
                 self.app.stdout,
                 indent=2,
@@ -244,7 +244,7 @@ class BuildImage(command.Command):
             deps = json.loads(result)
             images = []
             BuildImage.images_from_deps(images, deps)
-            yaml.safe_dump(
+            yaml_utils.safe_dump(
                 images,
                 self.app.stdout,
                 default_flow_style=False
@@ -461,7 +461,7 @@ class PrepareImageFiles(command.Command):
             append_tag = time.strftime('-modified-%Y%m%d%H%M%S')
         if parsed_args.modify_vars:
             with open(parsed_args.modify_vars) as m:
-                modify_vars = yaml.safe_load(m.read())
+                modify_vars = yaml_utils.safe_load(m.read())
 
         prepare_data = kolla_builder.container_images_prepare(
             excludes=parsed_args.excludes,
@@ -490,8 +490,8 @@ class PrepareImageFiles(command.Command):
                              build_env_file(params, self.app.command_options))
 
         result = prepare_data[output_images_file]
-        result_str = yaml.safe_dump({'container_images': result},
-                                    default_flow_style=False)
+        result_str = yaml_utils.safe_dump({'container_images': result},
+                                          default_flow_style=False)
         sys.stdout.write(result_str)
 
         if parsed_args.output_images_file:
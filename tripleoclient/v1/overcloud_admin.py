@@ -71,6 +71,21 @@ class Authorize(command.Command):
             type=int,
             default=constants.ENABLE_SSH_ADMIN_SSH_PORT_TIMEOUT
         )
+        parser.add_argument(
+            '--overcloud-ssh-batch-size',
+            help=_('Number of overcloud nodes the ssh admin access is '
+                   'enabled on at once. The nodes are all enabled at once '
+                   'when not specified.'),
+            type=int,
+            default=None
+        )
+        parser.add_argument(
+            '--overcloud-ssh-retries',
+            help=_('Number of times the ssh admin access is retried on the '
+                   'nodes where it failed or which were unreachable.'),
+            type=int,
+            default=constants.ENABLE_SSH_ADMIN_RETRIES
+        )
 
         return parser
 
@@ -85,5 +100,7 @@ class Authorize(command.Command):
             parsed_args.overcloud_ssh_user,
             self.get_key_pair(parsed_args),
             parsed_args.overcloud_ssh_port_timeout,
-            verbosity=oooutils.playbook_verbosity(self=self)
+            verbosity=oooutils.playbook_verbosity(self=self),
+            batch_size=parsed_args.overcloud_ssh_batch_size,
+            retries=parsed_args.overcloud_ssh_retries
         )
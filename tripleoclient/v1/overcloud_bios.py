@@ -17,10 +17,10 @@ import logging
 import os
 
 from osc_lib.i18n import _
-import yaml
 
 from tripleoclient import command
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 from tripleoclient.workflows import baremetal
 
 
@@ -53,11 +53,11 @@ class ConfigureBIOS(command.Command):
 
         if os.path.exists(parsed_args.configuration):
             with open(parsed_args.configuration, 'r') as fp:
-                configuration = yaml.safe_load(fp.read())
+                configuration = yaml_utils.safe_load(fp.read())
         else:
             try:
-                configuration = yaml.safe_load(parsed_args.configuration)
-            except yaml.YAMLError as exc:
+                configuration = yaml_utils.safe_load(parsed_args.configuration)
+            except yaml_utils.YAMLError as exc:
                 raise RuntimeError(
                     _('Configuration is not an existing file and cannot be '
                       'parsed as YAML: %s') % exc)
@@ -15,7 +15,6 @@ from __future__ import print_function
 from datetime import datetime
 import logging
 import os.path
-import yaml
 
 from osc_lib.i18n import _
 from osc_lib import utils
@@ -23,6 +22,7 @@ from osc_lib import utils
 from tripleoclient import command
 from tripleoclient import exceptions
 from tripleoclient import export
+from tripleoclient import yaml_utils
 
 
 MISTRAL_VAR = os.environ.get('MISTRAL_VAR',
@@ -98,7 +98,7 @@ class ExportCell(command.Command):
 
         # write the exported data
         with open(output_file, 'w') as f:
-            yaml.safe_dump(data, f, default_flow_style=False)
+            yaml_utils.safe_dump(data, f, default_flow_style=False)
 
         print("Cell input information exported to %s." % output_file)
 
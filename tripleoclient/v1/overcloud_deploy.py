@@ -26,23 +26,38 @@ import six
 import subprocess
 import tempfile
 import time
-import yaml
 
 from heatclient.common import template_utils
 from osc_lib import exceptions as oscexc
 from osc_lib.i18n import _
+from swiftclient import multithreading
 from swiftclient.exceptions import ClientException
 from tripleo_common import update
 
+from tripleoclient import ansible_profile
 from tripleoclient import command
 from tripleoclient import constants
+from tripleoclient import environment_merge
 from tripleoclient import exceptions
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 from tripleoclient.workflows import deployment
 from tripleoclient.workflows import parameters as workflow_params
 from tripleoclient.workflows import plan_management
 
 
+def _download_plan_file(connection, plan_name, name, file_path):
+    """Stream a plan object to a local file"""
+
+    _headers, body = connection.get_object(plan_name, name,
+                                           resp_chunk_size=65536)
+    # open in binary as the swiftclient get/put error under
+    # python3 if opened as Text I/O
+    with open(file_path, 'wb') as f:
+        for chunk in body:
+            f.write(chunk)
+
+
 class DeployOvercloud(command.Command):
     """Deploy Overcloud"""
 
@@ -83,7 +98,7 @@ class DeployOvercloud(command.Command):
         # Update parameters from answers file:
         if args.answers_file is not None:
             with open(args.answers_file, 'r') as answers_file:
-                answers = yaml.safe_load(answers_file)
+                answers = yaml_utils.safe_load(answers_file)
 
             if args.templates is None:
                 args.templates = answers['templates']
@@ -160,7 +175,7 @@ class DeployOvercloud(command.Command):
                                 container_name):
         # We write the env_map to the local /tmp tht_root and also
         # to the swift plan container.
-        contents = yaml.safe_dump(env_map, default_flow_style=False)
+        contents = yaml_utils.safe_dump(env_map, default_flow_style=False)
         user_env_path = self._user_env_path(abs_env_path, tht_root)
         self.log.debug("user_env_path=%s" % user_env_path)
         with open(user_env_path, 'w') as f:
@@ -172,7 +187,7 @@ class DeployOvercloud(command.Command):
             swift_path = "user-environments/{}".format(abs_env_path[1:])
         else:
             swift_path = "user-environments/{}".format(abs_env_path)
-        contents = yaml.safe_dump(env_map, default_flow_style=False)
+        contents = yaml_utils.safe_dump(env_map, default_flow_style=False)
         self.log.debug("Uploading %s to swift at %s"
                        % (abs_env_path, swift_path))
         self.object_client.put_object(container_name, swift_path, contents)
@@ -275,7 +290,7 @@ class DeployOvercloud(command.Command):
         # Parameters are removed from the environment
         params = env.pop('parameter_defaults', None)
 
-        contents = yaml.safe_dump(env, default_flow_style=False)
+        contents = yaml_utils.safe_dump(env, default_flow_style=False)
 
         # Until we have a well defined plan update workflow in tripleo-common
         # we need to manually add an environment in swift and for users
@@ -285,13 +300,13 @@ class DeployOvercloud(command.Command):
         swift_path = "user-environment.yaml"
         self.object_client.put_object(container_name, swift_path, contents)
 
-        env = yaml.safe_load(self.object_client.get_object(
+        env = yaml_utils.safe_load(self.object_client.get_object(
             container_name, constants.PLAN_ENVIRONMENT)[1])
 
         user_env = {'path': swift_path}
         if user_env not in env['environments']:
             env['environments'].append(user_env)
-            yaml_string = yaml.safe_dump(env, default_flow_style=False)
+            yaml_string = yaml_utils.safe_dump(env, default_flow_style=False)
             self.object_client.put_object(
                 container_name, constants.PLAN_ENVIRONMENT, yaml_string)
 
@@ -353,23 +368,40 @@ class DeployOvercloud(command.Command):
 
         return file_relocation
 
-    def _download_missing_files_from_plan(self, tht_dir, plan_name):
+    def _download_missing_files_from_plan(
+            self, tht_dir, plan_name,
+            workers=constants.PLAN_TRANSFER_WORKERS):
         # get and download missing files into tmp directory
-        plan_list = self.object_client.get_container(plan_name)
-        plan_filenames = [f['name'] for f in plan_list[1]]
-        for pf in plan_filenames:
+        plan_list = self.object_client.get_container(plan_name,
+                                                     full_listing=True)
+        missing_files = []
+        for pf in [f['name'] for f in plan_list[1]]:
             file_path = os.path.join(tht_dir, pf)
             if not os.path.isfile(file_path):
                 self.log.debug("Missing in templates directory, downloading \
                                %s from swift into %s" % (pf, file_path))
-                utils.makedirs(os.path.dirname(file_path))
-                # open in binary as the swiftclient get/put error under
-                # python3 if opened as Text I/O
-                with open(file_path, 'wb') as f:
-                    f.write(self.object_client.get_object(plan_name, pf)[1])
+                missing_files.append((pf, file_path))
+        if not missing_files:
+            return
+
+        for dir_path in sorted(set(os.path.dirname(file_path)
+                                   for _, file_path in missing_files)):
+            utils.makedirs(dir_path)
+
+        create_connection = utils.swift_connection_factory(self.object_client)
+        with multithreading.ConnectionThreadPoolExecutor(
+                create_connection,
+                max(min(workers, len(missing_files)), 1)) as executor:
+            futures = [
+                executor.submit(_download_plan_file, plan_name, pf,
+                                file_path)
+                for pf, file_path in missing_files
+            ]
+            for future in futures:
+                future.result()
 
     def _deploy_tripleo_heat_templates_tmpdir(self, stack, parsed_args):
-        # copy tht_root to temporary directory because we need to
+        # stage tht_root in a temporary directory because we need to
         # download any missing (e.g j2 rendered) files from the plan
         tht_root = os.path.abspath(parsed_args.templates)
         tht_tmp = tempfile.mkdtemp(prefix='tripleoclient-')
@@ -377,7 +409,7 @@ class DeployOvercloud(command.Command):
         self.log.debug("Creating temporary templates tree in %s"
                        % new_tht_root)
         try:
-            shutil.copytree(tht_root, new_tht_root, symlinks=True)
+            utils.stage_templates_dir(tht_root, new_tht_root)
             self._deploy_tripleo_heat_templates(stack, parsed_args,
                                                 new_tht_root, tht_root)
         finally:
@@ -420,13 +452,14 @@ class DeployOvercloud(command.Command):
 
         # Get any missing (e.g j2 rendered) files from the plan to tht_root
         self._download_missing_files_from_plan(
-            tht_root, parsed_args.stack)
+            tht_root, parsed_args.stack,
+            workers=parsed_args.plan_transfer_workers)
 
         print("Processing templates in the directory {0}".format(
             os.path.abspath(tht_root)))
 
         self.log.debug("Creating Environment files")
-        env = {}
+        layers = environment_merge.LayeredEnvironment()
         created_env_files = []
 
         created_env_files.extend(
@@ -439,14 +472,15 @@ class DeployOvercloud(command.Command):
         if stack:
             try:
                 # If user environment already exist then keep it
-                user_env = yaml.safe_load(self.object_client.get_object(
+                user_env = yaml_utils.safe_load(self.object_client.get_object(
                     parsed_args.stack, constants.USER_ENVIRONMENT)[1])
-                template_utils.deep_update(env, user_env)
+                layers.add(user_env, constants.USER_ENVIRONMENT)
             except ClientException:
                 pass
         parameters.update(self._update_parameters(parsed_args, stack))
-        template_utils.deep_update(env, self._create_parameters_env(
-            parameters, tht_root, parsed_args.stack))
+        layers.add(self._create_parameters_env(
+            parameters, tht_root, parsed_args.stack),
+            'tripleoclient-parameters.yaml')
 
         if parsed_args.environment_files:
             created_env_files.extend(parsed_args.environment_files)
@@ -457,10 +491,15 @@ class DeployOvercloud(command.Command):
                 parsed_args.deployment_python_interpreter
 
         self.log.debug("Processing environment files %s" % created_env_files)
-        env_files, localenv = utils.process_multiple_environments(
+        env_files, layers = utils.load_multiple_environments(
             created_env_files, tht_root, user_tht_root,
-            cleanup=(not parsed_args.no_cleanup))
-        template_utils.deep_update(env, localenv)
+            cleanup=(not parsed_args.no_cleanup),
+            cache_dir=constants.ENVIRONMENT_CACHE_DIR, layers=layers)
+        env = layers.materialise()
+        if self.log.isEnabledFor(logging.DEBUG):
+            for name in env.get('parameter_defaults') or {}:
+                self.log.debug("Parameter %s set by %s" % (
+                    name, layers.sources('parameter_defaults', name)[-1]))
 
         if stack:
             if not parsed_args.disable_validations:
@@ -636,7 +675,7 @@ class DeployOvercloud(command.Command):
             return []
 
         with open(parsed_args.baremetal_deployment, 'r') as fp:
-            roles = yaml.safe_load(fp)
+            roles = yaml_utils.safe_load(fp)
 
         key = self.get_key_pair(parsed_args)
         with open('{}.pub'.format(key), 'rt') as fp:
@@ -665,7 +704,7 @@ class DeployOvercloud(command.Command):
             )
 
         with open(output_path, 'r') as fp:
-            parameter_defaults = yaml.safe_load(fp)
+            parameter_defaults = yaml_utils.safe_load(fp)
 
         # TODO(sbaker) Remove this call when it is no longer necessary
         # to write to a swift object
@@ -683,7 +722,7 @@ class DeployOvercloud(command.Command):
             return
 
         with open(parsed_args.baremetal_deployment, 'r') as fp:
-            roles = yaml.safe_load(fp)
+            roles = yaml_utils.safe_load(fp)
 
         with utils.TempDirs() as tmp:
             utils.run_ansible_playbook(
@@ -756,6 +795,21 @@ class DeployOvercloud(command.Command):
             type=int,
             default=constants.ENABLE_SSH_ADMIN_SSH_PORT_TIMEOUT
         )
+        parser.add_argument(
+            '--overcloud-ssh-batch-size',
+            help=_('Number of overcloud nodes the ssh admin access is '
+                   'enabled on at once. The nodes are all enabled at once '
+                   'when not specified.'),
+            type=int,
+            default=None
+        )
+        parser.add_argument(
+            '--overcloud-ssh-retries',
+            help=_('Number of times the ssh admin access is retried on the '
+                   'nodes where it failed or which were unreachable.'),
+            type=int,
+            default=constants.ENABLE_SSH_ADMIN_RETRIES
+        )
         parser.add_argument(
             '--environment-file', '-e', metavar='<HEAT ENVIRONMENT FILE>',
             action='append', dest='environment_files',
@@ -933,6 +987,14 @@ class DeployOvercloud(command.Command):
                    'in the file will override any configuration used by '
                    'config-download by default.')
         )
+        parser.add_argument(
+            '--plan-transfer-workers',
+            action='store',
+            type=int,
+            default=constants.PLAN_TRANSFER_WORKERS,
+            help=_('Number of concurrent requests used to download the '
+                   'rendered plan files from Swift.')
+        )
         parser.add_argument(
             '--config-download-timeout',
             action='store',
@@ -1040,7 +1102,9 @@ class DeployOvercloud(command.Command):
                         parsed_args.overcloud_ssh_user,
                         self.get_key_pair(parsed_args),
                         parsed_args.overcloud_ssh_port_timeout,
-                        verbosity=utils.playbook_verbosity(self=self)
+                        verbosity=utils.playbook_verbosity(self=self),
+                        batch_size=parsed_args.overcloud_ssh_batch_size,
+                        retries=parsed_args.overcloud_ssh_retries
                     )
 
                 if parsed_args.config_download_timeout:
@@ -1144,3 +1208,106 @@ class GetDeploymentStatus(command.Command):
             ['Plan Name', 'Deployment Status'])
         table.add_row([plan, status])
         print(table, file=self.app.stdout)
+
+
+class ShowDeploymentProfile(command.Lister):
+    """Show the slowest tasks, steps or hosts of a config-download run"""
+
+    log = logging.getLogger(__name__ + ".ShowDeploymentProfile")
+
+    def get_parser(self, prog_name):
+        parser = super(ShowDeploymentProfile, self).get_parser(prog_name)
+        parser.add_argument('--plan', '--stack',
+                            help=_('Name of the stack/plan. '
+                                   '(default: overcloud)'),
+                            default='overcloud')
+        parser.add_argument(
+            '--output-dir',
+            action='store',
+            default=constants.DEFAULT_WORK_DIR,
+            help=_('Directory used for saved output by config-download. '
+                   '(default: %s)') % constants.DEFAULT_WORK_DIR
+        )
+        parser.add_argument(
+            '--profile',
+            help=_('Path of the profile to show. The profile of the last '
+                   'run is shown when not specified.')
+        )
+        parser.add_argument(
+            '--compare',
+            nargs='?',
+            const='',
+            default=None,
+            help=_('Compare the shown profile with the given profile, or '
+                   'with the profile of the previous run when no path is '
+                   'specified. The largest slowdowns are shown first.')
+        )
+        parser.add_argument(
+            '--group-by',
+            choices=ansible_profile.GROUP_BY,
+            default='task',
+            help=_('Rank the task durations by task name, deployment step, '
+                   'host or Ansible role. The steps are ranked by the time '
+                   'elapsed between their first and last task, the others '
+                   'by the total duration of their tasks. '
+                   '(default: task)')
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help=_('Number of entries to show, 0 shows all of them. '
+                   '(default: 20)')
+        )
+        return parser
+
+    def _profiles(self, parsed_args):
+        work_dir = os.path.join(parsed_args.output_dir, parsed_args.plan)
+        profiles = ansible_profile.list_profiles(work_dir)
+        profile = parsed_args.profile
+        if not profile:
+            if not profiles:
+                raise exceptions.NotFound(
+                    'No profile was found in %s' %
+                    ansible_profile.profile_dir(work_dir))
+            profile = profiles[-1]
+
+        previous = parsed_args.compare
+        if previous == '':
+            earlier = [p for p in profiles
+                       if os.path.basename(p) < os.path.basename(profile)]
+            if not earlier:
+                raise exceptions.NotFound(
+                    'No profile of a run before %s was found' % profile)
+            previous = earlier[-1]
+        return profile, previous
+
+    def take_action(self, parsed_args):
+        self.log.debug("take_action(%s)" % parsed_args)
+
+        profile, previous = self._profiles(parsed_args)
+        records = ansible_profile.load_profile(profile)
+        group_by = parsed_args.group_by
+        top = parsed_args.top or None
+
+        if previous is None:
+            self.log.info('Showing profile %s' % profile)
+            columns = (group_by.title(), 'Count', 'Elapsed (s)',
+                       'Total (s)', 'Longest (s)')
+            rows = [(e.name, e.count, round(e.elapsed, 2),
+                     round(e.total, 2), round(e.longest, 2))
+                    for e in ansible_profile.summarize(records, group_by)]
+            return (columns, rows[:top])
+
+        self.log.info('Comparing profile %s with %s' % (profile, previous))
+        columns = (group_by.title(), 'Before (s)', 'After (s)', 'Delta (s)')
+        before = ansible_profile.load_profile(previous)
+        rows = []
+        for name, time_before, time_after, delta in ansible_profile.compare(
+                before, records, group_by):
+            rows.append((
+                name,
+                None if time_before is None else round(time_before, 2),
+                None if time_after is None else round(time_after, 2),
+                round(delta, 2)))
+        return (columns, rows[:top])
@@ -15,13 +15,13 @@ from __future__ import print_function
 from datetime import datetime
 import logging
 import os.path
-import yaml
 
 from osc_lib.i18n import _
 from osc_lib import utils
 
 from tripleoclient import command
 from tripleoclient import export
+from tripleoclient import yaml_utils
 
 
 class ExportOvercloud(command.Command):
@@ -96,6 +96,6 @@ class ExportOvercloud(command.Command):
 
         # write the exported data
         with open(output_file, 'w') as f:
-            yaml.safe_dump(data, f, default_flow_style=False)
+            yaml_utils.safe_dump(data, f, default_flow_style=False)
 
         print("Stack information exported to %s." % output_file)
@@ -123,7 +123,8 @@ class ExternalUpgradeRun(command.Command):
                 parsed_args.static_inventory,
                 parsed_args.ssh_user,
                 parsed_args.stack,
-                return_inventory_file_path=True
+                return_inventory_file_path=True,
+                clients=self.app.client_manager
             ),
             tags=parsed_args.tags,
             skip_tags=parsed_args.skip_tags,
@@ -166,7 +166,8 @@ class FFWDUpgradeRun(command.Command):
                 parsed_args.static_inventory,
                 parsed_args.ssh_user,
                 parsed_args.stack,
-                return_inventory_file_path=True
+                return_inventory_file_path=True,
+                clients=self.app.client_manager
             )
         )
         self.log.info("Completed Overcloud FFWD Upgrade Run.")
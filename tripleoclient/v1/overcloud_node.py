@@ -25,10 +25,10 @@ from osc_lib import exceptions as oscexc
 from osc_lib.i18n import _
 from osc_lib import utils
 import six
-import yaml
 
 from tripleoclient import command
 from tripleoclient import constants
+from tripleoclient import yaml_utils
 from tripleoclient.exceptions import InvalidConfiguration
 from tripleoclient import utils as oooutils
 from tripleoclient.workflows import baremetal
@@ -143,7 +143,7 @@ class DeleteNode(command.Command):
 
         if parsed_args.baremetal_deployment:
             with open(parsed_args.baremetal_deployment, 'r') as fp:
-                roles = yaml.safe_load(fp)
+                roles = yaml_utils.safe_load(fp)
 
             nodes_text, nodes = self._nodes_to_delete(parsed_args, roles)
             if nodes_text:
@@ -297,14 +297,14 @@ class ConfigureNode(command.Command):
                                   "'manageable' state"))
         parser.add_argument(
             '--deploy-kernel',
-            default='file://%s/agent.kernel' %
-            constants.IRONIC_HTTP_BOOT_BIND_MOUNT,
-            help=_('Image with deploy kernel.'))
+            help=_('Image with deploy kernel. Defaults to the most specific '
+                   'deploy kernel of the architecture and platform of each '
+                   'node in %s.') % constants.IRONIC_HTTP_BOOT_BIND_MOUNT)
         parser.add_argument(
             '--deploy-ramdisk',
-            default='file://%s/agent.ramdisk' %
-            constants.IRONIC_HTTP_BOOT_BIND_MOUNT,
-            help=_('Image with deploy ramdisk.'))
+            help=_('Image with deploy ramdisk. Defaults to the most specific '
+                   'deploy ramdisk of the architecture and platform of each '
+                   'node in %s.') % constants.IRONIC_HTTP_BOOT_BIND_MOUNT)
         parser.add_argument('--instance-boot-option',
                             choices=['local', 'netboot'],
                             help=_('Whether to set instances for booting from '
@@ -330,28 +330,40 @@ class ConfigureNode(command.Command):
     def take_action(self, parsed_args):
         self.log.debug("take_action(%s)" % parsed_args)
 
+        http_boot = constants.IRONIC_HTTP_BOOT_BIND_MOUNT
+        deploy_images = None
+        if not (parsed_args.deploy_kernel or parsed_args.deploy_ramdisk):
+            deploy_images = oooutils.DeployImageIndex(http_boot)
+        kernel_name = (parsed_args.deploy_kernel or
+                       'file://%s/%s' % (http_boot, oooutils.deploy_kernel()))
+        ramdisk_name = (parsed_args.deploy_ramdisk or
+                        'file://%s/%s' % (http_boot,
+                                          oooutils.deploy_ramdisk()))
+
         if parsed_args.node_uuids:
             baremetal.configure(
                 self.app.client_manager,
                 node_uuids=parsed_args.node_uuids,
-                kernel_name=parsed_args.deploy_kernel,
-                ramdisk_name=parsed_args.deploy_ramdisk,
+                kernel_name=kernel_name,
+                ramdisk_name=ramdisk_name,
                 instance_boot_option=parsed_args.instance_boot_option,
                 root_device=parsed_args.root_device,
                 root_device_minimum_size=parsed_args.root_device_minimum_size,
                 overwrite_root_device_hints=(
-                    parsed_args.overwrite_root_device_hints)
+                    parsed_args.overwrite_root_device_hints),
+                deploy_images=deploy_images
             )
         else:
             baremetal.configure_manageable_nodes(
                 self.app.client_manager,
-                kernel_name=parsed_args.deploy_kernel,
-                ramdisk_name=parsed_args.deploy_ramdisk,
+                kernel_name=kernel_name,
+                ramdisk_name=ramdisk_name,
                 instance_boot_option=parsed_args.instance_boot_option,
                 root_device=parsed_args.root_device,
                 root_device_minimum_size=parsed_args.root_device_minimum_size,
                 overwrite_root_device_hints=(
-                    parsed_args.overwrite_root_device_hints)
+                    parsed_args.overwrite_root_device_hints),
+                deploy_images=deploy_images
             )
 
 
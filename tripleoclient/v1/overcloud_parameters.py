@@ -13,7 +13,6 @@
 import argparse
 import logging
 import simplejson
-import yaml
 
 from osc_lib.i18n import _
 
@@ -21,6 +20,7 @@ from tripleoclient import command
 from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 from tripleoclient.workflows import parameters
 
 
@@ -45,7 +45,7 @@ class SetParameters(command.Command):
         if parsed_args.file_in.name.endswith('.json'):
             params = simplejson.load(parsed_args.file_in)
         elif parsed_args.file_in.name.endswith('.yaml'):
-            params = yaml.safe_load(parsed_args.file_in)
+            params = yaml_utils.safe_load(parsed_args.file_in)
         else:
             raise exceptions.InvalidConfiguration(
                 _("Invalid file extension for %s, must be json or yaml") %
@@ -115,7 +115,8 @@ class GenerateFencingParameters(command.Command):
             ipmi_lanplus=parsed_args.ipmi_lanplus,
         )
 
-        fencing_parameters = yaml.safe_dump(result, default_flow_style=False)
+        fencing_parameters = yaml_utils.safe_dump(result,
+                                                  default_flow_style=False)
         if parsed_args.output:
             parsed_args.output.write(fencing_parameters)
             parsed_args.output.close()
@@ -18,8 +18,10 @@ from oslo_log import log as logging
 from osc_lib.i18n import _
 from osc_lib import utils
 
+from tripleoclient import ansible_scheduler
 from tripleoclient import command
 from tripleoclient import constants
+from tripleoclient import exceptions
 from tripleoclient import utils as oooutils
 from tripleoclient.v1.overcloud_deploy import DeployOvercloud
 from tripleoclient.workflows import deployment
@@ -109,6 +111,48 @@ class UpdateRun(command.Command):
                                    " that all services are updated and running"
                                    " with the target version configuration.")
                             )
+        parser.add_argument('--playbook-graph',
+                            dest='playbook_graph',
+                            default=None,
+                            help=_("YAML file listing the playbooks to run"
+                                   " instead of --playbook. Every entry may"
+                                   " declare the inventory groups targeted"
+                                   " by its playbook and the playbooks it"
+                                   " requires, for example: '- {playbook:"
+                                   " external_update_steps_playbook.yaml,"
+                                   " hosts: [Undercloud]}'. The playbooks"
+                                   " which do not share hosts and do not"
+                                   " require each other run concurrently.")
+                            )
+        parser.add_argument('--batch-size',
+                            dest='batch_size',
+                            type=int,
+                            default=None,
+                            help=_("Update the nodes matching --limit in"
+                                   " successive batches of this number of"
+                                   " nodes. The configuration and the"
+                                   " inventory are generated once for all"
+                                   " the batches. All the nodes are updated"
+                                   " at once when not specified.")
+                            )
+        parser.add_argument('--max-fail-percentage',
+                            dest='max_fail_percentage',
+                            type=int,
+                            default=0,
+                            help=_("With --batch-size, stop the update after"
+                                   " a batch in which more than this"
+                                   " percentage of the nodes failed"
+                                   " (default: 0, stop after the first"
+                                   " failure).")
+                            )
+        parser.add_argument('--playbook-workers',
+                            dest='playbook_workers',
+                            type=oooutils.positive_int,
+                            default=constants.PLAYBOOK_WORKERS,
+                            help=_("Maximum number of playbooks of"
+                                   " --playbook-graph running at the same"
+                                   " time.")
+                            )
         parser.add_argument("--ssh-user",
                             dest="ssh_user",
                             action="store",
@@ -161,6 +205,15 @@ class UpdateRun(command.Command):
             playbook = constants.MINOR_UPDATE_PLAYBOOKS
         else:
             playbook = parsed_args.playbook
+        if parsed_args.batch_size is not None and parsed_args.batch_size < 1:
+            raise exceptions.InvalidConfiguration(
+                '--batch-size must be a positive number')
+        if not 0 <= parsed_args.max_fail_percentage <= 100:
+            raise exceptions.InvalidConfiguration(
+                '--max-fail-percentage must be between 0 and 100')
+        if parsed_args.playbook_graph:
+            playbook = ansible_scheduler.load_playbooks(
+                parsed_args.playbook_graph)
 
         _, ansible_dir = self.get_ansible_key_and_dir(
             no_workflow=True,
@@ -177,11 +230,15 @@ class UpdateRun(command.Command):
             output_dir=ansible_dir,
             verbosity=oooutils.playbook_verbosity(self=self),
             ansible_playbook_name=playbook,
+            playbook_workers=parsed_args.playbook_workers,
+            batch_size=parsed_args.batch_size,
+            max_fail_percentage=parsed_args.max_fail_percentage,
             inventory_path=oooutils.get_tripleo_ansible_inventory(
                 parsed_args.static_inventory,
                 parsed_args.ssh_user,
                 parsed_args.stack,
-                return_inventory_file_path=True
+                return_inventory_file_path=True,
+                clients=self.app.client_manager
             ),
             limit_hosts=oooutils.playbook_limit_parse(
                 limit_nodes=parsed_args.limit
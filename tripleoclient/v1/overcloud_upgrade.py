@@ -18,6 +18,7 @@ from oslo_log import log as logging
 from osc_lib.i18n import _
 from osc_lib import utils
 
+from tripleoclient import ansible_scheduler
 from tripleoclient import command
 from tripleoclient import constants
 from tripleoclient import exceptions
@@ -131,6 +132,27 @@ class UpgradeRun(command.Command):
                                    " that all services are updated and running"
                                    " with the target version configuration.")
                             )
+        parser.add_argument('--playbook-graph',
+                            dest='playbook_graph',
+                            default=None,
+                            help=_("YAML file listing the playbooks to run"
+                                   " instead of --playbook. Every entry may"
+                                   " declare the inventory groups targeted"
+                                   " by its playbook and the playbooks it"
+                                   " requires, for example: '- {playbook:"
+                                   " external_update_steps_playbook.yaml,"
+                                   " hosts: [Undercloud]}'. The playbooks"
+                                   " which do not share hosts and do not"
+                                   " require each other run concurrently.")
+                            )
+        parser.add_argument('--playbook-workers',
+                            dest='playbook_workers',
+                            type=oooutils.positive_int,
+                            default=constants.PLAYBOOK_WORKERS,
+                            help=_("Maximum number of playbooks of"
+                                   " --playbook-graph running at the same"
+                                   " time.")
+                            )
         parser.add_argument('--static-inventory',
                             dest='static_inventory',
                             action="store",
@@ -201,6 +223,9 @@ class UpgradeRun(command.Command):
             playbook = constants.MAJOR_UPGRADE_PLAYBOOKS
         else:
             playbook = parsed_args.playbook
+        if parsed_args.playbook_graph:
+            playbook = ansible_scheduler.load_playbooks(
+                parsed_args.playbook_graph)
 
         _, ansible_dir = self.get_ansible_key_and_dir(
             no_workflow=parsed_args.no_workflow,
@@ -217,11 +242,13 @@ class UpgradeRun(command.Command):
             output_dir=ansible_dir,
             verbosity=oooutils.playbook_verbosity(self=self),
             ansible_playbook_name=playbook,
+            playbook_workers=parsed_args.playbook_workers,
             inventory_path=oooutils.get_tripleo_ansible_inventory(
                 parsed_args.static_inventory,
                 parsed_args.ssh_user,
                 parsed_args.stack,
-                return_inventory_file_path=True
+                return_inventory_file_path=True,
+                clients=self.app.client_manager
             ),
             tags=parsed_args.tags,
             skip_tags=parsed_args.skip_tags,
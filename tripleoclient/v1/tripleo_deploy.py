@@ -15,6 +15,7 @@
 from __future__ import print_function
 
 import argparse
+import collections
 import json
 import logging
 import netaddr
@@ -29,7 +30,6 @@ import tarfile
 import tempfile
 import time
 import traceback
-import yaml
 
 from cliff import command
 from datetime import datetime
@@ -37,10 +37,12 @@ from heatclient.common import template_utils
 from osc_lib.i18n import _
 from six.moves import configparser
 
+from tripleoclient import ansible_events
 from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import heat_launcher
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 
 from tripleo_common import constants as tc_constants
 from tripleo_common.image import kolla_builder
@@ -241,7 +243,9 @@ class Deploy(command.Command):
         # if the stack name is "undercloud".
         tar_filename = self._get_tar_filename(stack_name)
         try:
-            tf = tarfile.open(tar_filename, 'w:bz2')
+            # The working dir links to the source templates, archive their
+            # contents.
+            tf = tarfile.open(tar_filename, 'w:bz2', dereference=True)
             tf.add(self.tht_render, recursive=True, filter=remove_output_dir)
             tf.add(self.tmp_ansible_dir, recursive=True,
                    filter=remove_output_dir)
@@ -265,10 +269,10 @@ class Deploy(command.Command):
         if not self.tht_render:
             self.tht_render = os.path.join(self.output_dir,
                                            'tripleo-heat-installer-templates')
-            # Clear dir since we're using a static name and shutils.copytree
-            # needs the folder to not exist. We'll generate the
-            # contents each time. This should clear the folder on the first
-            # run of this function.
+            # Clear dir since we're using a static name and
+            # utils.stage_templates_dir needs the folder to not exist.
+            # We'll generate the contents each time. This should clear the
+            # folder on the first run of this function.
             shutil.rmtree(self.tht_render, ignore_errors=True)
         if not self.tmp_ansible_dir:
             self.tmp_ansible_dir = tempfile.mkdtemp(
@@ -278,7 +282,7 @@ class Deploy(command.Command):
                                 stack_name='undercloud'):
         """Creates template dir with templates
 
-        * Copy --templates content into a working dir
+        * Stage --templates content into a working dir
           created as 'output_dir/tripleo-heat-installer-templates'.
 
         :param source_templates_dir: string to a directory containing our
@@ -290,8 +294,11 @@ class Deploy(command.Command):
                                       "or permission denied" %
                                       source_templates_dir)
         if not os.path.exists(self.tht_render):
-            shutil.copytree(source_templates_dir, self.tht_render,
-                            symlinks=True)
+            # NOTE: the working dir is chown'ed to the deployment user, which
+            # would change the owner of hardlinked source templates too.
+            utils.stage_templates_dir(
+                source_templates_dir, self.tht_render,
+                methods=('reflink', 'symlink', 'copy'))
 
     def _set_default_plan(self):
         """Populate default plan-environment.yaml."""
@@ -344,7 +351,7 @@ class Deploy(command.Command):
         if os.path.exists(pw_file):
             with open(pw_file) as pf:
                 stack_env['parameter_defaults'].update(
-                    yaml.safe_load(pf.read())['parameter_defaults'])
+                    yaml_utils.safe_load(pf.read())['parameter_defaults'])
 
         if upgrade:
             # Getting passwords that were managed by instack-undercloud so
@@ -424,7 +431,7 @@ class Deploy(command.Command):
         # Write out the password file in yaml for heat.
         # This contains sensitive data so ensure it's not world-readable
         with open(pw_file, 'w') as pf:
-            yaml.safe_dump(stack_env, pf, default_flow_style=False)
+            yaml_utils.safe_dump(stack_env, pf, default_flow_style=False)
         # TODO(cjeanner) drop that once using oslo.privsep
         # Do not forget to re-add os.chmod 0o600 on that one!
         self._set_data_rights(pw_file, user=user)
@@ -660,7 +667,7 @@ class Deploy(command.Command):
         plan_env_path = utils.rel_or_abs_path(
             self._get_plan_env_file_path(parsed_args), self.tht_render)
         with open(plan_env_path, 'r') as f:
-            plan_env_data = yaml.safe_load(f)
+            plan_env_data = yaml_utils.safe_load(f)
         environments = [utils.rel_or_abs_path(e.get('path'), self.tht_render)
                         for e in plan_env_data.get('environments', {})]
 
@@ -706,8 +713,8 @@ class Deploy(command.Command):
                 roles_file_path, parsed_args.templates)))
 
         with open(maps_file, 'w') as env_file:
-            yaml.safe_dump({'parameter_defaults': tmp_env}, env_file,
-                           default_flow_style=False)
+            yaml_utils.safe_dump({'parameter_defaults': tmp_env}, env_file,
+                                 default_flow_style=False)
         environments.append(maps_file)
 
         # NOTE(aschultz): this doesn't get copied into tht_root but
@@ -724,7 +731,7 @@ class Deploy(command.Command):
                                            '%s-stack-vstate-dropin.yaml' %
                                            parsed_args.stack)
         with open(stack_vstate_dropin, 'w') as dropin_file:
-            yaml.safe_dump(
+            yaml_utils.safe_dump(
                 {'parameter_defaults': {
                     'RootStackName': parsed_args.stack.lower(),
                     'StackAction': self.stack_action,
@@ -759,7 +766,8 @@ class Deploy(command.Command):
         self.log.debug(_("Processing environment files %s") % environments)
         env_files, env = utils.process_multiple_environments(
             environments, self.tht_render, parsed_args.templates,
-            cleanup=parsed_args.cleanup)
+            cleanup=parsed_args.cleanup,
+            cache_dir=constants.ENVIRONMENT_CACHE_DIR)
 
         roles_data = utils.fetch_roles_file(
             roles_file_path, parsed_args.templates)
@@ -783,13 +791,14 @@ class Deploy(command.Command):
             roles_file_path = os.path.join(
                 self.tht_render, 'roles-data-override.yaml')
             with open(roles_file_path, "w") as f:
-                f.write(yaml.safe_dump(roles_data))
+                f.write(yaml_utils.safe_dump(roles_data))
             # Redo the dance
             environments = self._setup_heat_environments(
                 roles_file_path, networks_file_path, parsed_args)
             env_files, env = utils.process_multiple_environments(
                 environments, self.tht_render, parsed_args.templates,
-                cleanup=parsed_args.cleanup)
+                cleanup=parsed_args.cleanup,
+                cache_dir=constants.ENVIRONMENT_CACHE_DIR)
 
         self._prepare_container_images(env, roles_data)
         parameters.convert_docker_params(env)
@@ -893,7 +902,7 @@ class Deploy(command.Command):
         self._create_working_dirs(stack_name.lower())
         output = {'parameter_defaults': outputs}
         with open(endpointmap_file, 'w') as f:
-            yaml.safe_dump(output, f, default_flow_style=False)
+            yaml_utils.safe_dump(output, f, default_flow_style=False)
         return output
 
     def get_parser(self, prog_name):
@@ -1129,7 +1138,7 @@ class Deploy(command.Command):
             self.log.error(msg)
             raise exceptions.DeploymentError(msg)
 
-        hiera_data = yaml.safe_load(data)
+        hiera_data = yaml_utils.safe_load(data)
         if not hiera_data:
             msg = (_('Unsupported data format in hieradata override %s') %
                    target)
@@ -1147,7 +1156,7 @@ class Deploy(command.Command):
                           'legacy format into a file %s' %
                           hiera_override_file)
             with open(hiera_override_file, 'w') as override:
-                yaml.safe_dump(
+                yaml_utils.safe_dump(
                     {'parameter_defaults': {
                      extra_config_var: hiera_data}},
                     override,
@@ -1174,6 +1183,16 @@ class Deploy(command.Command):
                        name)
         self.log.error(json.dumps(failures.get(name, {}), indent=1))
 
+    def _log_ansible_failures(self, failures, name):
+        self.log.error(_('** Found ansible errors for %s deployment! **') %
+                       name)
+        errors = collections.OrderedDict()
+        for failure in failures:
+            errors.setdefault(failure.host, []).append(
+                [failure.task, {'msg': failure.msg,
+                                'status': failure.status}])
+        self.log.error(json.dumps(errors, indent=1))
+
     def _standalone_deploy(self, parsed_args):
         extra_env_var = dict()
         # NOTE(aschultz): the tripleo deploy interface is experimental but only
@@ -1222,6 +1241,7 @@ class Deploy(command.Command):
         self._set_default_plan()
 
         rc = 1
+        events = ansible_events.AnsibleEventStream()
         try:
             # NOTE(bogdando): Look for the unique virtual update mark matching
             # the heat stack name we are going to create below. If found the
@@ -1322,6 +1342,7 @@ class Deploy(command.Command):
                             verbosity=utils.playbook_verbosity(self=self),
                             extra_env_variables=extra_env_var,
                             fail_on_rc=False,
+                            events=events,
                             **operation
                         )[0]
                         if rc != 0:
@@ -1336,7 +1357,10 @@ class Deploy(command.Command):
             tar_filename = \
                 self._create_install_artifact(parsed_args.deployment_user,
                                               parsed_args.stack.lower())
-            if self.ansible_dir:
+            if events.failures:
+                self._log_ansible_failures(events.failures,
+                                           parsed_args.stack)
+            elif self.ansible_dir:
                 self._dump_ansible_errors(
                     os.path.join(self.ansible_dir,
                                  tc_constants.ANSIBLE_ERRORS_FILE),
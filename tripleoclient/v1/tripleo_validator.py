@@ -26,6 +26,7 @@ from osc_lib import exceptions
 from osc_lib.i18n import _
 from prettytable import PrettyTable
 
+from tripleoclient import ansible_events
 from tripleoclient import command
 from tripleoclient import constants
 from tripleoclient import utils as oooutils
@@ -457,9 +458,14 @@ class TripleOValidatorRun(command.Command):
             ssh_user='heat-admin',
             stack=parsed_args.plan,
             undercloud_connection='local',
-            return_inventory_file_path=True)
+            return_inventory_file_path=True,
+            clients=self.app.client_manager)
 
         failed_val = False
+        events = dict(
+            (playbook, ansible_events.AnsibleEventStream())
+            for playbook in playbooks
+        )
 
         with oooutils.TempDirs() as tmp:
             with ThreadPoolExecutor(max_workers=parsed_args.workers) as exe:
@@ -476,7 +482,8 @@ class TripleOValidatorRun(command.Command):
                         output_callback='validation_json',
                         quiet=True,
                         extra_vars=extra_vars_input,
-                        gathering_policy='explicit'): playbook
+                        gathering_policy='explicit',
+                        events=events[playbook]): playbook
                     for playbook in playbooks
                 }
 
@@ -488,7 +495,6 @@ class TripleOValidatorRun(command.Command):
                 results.append({
                     'validation': {
                         'validation_id': pl,
-                        'logfile': None,
                         'status': 'PASSED',
                         'output': output
                     }})
@@ -497,7 +503,6 @@ class TripleOValidatorRun(command.Command):
                 results.append({
                     'validation': {
                         'validation_id': pl,
-                        'logfile': None,
                         'status': 'FAILED',
                         'output': str(e)
                     }})
@@ -505,57 +510,45 @@ class TripleOValidatorRun(command.Command):
         if results:
             new_log_files = oooutils.get_new_validations_logs_on_disk()
 
-            for i in new_log_files:
-                val_id = "{}.yaml".format(i.split('_')[1])
-                for res in results:
-                    if res['validation'].get('validation_id') == val_id:
-                        res['validation']['logfile'] = \
-                            os.path.join(constants.VALIDATIONS_LOG_BASEDIR, i)
-
             t = PrettyTable(border=True, header=True, padding_width=1)
             t.field_names = [
                 "UUID", "Validations", "Status", "Host Group(s)",
                 "Status by Host", "Unreachable Host(s)", "Duration"]
 
             for validation in results:
+                playbook = validation['validation']['validation_id']
+                stream = events[playbook]
+                if stream.start is None:
+                    continue
+
                 r = []
-                logfile = validation['validation'].get('logfile', None)
-                if logfile and os.path.exists(logfile):
-                    with open(logfile, 'r') as val:
-                        contents = json.load(val)
-
-                    for i in contents['plays']:
-                        host = [x for x in i['play'].get('host').split(', ')]
-                        val_id = i['play'].get('validation_id')
-                        time_elapsed = \
-                            i['play']['duration'].get('time_elapsed', None)
-
-                    r.append(contents['plays'][0]['play'].get('id'))
-                    r.append(val_id)
-                    if validation['validation'].get('status') == "PASSED":
-                        r.append(PASSED_VALIDATION)
+                r.append(next(iter(stream.plays), None))
+                r.append(os.path.splitext(playbook)[0])
+                if validation['validation'].get('status') == "PASSED":
+                    r.append(PASSED_VALIDATION)
+                else:
+                    r.append(FAILED_VALIDATION)
+
+                unreachable_hosts = []
+                hosts_result = []
+                for ht, status in stream.host_status().items():
+                    if status == 'unreachable':
+                        unreachable_hosts.append(ht)
+                    elif status == 'failed':
+                        hosts_result.append("{}{}{}".format(
+                            RED, ht, RESET))
                     else:
-                        r.append(FAILED_VALIDATION)
-
-                    unreachable_hosts = []
-                    hosts_result = []
-                    for ht in list(contents['stats'].keys()):
-                        if contents['stats'][ht]['unreachable'] != 0:
-                            unreachable_hosts.append(ht)
-                        elif contents['stats'][ht]['failures'] != 0:
-                            hosts_result.append("{}{}{}".format(
-                                RED, ht, RESET))
-                        else:
-                            hosts_result.append("{}{}{}".format(
-                                GREEN, ht, RESET))
-
-                    r.append(", ".join(host))
-                    r.append(", ".join(hosts_result))
-                    r.append("{}{}{}".format(RED,
-                                             ", ".join(unreachable_hosts),
-                                             RESET))
-                    r.append(time_elapsed)
-                    t.add_row(r)
+                        hosts_result.append("{}{}{}".format(
+                            GREEN, ht, RESET))
+
+                plays = list(stream.plays.values())
+                r.append(plays[-1] if plays else '')
+                r.append(", ".join(hosts_result))
+                r.append("{}{}{}".format(RED,
+                                         ", ".join(unreachable_hosts),
+                                         RESET))
+                r.append(str(stream.duration))
+                t.add_row(r)
 
             t.sortby = "UUID"
             for field in t.field_names:
@@ -24,11 +24,12 @@ from cliff.formatters import table
 from osc_lib import exceptions as oscexc
 from osc_lib.i18n import _
 from osc_lib import utils
-import yaml
 
 from tripleoclient import command
 from tripleoclient import constants
+from tripleoclient import exceptions
 from tripleoclient import utils as oooutils
+from tripleoclient import yaml_utils
 from tripleoclient.workflows import baremetal
 
 # NOTE(cloudnull): V1 imports, These classes will be removed as they're
@@ -62,6 +63,14 @@ class ImportNode(command.Command):
                             default=False,
                             help=_('Validate the env_file and then exit '
                                    'without actually importing the nodes.'))
+        parser.add_argument('--check-bmc', action='store_true',
+                            default=False,
+                            help=_('With --validate-only, also check that '
+                                   'the BMCs of the nodes answer.'))
+        parser.add_argument('--bmc-timeout', type=int,
+                            help=_('Seconds to wait for a BMC to answer '
+                                   'with --check-bmc (default: %s).') %
+                            constants.BMC_PROBE_TIMEOUT)
         parser.add_argument('--provide',
                             action='store_true',
                             help=_('Provide (make available) the nodes'))
@@ -89,12 +98,27 @@ class ImportNode(command.Command):
     def take_action(self, parsed_args):
         self.log.debug("take_action(%s)" % parsed_args)
 
+        if parsed_args.check_bmc and not parsed_args.validate_only:
+            parsed_args.env_file.close()
+            raise exceptions.InvalidConfiguration(
+                _('--check-bmc requires --validate-only'))
+        if parsed_args.bmc_timeout is not None and not parsed_args.check_bmc:
+            parsed_args.env_file.close()
+            raise exceptions.InvalidConfiguration(
+                _('--bmc-timeout requires --check-bmc'))
+
         nodes_config = oooutils.parse_env_file(parsed_args.env_file)
         parsed_args.env_file.close()
 
         if parsed_args.validate_only:
-            return baremetal.validate_nodes(self.app.client_manager,
-                                            nodes_json=nodes_config)
+            bmc_timeout = parsed_args.bmc_timeout
+            if bmc_timeout is None:
+                bmc_timeout = constants.BMC_PROBE_TIMEOUT
+            return baremetal.validate_nodes(
+                self.app.client_manager,
+                nodes_json=nodes_config,
+                check_bmc=parsed_args.check_bmc,
+                bmc_timeout=bmc_timeout)
 
         # Look for *specific* deploy images and update the node data if
         # one is found.
@@ -242,7 +266,7 @@ class ProvisionNode(command.Command):
         self.log.debug("take_action(%s)" % parsed_args)
 
         with open(parsed_args.input, 'r') as fp:
-            roles = yaml.safe_load(fp)
+            roles = yaml_utils.safe_load(fp)
 
         key = self.get_key_pair(parsed_args)
         with open('{}.pub'.format(key), 'rt') as fp:
@@ -305,7 +329,7 @@ class UnprovisionNode(command.Command):
         self.log.debug("take_action(%s)" % parsed_args)
 
         with open(parsed_args.input, 'r') as fp:
-            roles = yaml.safe_load(fp)
+            roles = yaml_utils.safe_load(fp)
 
         with oooutils.TempDirs() as tmp:
             unprovision_confirm = os.path.join(tmp, 'unprovision_confirm.json')
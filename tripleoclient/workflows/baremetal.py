@@ -14,34 +14,61 @@
 
 from __future__ import print_function
 
+import collections
+import time
+
+from concurrent import futures
+
+from ironicclient import exc as ironic_exc
 import six
 
 from tripleo_common.actions import baremetal
 
+from tripleoclient import bmc_probe
 from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import utils
 
 
-def validate_nodes(clients, nodes_json):
+def validate_nodes(clients, nodes_json, check_bmc=False,
+                   bmc_timeout=constants.BMC_PROBE_TIMEOUT):
     """Validate nodes.
 
+    The errors of all the nodes are reported together.
+
     :param clients: Application client object.
     :type clients: Object
 
     :param nodes_json:
     :type nodes_json: Object
 
+    :param check_bmc: Whether to check that the BMCs of the nodes answer.
+    :type check_bmc: Boolean
+
+    :param bmc_timeout: Seconds to wait for a BMC to answer.
+    :type bmc_timeout: Integer
+
     :returns: Boolean
     """
 
+    errors = []
     context = clients.tripleoclient.create_mistral_context()
     nodes = baremetal.ValidateNodes(nodes_json=nodes_json)
     validated_nodes = nodes.run(context=context)
-    if not validated_nodes:
+    if validated_nodes:
+        errors.append(getattr(validated_nodes, 'error', validated_nodes))
+
+    if check_bmc:
+        print('Checking the BMCs of {} nodes'.format(len(nodes_json)))
+        errors.extend('node #{}: {}'.format(index, error)
+                      for index, error in bmc_probe.probe_nodes(
+                          nodes_json, timeout=bmc_timeout))
+
+    if not errors:
         return True
     else:
-        raise exceptions.RegisterOrUpdateError(validated_nodes)
+        raise exceptions.RegisterOrUpdateError('\n'.join(
+            str(error) for error in errors))
 
 
 def register_or_update(clients, nodes_json, kernel_name=None,
@@ -79,20 +106,87 @@ def register_or_update(clients, nodes_json, kernel_name=None,
     registered_nodes = nodes.run(context=context)
     if not isinstance(registered_nodes, list):
         raise exceptions.RegisterOrUpdateError(registered_nodes)
-    else:
-        for node in registered_nodes:
-            if node.provision_state == 'enroll':
-                clients.baremetal.node.set_provision_state(
-                    node_uuid=node.uuid,
-                    state='manage'
-                )
-                print('Successfully registered node UUID {}'.format(node.uuid))
-            else:
-                print('Node UUID {} is already registered'.format(node.uuid))
+
+    enrolled = [node.uuid for node in registered_nodes
+                if node.provision_state == 'enroll']
+    results = set_provision_state(clients, enrolled, 'manage')
+    failed = [uuid for uuid, error in results.items() if error]
+    print('Successfully registered {} nodes, {} already registered'.format(
+        len(enrolled) - len(failed), len(registered_nodes) - len(enrolled)))
+    if failed:
+        raise exceptions.RegisterOrUpdateError(
+            'Failed to manage {} registered nodes:\n{}'.format(
+                len(failed), '\n'.join('{}: {}'.format(uuid, results[uuid])
+                                       for uuid in failed)))
 
     return registered_nodes
 
 
+def _set_node_provision_state(clients, node_uuid, verb, retries,
+                              retry_delay):
+    delay = retry_delay
+    for attempt in range(retries + 1):
+        try:
+            clients.baremetal.node.set_provision_state(
+                node_uuid=node_uuid,
+                state=verb
+            )
+            return None
+        except ironic_exc.Conflict as e:
+            # The node is locked by another operation
+            if attempt == retries:
+                return str(e)
+            time.sleep(delay)
+            delay *= 2
+        except Exception as e:
+            return str(e)
+
+
+def set_provision_state(clients, node_uuids, verb,
+                        workers=constants.IRONIC_UPDATE_WORKERS,
+                        retries=constants.IRONIC_CONFLICT_RETRIES,
+                        retry_delay=constants.IRONIC_CONFLICT_RETRY_DELAY):
+    """Request a provision state transition of nodes concurrently.
+
+    The requests failing with a conflict, when a node is locked by
+    another operation, are retried.
+
+    :param clients: Application client object.
+    :type clients: Object
+
+    :param node_uuids: List of node UUID(s).
+    :type node_uuids: List
+
+    :param verb: Provision state transition, e.g. manage, provide or clean.
+    :type verb: String
+
+    :param workers: Maximum number of concurrent requests.
+    :type workers: Integer
+
+    :param retries: Number of retries of a request failing with a conflict.
+    :type retries: Integer
+
+    :param retry_delay: Delay before the first retry in seconds, doubled
+                        with every retry.
+    :type retry_delay: Integer
+
+    :returns: Ordered dictionary of the node UUIDs to the error of their
+              transition, None when it was accepted.
+    """
+
+    results = collections.OrderedDict()
+    if not node_uuids:
+        return results
+    with futures.ThreadPoolExecutor(
+            max_workers=max(min(workers, len(node_uuids)), 1)) as pool:
+        jobs = [(uuid, pool.submit(_set_node_provision_state, clients, uuid,
+                                   verb, retries, retry_delay))
+                for uuid in node_uuids]
+    for uuid, job in jobs:
+        results[uuid] = job.result()
+    return results
+
+
 def _format_errors(payload):
     errors = []
     messages = payload.get('message', [])
@@ -226,7 +320,7 @@ def introspect_manageable_nodes(clients, run_validations, concurrency,
 def configure(clients, node_uuids, kernel_name='bm-deploy-kernel',
               ramdisk_name='bm-deploy-ramdisk', instance_boot_option=None,
               root_device=None, root_device_minimum_size=4,
-              overwrite_root_device_hints=False):
+              overwrite_root_device_hints=False, deploy_images=None):
     """Configure Node boot options.
 
     :param node_uuids: List of instance UUID(s).
@@ -251,14 +345,37 @@ def configure(clients, node_uuids, kernel_name='bm-deploy-kernel',
                                         device hints when `root_device` is
                                         used.
     :type overwrite_root_device_hints: Boolean
+
+    :param deploy_images: Images of the HTTP boot directory. When set, the
+                          images of the architecture and platform of each
+                          node are used instead of `kernel_name` and
+                          `ramdisk_name` where they exist.
+    :type deploy_images: `utils.DeployImageIndex`
     """
 
     context = clients.tripleoclient.create_mistral_context()
+    nodes = {}
+    if deploy_images is not None:
+        # Nodes given by name are looked up by name too
+        for node in clients.baremetal.node.list(
+                fields=['uuid', 'name', 'properties', 'extra'], limit=0):
+            nodes[node.uuid] = node
+            if node.name:
+                nodes[node.name] = node
     for node_uuid in node_uuids:
+        node_kernel, node_ramdisk = kernel_name, ramdisk_name
+        node = nodes.get(node_uuid)
+        if node is not None:
+            arch = (node.properties or {}).get('cpu_arch')
+            platform = (node.extra or {}).get('tripleo_platform')
+            node_kernel = deploy_images.find_specific(
+                utils.deploy_kernel, arch, platform) or kernel_name
+            node_ramdisk = deploy_images.find_specific(
+                utils.deploy_ramdisk, arch, platform) or ramdisk_name
         boot_action = baremetal.ConfigureBootAction(
             node_uuid=node_uuid,
-            kernel_name=kernel_name,
-            ramdisk_name=ramdisk_name,
+            kernel_name=node_kernel,
+            ramdisk_name=node_ramdisk,
             instance_boot_option=instance_boot_option
         ).run(context=context)
         if boot_action:
@@ -278,7 +395,8 @@ def configure_manageable_nodes(clients, kernel_name='bm-deploy-kernel',
                                ramdisk_name='bm-deploy-ramdisk',
                                instance_boot_option=None,
                                root_device=None, root_device_minimum_size=4,
-                               overwrite_root_device_hints=False):
+                               overwrite_root_device_hints=False,
+                               deploy_images=None):
     """Configure all manageable Nodes.
 
     kernel_name=parsed_args.deploy_kernel,
@@ -307,6 +425,10 @@ def configure_manageable_nodes(clients, kernel_name='bm-deploy-kernel',
                                         device hints when `root_device` is
                                         used.
     :type overwrite_root_device_hints: Boolean
+
+    :param deploy_images: Images of the HTTP boot directory, see
+                          `configure`.
+    :type deploy_images: `utils.DeployImageIndex`
     """
 
     configure(
@@ -320,7 +442,8 @@ def configure_manageable_nodes(clients, kernel_name='bm-deploy-kernel',
         instance_boot_option=instance_boot_option,
         root_device=root_device,
         root_device_minimum_size=root_device_minimum_size,
-        overwrite_root_device_hints=overwrite_root_device_hints
+        overwrite_root_device_hints=overwrite_root_device_hints,
+        deploy_images=deploy_images
     )
 
 
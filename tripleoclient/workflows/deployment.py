@@ -11,23 +11,32 @@
 # under the License.
 from __future__ import print_function
 
-import copy
+import collections
 import getpass
 import os
-import yaml
+import time
 
 from heatclient.common import event_utils
 from heatclient import exc as heat_exc
+from mistral_lib import actions
 from openstackclient import shell
 from swiftclient import exceptions as swiftexceptions
 from tripleo_common.actions import ansible
 from tripleo_common.actions import config
 from tripleo_common.utils import swift as swift_utils
 
+from tripleoclient import ansible_events
+from tripleoclient import ansible_profile
+from tripleoclient import ansible_scheduler
+from tripleoclient import config_writer
+from tripleoclient import yaml_utils
 from tripleoclient.constants import ANSIBLE_TRIPLEO_PLAYBOOKS
 from tripleoclient.constants import CLOUD_HOME_DIR
 from tripleoclient.constants import DEFAULT_WORK_DIR
+from tripleoclient.constants import ENABLE_SSH_ADMIN_RETRIES
+from tripleoclient.constants import PLAYBOOK_WORKERS
 from tripleoclient import exceptions
+from tripleoclient import fact_cache
 from tripleoclient import utils
 
 
@@ -150,27 +159,21 @@ def create_overcloudrc(container="overcloud", no_proxy='',
 
 
 def get_overcloud_hosts(stack, ssh_network):
-    ips = []
     role_net_ip_map = utils.get_role_net_ip_map(stack)
-    blacklisted_ips = utils.get_blacklisted_ip_addresses(stack)
+    # blacklisted_ips will only be the ctlplane ips, the ssh_network ip of
+    # a host is at the same index as its ctlplane ip in the lists of a role
+    blacklisted_ips = set(utils.get_blacklisted_ip_addresses(stack) or [])
+    ips = []
     for net_ip_map in role_net_ip_map.values():
-        # get a copy of the lists of ssh_network and ctlplane ips
-        # as blacklisted_ips will only be the ctlplane ips, we need
-        # both lists to determine which to actually blacklist
-        net_ips = copy.copy(net_ip_map.get(ssh_network, []))
-        ctlplane_ips = copy.copy(net_ip_map.get('ctlplane', []))
-
-        blacklisted_ctlplane_ips = \
-            [ip for ip in ctlplane_ips if ip in blacklisted_ips]
-
-        # for each blacklisted ctlplane ip, remove the corresponding
-        # ssh_network ip at that same index in the net_ips list
-        for bcip in blacklisted_ctlplane_ips:
-            index = ctlplane_ips.index(bcip)
-            ctlplane_ips.pop(index)
-            net_ips.pop(index)
-
-        ips.extend(net_ips)
+        net_ips = net_ip_map.get(ssh_network, [])
+        if not blacklisted_ips:
+            ips.extend(net_ips)
+            continue
+        ctlplane_ips = net_ip_map.get('ctlplane', [])
+        ips.extend(
+            ip for index, ip in enumerate(net_ips)
+            if index >= len(ctlplane_ips) or
+            ctlplane_ips[index] not in blacklisted_ips)
 
     return ips
 
@@ -178,7 +181,8 @@ def get_overcloud_hosts(stack, ssh_network):
 def get_hosts_and_enable_ssh_admin(stack, overcloud_ssh_network,
                                    overcloud_ssh_user, overcloud_ssh_key,
                                    overcloud_ssh_port_timeout,
-                                   verbosity=0):
+                                   verbosity=0, batch_size=None,
+                                   retries=ENABLE_SSH_ADMIN_RETRIES):
     """Enable ssh admin access.
 
     Get a list of hosts from a given stack and enable admin ssh across all of
@@ -201,6 +205,13 @@ def get_hosts_and_enable_ssh_admin(stack, overcloud_ssh_network,
 
     :param verbosity: Verbosity level
     :type verbosity: Integer
+
+    :param batch_size: Number of hosts enabled at once, all of them when
+                       not set.
+    :type batch_size: Integer
+
+    :param retries: Number of times the failed hosts are retried.
+    :type retries: Integer
     """
 
     hosts = get_overcloud_hosts(stack, overcloud_ssh_network)
@@ -211,7 +222,9 @@ def get_hosts_and_enable_ssh_admin(stack, overcloud_ssh_network,
             overcloud_ssh_user,
             overcloud_ssh_key,
             overcloud_ssh_port_timeout,
-            verbosity=verbosity
+            verbosity=verbosity,
+            batch_size=batch_size,
+            retries=retries
         )
     else:
         raise exceptions.DeploymentError(
@@ -222,10 +235,68 @@ def get_hosts_and_enable_ssh_admin(stack, overcloud_ssh_network,
         )
 
 
+def _run_enable_ssh_admin(stack, hosts, ssh_user, ssh_key, timeout,
+                          verbosity, forks, durations):
+    """Run the enable ssh admin playbook on a group of hosts.
+
+    :returns: List of the hosts the playbook failed on.
+    """
+
+    events = ansible_events.AnsibleEventStream()
+    extra_env_variables = None
+    if forks:
+        extra_env_variables = {'ANSIBLE_FORKS': forks}
+    with utils.TempDirs() as tmp:
+        rc, _ = utils.run_ansible_playbook(
+            playbook='cli-enable-ssh-admin.yaml',
+            inventory=','.join(hosts),
+            workdir=tmp,
+            playbook_dir=ANSIBLE_TRIPLEO_PLAYBOOKS,
+            key=ssh_key,
+            ssh_user=ssh_user,
+            verbosity=verbosity,
+            extra_vars={
+                "ssh_user": ssh_user,
+                "ssh_servers": hosts,
+                'tripleo_cloud_name': stack.stack_name
+            },
+            ansible_timeout=timeout,
+            extra_env_variables=extra_env_variables,
+            events=events,
+            fail_on_rc=False
+        )
+    for result in events.results:
+        if result.host in durations:
+            durations[result.host] += result.duration or 0.0
+    if rc == 0:
+        return []
+
+    status = events.host_status()
+    failed = [host for host in hosts if status.get(host, 'ok') != 'ok']
+    if not failed:
+        # The failure is not tied to a host, the key setup on the
+        # undercloud failed for instance
+        return list(hosts)
+    # The playbook makes any error fatal, it was stopped on the other
+    # hosts too
+    others = [host for host in hosts if host not in failed]
+    if others:
+        failed.extend(_run_enable_ssh_admin(
+            stack, others, ssh_user, ssh_key, timeout, verbosity, forks,
+            durations))
+    return failed
+
+
 def enable_ssh_admin(stack, hosts, ssh_user, ssh_key, timeout,
-                     verbosity=0):
+                     verbosity=0, batch_size=None,
+                     retries=ENABLE_SSH_ADMIN_RETRIES):
     """Run enable ssh admin access playbook.
 
+    The hosts are enabled in waves of batch_size hosts, with as many Ansible
+    forks as hosts in the wave. A host which fails or is unreachable does not
+    stop the other hosts, the failed hosts are retried on their own once
+    all the waves are done.
+
     :param stack: Stack data.
     :type stack: Object
 
@@ -243,6 +314,13 @@ def enable_ssh_admin(stack, hosts, ssh_user, ssh_key, timeout,
 
     :param verbosity: Verbosity level
     :type verbosity: Integer
+
+    :param batch_size: Number of hosts enabled at once, all of them when
+                       not set.
+    :type batch_size: Integer
+
+    :param retries: Number of times the failed hosts are retried.
+    :type retries: Integer
     """
 
     print(
@@ -255,23 +333,247 @@ def enable_ssh_admin(stack, hosts, ssh_user, ssh_key, timeout,
             ssh_key
         )
     )
+    hosts = list(hosts)
+    start = time.time()
+    durations = collections.OrderedDict((host, 0.0) for host in hosts)
+    attempts = dict((host, 1) for host in hosts)
+    if batch_size:
+        waves = [hosts[i:i + batch_size]
+                 for i in range(0, len(hosts), batch_size)]
+    else:
+        waves = [hosts]
+
+    failed = []
+    for number, wave in enumerate(waves, 1):
+        if len(waves) > 1:
+            print('Enabling ssh admin for wave {}/{} ({} hosts)'.format(
+                number, len(waves), len(wave)))
+        failed.extend(_run_enable_ssh_admin(
+            stack, wave, ssh_user, ssh_key, timeout, verbosity,
+            len(wave) if batch_size else None, durations))
+
+    for _ in range(retries):
+        if not failed:
+            break
+        print('Retrying ssh admin enablement for hosts: {}'.format(failed))
+        for host in failed:
+            attempts[host] += 1
+        failed = _run_enable_ssh_admin(
+            stack, failed, ssh_user, ssh_key, timeout, verbosity,
+            len(failed) if batch_size else None, durations)
+
+    slowest = sorted(durations.items(), key=lambda item: item[1],
+                     reverse=True)
+    print('Enabling ssh admin took {:.0f}s for {} hosts in {} waves, '
+          'slowest hosts: {}'.format(
+              time.time() - start, len(hosts), len(waves),
+              ', '.join('{} {:.1f}s ({} attempts)'.format(
+                  host, duration, attempts[host])
+                  for host, duration in slowest[:5])))
+    if failed:
+        raise exceptions.DeploymentError(
+            'Enabling ssh admin failed for hosts: {}'.format(
+                ', '.join(failed)))
+    print("Enabling ssh admin - COMPLETE.")
+
+
+def warm_fact_cache(stack, inventory, ssh_user, key, timeout=600,
+                    verbosity=0, limit_hosts=None):
+    """Gather the facts of the nodes of a stack in a single pass.
+
+    The facts of all the nodes are gathered in parallel into the fact cache
+    of the stack, the playbooks which follow read them from the cache. The
+    nodes which do not answer are left to the playbooks which need them.
+
+    :param stack: Heat Stack object
+    :type stack: Object
+
+    :param inventory: Inventory file of the stack.
+    :type inventory: String
+
+    :param ssh_user: SSH user of the nodes.
+    :type ssh_user: String
+
+    :param key: Private key of the SSH user.
+    :type key: String
+
+    :param timeout: Ansible connection timeout in seconds.
+    :type timeout: Integer
+
+    :param verbosity: Ansible verbosity level.
+    :type verbosity: Integer
+
+    :param limit_hosts: Hosts to gather the facts of.
+    :type limit_hosts: String
+    """
+
     with utils.TempDirs() as tmp:
-        utils.run_ansible_playbook(
-            playbook='cli-enable-ssh-admin.yaml',
-            inventory=','.join(hosts),
+        # Without gather_facts, the play gathers the facts of the hosts
+        # missing from the cache only
+        playbook = os.path.join(tmp, 'tripleo-gather-facts.yaml')
+        with open(playbook, 'w') as f:
+            f.write(yaml_utils.safe_dump(
+                [{'name': 'Gather facts', 'hosts': 'all', 'tasks': []}],
+                default_flow_style=False))
+        rc, _ = utils.run_ansible_playbook(
+            playbook=playbook,
+            inventory=inventory,
             workdir=tmp,
-            playbook_dir=ANSIBLE_TRIPLEO_PLAYBOOKS,
-            key=ssh_key,
-            ssh_user=ssh_user,
             verbosity=verbosity,
-            extra_vars={
-                "ssh_user": ssh_user,
-                "ssh_servers": hosts,
-                'tripleo_cloud_name': stack.stack_name
+            ssh_user=ssh_user,
+            key=key,
+            limit_hosts=limit_hosts,
+            ansible_timeout=timeout,
+            plan=stack.stack_name,
+            extra_env_variables={
+                'ANSIBLE_BECOME': True,
             },
-            ansible_timeout=timeout
+            fail_on_rc=False,
         )
-    print("Enabling ssh admin - COMPLETE.")
+    hosts = fact_cache.cached_hosts(stack.stack_name)
+    print('Facts of {} hosts cached for stack {}'.format(
+        len(hosts), stack.stack_name))
+    if rc != 0:
+        print('The facts of some hosts could not be gathered, they are '
+              'gathered by the playbooks which need them')
+
+
+def _playbook_summary(playbook, rc, events):
+    status = collections.Counter(events.host_status().values())
+    lines = ['Playbook {} {} ({}): {} hosts ok, {} failed, {} '
+             'unreachable'.format(
+                 playbook, 'completed' if rc == 0 else 'failed',
+                 events.duration or 'no task run', status['ok'],
+                 status['failed'], status['unreachable'])]
+    for result in events.failures:
+        lines.append('    {}: {}: {}'.format(
+            result.host, result.task, result.msg))
+    return '\n'.join(lines)
+
+
+# Status of a host over several playbooks, the worst one wins
+_HOST_STATUS_RANK = {'ok': 0, 'failed': 1, 'unreachable': 2}
+
+
+def _run_playbook_graph(nodes, stack_work_dir, profile, workers, kwargs,
+                        fail_on_rc=True):
+    """Run a graph of playbooks, the independent ones concurrently.
+
+    The output of the playbooks running at the same time would be
+    interleaved, every playbook is run quietly and its results printed
+    once it is done.
+
+    :returns: Tuple of the return code, non zero when a playbook failed,
+              and the status of the hosts over all the playbooks.
+
+    :raises: DeploymentError when a playbook failed and fail_on_rc is set,
+             or when playbooks were not run.
+    """
+
+    host_status = collections.OrderedDict()
+
+    def _run(node):
+        events = ansible_events.AnsibleEventStream(callback=profile)
+        # The playbooks run in threads, the working directory of the
+        # process is left alone
+        with utils.TempDirs(chdir=False) as tmp:
+            rc, _ = utils.run_ansible_playbook(
+                playbook=os.path.join(stack_work_dir, node.playbook),
+                workdir=tmp,
+                cwd=tmp,
+                parallel_run=True,
+                quiet=True,
+                fail_on_rc=False,
+                events=events,
+                **kwargs
+            )
+        print(_playbook_summary(node.playbook, rc, events))
+        for host, status in events.host_status().items():
+            if (_HOST_STATUS_RANK[status] >=
+                    _HOST_STATUS_RANK[host_status.get(host, 'ok')]):
+                host_status[host] = status
+        return rc
+
+    results = ansible_scheduler.run_playbooks(nodes, _run, workers)
+    failed = [p for p, rc in results.items() if rc != 0]
+    not_run = [n.playbook for n in nodes if n.playbook not in results]
+    # The status of the hosts does not cover the playbooks which did not
+    # run, even the callers going on after failures stop here
+    if not_run or (failed and fail_on_rc):
+        msg = []
+        if failed:
+            msg.append('failed: {}'.format(', '.join(failed)))
+        if not_run:
+            msg.append('not run: {}'.format(', '.join(not_run)))
+        raise exceptions.DeploymentError(
+            'Playbooks {}'.format(', '.join(msg)))
+    return (1 if failed else 0), host_status
+
+
+def _run_in_batches(run, hosts, batch_size, max_fail_percentage):
+    """Run the playbooks on successive batches of hosts.
+
+    :param run: Run the playbooks, called with the limit of a batch and
+                returning the return code and the status of the hosts.
+    :type run: Callable
+
+    :param hosts: Hosts to run the playbooks on.
+    :type hosts: List
+
+    :param batch_size: Number of hosts of a batch.
+    :type batch_size: Integer
+
+    :param max_fail_percentage: The batches which follow a batch with more
+                                than this percentage of hosts failing are
+                                not run.
+    :type max_fail_percentage: Integer
+    """
+
+    batches = [hosts[i:i + batch_size]
+               for i in range(0, len(hosts), batch_size)]
+    failed = []
+    for number, batch in enumerate(batches, 1):
+        print('Running batch {}/{} on {} hosts: {}'.format(
+            number, len(batches), len(batch), ', '.join(batch)))
+        start = time.time()
+        rc, host_status = run(':'.join(batch))
+        # The hosts without results failed when the playbooks did
+        batch_failed = [
+            h for h in batch
+            if host_status.get(h, 'failed' if rc else 'ok') != 'ok']
+        failed.extend(batch_failed)
+        print('Batch {}/{} completed in {:.0f}s: {} hosts ok, {} '
+              'failed{}'.format(
+                  number, len(batches), time.time() - start,
+                  len(batch) - len(batch_failed), len(batch_failed),
+                  ': ' + ', '.join(batch_failed) if batch_failed else ''))
+        if len(batch_failed) * 100.0 / len(batch) > max_fail_percentage:
+            remaining = sum(len(b) for b in batches[number:])
+            msg = ('{} of the {} hosts of batch {} failed, above the {}% '
+                   'allowed: {}'.format(
+                       len(batch_failed), len(batch), number,
+                       max_fail_percentage, ', '.join(batch_failed)))
+            if remaining:
+                msg += '. {} hosts were not updated'.format(remaining)
+            raise exceptions.DeploymentError(msg)
+    if failed:
+        raise exceptions.DeploymentError(
+            'The playbooks failed on hosts: {}'.format(', '.join(failed)))
+
+
+def _check_action_result(action, result):
+    """Raise when an action returned its error instead of raising it.
+
+    :param action: Name of the action.
+    :type action: String
+
+    :param result: Result of the action.
+    :type result: Object
+    """
+
+    if isinstance(result, actions.Result):
+        raise exceptions.WorkflowActionError(
+            action, result.error or result.data)
 
 
 def config_download(log, clients, stack, ssh_network=None,
@@ -281,7 +583,9 @@ def config_download(log, clients, stack, ssh_network=None,
                     ansible_playbook_name='deploy_steps_playbook.yaml',
                     limit_hosts=None, extra_vars=None, inventory_path=None,
                     ssh_user='tripleo-admin', tags=None, skip_tags=None,
-                    deployment_timeout=None):
+                    deployment_timeout=None,
+                    playbook_workers=PLAYBOOK_WORKERS, batch_size=None,
+                    max_fail_percentage=0):
     """Run config download.
 
     :param log: Logging object
@@ -314,8 +618,12 @@ def config_download(log, clients, stack, ssh_network=None,
     :param in_flight_validations: Enable or Disable inflight validations.
     :type in_flight_validations: Boolean
 
-    :param ansible_playbook_name: Name of the playbook to execute.
-    :type ansible_playbook_name: String
+    :param ansible_playbook_name: Name of the playbook to execute, or list
+                                  of playbooks. The entries of a list may
+                                  declare the inventory groups their
+                                  playbook targets and the playbooks it
+                                  requires, see `ansible_scheduler`.
+    :type ansible_playbook_name: String or List
 
     :param limit_hosts: String of hosts to limit the current playbook to.
     :type limit_hosts: String
@@ -340,6 +648,18 @@ def config_download(log, clients, stack, ssh_network=None,
     :param deployment_timeout: Deployment timeout in minutes.
     :type deployment_timeout: Integer
 
+    :param playbook_workers: Maximum number of independent playbooks of a
+                             list running at the same time.
+    :type playbook_workers: Integer
+
+    :param batch_size: Run the playbooks on successive batches of this
+                       number of hosts, on all the hosts at once when None.
+    :type batch_size: Integer
+
+    :param max_fail_percentage: Stop after a batch in which more than this
+                                percentage of the hosts failed.
+    :type max_fail_percentage: Integer
+
     """
 
     def _log_and_print(message, logger, level='info', print_msg=True):
@@ -401,6 +721,7 @@ def config_download(log, clients, stack, ssh_network=None,
     blacklist_show = stack.output_show('BlacklistedHostnames')
     blacklist_stack_output = blacklist_show.get('output', dict())
     blacklist_stack_output_value = blacklist_stack_output.get('output_value')
+    batch_limit = limit_hosts
     if blacklist_stack_output_value:
 
         if not limit_hosts:
@@ -418,21 +739,41 @@ def config_download(log, clients, stack, ssh_network=None,
         print_msg=(verbosity == 0)
     )
     container_config = '{}-config'.format(stack.stack_name)
-
-    utils.get_config(clients, container=stack.stack_name,
-                     container_config=container_config)
-    _log_and_print(
-        message='Downloading configuration for stack: {}'.format(
-            stack.stack_name
-        ),
-        logger=log,
-        print_msg=(verbosity == 0)
-    )
-    download = config.DownloadConfigAction(
-        work_dir=stack_work_dir,
-        container_config=container_config)
-
-    work_dir = download.run(context=context)
+    config_key = utils.config_cache_key(stack, container_config)
+    if utils.is_config_cached(stack_work_dir, config_key):
+        _log_and_print(
+            message='Reusing the configuration of stack {} downloaded in '
+                    '{}'.format(stack.stack_name, stack_work_dir),
+            logger=log,
+            print_msg=(verbosity == 0)
+        )
+        work_dir = stack_work_dir
+    else:
+        # An interrupted download must not be reused
+        utils.set_config_cache_key(stack_work_dir)
+        result = utils.get_config(clients, container=stack.stack_name,
+                                  container_config=container_config)
+        _check_action_result('GetOvercloudConfig', result)
+        _log_and_print(
+            message='Downloading configuration for stack: {}'.format(
+                stack.stack_name
+            ),
+            logger=log,
+            print_msg=(verbosity == 0)
+        )
+        # Only the files which changed are written, the tarball of the
+        # container is left out of the changes.
+        changes = config_writer.sync_container(
+            clients.tripleoclient.object_store, container_config,
+            stack_work_dir, ignore=['{}.tar.gz'.format(container_config)])
+        config_writer.link_latest(stack_work_dir)
+        work_dir = stack_work_dir
+        utils.set_config_cache_key(stack_work_dir, config_key)
+        _log_and_print(
+            message=config_writer.summary(changes),
+            logger=log,
+            print_msg=(verbosity == 0)
+        )
     _log_and_print(
         message='Retrieving keyfile for stack: {}'.format(
             stack.stack_name
@@ -470,33 +811,84 @@ def config_download(log, clients, stack, ssh_network=None,
         print_msg=(verbosity == 0)
     )
 
+    if batch_size:
+        batch_hosts = utils.inventory_limit_hosts(inventory_path, batch_limit)
+        if batch_hosts is None:
+            raise exceptions.InvalidConfiguration(
+                'The hosts matching {} can not be split into batches, only '
+                'host and group names of the inventory {} are '
+                'supported'.format(batch_limit, inventory_path))
+        blacklisted = set(blacklist_stack_output_value or [])
+        batch_hosts = [h for h in batch_hosts if h not in blacklisted]
+
+    if fact_cache.sync(stack):
+        _log_and_print(
+            message='Gathering facts for stack: {}'.format(stack.stack_name),
+            logger=log,
+            print_msg=(verbosity == 0)
+        )
+        warm_fact_cache(stack, inventory_path, ssh_user, key_file,
+                        timeout=timeout, verbosity=verbosity,
+                        limit_hosts=limit_hosts)
+
+    nodes = None
     if isinstance(ansible_playbook_name, list):
-        playbooks = [os.path.join(stack_work_dir, p)
-                     for p in ansible_playbook_name]
+        nodes = ansible_scheduler.playbook_nodes(
+            ansible_playbook_name,
+            resolve_hosts=lambda groups: utils.inventory_group_hosts(
+                inventory_path, groups))
+        playbooks = [os.path.join(stack_work_dir, n.playbook) for n in nodes]
     else:
         playbooks = os.path.join(stack_work_dir, ansible_playbook_name)
 
-    with utils.TempDirs() as tmp:
-        utils.run_ansible_playbook(
-            playbook=playbooks,
-            inventory=inventory_path,
-            workdir=tmp,
-            playbook_dir=work_dir,
-            skip_tags=skip_tags,
-            tags=tags,
-            ansible_cfg=override_ansible_cfg,
-            verbosity=verbosity,
-            ssh_user=ssh_user,
-            key=key_file,
-            limit_hosts=limit_hosts,
-            ansible_timeout=timeout,
-            reproduce_command=True,
-            extra_env_variables={
-                'ANSIBLE_BECOME': True,
-            },
-            extra_vars=extra_vars,
-            timeout=deployment_timeout,
-        )
+    # The timing of every task is kept in a profile of the run, see
+    # 'openstack overcloud deploy profile show'
+    profile = ansible_profile.ProfileWriter(
+        ansible_profile.new_profile_path(stack_work_dir))
+    playbook_kwargs = dict(
+        inventory=inventory_path,
+        playbook_dir=work_dir,
+        skip_tags=skip_tags,
+        tags=tags,
+        ansible_cfg=override_ansible_cfg,
+        verbosity=verbosity,
+        ssh_user=ssh_user,
+        key=key_file,
+        ansible_timeout=timeout,
+        extra_env_variables={
+            'ANSIBLE_BECOME': True,
+        },
+        extra_vars=extra_vars,
+        timeout=deployment_timeout,
+    )
+
+    def _run(limit, fail_on_rc=False):
+        kwargs = dict(playbook_kwargs, limit_hosts=limit)
+        if nodes and not ansible_scheduler.is_sequential(nodes):
+            return _run_playbook_graph(nodes, stack_work_dir, profile,
+                                       playbook_workers, kwargs,
+                                       fail_on_rc=fail_on_rc)
+        events = ansible_events.AnsibleEventStream(callback=profile,
+                                                   keep_results=False)
+        with utils.TempDirs() as tmp:
+            result = utils.run_ansible_playbook(
+                playbook=playbooks,
+                workdir=tmp,
+                reproduce_command=True,
+                events=events,
+                fail_on_rc=fail_on_rc,
+                **kwargs
+            )
+        return result[0], events.host_status()
+
+    with profile:
+        if batch_size:
+            _run_in_batches(_run, batch_hosts, batch_size,
+                            max_fail_percentage)
+        else:
+            _run(limit_hosts, fail_on_rc=True)
+    if profile.records:
+        log.info('Task profile of the run: {}'.format(profile.path))
 
     _log_and_print(
         message='Overcloud configuration completed for stack: {}'.format(
@@ -588,7 +980,7 @@ def get_deployment_status(clients, plan):
             '%s-messages' % plan,
             'deployment_status.yaml')
 
-        return yaml.safe_load(body)['deployment_status']
+        return yaml_utils.safe_load(body)['deployment_status']
     except swiftexceptions.ClientException:
         return None
 
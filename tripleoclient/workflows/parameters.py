@@ -13,10 +13,10 @@
 import logging
 import os
 import re
-import yaml
 
 from tripleo_common.utils import stack_parameters as stk_parameters
 
+from tripleoclient import yaml_utils
 from tripleoclient.constants import ANSIBLE_TRIPLEO_PLAYBOOKS
 from tripleoclient.constants import UNUSED_PARAMETER_EXCLUDES_RE
 from tripleoclient import exceptions
@@ -34,7 +34,7 @@ def invoke_plan_env_workflows(clients, stack_name, plan_env_file,
 
     try:
         with open(plan_env_file) as pf:
-            plan_env_data = yaml.safe_load(pf.read())
+            plan_env_data = yaml_utils.safe_load(pf.read())
     except IOError as exc:
         raise exceptions.PlanEnvWorkflowError('File (%s) is not found: '
                                               '%s' % (plan_env_file, exc))
@@ -44,7 +44,8 @@ def invoke_plan_env_workflows(clients, stack_name, plan_env_file,
             ssh_user='heat-admin',
             stack=stack_name,
             undercloud_connection='local',
-            return_inventory_file_path=True
+            return_inventory_file_path=True,
+            clients=clients
         )
         with utils.TempDirs() as tmp:
             for pb, pb_vars in plan_env_data["playbook_parameters"].items():
@@ -101,7 +102,8 @@ def invoke_plan_env_workflows(clients, stack_name, plan_env_file,
                 # Prints the workflow result
                 if result:
                     print('Workflow execution is completed. result:')
-                    print(yaml.safe_dump(result, default_flow_style=False))
+                    print(yaml_utils.safe_dump(result,
+                                               default_flow_style=False))
             else:
                 message = payload.get('message', '')
                 msg = ('Workflow execution is failed: %s' % (message))
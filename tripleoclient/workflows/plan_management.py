@@ -9,12 +9,14 @@
 # WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 # License for the specific language governing permissions and limitations
 # under the License.
+import fnmatch
+import hashlib
 import logging
 import os
 import tempfile
-import yaml
 
 from swiftclient import exceptions as swift_exc
+from swiftclient import multithreading
 from tripleo_common.actions import plan
 from tripleo_common.utils import plan as plan_utils
 from tripleo_common.utils import swift as swiftutils
@@ -23,6 +25,7 @@ from tripleo_common.utils import tarball
 from tripleoclient import constants
 from tripleoclient import exceptions
 from tripleoclient import utils
+from tripleoclient import yaml_utils
 
 LOG = logging.getLogger(__name__)
 # Plan management workflows should generally be quick. However, the creation
@@ -36,8 +39,19 @@ _WORKFLOW_TIMEOUT = 20 * 60  # 20 minutes * 60 seconds
 
 
 def _upload_templates(swift_client, container_name, tht_root, roles_file=None,
-                      plan_env_file=None, networks_file=None):
-    """tarball up a given directory and upload it to Swift to be extracted"""
+                      plan_env_file=None, networks_file=None, delta=False,
+                      keep=()):
+    """tarball up a given directory and upload it to Swift to be extracted
+
+    When delta is set only the files which differ from the objects already
+    in the container are uploaded, see `_upload_templates_delta`.
+    """
+
+    if delta:
+        return _upload_templates_delta(
+            swift_client, container_name, tht_root, roles_file=roles_file,
+            plan_env_file=plan_env_file, networks_file=networks_file,
+            keep=keep)
 
     with tempfile.NamedTemporaryFile() as tmp_tarball:
         tarball.create_tarball(tht_root, tmp_tarball.name)
@@ -64,6 +78,114 @@ def _upload_templates(swift_client, container_name, tht_root, roles_file=None,
                      constants.PLAN_ENVIRONMENT, plan_env_file)
 
 
+def _list_template_files(tht_root):
+    """Map the object names of a templates directory to their local paths.
+
+    Files matching the excludes of the plan tarball are skipped, so the
+    result is the same set of objects a tarball upload would create.
+    """
+
+    def _excluded(name):
+        return any(fnmatch.fnmatch(name, pattern)
+                   for pattern in tarball.DEFAULT_TARBALL_EXCLUDES)
+
+    files = {}
+    for root, dirs, filenames in os.walk(tht_root):
+        dirs[:] = [d for d in dirs if not _excluded(d)]
+        for filename in filenames:
+            if _excluded(filename):
+                continue
+            path = os.path.join(root, filename)
+            if os.path.isfile(path):
+                files[os.path.relpath(path, tht_root)] = path
+    return files
+
+
+def _file_etag(path):
+    """Return the Swift ETag (MD5 hex digest) of a local file"""
+
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _put_file(connection, container, name, local_filename):
+    LOG.debug("Uploading {0} to plan".format(name))
+    with open(local_filename, 'rb') as file_content:
+        connection.put_object(container, name, file_content)
+
+
+def _delete_object(connection, container, name):
+    LOG.debug("Removing {0} from plan".format(name))
+    try:
+        connection.delete_object(container, name)
+    except swift_exc.ClientException as e:
+        if e.http_status != 404:
+            raise
+
+
+def _upload_templates_delta(swift_client, container_name, tht_root,
+                            roles_file=None, plan_env_file=None,
+                            networks_file=None, keep=(),
+                            workers=constants.PLAN_TRANSFER_WORKERS):
+    """Synchronise a plan container with a templates directory.
+
+    The MD5 of every local file is compared to the ETag of the object of
+    the same name, taken from a single listing of the container. Only new
+    or modified files are uploaded, and objects which no longer exist
+    locally are removed, through a bounded pool of connections.
+
+    :param keep: Object names which are neither uploaded nor removed, the
+                 caller takes care of them.
+    :type keep: Iterable
+
+    :returns: Tuple (number of uploaded objects, number of removed objects)
+    """
+
+    local_files = _list_template_files(tht_root)
+    # Optional overrides of the roles_data.yaml, network_data.yaml and
+    # plan-environment.yaml files
+    if roles_file:
+        local_files[constants.OVERCLOUD_ROLES_FILE] = utils.rel_or_abs_path(
+            roles_file, tht_root)
+    if networks_file:
+        local_files[constants.OVERCLOUD_NETWORKS_FILE] = networks_file
+    if plan_env_file:
+        local_files[constants.PLAN_ENVIRONMENT] = plan_env_file
+    for name in keep:
+        local_files.pop(name, None)
+
+    remote_etags = dict(
+        (i['name'], i['hash']) for i in swift_client.get_container(
+            container_name, full_listing=True)[1])
+
+    to_upload = [name for name, path in sorted(local_files.items())
+                 if remote_etags.get(name) != _file_etag(path)]
+    to_delete = [name for name in sorted(remote_etags)
+                 if name not in local_files and name not in keep]
+    LOG.debug("Plan {0}: uploading {1} and removing {2} of {3} objects".format(
+        container_name, len(to_upload), len(to_delete), len(remote_etags)))
+
+    if to_upload or to_delete:
+        create_connection = utils.swift_connection_factory(swift_client)
+        with multithreading.ConnectionThreadPoolExecutor(
+                create_connection, workers) as executor:
+            futures = [
+                executor.submit(_put_file, container_name, name,
+                                local_files[name])
+                for name in to_upload
+            ] + [
+                executor.submit(_delete_object, container_name, name)
+                for name in to_delete
+            ]
+            for future in futures:
+                future.result()
+
+    return len(to_upload), len(to_delete)
+
+
 def create_deployment_plan(container, generate_passwords,
                            use_default_templates=False, source_url=None,
                            validate_stack=True, verbosity_level=0,
@@ -158,7 +280,8 @@ def create_plan_from_templates(clients, name, tht_root, roles_file=None,
 def update_plan_from_templates(clients, name, tht_root, roles_file=None,
                                generate_passwords=True, plan_env_file=None,
                                networks_file=None, keep_env=False,
-                               validate_stack=True, verbosity_level=1):
+                               validate_stack=True, verbosity_level=1,
+                               delta_upload=True):
     swift_client = clients.tripleoclient.object_store
     passwords = None
     keep_file_contents = {}
@@ -183,10 +306,11 @@ def update_plan_from_templates(clients, name, tht_root, roles_file=None,
     else:
         passwords = _load_passwords(swift_client, name)
 
-    # TODO(dmatthews): Removing the existing plan files should probably be
-    #                  a Mistral action.
-    print("Removing the current plan files")
-    swiftutils.empty_container(swift_client, name)
+    if not delta_upload:
+        # TODO(dmatthews): Removing the existing plan files should probably
+        #                  be a Mistral action.
+        print("Removing the current plan files")
+        swiftutils.empty_container(swift_client, name)
 
     # Until we have a well defined plan update workflow in
     # tripleo-common we need to manually reset the environments and
@@ -201,13 +325,14 @@ def update_plan_from_templates(clients, name, tht_root, roles_file=None,
 
     print("Uploading new plan files")
     if keep_env:
-        _upload_templates(swift_client, name, tht_root)
+        _upload_templates(swift_client, name, tht_root, delta=delta_upload,
+                          keep=keep_file_contents)
         for filename in keep_file_contents:
             _upload_file_content(swift_client, name, filename,
                                  keep_file_contents[filename])
     else:
         _upload_templates(swift_client, name, tht_root, roles_file,
-                          plan_env_file, networks_file)
+                          plan_env_file, networks_file, delta=delta_upload)
         _update_passwords(swift_client, name, passwords)
 
     update_deployment_plan(clients, container=name,
@@ -267,7 +392,7 @@ def _upload_file_content(swift_client, container, filename, content):
 
 
 def _load_passwords(swift_client, name):
-    plan_env = yaml.safe_load(swift_client.get_object(
+    plan_env = yaml_utils.safe_load(swift_client.get_object(
         name, constants.PLAN_ENVIRONMENT)[1])
 
     if "passwords" in plan_env:
@@ -283,13 +408,13 @@ def _update_passwords(swift_client, name, passwords):
     # separate environment (https://review.opendev.org/#/c/467909/)
     if passwords:
         try:
-            env = yaml.safe_load(swift_client.get_object(
+            env = yaml_utils.safe_load(swift_client.get_object(
                 name, constants.PLAN_ENVIRONMENT)[1])
             env['passwords'] = passwords
             swift_client.put_object(name,
                                     constants.PLAN_ENVIRONMENT,
-                                    yaml.safe_dump(env,
-                                                   default_flow_style=False))
+                                    yaml_utils.safe_dump(
+                                        env, default_flow_style=False))
         except swift_exc.ClientException:
             # The plan likely has not been migrated to using Swift yet.
             LOG.debug("Could not find plan environment %s in %s",
@@ -12,10 +12,10 @@
 
 import logging
 
-import yaml
-
 from tripleo_common.actions import plan
 
+from tripleoclient import yaml_utils
+
 
 LOG = logging.getLogger(__name__)
 
@@ -39,7 +39,7 @@ def list_available_roles(clients, container='overcloud'):
     for obj in obj_client.get_container(container)[-1]:
         name = obj['name']
         if name.startswith('roles/') and name.endswith(('yml', 'yaml')):
-            role_data = yaml.safe_load(
+            role_data = yaml_utils.safe_load(
                 obj_client.get_object(container, name)[-1]
             )
             available_yaml_roles.append(role_data[0])
@@ -0,0 +1,70 @@
+#   Copyright 2020 Red Hat, Inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""YAML input and output of the client.
+
+All the YAML documents of the client are read and written with these
+helpers. They use the libyaml based loader and dumper when PyYAML was built
+with them, which are several times faster than the pure Python ones on the
+large tripleo-heat-templates documents.
+"""
+
+import yaml
+
+
+try:
+    SafeLoader = yaml.CSafeLoader
+    SafeDumper = yaml.CSafeDumper
+except AttributeError:
+    SafeLoader = yaml.SafeLoader
+    SafeDumper = yaml.SafeDumper
+
+YAMLError = yaml.YAMLError
+
+
+class NoAliasSafeDumper(SafeDumper):
+    """Dumper writing repeated objects in full instead of aliases."""
+
+    def ignore_aliases(self, data):
+        return True
+
+
+def safe_load(stream):
+    """Parse a YAML document, like `yaml.safe_load`.
+
+    :param stream: Document to parse.
+    :type stream: String or File
+
+    :returns: The python object of the document.
+    """
+
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def safe_dump(data, stream=None, **kwargs):
+    """Serialize an object to YAML, like `yaml.safe_dump`.
+
+    :param data: Object to serialize.
+    :type data: Object
+
+    :param stream: File the document is written to. The document is
+                   returned when unset.
+    :type stream: File
+
+    :returns: The document when no stream is given, None otherwise.
+    """
+
+    kwargs.setdefault('Dumper', SafeDumper)
+    return yaml.dump(data, stream, **kwargs)